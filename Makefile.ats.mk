@@ -8,7 +8,7 @@ export DATE ?= $(shell date '+%FT%T%:z')
 
 IMG_VER ?= ${VER}-${COMMIT}
 
-.PHONY: all release release_ver_to_code docker-build docker-build-image docker-build-ver docker-push docker-build-test test docker-test docker-test-ci update-crds
+.PHONY: all release release_ver_to_code docker-build docker-build-image docker-build-ver docker-push docker-build-test test benchmark benchmark-micro docker-test docker-test-ci update-crds
 
 check_defined = \
     $(strip $(foreach 1,$1, \
@@ -60,6 +60,14 @@ test-docker-run = docker $(test-docker-args) ${IMG}-test:latest
 test:
 	uv run python -m pytest $(test-command)
 
+# Run the end-to-end benchmarks against a fake cluster and compare them to benchmarks/baseline.json.
+benchmark:
+	uv run python -m benchmarks
+
+# Time the chart and catalog primitives on large generated inputs and compare them to benchmarks/micro_baseline.json.
+benchmark-micro:
+	uv run python -m benchmarks.micro
+
 docker-test: docker-build-test
 	$(test-docker-run) $(test-command)
 
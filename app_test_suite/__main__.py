@@ -7,6 +7,7 @@ import sys
 from typing import List, Optional
 
 import configargparse
+from pykube import HTTPClient, KubeConfig
 from step_exec_lib.errors import ConfigError
 from step_exec_lib.steps import BuildStepsFilteringPipeline, BuildStep, Runner
 from step_exec_lib.types import STEP_ALL
@@ -20,15 +21,35 @@ from app_test_suite.config import (
     KEY_CFG_UPGRADE_HOOK,
     KEY_CFG_STABLE_APP_FILE,
     KEY_CFG_UPGRADE_SAVE_METADATA,
+    KEY_CFG_UPGRADE_PROBE_INTERVAL,
+    KEY_CFG_UPGRADE_PROBE_PATH,
+    KEY_CFG_UPGRADE_MAX_ERROR_RATE,
+    KEY_CFG_UPGRADE_MAX_OUTAGE,
 )
+from app_test_suite.availability import DEFAULT_PROBE_PATH
+from app_test_suite.history import (
+    DEFAULT_HISTORY_DB,
+    DEFAULT_REGRESSION_MIN_DELTA_SEC,
+    DEFAULT_REGRESSION_THRESHOLD,
+    DEFAULT_REGRESSION_WINDOW,
+    HistoryFilter,
+    TimingHistory,
+)
+from app_test_suite.metrics import RunMetrics
+from app_test_suite.namespace_manager import sweep_expired_namespaces
+from app_test_suite.profiling import profiled
 from app_test_suite.steps.base import TestExecutor
 from app_test_suite.steps.executors.gotest import GotestTestFilteringPipeline
 from app_test_suite.steps.executors.pytest import PytestScenariosFilteringPipeline
 from app_test_suite.steps.test_types import ALL_STEPS
+from app_test_suite.tracing import span, start_tracing, stop_tracing
 
 TEST_EXECUTOR_AUTO = "auto"
 TEST_EXECUTOR_PYTEST = "pytest"
 TEST_EXECUTOR_GOTEST = "gotest"
+COMMAND_GC = "gc"
+COMMAND_REPORT = "report"
+REPORT_TIMINGS = "timings"
 
 ver = "v0.0.0-dev"
 app_name = "app_test_suite"
@@ -127,6 +148,28 @@ def configure_global_options(config_parser: configargparse.ArgParser) -> None:
         help="Directory where the test suite source code (pytest or go tests) can be found. Resolved relative "
         "to the working directory unless an absolute path is given.",
     )
+    config_parser.add_argument(
+        "--trace-file",
+        required=False,
+        default="",
+        help="Write the time spent in every phase of the run, like deploys, hooks and tests, to this file as a "
+        "Chrome trace-event JSON file, to be opened in Perfetto (https://ui.perfetto.dev).",
+    )
+    config_parser.add_argument(
+        "--metrics-file",
+        required=False,
+        default="",
+        help="Write phase durations, test counts, retries and cache hits of the run to this file in the Prometheus "
+        "text format, like a '.prom' file in the directory of the node exporter's textfile collector.",
+    )
+    config_parser.add_argument(
+        "--profile",
+        required=False,
+        default="",
+        metavar="PATH_PREFIX",
+        help="Profile ATS itself and write the profile to 'PATH_PREFIX.pstats', to be read with 'pstats' or "
+        "snakeviz, and the sampled stacks of every thread to 'PATH_PREFIX.collapsed', to be drawn as flamegraphs.",
+    )
     config_parser.add_argument("--version", action="version", version=f"{app_name} {get_version()}")
     config_parser.add_argument(
         "--keep-going",
@@ -195,6 +238,37 @@ def configure_test_specific_options(config_parser: configargparse.ArgParser) ->
         required=False,
         help="Save upgrade test result to a metadata file.",
     )
+    config_parser_group.add_argument(
+        KEY_CFG_UPGRADE_PROBE_INTERVAL,
+        required=False,
+        type=float,
+        default=0,
+        help="Request every Service of the release every this many seconds while the app is upgraded, through the "
+        "API server's service proxy, and report the error rate, latency and longest outage clients saw. "
+        "Use 0 to disable.",
+    )
+    config_parser_group.add_argument(
+        KEY_CFG_UPGRADE_PROBE_PATH,
+        required=False,
+        default=DEFAULT_PROBE_PATH,
+        help=f"HTTP path requested on the Services by '{KEY_CFG_UPGRADE_PROBE_INTERVAL}'.",
+    )
+    config_parser_group.add_argument(
+        KEY_CFG_UPGRADE_MAX_ERROR_RATE,
+        required=False,
+        type=float,
+        default=1.0,
+        help="Fail the upgrade test when more than this share of the probe requests of any Service failed during "
+        "the upgrade, like 0.01 for 1%%. The default of 1 never fails.",
+    )
+    config_parser_group.add_argument(
+        KEY_CFG_UPGRADE_MAX_OUTAGE,
+        required=False,
+        type=float,
+        default=0,
+        help="Fail the upgrade test when any Service was unavailable to the probe for longer than this many seconds "
+        "in a row during the upgrade. Use 0 for no limit.",
+    )
 
 
 # .yml is listed before .yaml, so .yaml wins when a directory has both.
@@ -264,24 +338,223 @@ def get_config(steps: List[BuildStep]) -> configargparse.Namespace:
     return config
 
 
+def get_gc_config_parser() -> configargparse.ArgParser:
+    config_parser = configargparse.ArgParser(
+        prog=f"{app_name} {COMMAND_GC}",
+        description="Delete expired namespaces generated by ATS runs using '--app-tests-namespace-mode'.",
+        add_env_var_help=True,
+        auto_env_var_prefix="ATS_",
+        formatter_class=configargparse.ArgumentDefaultsHelpFormatter,
+    )
+    config_parser.add_argument(
+        "-d",
+        "--debug",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Enable debug messages.",
+    )
+    config_parser.add_argument(
+        "--cluster-kubeconfig",
+        required=True,
+        help="Path to the 'kubeconfig' file of the cluster to sweep.",
+    )
+    config_parser.add_argument(
+        "--dry-run",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Only list the expired namespaces, don't delete them.",
+    )
+    config_parser.add_argument(
+        "--run-id",
+        required=False,
+        help="Delete all the namespaces of this run, whether they expired or not.",
+    )
+    return config_parser
+
+
+def gc_main(argv: List[str]) -> None:
+    config = get_gc_config_parser().parse_args(argv)
+    if config.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    if not os.path.isfile(config.cluster_kubeconfig):
+        logger.error(f"Kubeconfig file '{config.cluster_kubeconfig}' not found.")
+        sys.exit(1)
+    kube_client = HTTPClient(KubeConfig.from_file(config.cluster_kubeconfig))
+    expired = sweep_expired_namespaces(kube_client, dry_run=config.dry_run, run_id=config.run_id)
+    logger.info(f"Found {len(expired)} expired namespace(s): {expired}.")
+
+
+def get_report_config_parser() -> configargparse.ArgParser:
+    config_parser = configargparse.ArgParser(
+        prog=f"{app_name} {COMMAND_REPORT}",
+        description="Report on the test timings recorded in the local history database by past ATS runs.",
+        add_env_var_help=True,
+        auto_env_var_prefix="ATS_",
+        formatter_class=configargparse.ArgumentDefaultsHelpFormatter,
+    )
+    config_parser.add_argument(
+        "report",
+        choices=[REPORT_TIMINGS],
+        help="The report to show.",
+    )
+    config_parser.add_argument(
+        "-d",
+        "--debug",
+        required=False,
+        default=False,
+        action="store_true",
+        help="Enable debug messages.",
+    )
+    config_parser.add_argument(
+        "--history-db",
+        required=False,
+        default=DEFAULT_HISTORY_DB,
+        help="Path to the history database written by '--app-tests-history-db'.",
+    )
+    config_parser.add_argument("--chart", required=False, help="Only report the tests of this chart.")
+    config_parser.add_argument(
+        "--test-type", required=False, help="Only report the tests of this test type, like 'functional'."
+    )
+    config_parser.add_argument(
+        "--cluster-type", required=False, help="Only report the tests run on this cluster type, like 'kind'."
+    )
+    config_parser.add_argument(
+        "--limit",
+        required=False,
+        default=20,
+        type=int,
+        help="How many of the slowest tests to show.",
+    )
+    config_parser.add_argument(
+        "--regression-threshold",
+        required=False,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        type=float,
+        help="Report a test as regressed when its latest passing run took this many times its baseline.",
+    )
+    config_parser.add_argument(
+        "--regression-min-delta",
+        required=False,
+        default=DEFAULT_REGRESSION_MIN_DELTA_SEC,
+        type=float,
+        help="Ignore regressions smaller than this many seconds.",
+    )
+    config_parser.add_argument(
+        "--regression-window",
+        required=False,
+        default=DEFAULT_REGRESSION_WINDOW,
+        type=int,
+        help="How many previous passing runs the baseline (their median duration) is computed from.",
+    )
+    config_parser.add_argument(
+        "--csv",
+        required=False,
+        help="Also export all the recorded test results matching the filters to this CSV file ('-' for stdout).",
+    )
+    return config_parser
+
+
+def report_main(argv: List[str]) -> None:
+    config = get_report_config_parser().parse_args(argv)
+    if config.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    if not os.path.isfile(config.history_db):
+        logger.error(f"History database '{config.history_db}' not found. Run tests with '--app-tests-history-db'.")
+        sys.exit(1)
+    history = TimingHistory(config.history_db)
+    history_filter = HistoryFilter(chart=config.chart, test_type=config.test_type, cluster_type=config.cluster_type)
+
+    print(f"Slowest tests (average of all recorded runs, top {config.limit}):")
+    print(f"{'avg [s]':>9} {'max [s]':>9} {'runs':>5} {'failed':>6}  test")
+    for row in history.slowest_tests(history_filter, config.limit):
+        print(
+            f"{row['avg_sec']:9.2f} {row['max_sec']:9.2f} {row['runs']:5d} {row['failures']:6d}  "
+            f"{row['chart']}/{row['test_type']}/{row['cluster_type']}: {row['classname']}::{row['name']}"
+        )
+
+    regressions = history.regressions(
+        history_filter, config.regression_threshold, config.regression_min_delta, config.regression_window
+    )
+    print(f"\nRegressions (latest run over {config.regression_threshold}x the baseline): {len(regressions)}")
+    for row in regressions:
+        print(
+            f"{row['latest_sec']:9.2f} {row['baseline_sec']:9.2f} {row['ratio']:5.1f}x  "
+            f"{row['chart']}/{row['test_type']}/{row['cluster_type']}: {row['classname']}::{row['name']}"
+        )
+
+    if config.csv == "-":
+        history.export_csv(history_filter, sys.stdout)
+    elif config.csv:
+        with open(config.csv, "w", newline="", encoding="utf-8") as f:
+            count = history.export_csv(history_filter, f)
+        logger.info(f"Exported {count} test result(s) to '{config.csv}'.")
+
+
+class TracingRunner(Runner):
+    """Runs the steps of the pipelines like ``Runner``, with a trace span for each of its stages."""
+
+    def run_pre_steps(self) -> None:
+        with span("pre_run validation", "config"):
+            super().run_pre_steps()
+
+    def run_build_steps(self) -> None:
+        with span("run", "run"):
+            super().run_build_steps()
+
+    def run_cleanup(self) -> None:
+        with span("cleanup", "teardown"):
+            super().run_cleanup()
+
+
 def main() -> None:
     log_format = "%(asctime)s %(name)s %(levelname)s: %(message)s"
     logging.basicConfig(format=log_format)
     logging.getLogger().setLevel(logging.INFO)
 
-    global_only_config_parser = get_global_config_parser(add_help=False)
-    global_only_config = global_only_config_parser.parse_known_args()[0]
-    if global_only_config.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
+    if len(sys.argv) > 1 and sys.argv[1] == COMMAND_GC:
+        gc_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == COMMAND_REPORT:
+        report_main(sys.argv[2:])
+        return
+
+    profile = get_global_config_parser(add_help=False).parse_known_args()[0].profile
+    with profiled(profile):
+        run_tests()
 
-    test_executor = global_only_config.test_executor
-    if test_executor == TEST_EXECUTOR_AUTO:
-        test_executor = detect_test_executor(global_only_config.tests_dir, get_chart_file_from_argv())
 
-    steps = get_pipeline(test_executor)
-    config = get_config(steps)
-    runner = Runner(config, steps)
-    runner.run()
+def run_tests() -> None:
+    tracer = start_tracing()
+    trace_file = ""
+    metrics_file = ""
+    succeeded = False
+    try:
+        with span("config parsing", "config"):
+            global_only_config_parser = get_global_config_parser(add_help=False)
+            global_only_config = global_only_config_parser.parse_known_args()[0]
+            trace_file = global_only_config.trace_file
+            metrics_file = global_only_config.metrics_file
+            if global_only_config.debug:
+                logging.getLogger().setLevel(logging.DEBUG)
+
+            test_executor = global_only_config.test_executor
+            if test_executor == TEST_EXECUTOR_AUTO:
+                test_executor = detect_test_executor(global_only_config.tests_dir, get_chart_file_from_argv())
+
+            steps = get_pipeline(test_executor)
+            config = get_config(steps)
+        runner = TracingRunner(config, steps)
+        runner.run()
+        succeeded = True
+    finally:
+        # also written when the run fails and exits, as that's when the trace is needed the most
+        stop_tracing()
+        if trace_file:
+            tracer.write(trace_file)
+        if metrics_file:
+            RunMetrics(tracer.events, succeeded).write(metrics_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import pykube
+from pykube import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROBE_PATH = "/"
+# a request slower than that counts as failed, the client wouldn't wait longer either
+_PROBE_TIMEOUT_SEC = 5.0
+
+
+@dataclass
+class ProbeTarget:
+    """A port of a Service, requested through the API server's service proxy."""
+
+    service: str
+    port: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.service}:{self.port}"
+
+
+@dataclass
+class AvailabilityReport:
+    """What clients of a Service experienced while it was probed."""
+
+    target: str
+    samples: List[Tuple[float, bool, float]] = field(default_factory=list)
+    """Probes as (seconds since probing started, whether the request succeeded, latency in seconds)."""
+
+    @property
+    def requests(self) -> int:
+        return len(self.samples)
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for _, ok, _ in self.samples if not ok)
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.samples else 0.0
+
+    @property
+    def longest_outage_sec(self) -> float:
+        """Longest time from a failed request until the next successful one, or the last request if none followed."""
+        longest = 0.0
+        outage_started: Optional[float] = None
+        for offset_sec, ok, _ in self.samples:
+            if not ok and outage_started is None:
+                outage_started = offset_sec
+            elif ok and outage_started is not None:
+                longest = max(longest, offset_sec - outage_started)
+                outage_started = None
+        if outage_started is not None:
+            last_offset_sec, _, last_latency_sec = self.samples[-1]
+            longest = max(longest, last_offset_sec + last_latency_sec - outage_started)
+        return longest
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Return the 50th, 90th and 99th percentile of the latency of the successful requests, in seconds."""
+        latencies = [latency_sec for _, ok, latency_sec in self.samples if ok]
+        if len(latencies) < 2:
+            return {f"p{p}": latencies[0] for p in (50, 90, 99)} if latencies else {}
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        return {f"p{p}": quantiles[p - 1] for p in (50, 90, 99)}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "errorRate": round(self.error_rate, 4),
+            "longestOutageSec": round(self.longest_outage_sec, 3),
+            "latencySec": {name: round(value, 4) for name, value in self.latency_percentiles().items()},
+        }
+
+
+def find_probe_targets(kube_client: HTTPClient, namespace: str) -> List[ProbeTarget]:
+    """Return the first TCP port of every Service in the namespace that routes to pods."""
+    targets: List[ProbeTarget] = []
+    for service in pykube.Service.objects(kube_client).filter(namespace=namespace):
+        spec = service.obj.get("spec", {})
+        if spec.get("type") == "ExternalName" or not spec.get("selector"):
+            continue
+        ports = [p for p in spec.get("ports", []) if p.get("protocol", "TCP") == "TCP"]
+        if ports:
+            targets.append(ProbeTarget(service.name, ports[0]["port"]))
+    return sorted(targets, key=lambda t: t.name)
+
+
+class AvailabilityProbe:
+    """
+    Requests the Services of a release at a fixed rate from background threads, to measure what clients see.
+
+    Every target is requested every ``interval_sec`` by a thread of its own, through the API server's service proxy,
+    so the pods are reached from inside the cluster without port-forwards. A request fails on a connection error,
+    a timeout or a 5xx response, like the 503 the proxy returns while a Service has no ready endpoints; any other
+    response means the app answered.
+
+    ``kube_client`` should neither retry nor rate limit requests, so it can't be the client shared through the
+    cluster manager: retries would turn failed requests into slow successes and the rate limiter would delay them,
+    hiding the outages the probe is there to see. The probe owns the client and closes its session when stopped.
+    """
+
+    def __init__(
+        self, kube_client: HTTPClient, namespace: str, targets: List[ProbeTarget], interval_sec: float, path: str
+    ):
+        self._kube_client = kube_client
+        self._namespace = namespace
+        self._targets = targets
+        self._interval_sec = interval_sec
+        self._path = path.lstrip("/")
+        self._reports = {t.name: AvailabilityReport(t.name) for t in targets}
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started_at = 0.0
+
+    def start(self) -> "AvailabilityProbe":
+        self._started_at = time.monotonic()
+        for target in self._targets:
+            thread = threading.Thread(target=self._run, args=(target,), name=f"ats-probe-{target.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> Dict[str, AvailabilityReport]:
+        """Stop probing and return what every target experienced, by target name."""
+        self._stopped.set()
+        try:
+            for thread in self._threads:
+                thread.join()
+        finally:
+            self._kube_client.session.close()
+        return self._reports
+
+    def _run(self, target: ProbeTarget) -> None:
+        report = self._reports[target.name]
+        next_probe = time.monotonic()
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            ok = self.probe(target)
+            report.samples.append((round(started - self._started_at, 3), ok, time.monotonic() - started))
+            # requests start at a fixed rate, whatever they take, unless one takes longer than the interval
+            next_probe = max(next_probe + self._interval_sec, time.monotonic())
+            if self._stopped.wait(next_probe - time.monotonic()):
+                return
+
+    def probe(self, target: ProbeTarget) -> bool:
+        try:
+            response = self._kube_client.get(
+                namespace=self._namespace,
+                url=f"services/{target.service}:{target.port}/proxy/{self._path}",
+                timeout=_PROBE_TIMEOUT_SEC,
+            )
+        except Exception as e:
+            logger.debug(f"Probing '{target.name}' failed: {e}")
+            return False
+        return response.status_code < 500
+
+
+def summarize_availability(reports: Dict[str, AvailabilityReport]) -> Dict[str, Dict[str, Any]]:
+    """Return the error rate, longest outage and latency percentiles of every target, by target name."""
+    return {name: report.summary() for name, report in sorted(reports.items())}
+
+
+def write_availability(path: str, namespace: str, interval_sec: float, reports: Dict[str, AvailabilityReport]) -> None:
+    """Write every probe request of every target, with their summary, as a JSON file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "namespace": namespace,
+                "intervalSec": interval_sec,
+                "services": {
+                    name: {**report.summary(), "samples": [list(s) for s in report.samples]}
+                    for name, report in sorted(reports.items())
+                },
+            },
+            f,
+            indent=2,
+        )
@@ -1,12 +1,22 @@
 import argparse
 import logging
 import os
+import threading
 from dataclasses import dataclass
+from typing import List
 
 import configargparse
+from pykube import HTTPClient
 from step_exec_lib.errors import ConfigError
 from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
 
+from app_test_suite.kube_client import (
+    DEFAULT_API_BURST,
+    DEFAULT_API_QPS,
+    DEFAULT_API_RETRIES,
+    build_kube_client,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +30,13 @@ class ClusterInfo:
     version: str
     # a flag indicating if the required dependency CRDs were already bootstrapped on this cluster
     dependency_crds_ready: bool = False
+    # client-side limit of API requests per second (0 disables it) and the burst allowed above it
+    api_qps: float = DEFAULT_API_QPS
+    api_burst: int = DEFAULT_API_BURST
+    # how many times a throttled or transiently failed API request is retried
+    api_retries: int = DEFAULT_API_RETRIES
+    # short name of the cluster in logs and reports; only set for the clusters of the compatibility tests
+    name: str = ""
 
 
 class ClusterManager:
@@ -28,15 +45,23 @@ class ClusterManager:
 
     ATS does not create or destroy clusters: the user must provide a kubeconfig for an existing
     cluster via '--cluster-kubeconfig'. The same cluster is shared across all test scenarios
-    (smoke, functional, upgrade), so the required dependency CRDs are bootstrapped only once.
+    (smoke, functional, upgrade), so the required dependency CRDs are bootstrapped only once, and all of
+    them share a single pooled, rate limited and retrying API client (see 'get_kube_client').
     """
 
     KEY_CONFIG_OPTION_KUBECONFIG = "--cluster-kubeconfig"
     KEY_CONFIG_OPTION_CLUSTER_TYPE = "--cluster-type"
     KEY_CONFIG_OPTION_CLUSTER_VERSION = "--cluster-version"
+    KEY_CONFIG_OPTION_API_QPS = "--cluster-api-qps"
+    KEY_CONFIG_OPTION_API_BURST = "--cluster-api-burst"
+    KEY_CONFIG_OPTION_API_RETRIES = "--cluster-api-retries"
+    KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS = "--cluster-compatibility-kubeconfigs"
 
     def __init__(self) -> None:
         self._cluster_info: ClusterInfo | None = None
+        self._compatibility_clusters: List[ClusterInfo] = []
+        self._kube_client: HTTPClient | None = None
+        self._kube_client_lock = threading.Lock()
 
     def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
         config_parser.add_argument(
@@ -56,6 +81,36 @@ class ClusterManager:
             help="An optional free-text label identifying the cluster version. Exported to tests as "
             "'ATS_CLUSTER_VERSION' and saved in upgrade test metadata.",
         )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_API_QPS,
+            required=False,
+            type=float,
+            default=DEFAULT_API_QPS,
+            help="Client-side limit of requests per second ATS sends to the cluster's API server. Use 0 to disable.",
+        )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_API_BURST,
+            required=False,
+            type=int,
+            default=DEFAULT_API_BURST,
+            help="Number of API requests that can be sent at once before the QPS limit kicks in.",
+        )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_API_RETRIES,
+            required=False,
+            type=int,
+            default=DEFAULT_API_RETRIES,
+            help="How many times an API request is retried when it's throttled (429) or fails transiently.",
+        )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS,
+            required=False,
+            nargs="*",
+            default=[],
+            help="Kubeconfig files of the clusters the compatibility tests run on at once, like clusters with "
+            "different Kubernetes versions. Every entry is '[name=]path'; the name defaults to the file name "
+            "without its extension and identifies the cluster in logs and reports.",
+        )
 
     def pre_run(self, config: argparse.Namespace) -> None:
         kube_config_path = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_KUBECONFIG)
@@ -71,13 +126,86 @@ class ClusterManager:
             )
         cluster_type = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_CLUSTER_TYPE) or ""
         cluster_version = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_CLUSTER_VERSION) or ""
+        api_qps = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_API_QPS)
+        api_burst = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_API_BURST)
+        api_retries = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_API_RETRIES)
+        if api_qps < 0:
+            raise ConfigError(self.KEY_CONFIG_OPTION_API_QPS, "API QPS limit can't be negative.")
+        if api_burst < 1:
+            raise ConfigError(self.KEY_CONFIG_OPTION_API_BURST, "API burst must be at least 1.")
+        if api_retries < 0:
+            raise ConfigError(self.KEY_CONFIG_OPTION_API_RETRIES, "API retries count can't be negative.")
         self._cluster_info = ClusterInfo(
             kube_config_path=kube_config_path,
             cluster_type=cluster_type,
             version=cluster_version,
+            api_qps=api_qps,
+            api_burst=api_burst,
+            api_retries=api_retries,
         )
+        self._compatibility_clusters = []
+        for entry in (
+            get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS) or []
+        ):
+            name, sep, path = entry.partition("=")
+            if not sep:
+                name, path = os.path.splitext(os.path.basename(entry))[0], entry
+            if not name:
+                raise ConfigError(
+                    self.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS, f"Cluster name in '{entry}' can't be empty."
+                )
+            if not os.path.isfile(path):
+                raise ConfigError(
+                    self.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS, f"Kubeconfig file '{path}' not found."
+                )
+            if name in {c.name for c in self._compatibility_clusters}:
+                raise ConfigError(
+                    self.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS,
+                    f"Cluster name '{name}' is used more than once; name the clusters with '<name>=<path>'.",
+                )
+            self._compatibility_clusters.append(
+                ClusterInfo(
+                    kube_config_path=path,
+                    cluster_type=cluster_type,
+                    # detected from the API server when the tests run
+                    version="",
+                    api_qps=api_qps,
+                    api_burst=api_burst,
+                    api_retries=api_retries,
+                    name=name,
+                )
+            )
 
     def get_cluster(self) -> ClusterInfo:
         if self._cluster_info is None:
             raise ValueError("Cluster info was requested before it was initialized in 'pre_run'.")
         return self._cluster_info
+
+    def get_compatibility_clusters(self) -> List[ClusterInfo]:
+        """Return the clusters the compatibility tests run on, in the configured order."""
+        return self._compatibility_clusters
+
+    def get_kube_client(self) -> HTTPClient:
+        """Return the API client shared by all the scenarios, creating it on first use."""
+        cluster_info = self.get_cluster()
+        with self._kube_client_lock:
+            if self._kube_client is None:
+                logger.debug(
+                    f"Creating API client for '{cluster_info.kube_config_path}' (QPS: {cluster_info.api_qps}, "
+                    f"burst: {cluster_info.api_burst}, retries: {cluster_info.api_retries})."
+                )
+                self._kube_client = build_kube_client(
+                    cluster_info.kube_config_path,
+                    qps=cluster_info.api_qps,
+                    burst=cluster_info.api_burst,
+                    retries=cluster_info.api_retries,
+                )
+            return self._kube_client
+
+
+class StaticClusterManager(ClusterManager):
+    """Provides a single, already configured cluster, like one of the clusters of the compatibility tests."""
+
+    def __init__(self, cluster_info: ClusterInfo) -> None:
+        super().__init__()
+        self._cluster_info = cluster_info
@@ -9,3 +9,7 @@ KEY_CFG_STABLE_APP_VERSION = "--upgrade-tests-app-version"
 KEY_CFG_STABLE_APP_CONFIG = "--upgrade-tests-app-config-file"
 KEY_CFG_UPGRADE_HOOK = "--upgrade-tests-upgrade-hook"
 KEY_CFG_UPGRADE_SAVE_METADATA = "--upgrade-tests-save-metadata"
+KEY_CFG_UPGRADE_PROBE_INTERVAL = "--upgrade-tests-probe-interval"
+KEY_CFG_UPGRADE_PROBE_PATH = "--upgrade-tests-probe-path"
+KEY_CFG_UPGRADE_MAX_ERROR_RATE = "--upgrade-tests-max-error-rate"
+KEY_CFG_UPGRADE_MAX_OUTAGE = "--upgrade-tests-max-outage"
@@ -0,0 +1,273 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
+from app_test_suite.namespace_manager import LABEL_PREFIX, to_dns_label
+from app_test_suite.processes import Deadline, run_and_log
+from app_test_suite.tracing import span
+
+DEPLOY_ENGINE_HELM = "helm"
+DEPLOY_ENGINE_TEMPLATE = "template"
+DEPLOY_ENGINES = [DEPLOY_ENGINE_HELM, DEPLOY_ENGINE_TEMPLATE]
+DEFAULT_MANIFEST_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "app-test-suite", "manifests")
+
+LABEL_RELEASE = f"{LABEL_PREFIX}/release"
+FIELD_MANAGER = "app-test-suite"
+_WORKLOAD_KINDS = ("Deployment", "StatefulSet", "DaemonSet")
+_CRD_KIND = "CustomResourceDefinition"
+# built-in kinds that must not get a namespace; the API server drops the namespace of other cluster-scoped objects
+_CLUSTER_SCOPED_KINDS = (
+    _CRD_KIND,
+    "APIService",
+    "ClusterRole",
+    "ClusterRoleBinding",
+    "IngressClass",
+    "MutatingWebhookConfiguration",
+    "Namespace",
+    "PersistentVolume",
+    "PriorityClass",
+    "StorageClass",
+    "ValidatingWebhookConfiguration",
+)
+_HELM_BIN = "helm"
+_KUBECTL_BIN = "kubectl"
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+# deleting runs during teardown, possibly after the scenario deadline expired; same as the default of 'helm uninstall'
+_DELETE_TIMEOUT_SEC = 300
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: Optional[str]) -> str:
+    """Return the sha256 hex digest of a file's content, or of an empty input if no file is given."""
+    digest = hashlib.sha256()
+    if path:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_DIGEST_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def label_manifests(manifests: str, release_name: str, namespace: str) -> Tuple[str, List[Tuple[str, str, str]]]:
+    """
+    Add the release-scoped label to every rendered object and put namespaced objects without one into ``namespace``.
+
+    Returns the labelled manifests and the ``(kind, namespace, name)`` tuples of the workloads found in them.
+    """
+    docs = []
+    workloads: List[Tuple[str, str, str]] = []
+    release_label = to_dns_label(release_name)
+    for doc in yaml.safe_load_all(manifests):
+        if not isinstance(doc, dict) or not doc.get("kind"):
+            continue
+        metadata = doc.setdefault("metadata", {})
+        labels = metadata.get("labels") or {}
+        labels[LABEL_RELEASE] = release_label
+        metadata["labels"] = labels
+        if not metadata.get("namespace") and doc["kind"] not in _CLUSTER_SCOPED_KINDS:
+            metadata["namespace"] = namespace
+        if doc["kind"] in _WORKLOAD_KINDS:
+            workloads.append((doc["kind"], metadata["namespace"], metadata.get("name", "")))
+        docs.append(doc)
+    return yaml.safe_dump_all(docs, default_flow_style=False), workloads
+
+
+def without_crds(manifests: str) -> str:
+    """Return the manifests without the CustomResourceDefinitions, which are left in the cluster on delete."""
+    docs = [doc for doc in yaml.safe_load_all(manifests) if isinstance(doc, dict) and doc.get("kind") != _CRD_KIND]
+    return yaml.safe_dump_all(docs, default_flow_style=False)
+
+
+class ManifestDeployer:
+    """
+    Alternative to 'helm upgrade --install': renders the chart once with 'helm template' and applies it.
+
+    Rendered manifests are cached on disk keyed by the chart digest, the values digest, the release name, the
+    namespace and the Kubernetes version of the cluster, so repeated deploys of the same chart (smoke,
+    functional and both upgrade stages, or later runs sharing the cache directory) skip rendering. Objects are
+    applied with server-side apply and labelled with the release name, which is used to prune objects dropped
+    by a newer chart version. Objects keep the namespace set by the chart, like with Helm; only the ones
+    without it go to the deploy namespace. Rendering and applying are bound by the given ``Deadline``;
+    deleting has its own timeout.
+    """
+
+    def __init__(self, cache_dir: str, rollout_timeout: str):
+        self._cache_dir = cache_dir
+        self._rollout_timeout = rollout_timeout
+        # rendered manifest file of every release applied by this deployer
+        self._applied: Dict[Tuple[str, str], str] = {}
+
+    def for_another_cluster(self) -> "ManifestDeployer":
+        """Return a deployer sharing the manifest cache, but not the applied releases, to deploy to another cluster."""
+        return ManifestDeployer(self._cache_dir, self._rollout_timeout)
+
+    def render(
+        self,
+        release_name: str,
+        chart_file: str,
+        namespace: str,
+        values_file: Optional[str],
+        kube_version: str,
+        env: Dict[str, str],
+        deadline: Deadline,
+    ) -> str:
+        """
+        Render the chart and return the path of the cached, labelled manifests file.
+
+        ``kube_version`` is the version of the target cluster, used for the chart's '.Capabilities'; if empty,
+        Helm's built-in default is used.
+        """
+        key = hashlib.sha256(
+            "\n".join(
+                [file_digest(chart_file), file_digest(values_file), release_name, namespace, kube_version]
+            ).encode()
+        ).hexdigest()
+        manifest_path = os.path.join(self._cache_dir, f"{to_dns_label(release_name)}-{key[:32]}.yaml")
+        cached = os.path.isfile(manifest_path)
+        with span("manifest rendering", "cache", cache="manifests", hits=int(cached), lookups=1):
+            if cached:
+                logger.info(f"Using cached manifests '{manifest_path}' for release '{release_name}'.")
+                return manifest_path
+            return self._render(
+                release_name, chart_file, namespace, values_file, kube_version, env, deadline, manifest_path
+            )
+
+    def _render(
+        self,
+        release_name: str,
+        chart_file: str,
+        namespace: str,
+        values_file: Optional[str],
+        kube_version: str,
+        env: Dict[str, str],
+        deadline: Deadline,
+        manifest_path: str,
+    ) -> str:
+        args = [
+            _HELM_BIN,
+            "template",
+            release_name,
+            chart_file,
+            "--namespace",
+            namespace,
+            "--include-crds",
+            "--skip-tests",
+        ]
+        if values_file:
+            args += ["--values", values_file]
+        # no '--validate': it fails on custom resources whose CRDs are installed by the chart itself
+        if kube_version:
+            args += ["--kube-version", kube_version]
+        logger.info(f"Rendering chart '{chart_file}' for release '{release_name}'.")
+        # the chart file is the user's responsibility
+        run_res = run_and_log(args, timeout_sec=deadline.timeout(), env=env, capture_output=True)  # nosec
+        if run_res.returncode != 0:
+            raise ATSTestError(f"Rendering chart '{chart_file}' with 'helm template' failed:\n{run_res.stderr}")
+        labelled, _ = label_manifests(run_res.stdout, release_name, namespace)
+        self._write(manifest_path, labelled)
+        logger.info(f"Rendered manifests cached in '{manifest_path}'.")
+        return manifest_path
+
+    def _write(self, path: str, manifests: str) -> None:
+        os.makedirs(self._cache_dir, exist_ok=True)
+        # write to a temporary file first, so concurrent runs never see a partially written file
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(manifests)
+        os.replace(tmp_path, path)
+
+    def deploy(
+        self,
+        release_name: str,
+        chart_file: str,
+        namespace: str,
+        values_file: Optional[str],
+        kube_version: str,
+        env: Dict[str, str],
+        deadline: Deadline,
+    ) -> str:
+        """Render (or reuse) the manifests, apply them and wait for the workloads to roll out."""
+        manifest_path = self.render(release_name, chart_file, namespace, values_file, kube_version, env, deadline)
+        with open(manifest_path) as f:
+            _, workloads = label_manifests(f.read(), release_name, namespace)
+
+        logger.info(f"Applying manifests of release '{release_name}' with default namespace '{namespace}'.")
+        # no '--namespace': kubectl rejects objects whose namespace differs from it, like the PolicyExceptions
+        # of Giant Swarm charts; every namespaced object already has its namespace set while rendering
+        args = [
+            _KUBECTL_BIN,
+            "apply",
+            "--server-side",
+            "--force-conflicts",
+            f"--field-manager={FIELD_MANAGER}",
+            "--filename",
+            manifest_path,
+            "--prune",
+            "--selector",
+            f"{LABEL_RELEASE}={to_dns_label(release_name)}",
+        ]
+        run_res = run_and_log(args, timeout_sec=deadline.timeout(), env=env)  # nosec
+        if run_res.returncode != 0:
+            raise ATSTestError(f"Applying manifests of release '{release_name}' failed")
+        self._applied[(release_name, namespace)] = manifest_path
+
+        for kind, workload_namespace, name in workloads:
+            run_res = run_and_log(
+                [
+                    _KUBECTL_BIN,
+                    "rollout",
+                    "status",
+                    f"{kind.lower()}/{name}",
+                    "--namespace",
+                    workload_namespace,
+                    "--timeout",
+                    self._rollout_timeout,
+                ],
+                timeout_sec=deadline.timeout(),
+                env=env,
+            )  # nosec
+            if run_res.returncode != 0:
+                raise ATSTestError(f"{kind} '{name}' of release '{release_name}' didn't become ready")
+        return manifest_path
+
+    def delete(self, release_name: str, namespace: str, env: Dict[str, str]) -> bool:
+        """
+        Delete the objects of a release applied by this deployer. Returns False if it wasn't applied.
+
+        CustomResourceDefinitions are kept, like 'helm uninstall' does, as deleting them deletes all their
+        objects in the whole cluster.
+        """
+        manifest_path = self._applied.pop((release_name, namespace), None)
+        if manifest_path is None:
+            return False
+        logger.info(f"Deleting objects of release '{release_name}' with default namespace '{namespace}'.")
+        with open(manifest_path) as f:
+            manifests = without_crds(f.read())
+        delete_path = f"{os.path.splitext(manifest_path)[0]}-delete.yaml"
+        self._write(delete_path, manifests)
+        try:
+            run_res = run_and_log(
+                [
+                    _KUBECTL_BIN,
+                    "delete",
+                    "--filename",
+                    delete_path,
+                    "--ignore-not-found",
+                    "--wait",
+                    "--timeout",
+                    f"{_DELETE_TIMEOUT_SEC}s",
+                ],
+                timeout_sec=_DELETE_TIMEOUT_SEC,
+                env=env,
+            )  # nosec
+        except ATSTimeoutError as e:
+            logger.warning(f"Deleting objects of release '{release_name}' timed out; continuing: {e}")
+            return True
+        if run_res.returncode != 0:
+            logger.warning(f"Deleting objects of release '{release_name}' failed; continuing.")
+        return True
@@ -0,0 +1,414 @@
+import io
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pykube
+import yaml
+from pykube import HTTPClient
+
+from app_test_suite.errors import ATSTimeoutError
+from app_test_suite.namespace_manager import to_dns_label
+from app_test_suite.processes import run_and_log
+from app_test_suite.tracing import span
+
+DEFAULT_DIAGNOSTICS_WORKERS = 8
+DEFAULT_DIAGNOSTICS_CALL_TIMEOUT_SEC = 30
+DEFAULT_DIAGNOSTICS_DEADLINE_SEC = 180
+DEFAULT_DIAGNOSTICS_DIR = "ats-diagnostics"
+_HELM_BIN = "helm"
+_POLL_INTERVAL_SEC = 0.1
+_SPOOL_MAX_BYTES = 1024 * 1024
+_INDEX_FILE = "index.yaml"
+_SEPARATOR = "=" * 80
+
+logger = logging.getLogger(__name__)
+
+# a single line of diagnostics output: log level and message
+Record = Tuple[int, str]
+
+
+@dataclass
+class DiagnosticsLimits:
+    # maximum number of diagnostics calls running at the same time
+    workers: int = DEFAULT_DIAGNOSTICS_WORKERS
+    # maximum time a single call (an API request or a 'helm' command) may take
+    call_timeout_sec: float = DEFAULT_DIAGNOSTICS_CALL_TIMEOUT_SEC
+    # maximum time the whole collection may take; whatever is ready by then is reported
+    deadline_sec: float = DEFAULT_DIAGNOSTICS_DEADLINE_SEC
+
+
+@dataclass
+class _Task:
+    label: str
+    future: "Future[List[Record]]"
+    started_at: List[float] = field(default_factory=list)
+
+
+class _Output(ABC):
+    """Where a diagnostics task sends what it collected; every task gets its own instance."""
+
+    def __init__(self) -> None:
+        # records logged once the task is reported, in the fixed report order
+        self.records: List[Record] = []
+
+    @abstractmethod
+    def add(self, path: str, title: str, lines: Iterable[str]) -> None:
+        """Add a diagnostics item, stored as ``path`` in the bundle."""
+        raise NotImplementedError
+
+    def summary(self, message: str) -> None:
+        """Add a line that is worth logging even when the items themselves go to the bundle."""
+
+    def warning(self, message: str) -> None:
+        self.records.append((logging.WARNING, message))
+
+
+class _LogOutput(_Output):
+    def add(self, path: str, title: str, lines: Iterable[str]) -> None:
+        self.records.append((logging.ERROR, title))
+        self.records.extend((logging.ERROR, line) for line in lines)
+
+
+class _BundleOutput(_Output):
+    def __init__(self, bundle: "DiagnosticsBundle"):
+        super().__init__()
+        self._bundle = bundle
+
+    def add(self, path: str, title: str, lines: Iterable[str]) -> None:
+        self._bundle.add(path, title, lines)
+
+    def summary(self, message: str) -> None:
+        self.records.append((logging.ERROR, message))
+
+
+class DiagnosticsBundle:
+    """
+    A '.tar.gz' archive that diagnostics items are streamed into.
+
+    Each item is spooled to a temporary file (kept in memory only while it's small) and appended to the
+    archive as soon as it's complete, so memory use doesn't grow with the number or size of items. The
+    archive is written under a temporary name and moved into place by ``close``, together with an
+    ``index.yaml`` listing every item.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # a unique temporary file, as concurrent scenarios may write bundles into the same directory
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        os.close(fd)
+        self._tar = tarfile.open(self._tmp_path, "w:gz")
+        self._lock = threading.Lock()
+        self._closed = False
+        self._entries: List[Dict[str, Any]] = []
+
+    def add(self, path: str, title: str, lines: Iterable[str]) -> None:
+        with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES) as buffer:
+            for line in lines:
+                buffer.write(line.encode())
+                if not line.endswith("\n"):
+                    buffer.write(b"\n")
+            size = buffer.tell()
+            buffer.seek(0)
+            with self._lock:
+                # calls abandoned after a timeout may still finish once the bundle is closed
+                if self._closed:
+                    return
+                self._tar.addfile(self._tar_info(path, size), buffer)
+                self._entries.append({"path": path, "title": title.strip("- "), "size": size})
+
+    def close(self, metadata: Dict[str, Any]) -> int:
+        """Write the index and move the bundle into place. Returns the number of items in the bundle."""
+        with self._lock:
+            self._closed = True
+            index = yaml.safe_dump(
+                {**metadata, "items": sorted(self._entries, key=lambda e: e["path"])}, default_flow_style=False
+            ).encode()
+            self._tar.addfile(self._tar_info(_INDEX_FILE, len(index)), io.BytesIO(index))
+            self._tar.close()
+            os.replace(self._tmp_path, self.path)
+            return len(self._entries)
+
+    @staticmethod
+    def _tar_info(path: str, size: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(path)
+        info.size = size
+        info.mtime = int(time.time())
+        return info
+
+
+class FailureDiagnosticsCollector:
+    """
+    Collects cluster diagnostics of a failed test run, before cleanup destroys the evidence.
+
+    All the API calls and 'helm' commands run concurrently on a bounded thread pool. Every call is limited
+    by a per-call timeout and the whole collection by an overall deadline. The output is always reported
+    in the same order no matter which call finished first, and the results that are ready when the
+    deadline hits are still reported.
+
+    When ``bundle_dir`` is given, the collected items are streamed into a '.tar.gz' bundle in that directory,
+    organised per namespace, pod and container, and only a compact summary is logged. Otherwise, everything
+    is logged.
+    """
+
+    def __init__(
+        self,
+        kube_client: HTTPClient,
+        helm_env: Dict[str, str],
+        limits: DiagnosticsLimits,
+        bundle_dir: Optional[str] = None,
+    ):
+        self._kube_client = kube_client
+        self._helm_env = helm_env
+        self._limits = limits
+        self._bundle_dir = bundle_dir
+
+    def collect(self, release_name: str, namespace: str, stage: str = "") -> Optional[str]:
+        """
+        Collect and report the diagnostics. Returns the path of the bundle, if one was written.
+
+        ``stage`` names what failed, like the scenario and the cluster, and goes into the bundle's name, so
+        scenarios failing at the same time in the same namespace don't write the same bundle.
+        """
+        deadline = time.monotonic() + self._limits.deadline_sec
+        logger.error(_SEPARATOR)
+        logger.error(f"FAILURE DIAGNOSTICS for release '{release_name}' in namespace '{namespace}'")
+        logger.error(_SEPARATOR)
+
+        bundle = self._open_bundle(release_name, namespace, stage)
+        skipped: List[str] = []
+        pool = ThreadPoolExecutor(max_workers=max(self._limits.workers, 1), thread_name_prefix="ats-diagnostics")
+        try:
+            pods: List[pykube.Pod] = []
+            pods_task = self._submit(pool, bundle, "pods", self._list_pods, namespace, pods)
+            tasks = [
+                self._submit(pool, bundle, "events", self._events, namespace),
+                self._submit(
+                    pool,
+                    bundle,
+                    "helm status",
+                    self._helm,
+                    f"{namespace}/helm-status.txt",
+                    [_HELM_BIN, "status", release_name, "-n", namespace],
+                ),
+                self._submit(
+                    pool,
+                    bundle,
+                    "helm get values",
+                    self._helm,
+                    f"{namespace}/helm-values.yaml",
+                    [_HELM_BIN, "get", "values", release_name, "-n", namespace],
+                ),
+                self._submit(pool, bundle, "deployments", self._deployments, namespace),
+                self._submit(pool, bundle, "nodes", self._nodes),
+            ]
+
+            # pod logs can only be requested once the pods are known
+            pod_records = self._wait(pods_task, deadline)
+            log_tasks = [
+                self._submit(
+                    pool, bundle, f"logs of '{pod.name}/{container}'", self._logs, namespace, pod, container, previous
+                )
+                for pod in (pods if pod_records is not None else [])
+                for container in self._containers(pod)
+                for previous in (False, True)
+            ]
+
+            for task, records in [(pods_task, pod_records)] + [
+                (task, self._wait(task, deadline)) for task in log_tasks + tasks
+            ]:
+                if records is None:
+                    logger.warning(f"Collecting diagnostics ({task.label}) timed out; skipping it.")
+                    skipped.append(task.label)
+                    continue
+                for level, message in records:
+                    logger.log(level, message)
+        finally:
+            # don't wait for calls that timed out; their results are dropped
+            pool.shutdown(wait=False, cancel_futures=True)
+            bundle_path = self._close_bundle(bundle, release_name, namespace, skipped)
+
+        logger.error(_SEPARATOR)
+        logger.error("END OF FAILURE DIAGNOSTICS")
+        logger.error(_SEPARATOR)
+        return bundle_path
+
+    def _open_bundle(self, release_name: str, namespace: str, stage: str) -> Optional[DiagnosticsBundle]:
+        if not self._bundle_dir:
+            return None
+        os.makedirs(self._bundle_dir, exist_ok=True)
+        name_parts = [release_name, namespace] + ([stage] if stage else [])
+        file_name = (
+            f"diagnostics-{'-'.join(to_dns_label(part) for part in name_parts)}-"
+            f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}.tar.gz"
+        )
+        return DiagnosticsBundle(os.path.join(self._bundle_dir, file_name))
+
+    @staticmethod
+    def _close_bundle(
+        bundle: Optional[DiagnosticsBundle], release_name: str, namespace: str, skipped: List[str]
+    ) -> Optional[str]:
+        if bundle is None:
+            return None
+        items = bundle.close(
+            {
+                "release": release_name,
+                "namespace": namespace,
+                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "skipped": skipped,
+            }
+        )
+        logger.error(f"Diagnostics bundle with {items} items written to '{bundle.path}'.")
+        return bundle.path
+
+    def _submit(
+        self,
+        pool: ThreadPoolExecutor,
+        bundle: Optional[DiagnosticsBundle],
+        label: str,
+        fn: Callable[..., None],
+        *args: Any,
+    ) -> _Task:
+        started_at: List[float] = []
+
+        def run() -> List[Record]:
+            started_at.append(time.monotonic())
+            out: _Output = _LogOutput() if bundle is None else _BundleOutput(bundle)
+            with span(label, "diagnostics-call"):
+                try:
+                    fn(out, *args)
+                except Exception as ex:
+                    out.warning(f"Failed to collect diagnostics ({label}): {ex}")
+            return out.records
+
+        return _Task(label=label, future=pool.submit(run), started_at=started_at)
+
+    def _wait(self, task: _Task, deadline: float) -> Optional[List[Record]]:
+        """Wait for the task's result, honouring both the per-call timeout and the overall deadline."""
+        while True:
+            if task.future.done():
+                return task.future.result()
+            now = time.monotonic()
+            limit = deadline
+            if task.started_at:
+                limit = min(deadline, task.started_at[0] + self._limits.call_timeout_sec)
+            if now >= limit:
+                return None
+            # a queued task has no call timeout yet, so poll until it starts
+            wait = limit - now if task.started_at else min(limit - now, _POLL_INTERVAL_SEC)
+            try:
+                return task.future.result(timeout=wait)
+            except FuturesTimeoutError:
+                continue
+
+    @staticmethod
+    def _containers(pod: pykube.Pod) -> List[str]:
+        spec = pod.obj.get("spec", {})
+        return [c["name"] for c in spec.get("containers", [])] + [c["name"] for c in spec.get("initContainers", [])]
+
+    def _list_pods(self, out: _Output, namespace: str, pods: List[pykube.Pod]) -> None:
+        # the pods are handed back to the caller to fan out the log requests
+        pods.extend(pykube.Pod.objects(self._kube_client).filter(namespace=namespace))
+        if pods:
+            out.add(
+                f"{namespace}/pods.txt",
+                f"--- Pods in namespace '{namespace}' ---",
+                (f"  {pod.name}: {pod.obj.get('status', {}).get('phase', 'Unknown')}" for pod in pods),
+            )
+        # full spec/status for non-Running pods (shows conditions, events, image pull errors)
+        for pod in pods:
+            phase = pod.obj.get("status", {}).get("phase")
+            if phase != "Running":
+                out.summary(f"  Pod '{pod.name}' is {phase or 'Unknown'}")
+                out.add(
+                    f"{namespace}/pods/{pod.name}/pod.yaml", f"--- Describe pod '{pod.name}' ---", [yaml.dump(pod.obj)]
+                )
+
+    def _logs(self, out: _Output, namespace: str, pod: pykube.Pod, container: str, previous: bool) -> None:
+        if previous:
+            try:
+                prev_logs = pod.logs(container=container, previous=True, tail_lines=50)
+            except Exception:
+                return  # previous logs don't exist if the container hasn't restarted
+            if prev_logs:
+                out.add(
+                    f"{namespace}/pods/{pod.name}/{container}.previous.log",
+                    f"--- Previous logs from pod '{pod.name}' container '{container}' (last 50 lines) ---",
+                    [prev_logs],
+                )
+            return
+        try:
+            logs = pod.logs(container=container, tail_lines=100)
+        except Exception as ex:
+            out.warning(f"Failed to get logs for pod '{pod.name}' container '{container}': {ex}")
+            return
+        if logs:
+            out.add(
+                f"{namespace}/pods/{pod.name}/{container}.log",
+                f"--- Logs from pod '{pod.name}' container '{container}' (last 100 lines) ---",
+                [logs],
+            )
+
+    def _events(self, out: _Output, namespace: str) -> None:
+        events = sorted(
+            pykube.Event.objects(self._kube_client).filter(namespace=namespace),
+            key=lambda e: e.obj.get("lastTimestamp") or "",
+        )
+        if not events:
+            return
+        warnings = sum(1 for e in events if e.obj.get("type") == "Warning")
+        if warnings:
+            out.summary(f"  {warnings} warning events in namespace '{namespace}'")
+        out.add(
+            f"{namespace}/events.txt",
+            f"--- Events in namespace '{namespace}' ---",
+            (
+                f"  {event.obj.get('lastTimestamp', '')} {event.obj.get('type', '')} "
+                f"{event.obj.get('reason', '')} {event.obj.get('message', '')}"
+                for event in events
+            ),
+        )
+
+    def _helm(self, out: _Output, path: str, args: List[str]) -> None:
+        label = " ".join(args[:-3])
+        try:
+            res = run_and_log(  # nosec
+                args, timeout_sec=self._limits.call_timeout_sec, env=self._helm_env, capture_output=True
+            )
+        except ATSTimeoutError:
+            out.warning(f"'{label}' timed out after {self._limits.call_timeout_sec}s.")
+            return
+        if res.returncode == 0 and res.stdout:
+            out.add(path, f"--- {label} '{args[-3]}' ---", [res.stdout])
+
+    def _deployments(self, out: _Output, namespace: str) -> None:
+        deployments = list(pykube.Deployment.objects(self._kube_client).filter(namespace=namespace))
+        if deployments:
+            out.add(
+                f"{namespace}/deployments.yaml",
+                f"--- Deployments in namespace '{namespace}' ---",
+                (f"  {d.name}: {yaml.dump(d.obj.get('status', {}))}" for d in deployments),
+            )
+
+    def _nodes(self, out: _Output) -> None:
+        # node status is useful for spotting clusters with resource issues
+        nodes = list(pykube.Node.objects(self._kube_client).all())
+        if not nodes:
+            return
+        lines = []
+        for node in nodes:
+            conditions = node.obj.get("status", {}).get("conditions", [])
+            ready_cond = next((c for c in conditions if c.get("type") == "Ready"), None)
+            ready_status = ready_cond.get("status", "Unknown") if ready_cond else "Unknown"
+            if ready_status != "True":
+                out.summary(f"  Node '{node.name}' is not ready: Ready={ready_status}")
+            lines.append(f"  {node.name}: Ready={ready_status}")
+        out.add("cluster/nodes.txt", "--- Cluster nodes ---", lines)
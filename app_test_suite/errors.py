@@ -8,3 +8,9 @@ class ATSTestError(Error):
 
     def __str__(self) -> str:
         return self.msg
+
+
+class ATSTimeoutError(ATSTestError):
+    """
+    Raised when a command or a whole test scenario runs out of time
+    """
@@ -0,0 +1,345 @@
+import csv
+import logging
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from semver import VersionInfo
+
+from app_test_suite.junit import OUTCOME_FAILED, OUTCOME_FLAKY, OUTCOME_PASSED, JUnitTestCase
+from app_test_suite.performance import PerformanceResult
+
+DEFAULT_HISTORY_DB = os.path.join(os.path.expanduser("~"), ".cache", "app-test-suite", "history.sqlite")
+DEFAULT_REGRESSION_THRESHOLD = 1.5
+DEFAULT_REGRESSION_MIN_DELTA_SEC = 1.0
+DEFAULT_REGRESSION_WINDOW = 10
+DEFAULT_RECENT_FAILURE_WINDOW = 3
+_LOCK_TIMEOUT_SEC = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_results (
+    run_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    chart TEXT NOT NULL,
+    chart_version TEXT NOT NULL,
+    test_type TEXT NOT NULL,
+    cluster_type TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    classname TEXT NOT NULL,
+    name TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration_sec REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_results_by_test
+    ON test_results (chart, test_type, cluster_type, classname, name, recorded_at);
+CREATE TABLE IF NOT EXISTS deploy_timings (
+    run_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    chart TEXT NOT NULL,
+    chart_version TEXT NOT NULL,
+    test_type TEXT NOT NULL,
+    cluster_type TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    duration_sec REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS performance_results (
+    run_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    chart TEXT NOT NULL,
+    chart_version TEXT NOT NULL,
+    test_type TEXT NOT NULL,
+    cluster_type TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS performance_results_by_version
+    ON performance_results (chart, test_type, cluster_type, chart_version);
+"""
+_TEST_COLUMNS = (
+    "run_id",
+    "recorded_at",
+    "chart",
+    "chart_version",
+    "test_type",
+    "cluster_type",
+    "stage",
+    "classname",
+    "name",
+    "outcome",
+    "duration_sec",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HistoryKey:
+    """Identifies what a recorded timing belongs to."""
+
+    chart: str
+    chart_version: str
+    test_type: str
+    cluster_type: str
+
+
+@dataclass
+class TestPriority:
+    """What the history knows about a test when deciding in which order to run it."""
+
+    recently_failed: bool
+    """The test failed, or was flaky, in at least one of its most recent runs."""
+    avg_sec: float
+    """Average duration of the test over all the recorded runs."""
+
+
+@dataclass
+class HistoryFilter:
+    chart: Optional[str] = None
+    test_type: Optional[str] = None
+    cluster_type: Optional[str] = None
+
+    def where(self) -> Tuple[str, List[str]]:
+        clauses, params = [], []
+        for column in ("chart", "test_type", "cluster_type"):
+            value = getattr(self, column)
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class TimingHistory:
+    """
+    A local SQLite database with the duration and outcome of every test and deploy of past runs.
+
+    Every call opens its own short-lived connection, so concurrent runs sharing the database only wait for
+    each other's writes instead of failing.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self._path):
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        connection = sqlite3.connect(self._path, timeout=_LOCK_TIMEOUT_SEC)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def record_test_results(self, key: HistoryKey, run_id: str, stage: str, cases: List[JUnitTestCase]) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                f"INSERT INTO test_results ({', '.join(_TEST_COLUMNS)}) VALUES ({', '.join('?' * len(_TEST_COLUMNS))})",
+                [
+                    (
+                        run_id,
+                        now,
+                        key.chart,
+                        key.chart_version,
+                        key.test_type,
+                        key.cluster_type,
+                        stage,
+                        case.classname,
+                        case.name,
+                        case.outcome,
+                        case.time_sec,
+                    )
+                    for case in cases
+                ],
+            )
+
+    def record_deploy(self, key: HistoryKey, run_id: str, stage: str, duration_sec: float) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO deploy_timings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    time.time(),
+                    key.chart,
+                    key.chart_version,
+                    key.test_type,
+                    key.cluster_type,
+                    stage,
+                    duration_sec,
+                ),
+            )
+
+    def record_performance_results(
+        self, key: HistoryKey, run_id: str, stage: str, results: List[PerformanceResult]
+    ) -> None:
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT INTO performance_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        now,
+                        key.chart,
+                        key.chart_version,
+                        key.test_type,
+                        key.cluster_type,
+                        stage,
+                        result.name,
+                        result.value,
+                        result.unit,
+                    )
+                    for result in results
+                ],
+            )
+
+    def performance_baseline(
+        self, key: HistoryKey, baseline_version: Optional[str] = None
+    ) -> Optional[Tuple[str, Dict[str, float]]]:
+        """
+        Return the chart version to compare the performance of ``key`` with and the median of every metric in it.
+
+        The baseline is ``baseline_version`` when it's given, otherwise the highest recorded version lower than
+        the one under test. When the version under test isn't a semantic version, it's the most recently
+        recorded other version. Returns None if there's nothing recorded to compare with.
+        """
+        where, params = HistoryFilter(key.chart, key.test_type, key.cluster_type).where()
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT chart_version, name, value FROM performance_results {where} ORDER BY recorded_at DESC",
+                params,
+            ).fetchall()
+        values: Dict[str, Dict[str, List[float]]] = {}
+        for chart_version, name, value in rows:
+            values.setdefault(chart_version, {}).setdefault(name, []).append(value)
+        version = baseline_version or self._previous_version(key.chart_version, list(values))
+        if version is None or version not in values:
+            return None
+        return version, {name: statistics.median(metric_values) for name, metric_values in values[version].items()}
+
+    @staticmethod
+    def _previous_version(chart_version: str, recorded_versions: List[str]) -> Optional[str]:
+        """Pick the baseline from ``recorded_versions``, which are ordered from the most recently recorded."""
+        others = [v for v in recorded_versions if v != chart_version]
+        if not VersionInfo.is_valid(chart_version):
+            return others[0] if others else None
+        lower = [
+            v for v in others if VersionInfo.is_valid(v) and VersionInfo.parse(v) < VersionInfo.parse(chart_version)
+        ]
+        return max(lower, key=VersionInfo.parse) if lower else None
+
+    def slowest_tests(self, history_filter: HistoryFilter, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return the tests with the longest average duration, slowest first."""
+        where, params = history_filter.where()
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(
+                "SELECT chart, test_type, cluster_type, classname, name, COUNT(*) AS runs, "
+                "AVG(duration_sec) AS avg_sec, MAX(duration_sec) AS max_sec, "
+                "SUM(CASE WHEN outcome = 'failed' THEN 1 ELSE 0 END) AS failures, "
+                "SUM(duration_sec) AS total_sec "
+                f"FROM test_results {where} "
+                "GROUP BY chart, test_type, cluster_type, classname, name "
+                "ORDER BY avg_sec DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def regressions(
+        self,
+        history_filter: HistoryFilter,
+        threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+        min_delta_sec: float = DEFAULT_REGRESSION_MIN_DELTA_SEC,
+        window: int = DEFAULT_REGRESSION_WINDOW,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the tests whose latest passing run took longer than ``threshold`` times their baseline.
+
+        The baseline is the median duration of up to ``window`` passing runs before the latest one. Changes
+        smaller than ``min_delta_sec`` are ignored, so very fast tests don't show up because of noise.
+        """
+        where, params = history_filter.where()
+        where = f"{where} AND outcome = ?" if where else "WHERE outcome = ?"
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT chart, test_type, cluster_type, classname, name, duration_sec "
+                f"FROM test_results {where} "
+                "ORDER BY chart, test_type, cluster_type, classname, name, recorded_at DESC",
+                params + [OUTCOME_PASSED],
+            ).fetchall()
+
+        durations: Dict[Tuple[str, ...], List[float]] = {}
+        for *test_key, duration in rows:
+            durations.setdefault(tuple(test_key), []).append(duration)
+        result = []
+        for test_key, test_durations in durations.items():
+            latest, previous = test_durations[0], test_durations[1 : window + 1]
+            if not previous:
+                continue
+            baseline = statistics.median(previous)
+            if latest > baseline * threshold and latest - baseline >= min_delta_sec:
+                chart, test_type, cluster_type, classname, name = test_key
+                result.append(
+                    {
+                        "chart": chart,
+                        "test_type": test_type,
+                        "cluster_type": cluster_type,
+                        "classname": classname,
+                        "name": name,
+                        "latest_sec": latest,
+                        "baseline_sec": baseline,
+                        "ratio": latest / baseline if baseline else float("inf"),
+                    }
+                )
+        return sorted(result, key=lambda r: r["latest_sec"] - r["baseline_sec"], reverse=True)
+
+    def test_priorities(
+        self, history_filter: HistoryFilter, failure_window: int = DEFAULT_RECENT_FAILURE_WINDOW
+    ) -> Dict[Tuple[str, str], TestPriority]:
+        """
+        Return the ordering priority of every recorded test, keyed by its JUnit class name and name.
+
+        A test counts as recently failed when any of its last ``failure_window`` runs failed or was flaky.
+        """
+        where, params = history_filter.where()
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT classname, name, outcome, duration_sec FROM test_results {where} "
+                "ORDER BY classname, name, recorded_at DESC",
+                params,
+            ).fetchall()
+
+        results: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        for classname, name, outcome, duration in rows:
+            results.setdefault((classname, name), []).append((outcome, duration))
+        return {
+            test: TestPriority(
+                recently_failed=any(
+                    outcome in (OUTCOME_FAILED, OUTCOME_FLAKY) for outcome, _ in test_results[:failure_window]
+                ),
+                avg_sec=statistics.fmean(duration for _, duration in test_results),
+            )
+            for test, test_results in results.items()
+        }
+
+    def export_csv(self, history_filter: HistoryFilter, out: TextIO) -> int:
+        """Write all the recorded test results as CSV. Returns the number of rows written."""
+        where, params = history_filter.where()
+        writer = csv.writer(out)
+        writer.writerow(_TEST_COLUMNS)
+        count = 0
+        with closing(self._connect()) as connection:
+            for row in self._iter_rows(
+                connection, f"SELECT {', '.join(_TEST_COLUMNS)} FROM test_results {where}", params
+            ):
+                writer.writerow(row)
+                count += 1
+        return count
+
+    @staticmethod
+    def _iter_rows(connection: sqlite3.Connection, query: str, params: List[str]) -> Iterator[Tuple[Any, ...]]:
+        cursor = connection.execute(f"{query} ORDER BY recorded_at", params)
+        while rows := cursor.fetchmany(1000):
+            yield from rows
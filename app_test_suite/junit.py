@@ -0,0 +1,99 @@
+import os
+import xml.etree.ElementTree as ET  # nosec, only reports written by the test executors are parsed
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+
+OUTCOME_PASSED = "passed"
+OUTCOME_FAILED = "failed"
+OUTCOME_SKIPPED = "skipped"
+# the test failed, but passed when it was run again
+OUTCOME_FLAKY = "flaky"
+# JUnit elements of a test case that failed and then passed on retry, the convention of the Maven Surefire plugin
+_FLAKY_ELEMENTS = {"failure": "flakyFailure", "error": "flakyError"}
+
+
+@dataclass
+class JUnitTestCase:
+    classname: str
+    """Group of the test, written as the name of its test suite, like a Go package or a Python module."""
+    name: str
+    time_sec: float
+    outcome: str
+    output: str = ""
+    """Output of a failed or flaky test, written as the failure details."""
+
+
+def write_junit_xml(path: str, name: str, cases: List[JUnitTestCase]) -> None:
+    """Write the test cases as a JUnit XML report, with one test suite per ``classname``."""
+    suites: Dict[str, List[JUnitTestCase]] = {}
+    for case in cases:
+        suites.setdefault(case.classname, []).append(case)
+
+    root = ET.Element("testsuites", name=name)
+    for suite_name, suite_cases in suites.items():
+        suite = ET.SubElement(
+            root,
+            "testsuite",
+            name=suite_name,
+            tests=str(len(suite_cases)),
+            failures=str(sum(1 for c in suite_cases if c.outcome == OUTCOME_FAILED)),
+            skipped=str(sum(1 for c in suite_cases if c.outcome == OUTCOME_SKIPPED)),
+            time=f"{sum(c.time_sec for c in suite_cases):.3f}",
+        )
+        for case in suite_cases:
+            element = ET.SubElement(
+                suite, "testcase", classname=case.classname, name=case.name, time=f"{case.time_sec:.3f}"
+            )
+            if case.outcome == OUTCOME_FAILED:
+                ET.SubElement(element, "failure", message="failed").text = case.output
+            elif case.outcome == OUTCOME_FLAKY:
+                ET.SubElement(element, _FLAKY_ELEMENTS["failure"], message="failed").text = case.output
+            elif case.outcome == OUTCOME_SKIPPED:
+                ET.SubElement(element, "skipped")
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def read_junit_xml(path: str) -> List[JUnitTestCase]:
+    """Read the test cases of a JUnit XML report written by any of the test executors."""
+    cases = []
+    for element in ET.parse(path).getroot().iter("testcase"):  # nosec, reports are written by the executors
+        outcome = OUTCOME_PASSED
+        if element.find("failure") is not None or element.find("error") is not None:
+            outcome = OUTCOME_FAILED
+        elif any(element.find(flaky) is not None for flaky in _FLAKY_ELEMENTS.values()):
+            outcome = OUTCOME_FLAKY
+        elif element.find("skipped") is not None:
+            outcome = OUTCOME_SKIPPED
+        cases.append(
+            JUnitTestCase(
+                classname=element.get("classname", ""),
+                name=element.get("name", ""),
+                time_sec=float(element.get("time") or 0.0),
+                outcome=outcome,
+            )
+        )
+    return cases
+
+
+def mark_flaky_tests(path: str, tests: Set[Tuple[str, str]]) -> None:
+    """
+    Mark the failures of the given tests, by class name and name, as flaky in an existing JUnit report.
+
+    Failure elements are renamed to their flaky counterparts, keeping their details, and the failure counters
+    of the test suites are updated, so the tests count as passed.
+    """
+    tree = ET.parse(path)  # nosec, reports are written by the executors
+    for suite in tree.getroot().iter("testsuite"):
+        for case in suite.findall("testcase"):
+            if (case.get("classname", ""), case.get("name", "")) not in tests:
+                continue
+            for tag, flaky_tag in _FLAKY_ELEMENTS.items():
+                for element in case.findall(tag):
+                    element.tag = flaky_tag
+                    counter = f"{tag}s"
+                    if suite.get(counter, "").isdigit():
+                        suite.set(counter, str(max(int(suite.get(counter, "0")) - 1, 0)))
+    tree.write(path, encoding="utf-8", xml_declaration=True)
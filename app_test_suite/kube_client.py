@@ -0,0 +1,157 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+from pykube import HTTPClient, KubeConfig
+from pykube.http import KubernetesHTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_QPS = 20.0
+DEFAULT_API_BURST = 40
+DEFAULT_API_RETRIES = 5
+DEFAULT_POOL_MAXSIZE = 32
+_BACKOFF_BASE_SEC = 0.5
+_BACKOFF_MAX_SEC = 30.0
+_RETRY_AFTER_MAX_SEC = 60.0
+_RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket limiting the rate of requests sent to the API server.
+
+    Up to ``burst`` requests can be sent at once, after that requests are let through at ``rate``
+    requests per second. A ``rate`` of 0 disables the limit.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed. Returns the time spent waiting in seconds."""
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # the token is reserved even if it's not available yet, so concurrent callers queue up fairly
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class RateLimitedHTTPAdapter(KubernetesHTTPAdapter):
+    """
+    Kubernetes HTTP adapter that throttles requests with a shared token bucket and retries them.
+
+    Requests rejected with '429 Too Many Requests' are always retried, honouring the 'Retry-After' header.
+    Connection errors and 5xx responses are retried with jittered exponential backoff, but only for
+    idempotent methods, so a create is never sent twice.
+    """
+
+    def __init__(
+        self,
+        kube_config: KubeConfig,
+        rate_limiter: TokenBucket,
+        retries: int = DEFAULT_API_RETRIES,
+        sleep: Callable[[float], None] = time.sleep,
+        **kwargs: Any,
+    ):
+        super().__init__(kube_config, **kwargs)
+        self._rate_limiter = rate_limiter
+        self._retries = retries
+        self._sleep = sleep
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        idempotent = (request.method or "").upper() in _IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self._rate_limiter.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= self._retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.debug(f"Request '{request.method} {request.url}' failed: {e}; retrying in {delay:.2f}s.")
+            else:
+                throttled = response.status_code == 429
+                if not (throttled or (idempotent and response.status_code in _RETRYABLE_STATUS_CODES)):
+                    return response
+                if attempt >= self._retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) if throttled else None
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                logger.debug(
+                    f"Request '{request.method} {request.url}' returned [{response.status_code}]; "
+                    f"retrying in {delay:.2f}s."
+                )
+                response.close()
+            attempt += 1
+            self._sleep(delay)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(_BACKOFF_MAX_SEC, _BACKOFF_BASE_SEC * 2**attempt))  # nosec, not for crypto
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a 'Retry-After' header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        delay = retry_at.timestamp() - time.time()
+    return min(max(delay, 0.0), _RETRY_AFTER_MAX_SEC)
+
+
+def build_kube_client(
+    kube_config_path: str,
+    qps: float = DEFAULT_API_QPS,
+    burst: int = DEFAULT_API_BURST,
+    retries: int = DEFAULT_API_RETRIES,
+) -> HTTPClient:
+    """Create a keep-alive, rate limited and retrying client for the cluster described by the kubeconfig."""
+    kube_config = KubeConfig.from_file(kube_config_path)
+    adapter = RateLimitedHTTPAdapter(
+        kube_config,
+        TokenBucket(qps, burst),
+        retries=retries,
+        pool_connections=1,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    )
+    return HTTPClient(kube_config, http_adapter=adapter)
+
+
+def get_server_version(kube_client: HTTPClient) -> str:
+    """Return the Kubernetes version of the API server, like 'v1.29.2'."""
+    response = kube_client.session.get(f"{kube_client.url}/version", timeout=kube_client.timeout)
+    response.raise_for_status()
+    return response.json().get("gitVersion", "")
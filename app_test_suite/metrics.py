@@ -0,0 +1,156 @@
+import logging
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# phases take from a fraction of a second (namespace setup) to hours (test runs)
+DURATION_BUCKETS_SEC = [0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200]
+SCENARIO_LABELS = ("chart", "test_type", "cluster_type")
+
+# spans with labels of unbounded cardinality, like pod names, aren't phases
+_NON_PHASE_CATEGORIES = {"diagnostics-call"}
+_TEST_OUTCOME_PREFIX = "tests_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = [(k, v) for k, v in labels + extra if v != ""]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not math.isinf(value) else "+Inf"
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.buckets = [0] * len(DURATION_BUCKETS_SEC)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(DURATION_BUCKETS_SEC):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class RunMetrics:
+    """
+    Metrics of an ATS run in the Prometheus text exposition format, derived from the trace spans of the run.
+
+    Every span counts in the phase duration histogram, labelled with the chart, test type and cluster type of the
+    scenario it ran in. Test execution spans add the test counts by outcome, test retry spans the retries and
+    cache spans their hits and lookups.
+    """
+
+    def __init__(self, events: List[Dict[str, Any]], succeeded: bool, finished_at: Optional[float] = None):
+        self._succeeded = succeeded
+        self._finished_at = time.time() if finished_at is None else finished_at
+        self._run_duration_sec = 0.0
+        self._phases: Dict[Labels, _Histogram] = defaultdict(_Histogram)
+        self._tests: Counter = Counter()
+        self._retries: Counter = Counter()
+        self._cache_hits: Counter = Counter()
+        self._cache_lookups: Counter = Counter()
+        self._load(events)
+
+    def _load(self, events: List[Dict[str, Any]]) -> None:
+        spans = [e for e in events if e.get("ph") == "X"]
+        scenarios = [s for s in spans if s.get("cat") == "scenario"]
+        if spans:
+            self._run_duration_sec = (max(s["ts"] + s["dur"] for s in spans) - min(s["ts"] for s in spans)) / 1_000_000
+        for s in spans:
+            if s.get("cat") in _NON_PHASE_CATEGORIES:
+                continue
+            labels = self._scenario_labels(s, scenarios)
+            args = s.get("args", {})
+            self._phases[labels + (("phase", s["name"]),)].observe(s["dur"] / 1_000_000)
+            for key, value in args.items():
+                if key.startswith(_TEST_OUTCOME_PREFIX) and isinstance(value, int):
+                    self._tests[labels + (("outcome", key[len(_TEST_OUTCOME_PREFIX) :]),)] += value
+            if s["name"] == "test retry":
+                self._retries[labels] += 1
+            if s.get("cat") == "cache" and isinstance(args.get("lookups"), int):
+                cache_labels = labels + (("cache", str(args.get("cache", ""))),)
+                self._cache_hits[cache_labels] += args.get("hits", 0)
+                self._cache_lookups[cache_labels] += args["lookups"]
+
+    @staticmethod
+    def _scenario_labels(span: Dict[str, Any], scenarios: List[Dict[str, Any]]) -> Labels:
+        # scenarios run one after another, so the one running when the span started is the span's, on any thread
+        for scenario in scenarios:
+            if scenario["ts"] <= span["ts"] <= scenario["ts"] + scenario["dur"]:
+                return tuple((label, str(scenario.get("args", {}).get(label, ""))) for label in SCENARIO_LABELS)
+        return tuple((label, "") for label in SCENARIO_LABELS)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def metric(name: str, metric_type: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        metric("ats_run_success", "gauge", "Whether the last ATS run succeeded.")
+        lines.append(f"ats_run_success {int(self._succeeded)}")
+        metric("ats_run_duration_seconds", "gauge", "Duration of the last ATS run.")
+        lines.append(f"ats_run_duration_seconds {_format_value(self._run_duration_sec)}")
+        metric("ats_run_timestamp_seconds", "gauge", "When the last ATS run finished, as a Unix timestamp.")
+        lines.append(f"ats_run_timestamp_seconds {_format_value(self._finished_at)}")
+
+        metric("ats_phase_duration_seconds", "histogram", "Duration of the phases of the last ATS run.")
+        for labels, histogram in sorted(self._phases.items()):
+            for bound, count in zip(DURATION_BUCKETS_SEC, histogram.buckets):
+                lines.append(
+                    f"ats_phase_duration_seconds_bucket{_format_labels(labels, (('le', _format_value(bound)),))} "
+                    f"{count}"
+                )
+            lines.append(
+                f"ats_phase_duration_seconds_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}"
+            )
+            lines.append(f"ats_phase_duration_seconds_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+            lines.append(f"ats_phase_duration_seconds_count{_format_labels(labels)} {histogram.count}")
+
+        for name, help_text, values in [
+            ("ats_tests", "Tests run in the last ATS run by outcome.", self._tests),
+            ("ats_test_retries", "Times failed tests were run again in the last ATS run.", self._retries),
+            ("ats_cache_hits", "Cache hits in the last ATS run.", self._cache_hits),
+            ("ats_cache_lookups", "Cache lookups in the last ATS run.", self._cache_lookups),
+        ]:
+            metric(name, "gauge", help_text)
+            lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in sorted(values.items()))
+
+        metric("ats_cache_hit_ratio", "gauge", "Share of the cache lookups that were hits in the last ATS run.")
+        for labels, lookups in sorted(self._cache_lookups.items()):
+            if lookups:
+                lines.append(
+                    f"ats_cache_hit_ratio{_format_labels(labels)} {_format_value(self._cache_hits[labels] / lookups)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the metrics to ``path``.
+
+        The file is written under a temporary name and renamed, as the textfile collector of the node exporter
+        may read it at any time.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        logger.info(f"Metrics of the run written to '{path}'.")
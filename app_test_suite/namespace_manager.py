@@ -0,0 +1,227 @@
+import argparse
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+import configargparse
+import pykube
+from pykube import HTTPClient
+from pytest_helm_charts.k8s.namespace import ensure_namespace_exists
+from step_exec_lib.errors import ConfigError
+from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_MODE_FIXED = "fixed"
+NAMESPACE_MODE_PER_RUN = "per-run"
+NAMESPACE_MODE_PER_SCENARIO = "per-scenario"
+NAMESPACE_MODES = [NAMESPACE_MODE_FIXED, NAMESPACE_MODE_PER_RUN, NAMESPACE_MODE_PER_SCENARIO]
+
+LABEL_PREFIX = "app-test-suite.giantswarm.io"
+LABEL_MANAGED = f"{LABEL_PREFIX}/managed"
+LABEL_RUN_ID = f"{LABEL_PREFIX}/run-id"
+LABEL_CHART = f"{LABEL_PREFIX}/chart"
+LABEL_EXPIRES_AT = f"{LABEL_PREFIX}/expires-at"
+
+DEFAULT_NAMESPACE_TTL_SEC = 3 * 60 * 60
+_NAMESPACE_PREFIX = "ats"
+_MAX_NAMESPACE_NAME_LEN = 63
+_INVALID_DNS_CHARS = re.compile(r"[^a-z0-9-]+")
+
+
+def to_dns_label(value: str, max_len: int = _MAX_NAMESPACE_NAME_LEN) -> str:
+    """Turn any string into a valid RFC 1123 label (also a valid label value) of at most ``max_len`` chars."""
+    label = _INVALID_DNS_CHARS.sub("-", value.lower())[:max_len]
+    return label.strip("-")
+
+
+class NamespaceManager:
+    """
+    Resolves the namespace the app under test is deployed into.
+
+    By default ('fixed' mode) the namespace configured with '--app-tests-deploy-namespace' is used as-is.
+    In the 'per-run' and 'per-scenario' modes a unique namespace is generated for the whole ATS run or
+    for every test scenario, so concurrent runs on a shared cluster don't collide. Generated namespaces
+    are labelled with the run ID, the chart name and an expiry timestamp, so the ones left behind by
+    crashed runs can be removed later with 'ats gc'.
+    """
+
+    KEY_CONFIG_OPTION_NAMESPACE_MODE = "--app-tests-namespace-mode"
+    KEY_CONFIG_OPTION_NAMESPACE_TTL = "--app-tests-namespace-ttl"
+    KEY_CONFIG_OPTION_RUN_ID = "--app-tests-run-id"
+    # registered by BaseTestScenariosFilteringPipeline, which reuses this constant
+    KEY_CONFIG_OPTION_DEPLOY_NAMESPACE = "--app-tests-deploy-namespace"
+
+    def __init__(self) -> None:
+        self._generated_run_id = uuid.uuid4().hex[:8]
+        # namespaces created by this run with the client of their cluster; the compatibility tests create the
+        # same namespace on several clusters at once
+        self._created_namespaces: List[Tuple[str, HTTPClient]] = []
+        self._lock = threading.Lock()
+
+    def initialize_config(self, config_parser: configargparse.ArgParser) -> None:
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_NAMESPACE_MODE,
+            required=False,
+            default=NAMESPACE_MODE_FIXED,
+            choices=NAMESPACE_MODES,
+            help="How the deploy namespace is chosen. 'fixed' uses '--app-tests-deploy-namespace'; 'per-run' "
+            "generates one labelled namespace for the whole run and 'per-scenario' one for every test scenario. "
+            "Generated namespaces are deleted on teardown and can be swept with 'ats gc' when a run crashes.",
+        )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_NAMESPACE_TTL,
+            required=False,
+            type=int,
+            default=DEFAULT_NAMESPACE_TTL_SEC,
+            help="Time in seconds after which a generated namespace is considered expired and can be removed "
+            "by 'ats gc'.",
+        )
+        config_parser.add_argument(
+            self.KEY_CONFIG_OPTION_RUN_ID,
+            required=False,
+            help="Identifier of this run, used in generated namespace names and labels. A random ID is "
+            "generated when not set.",
+        )
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        mode = self._get_mode(config)
+        if mode not in NAMESPACE_MODES:
+            raise ConfigError(
+                self.KEY_CONFIG_OPTION_NAMESPACE_MODE,
+                f"Unknown namespace mode '{mode}'. Valid modes are: {NAMESPACE_MODES}.",
+            )
+        if mode == NAMESPACE_MODE_FIXED:
+            return
+        ttl = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_NAMESPACE_TTL)
+        if ttl is None or int(ttl) <= 0:
+            raise ConfigError(self.KEY_CONFIG_OPTION_NAMESPACE_TTL, "Namespace TTL must be a positive number.")
+        run_id = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_RUN_ID)
+        if run_id and not to_dns_label(run_id):
+            raise ConfigError(
+                self.KEY_CONFIG_OPTION_RUN_ID,
+                f"Run ID '{run_id}' doesn't contain any character usable in a namespace name.",
+            )
+
+    def is_ephemeral(self, config: argparse.Namespace) -> bool:
+        return self._get_mode(config) != NAMESPACE_MODE_FIXED
+
+    def get_run_id(self, config: argparse.Namespace) -> str:
+        run_id = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_RUN_ID)
+        return to_dns_label(run_id) if run_id else self._generated_run_id
+
+    def get_namespace(self, config: argparse.Namespace, chart_name: str, test_type: str) -> str:
+        """Return the namespace to deploy the chart into for the given test scenario.
+
+        The result only depends on the config, the chart name and the test type, so it's safe to call it
+        repeatedly from the different phases of a scenario.
+        """
+        mode = self._get_mode(config)
+        if mode == NAMESPACE_MODE_FIXED:
+            return get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE)
+        suffix = self.get_run_id(config)
+        if mode == NAMESPACE_MODE_PER_SCENARIO:
+            suffix = f"{suffix}-{to_dns_label(test_type)}"
+        # leave room for the prefix, the suffix and the two separating dashes
+        chart_len = _MAX_NAMESPACE_NAME_LEN - len(_NAMESPACE_PREFIX) - len(suffix) - 2
+        chart_part = to_dns_label(chart_name, max(chart_len, 0))
+        parts = [_NAMESPACE_PREFIX, chart_part, suffix] if chart_part else [_NAMESPACE_PREFIX, suffix]
+        return to_dns_label("-".join(parts))
+
+    def ensure_namespace(
+        self, config: argparse.Namespace, kube_client: HTTPClient, namespace: str, chart_name: str
+    ) -> None:
+        """Create a generated namespace with its ownership and expiry labels. No-op in the 'fixed' mode."""
+        if not self.is_ephemeral(config):
+            return
+        with self._lock:
+            if (namespace, kube_client) in self._created_namespaces:
+                return
+        ttl = int(get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_NAMESPACE_TTL))
+        labels = {
+            LABEL_MANAGED: "true",
+            LABEL_RUN_ID: self.get_run_id(config),
+            LABEL_CHART: to_dns_label(chart_name),
+            LABEL_EXPIRES_AT: str(int(time.time()) + ttl),
+        }
+        logger.info(f"Creating namespace '{namespace}' for run '{labels[LABEL_RUN_ID]}' (expires in {ttl}s).")
+        ensure_namespace_exists(kube_client, namespace, extra_metadata={"labels": labels})
+        with self._lock:
+            self._created_namespaces.append((namespace, kube_client))
+
+    def release_namespace(
+        self, config: argparse.Namespace, namespace: str, kube_client: Optional[HTTPClient] = None
+    ) -> None:
+        """Delete a namespace created by this run once it's no longer needed.
+
+        Only the namespace on the cluster of ``kube_client`` is deleted, when it's given. In the 'per-run' mode
+        the namespace is shared by all the scenarios, so it's kept until 'cleanup'.
+        """
+        if self._get_mode(config) != NAMESPACE_MODE_PER_SCENARIO:
+            return
+        self._delete_namespace(namespace, kube_client)
+
+    def cleanup(self) -> None:
+        """Delete all the namespaces this run created and didn't release yet."""
+        for namespace in sorted({namespace for namespace, _ in self._created_namespaces}):
+            self._delete_namespace(namespace)
+
+    def _delete_namespace(self, namespace: str, kube_client: Optional[HTTPClient] = None) -> None:
+        with self._lock:
+            deleted = [
+                (ns, client)
+                for ns, client in self._created_namespaces
+                if ns == namespace and (kube_client is None or client is kube_client)
+            ]
+            self._created_namespaces = [entry for entry in self._created_namespaces if entry not in deleted]
+        for _, client in deleted:
+            logger.info(f"Deleting namespace '{namespace}'.")
+            try:
+                pykube.Namespace(client, {"metadata": {"name": namespace}}).delete()
+            except Exception as e:
+                logger.warning(f"Deleting namespace '{namespace}' failed; it will be removed by 'ats gc': {e}")
+
+    def _get_mode(self, config: argparse.Namespace) -> str:
+        return (
+            get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_NAMESPACE_MODE) or NAMESPACE_MODE_FIXED
+        )
+
+
+def sweep_expired_namespaces(
+    kube_client: HTTPClient,
+    now: Optional[float] = None,
+    dry_run: bool = False,
+    run_id: Optional[str] = None,
+) -> List[str]:
+    """Delete namespaces generated by ATS whose TTL expired. Returns the names of the expired namespaces.
+
+    Only namespaces carrying the ATS 'managed' label are considered. When ``run_id`` is given, all the
+    namespaces of that run are removed, whether they expired or not.
+    """
+    now = time.time() if now is None else now
+    selector = {LABEL_MANAGED: "true"}
+    if run_id:
+        selector[LABEL_RUN_ID] = to_dns_label(run_id)
+    expired: List[str] = []
+    for ns in pykube.Namespace.objects(kube_client).filter(selector=selector):
+        expires_at = ns.obj.get("metadata", {}).get("labels", {}).get(LABEL_EXPIRES_AT, "")
+        if not run_id:
+            try:
+                if float(expires_at) > now:
+                    continue
+            except ValueError:
+                logger.warning(f"Namespace '{ns.name}' has an invalid '{LABEL_EXPIRES_AT}' label '{expires_at}'.")
+                continue
+        expired.append(ns.name)
+        if dry_run:
+            logger.info(f"Namespace '{ns.name}' expired; not deleting it in dry-run mode.")
+            continue
+        logger.info(f"Deleting expired namespace '{ns.name}'.")
+        try:
+            ns.delete()
+        except Exception as e:
+            logger.warning(f"Deleting namespace '{ns.name}' failed: {e}")
+    return expired
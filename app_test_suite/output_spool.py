@@ -0,0 +1,119 @@
+import gzip
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, Deque, IO, List, Optional, Type
+
+from app_test_suite.errors import ATSTimeoutError
+from app_test_suite.processes import run_and_stream
+
+OUTPUT_MODE_STREAM = "stream"
+OUTPUT_MODE_QUIET = "quiet"
+OUTPUT_MODES = [OUTPUT_MODE_QUIET, OUTPUT_MODE_STREAM]
+REPLAY_TAIL = "tail"
+REPLAY_FULL = "full"
+REPLAY_MODES = [REPLAY_TAIL, REPLAY_FULL]
+DEFAULT_OUTPUT_DIR = "ats-output"
+DEFAULT_TAIL_LINES = 200
+
+logger = logging.getLogger(__name__)
+
+# makes spool file names unique when the same command runs more than once within a second
+_sequence = itertools.count(1)
+
+
+@dataclass
+class OutputSettings:
+    """Configures spooling of the output of test executors and hooks to disk."""
+
+    directory: str = DEFAULT_OUTPUT_DIR
+    tail_lines: int = DEFAULT_TAIL_LINES
+    replay: str = REPLAY_TAIL
+
+
+class SpooledOutput:
+    """
+    Keeps the output of a command out of the log.
+
+    Every line is written to a gzip compressed file and the last ``tail_lines`` lines are also kept in a ring
+    buffer. Once the command is done, ``report`` logs only a summary if it succeeded. If it failed, the tail
+    from the ring buffer (or the whole output, re-read from the file) is replayed into the log.
+    """
+
+    def __init__(self, settings: OutputSettings, name: str):
+        self._settings = settings
+        self.path = os.path.join(
+            settings.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{next(_sequence)}.log.gz"
+        )
+        self._tail: Deque[str] = deque(maxlen=max(settings.tail_lines, 1))
+        self._file: Optional[IO[str]] = None
+        self.lines = 0
+
+    def __enter__(self) -> "SpooledOutput":
+        os.makedirs(self._settings.directory, exist_ok=True)
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, line: str) -> None:
+        if self._file is not None:
+            self._file.write(line + "\n")
+        self._tail.append(line)
+        self.lines += 1
+
+    def report(self, failed: bool) -> None:
+        if not failed:
+            logger.info(f"Command output ({self.lines} lines) saved to '{self.path}'.")
+            return
+        if self._settings.replay == REPLAY_FULL:
+            logger.info(f"Command failed, replaying its full output ({self.lines} lines) from '{self.path}':")
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    logger.info(line.rstrip("\n"))
+            return
+        skipped = self.lines - len(self._tail)
+        logger.info(
+            f"Command failed, replaying the last {len(self._tail)} of {self.lines} output lines; full output saved "
+            f"to '{self.path}':"
+        )
+        if skipped > 0:
+            logger.info(f"[... {skipped} lines skipped ...]")
+        for line in self._tail:
+            logger.info(line)
+
+
+def run_spooled(
+    args: List[str],
+    settings: OutputSettings,
+    name: str,
+    ok_codes: Optional[List[int]] = None,
+    timeout_sec: Optional[float] = None,
+    **kwargs: Any,
+) -> int:
+    """
+    Run a command with its output spooled to disk. Returns the exit code of the command.
+
+    Exit codes in ``ok_codes`` (by default only 0) don't trigger the replay of the output. When the command
+    times out, its output is replayed and the ``ATSTimeoutError`` is re-raised.
+    """
+    try:
+        with SpooledOutput(settings, name) as spool:
+            return_code = run_and_stream(args, spool.write, timeout_sec=timeout_sec, **kwargs)
+    except ATSTimeoutError:
+        spool.report(failed=True)
+        raise
+    spool.report(failed=return_code not in (ok_codes or [0]))
+    return return_code
@@ -0,0 +1,104 @@
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+ENV_PERFORMANCE_RESULTS_FILE = "ATS_PERFORMANCE_RESULTS_FILE"
+DEFAULT_PERFORMANCE_THRESHOLD = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PerformanceResult:
+    """A metric reported by a performance test, like a latency percentile or a throughput."""
+
+    name: str
+    value: float
+    unit: str = ""
+    higher_is_better: bool = False
+    """Throughput-like metrics regress when they go down, latency-like ones when they go up."""
+    threshold: Optional[float] = None
+    """Largest relative change for the worse that isn't a regression; the configured one when not set."""
+
+
+@dataclass
+class PerformanceComparison:
+    result: PerformanceResult
+    baseline: Optional[float]
+    """Value of the metric for the baseline chart version, or None if it wasn't measured there."""
+    threshold: float
+
+    @property
+    def change(self) -> Optional[float]:
+        """Relative change of the metric against the baseline, positive when it got worse."""
+        if self.baseline is None:
+            return None
+        if self.baseline == 0:
+            return 0.0 if self.result.value == self.baseline else math.inf
+        change = (self.result.value - self.baseline) / abs(self.baseline)
+        return -change if self.result.higher_is_better else change
+
+    @property
+    def regressed(self) -> bool:
+        change = self.change
+        return change is not None and change > self.threshold
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.result.name,
+            "value": self.result.value,
+            "unit": self.result.unit,
+            "higherIsBetter": self.result.higher_is_better,
+            "baseline": self.baseline,
+            "change": self.change,
+            "threshold": self.threshold,
+            "regressed": self.regressed,
+        }
+
+
+def read_performance_results(path: str) -> List[PerformanceResult]:
+    """
+    Read the metrics the performance tests wrote to the results file, one JSON object per line.
+
+    Every line needs a 'name' and a numeric 'value'; 'unit', 'higher_is_better' and 'threshold' are optional.
+    Lines that don't follow that are skipped with a warning. A metric reported more than once keeps its last value.
+    """
+    results: Dict[str, PerformanceResult] = {}
+    if not os.path.isfile(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item["value"], (int, float)) or isinstance(item["value"], bool):
+                    raise ValueError(f"'value' has to be a number, not '{item['value']}'")
+                threshold = item.get("threshold")
+                result = PerformanceResult(
+                    name=str(item["name"]),
+                    value=float(item["value"]),
+                    unit=str(item.get("unit", "")),
+                    higher_is_better=bool(item.get("higher_is_better", False)),
+                    threshold=None if threshold is None else float(threshold),
+                )
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Skipping line {line_no} of performance results '{path}' that can't be read: {e}")
+                continue
+            results[result.name] = result
+    return list(results.values())
+
+
+def compare_performance(
+    results: List[PerformanceResult], baseline: Dict[str, float], threshold: float
+) -> List[PerformanceComparison]:
+    """Compare every metric to its baseline value, with its own threshold or ``threshold``."""
+    return [
+        PerformanceComparison(
+            result, baseline.get(result.name), threshold if result.threshold is None else result.threshold
+        )
+        for result in sorted(results, key=lambda r: r.name)
+    ]
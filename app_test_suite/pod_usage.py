@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import pykube
+from pykube import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+_METRICS_API_VERSION = "metrics.k8s.io/v1beta1"
+_CPU_SUFFIXES = {"n": 1e-9, "u": 1e-6, "m": 1e-3}
+_MEMORY_SUFFIXES = {
+    "Ki": 1024,
+    "Mi": 1024**2,
+    "Gi": 1024**3,
+    "Ti": 1024**4,
+    "k": 1000,
+    "M": 1000**2,
+    "G": 1000**3,
+    "T": 1000**4,
+}
+
+
+def parse_cpu(quantity: str) -> float:
+    """Return a Kubernetes CPU quantity, like '250m' or '12345n', in cores."""
+    if quantity and quantity[-1] in _CPU_SUFFIXES:
+        return float(quantity[:-1]) * _CPU_SUFFIXES[quantity[-1]]
+    return float(quantity)
+
+
+def parse_memory(quantity: str) -> int:
+    """Return a Kubernetes memory quantity, like '128Mi' or '1G', in bytes."""
+    for suffix, factor in _MEMORY_SUFFIXES.items():
+        if quantity.endswith(suffix):
+            return int(float(quantity[: -len(suffix)]) * factor)
+    return int(float(quantity))
+
+
+@dataclass
+class PodUsage:
+    """CPU and memory used by a pod over time, with the peaks and the restarts of its containers."""
+
+    pod: str
+    restarts: int = 0
+    peak_cpu_cores: float = 0.0
+    peak_memory_bytes: int = 0
+    samples: List[Tuple[float, float, int]] = field(default_factory=list)
+    """Samples of (seconds since the sampling started, CPU cores, memory bytes)."""
+
+    def add_sample(self, offset_sec: float, cpu_cores: float, memory_bytes: int) -> None:
+        self.samples.append((round(offset_sec, 3), cpu_cores, memory_bytes))
+        self.peak_cpu_cores = max(self.peak_cpu_cores, cpu_cores)
+        self.peak_memory_bytes = max(self.peak_memory_bytes, memory_bytes)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "peakCpuCores": round(self.peak_cpu_cores, 4),
+            "peakMemoryBytes": self.peak_memory_bytes,
+            "restarts": self.restarts,
+        }
+
+
+class PodUsageSampler:
+    """
+    Samples the CPU and memory used by every pod in a namespace from a background thread.
+
+    Usage is read from the 'metrics.k8s.io' API. When the cluster doesn't serve it, like a 'kind' cluster without
+    metrics-server, the summary API of the kubelets the pods run on is read instead, through the API server's node
+    proxy. Failed polls are logged and skipped: sampling never fails the tests it runs next to.
+    """
+
+    def __init__(self, kube_client: HTTPClient, namespace: str, interval_sec: float):
+        self._kube_client = kube_client
+        self._namespace = namespace
+        self._interval_sec = interval_sec
+        self._usage: Dict[str, PodUsage] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._metrics_api_available = True
+        self._poll_failed = False
+
+    def start(self) -> "PodUsageSampler":
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="ats-pod-usage", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, PodUsage]:
+        """Stop sampling and return the usage of every pod seen, by pod name."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self._usage
+
+    def _run(self) -> None:
+        while True:
+            self.poll()
+            if self._stopped.wait(self._interval_sec):
+                return
+
+    def poll(self) -> None:
+        offset_sec = time.monotonic() - self._started_at
+        try:
+            pods = list(pykube.Pod.objects(self._kube_client).filter(namespace=self._namespace))
+            usage = self._read_usage(pods)
+        except Exception as e:
+            # the first failure is worth a warning, the following ones are most likely the same
+            log = logger.debug if self._poll_failed else logger.warning
+            log(f"Sampling resource usage of pods in namespace '{self._namespace}' failed: {e}")
+            self._poll_failed = True
+            return
+        for pod in pods:
+            pod_usage = self._usage.setdefault(pod.name, PodUsage(pod.name))
+            statuses = pod.obj.get("status", {}).get("containerStatuses", [])
+            pod_usage.restarts = max(pod_usage.restarts, sum(s.get("restartCount", 0) for s in statuses))
+            if pod.name in usage:
+                pod_usage.add_sample(offset_sec, *usage[pod.name])
+
+    def _read_usage(self, pods: List[pykube.Pod]) -> Dict[str, Tuple[float, int]]:
+        if self._metrics_api_available:
+            response = self._kube_client.get(version=_METRICS_API_VERSION, namespace=self._namespace, url="pods")
+            if response.status_code != 404:
+                response.raise_for_status()
+                return {
+                    item["metadata"]["name"]: (
+                        sum(parse_cpu(c["usage"]["cpu"]) for c in item.get("containers", [])),
+                        sum(parse_memory(c["usage"]["memory"]) for c in item.get("containers", [])),
+                    )
+                    for item in response.json().get("items", [])
+                }
+            logger.info("The 'metrics.k8s.io' API isn't available, reading pod usage from the kubelets instead.")
+            self._metrics_api_available = False
+        usage: Dict[str, Tuple[float, int]] = {}
+        for node in sorted({p.obj.get("spec", {}).get("nodeName") for p in pods} - {None}):
+            response = self._kube_client.get(url=f"nodes/{node}/proxy/stats/summary")
+            response.raise_for_status()
+            for item in response.json().get("pods", []):
+                if item.get("podRef", {}).get("namespace") != self._namespace:
+                    continue
+                usage[item["podRef"]["name"]] = (
+                    item.get("cpu", {}).get("usageNanoCores", 0) / 1e9,
+                    item.get("memory", {}).get("workingSetBytes", 0),
+                )
+        return usage
+
+
+def summarize_pod_usage(usage: Dict[str, PodUsage]) -> Dict[str, Dict[str, Any]]:
+    """Return the peaks and restarts of every pod, by pod name."""
+    return {name: pod_usage.summary() for name, pod_usage in sorted(usage.items())}
+
+
+def write_pod_usage(path: str, namespace: str, interval_sec: float, usage: Dict[str, PodUsage]) -> None:
+    """Write the usage time series of every pod, with their peaks and restarts, as a JSON file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "namespace": namespace,
+                "intervalSec": interval_sec,
+                "pods": {
+                    name: {**pod_usage.summary(), "samples": [list(s) for s in pod_usage.samples]}
+                    for name, pod_usage in sorted(usage.items())
+                },
+            },
+            f,
+            indent=2,
+        )
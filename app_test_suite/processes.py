@@ -0,0 +1,126 @@
+import logging
+import os
+import signal
+import subprocess  # nosec: we need it to invoke binaries from system
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from step_exec_lib.utils import processes
+
+from app_test_suite.errors import ATSTimeoutError
+
+# how long a timed out command gets to exit after SIGTERM before its process group is killed with SIGKILL
+_KILL_GRACE_PERIOD_SEC = 10
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    An optional point in time by which a sequence of commands has to finish.
+
+    ``timeout`` caps the timeout of the next command by the time that is left, so a deadline applies to all the
+    commands run until it expires, even if each of them has a timeout of its own.
+    """
+
+    def __init__(self, timeout_sec: Optional[float], name: str = "deadline"):
+        self._timeout_sec = timeout_sec
+        self._name = name
+        self._expires_at = time.monotonic() + timeout_sec if timeout_sec else None
+
+    def timeout(self, command_timeout_sec: Optional[float] = None) -> Optional[float]:
+        """Return the timeout of the next command, or None if it has none. Raises if the deadline expired."""
+        if self._expires_at is None:
+            return command_timeout_sec
+        remaining = self._expires_at - time.monotonic()
+        if remaining <= 0:
+            raise ATSTimeoutError(f"The {self._name} of {self._timeout_sec}s expired.")
+        return remaining if command_timeout_sec is None else min(command_timeout_sec, remaining)
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    """Stop a command started in a new session, together with all the processes it started."""
+    for sig, wait_sec in ((signal.SIGTERM, _KILL_GRACE_PERIOD_SEC), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(wait_sec)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _timeout_error(args: List[str], timeout_sec: float) -> ATSTimeoutError:
+    return ATSTimeoutError(f"Command '{' '.join(args)}' timed out after {timeout_sec:.0f}s and was killed.")
+
+
+def run_and_log(args: List[str], timeout_sec: Optional[float] = None, **kwargs: Any) -> subprocess.CompletedProcess:
+    """
+    Run a command like ``step_exec_lib``'s ``run_and_log``, optionally with a timeout.
+
+    With a timeout, the command runs in a process group of its own, which is killed as a whole when the
+    timeout expires, so processes it started don't keep running. An ``ATSTimeoutError`` is raised then.
+    """
+    if timeout_sec is None:
+        return processes.run_and_log(args, **kwargs)
+    logger.info("Running command:")
+    logger.info(" ".join(args))
+    kwargs.setdefault("text", True)
+    if kwargs.pop("capture_output", False):
+        kwargs.update(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with subprocess.Popen(args, start_new_session=True, **kwargs) as proc:  # nosec
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout_sec)
+        except subprocess.TimeoutExpired:
+            kill_process_group(proc)
+            raise _timeout_error(args, timeout_sec) from None
+    logger.info(f"Command executed, exit code: {proc.returncode}.")
+    return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+
+
+def run_and_stream(
+    args: List[str], line_handler: Callable[[str], None], timeout_sec: Optional[float] = None, **kwargs: Any
+) -> int:
+    """
+    Run a command and pass every line of its output to ``line_handler`` as soon as it's printed.
+
+    stderr is merged into stdout, so the lines arrive in the order the command printed them. Nothing is
+    buffered beyond a single line. Returns the exit code of the command. With a timeout, the process group
+    of the command is killed when it expires, like in ``run_and_log``.
+    """
+    logger.info("Running command:")
+    logger.info(" ".join(args))
+    timed_out = threading.Event()
+    with subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        start_new_session=timeout_sec is not None,
+        **kwargs,
+    ) as proc:  # nosec
+
+        def kill() -> None:
+            timed_out.set()
+            kill_process_group(proc)
+
+        timer = None
+        if timeout_sec is not None:
+            timer = threading.Timer(timeout_sec, kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            assert proc.stdout is not None  # nosec, set with 'stdout=PIPE'
+            for line in proc.stdout:
+                line_handler(line.rstrip("\n"))
+        finally:
+            if timer is not None:
+                timer.cancel()
+    if timeout_sec is not None and timed_out.is_set():
+        raise _timeout_error(args, timeout_sec)
+    logger.info(f"Command executed, exit code: {proc.returncode}.")
+    return proc.returncode
@@ -0,0 +1,101 @@
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from types import FrameType
+from typing import ContextManager, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# frequent enough for phases of a few seconds, rare enough to stay out of the profile
+DEFAULT_SAMPLING_INTERVAL_SEC = 0.005
+PSTATS_SUFFIX = ".pstats"
+COLLAPSED_SUFFIX = ".collapsed"
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    # ';' separates frames and the last space the count in the collapsed format
+    return f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class Profiler:
+    """
+    Profiles ATS itself, to find its own overhead, like YAML parsing, config handling and subprocess bookkeeping.
+
+    Two profiles are recorded at once. A deterministic ``cProfile`` profile counts every call and is saved as a
+    pstats file; on Python 3.12 and later it covers all the threads. The stacks of every thread are also sampled
+    at ``interval_sec`` and saved in the collapsed-stack format of flamegraph tools, like 'flamegraph.pl',
+    speedscope or Perfetto, with the name of its thread as the root frame of every stack, so each thread gets a
+    flame of its own.
+    """
+
+    def __init__(self, interval_sec: float = DEFAULT_SAMPLING_INTERVAL_SEC):
+        self._interval_sec = interval_sec
+        self._profile = cProfile.Profile()
+        self._samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self._interval_sec):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack: List[str] = []
+                current: Optional[FrameType] = frame
+                while current is not None:
+                    stack.append(_frame_label(current))
+                    current = current.f_back
+                thread_name = names.get(ident, str(ident)).replace(";", ",").replace(" ", "_")
+                self._samples[";".join([thread_name] + stack[::-1])] += 1
+
+    def start(self) -> None:
+        self._sampler = threading.Thread(target=self._sample, name="ats-profiler", daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def write(self, path_prefix: str) -> List[str]:
+        """Write the pstats and collapsed-stack files, named ``path_prefix`` with their suffix, and return them."""
+        if os.path.dirname(path_prefix):
+            os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+        pstats_path = path_prefix + PSTATS_SUFFIX
+        self._profile.dump_stats(pstats_path)
+        collapsed_path = path_prefix + COLLAPSED_SUFFIX
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._samples.items()):
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Profile of ATS written to '{pstats_path}' and '{collapsed_path}'.")
+        return [pstats_path, collapsed_path]
+
+
+@contextmanager
+def _profiled(path_prefix: str, interval_sec: float) -> Iterator[Profiler]:
+    profiler = Profiler(interval_sec)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        # also written when the run fails and exits
+        profiler.stop()
+        profiler.write(path_prefix)
+
+
+def profiled(
+    path_prefix: str, interval_sec: float = DEFAULT_SAMPLING_INTERVAL_SEC
+) -> ContextManager[Optional[Profiler]]:
+    """Profile the ``with`` block and write the profiles with ``path_prefix``; does nothing if it's empty."""
+    if not path_prefix:
+        return nullcontext()
+    return _profiled(path_prefix, interval_sec)
@@ -0,0 +1,20 @@
+"""
+Pytest plugin that records the node IDs of the failed tests, so the ATS pytest executor can run only them again.
+
+Like 'ats_test_order', it's loaded with '-p ats_failed_tests' into the virtual env of the tests under test and
+can't import anything from ATS. The node ID of every test that fails in any of its phases is appended as a line
+to the file pointed to by the 'ATS_FAILED_TESTS_FILE' environment variable.
+"""
+
+import os
+
+import pytest
+
+ENV_FAILED_TESTS_FILE = "ATS_FAILED_TESTS_FILE"
+
+
+def pytest_runtest_logreport(report: pytest.TestReport) -> None:
+    failed_tests_file = os.environ.get(ENV_FAILED_TESTS_FILE)
+    if failed_tests_file and report.failed:
+        with open(failed_tests_file, "a", encoding="utf-8") as f:
+            f.write(f"{report.nodeid}\n")
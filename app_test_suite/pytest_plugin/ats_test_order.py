@@ -0,0 +1,42 @@
+"""
+Pytest plugin that runs recently failed tests first and then the fastest ones.
+
+It's loaded by the ATS pytest executor with '-p ats_test_order' into the virtual env of the tests under test,
+where ATS itself isn't installed, so it can't import anything from it. The test history is read from the JSON
+file pointed to by the 'ATS_TEST_ORDER_FILE' environment variable: a list of objects with the JUnit 'classname'
+and 'name' of a test, 'recently_failed' and 'avg_sec'. Tests that aren't in the history run right after the
+recently failed ones, as new tests are the likeliest to fail. Ties keep the collection order.
+"""
+
+import json
+import os
+from typing import Dict, List, Tuple
+
+import pytest
+
+ENV_TEST_ORDER_FILE = "ATS_TEST_ORDER_FILE"
+
+
+def junit_test_id(nodeid: str) -> Tuple[str, str]:
+    """Return the class name and name pytest's JUnit report uses for the test with the given node ID."""
+    path, *names = nodeid.split("::")
+    if path.endswith(".py"):
+        path = path[: -len(".py")]
+    names = [path.replace("/", ".")] + [name for name in names if name != "()"]
+    return ".".join(names[:-1]), names[-1]
+
+
+def _sort_key(priorities: Dict[Tuple[str, str], Dict], item: pytest.Item) -> Tuple[int, float]:
+    priority = priorities.get(junit_test_id(item.nodeid))
+    if priority is None:
+        return 1, 0.0
+    return (0 if priority["recently_failed"] else 2), float(priority["avg_sec"])
+
+
+def pytest_collection_modifyitems(session: pytest.Session, config: pytest.Config, items: List[pytest.Item]) -> None:
+    order_file = os.environ.get(ENV_TEST_ORDER_FILE)
+    if not order_file:
+        return
+    with open(order_file, encoding="utf-8") as f:
+        priorities = {(test["classname"], test["name"]): test for test in json.load(f)}
+    items.sort(key=lambda item: _sort_key(priorities, item))
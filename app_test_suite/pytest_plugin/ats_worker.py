@@ -0,0 +1,115 @@
+"""
+Warm pytest worker that runs test sessions in forked copies of an interpreter with the test dependencies imported.
+
+It's started by the ATS pytest executor with 'uv run python ats_worker.py <test dir>' in the virtual env of the
+tests under test, so, like the plugins next to it, it can't import anything from ATS. On start, it imports pytest,
+its plugins and the third-party modules the tests import, then prints a ready line. Every following line of
+stdin is a JSON request with the pytest arguments, environment variables and working directory of a test
+session. The session runs in a forked child, so the changes it makes to the environment, 'sys.modules' and any
+global state are gone when it ends, and the next one starts from the same warm interpreter. The output of the
+session goes to stdout, followed by a line with the exit code. The worker exits when stdin is closed.
+"""
+
+import ast
+import importlib
+import importlib.metadata
+import json
+import os
+import sys
+import traceback
+
+import pytest
+
+# prefix of the lines the worker prints for ATS rather than for the user; the NUL byte never appears in test output
+SENTINEL = "\0ats-worker"
+READY = "ready"
+DONE = "done"
+
+
+def _local_modules(test_dir: str) -> set:
+    names = set()
+    for entry in os.listdir(test_dir):
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isdir(os.path.join(test_dir, entry)):
+            names.add(entry)
+    return names
+
+
+def _imported_modules(test_dir: str) -> set:
+    """Return the top-level modules imported by the Python files of the tests, except the tests' own ones."""
+    names: set = set()
+    for root, dirs, files in os.walk(test_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+        for file in files:
+            if not file.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(root, file), encoding="utf-8") as f:
+                    tree = ast.parse(f.read())
+            except (OSError, SyntaxError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    names.update(alias.name.split(".")[0] for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                    names.add(node.module.split(".")[0])
+    return names - _local_modules(test_dir)
+
+
+def preload(test_dir: str) -> None:
+    """
+    Import pytest plugins and the dependencies of the tests.
+
+    The test modules themselves aren't imported: they may read the environment when they're imported, which
+    has to be the one of each test session.
+    """
+    modules = {ep.module.split(":")[0] for ep in importlib.metadata.entry_points(group="pytest11")}
+    modules |= _imported_modules(test_dir)
+    for module in sorted(modules):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            # a module that can't be imported here fails in the test session instead
+            continue
+
+
+def _run_session(request: dict) -> int:
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    # plugins loaded with '-p' are found through PYTHONPATH, which a running interpreter doesn't read again
+    for path in reversed(request["env"].get("PYTHONPATH", "").split(os.pathsep)):
+        if path and path not in sys.path:
+            sys.path.insert(0, path)
+    return int(pytest.main(request["args"]))
+
+
+def serve() -> None:
+    print(f"{SENTINEL} {READY}", flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                exit_code = _run_session(request)
+            except BaseException:
+                traceback.print_exc()
+                exit_code = int(pytest.ExitCode.INTERNAL_ERROR)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        _, status = os.waitpid(pid, 0)
+        print(f"{SENTINEL} {DONE} {os.waitstatus_to_exitcode(status)}", flush=True)
+
+
+if __name__ == "__main__":
+    preload(sys.argv[1] if len(sys.argv) > 1 else os.getcwd())
+    serve()
@@ -0,0 +1,130 @@
+import json
+import logging
+import subprocess  # nosec: we need it to invoke binaries from system
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
+from app_test_suite.processes import kill_process_group
+from app_test_suite.pytest_plugin import ats_worker
+
+logger = logging.getLogger(__name__)
+
+
+class PytestWorkerError(ATSTestError):
+    """
+    Raised when the warm pytest worker can't be started or stops unexpectedly
+    """
+
+
+class PytestWorker:
+    """
+    Client of a warm pytest worker, an interpreter in the test virtual env that runs pytest sessions in forks of itself.
+
+    The worker is started with ``start_args`` the first time a session is run and stopped with ``stop``. Sessions
+    run one at a time. If a session times out, the whole worker is killed and started again for the next one.
+    """
+
+    def __init__(self, start_args: List[str], cwd: str, env: Dict[str, str]):
+        self._start_args = start_args
+        self._cwd = cwd
+        self._env = env
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self) -> subprocess.Popen:
+        logger.info(f"Starting warm pytest worker: {' '.join(self._start_args)}")
+        proc = subprocess.Popen(
+            self._start_args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+            cwd=self._cwd,
+            env=self._env,
+        )  # nosec, no user input
+        self._proc = proc
+        if self._read_until_sentinel(logger.info) != ats_worker.READY:
+            self.stop()
+            raise PytestWorkerError("The warm pytest worker exited before it was ready.")
+        return proc
+
+    def _read_until_sentinel(self, line_handler: Callable[[str], None]) -> Optional[str]:
+        """Pass the output of the worker to ``line_handler`` up to its next own line; None if it exited."""
+        assert self._proc is not None and self._proc.stdout is not None  # nosec, set in '_start'
+        for line in self._proc.stdout:
+            line = line.rstrip("\n")
+            if line.startswith(ats_worker.SENTINEL):
+                return line[len(ats_worker.SENTINEL) :].strip()
+            line_handler(line)
+        return None
+
+    def run(
+        self,
+        args: List[str],
+        env: Dict[str, str],
+        cwd: str,
+        line_handler: Callable[[str], None],
+        timeout_sec: Optional[float] = None,
+    ) -> int:
+        """
+        Run a pytest session with ``args`` in a fork of the worker and return its exit code.
+
+        The session gets ``env`` as its whole environment. Its output is passed to ``line_handler`` line by line.
+        """
+        with self._lock:
+            proc = self._proc
+            if proc is None or proc.poll() is not None:
+                proc = self._start()
+            assert proc.stdin is not None  # nosec, set with 'stdin=PIPE'
+            logger.info(f"Running pytest in the warm worker: pytest {' '.join(args)}")
+            timed_out = threading.Event()
+
+            def kill() -> None:
+                timed_out.set()
+                kill_process_group(proc)
+
+            timer = None
+            if timeout_sec is not None:
+                timer = threading.Timer(timeout_sec, kill)
+                timer.daemon = True
+                timer.start()
+            try:
+                proc.stdin.write(json.dumps({"args": args, "env": env, "cwd": cwd}) + "\n")
+                proc.stdin.flush()
+                response = self._read_until_sentinel(line_handler)
+            except BrokenPipeError:
+                response = None
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            if timed_out.is_set():
+                self.stop()
+                raise ATSTimeoutError(f"pytest in the warm worker timed out after {timeout_sec:.0f}s and was killed.")
+            if response is None or not response.startswith(ats_worker.DONE):
+                self.stop()
+                raise PytestWorkerError("The warm pytest worker exited unexpectedly.")
+            return_code = int(response.split()[1])
+            logger.info(f"pytest session finished, exit code: {return_code}.")
+            return return_code
+
+    def stop(self) -> None:
+        """Stop the worker, if it's running; it exits when its stdin is closed."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        logger.info("Stopping warm pytest worker.")
+        try:
+            if proc.stdin is not None:
+                proc.stdin.close()
+            proc.wait(10)
+        except (OSError, subprocess.TimeoutExpired):
+            kill_process_group(proc)
+        if proc.stdout is not None:
+            proc.stdout.close()
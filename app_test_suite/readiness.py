@@ -0,0 +1,219 @@
+import datetime
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import pykube
+from pykube import HTTPClient
+
+# 'Successfully pulled image "nginx:1.27" in 2.1s (2.1s including waiting)', with a Go duration
+_PULLED_IN_PATTERN = re.compile(r"\bin ((?:[\d.]+(?:h|ms|m|s|us|µs|ns))+)")
+_GO_DURATION_PART_PATTERN = re.compile(r"([\d.]+)(h|ms|m|s|us|µs|ns)")
+_GO_DURATION_UNITS_SEC = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 1e-3, "us": 1e-6, "µs": 1e-6, "ns": 1e-9}
+_CONTAINER_FIELD_PATH_PATTERN = re.compile(r"^spec\.containers\{(.+)\}$")
+
+
+def parse_go_duration(duration: str) -> float:
+    """Return a Go duration, like '1m2.5s' or '850ms', in seconds."""
+    return sum(
+        float(value) * _GO_DURATION_UNITS_SEC[unit] for value, unit in _GO_DURATION_PART_PATTERN.findall(duration)
+    )
+
+
+def _parse_time(timestamp: Optional[str]) -> Optional[datetime.datetime]:
+    if not timestamp:
+        return None
+    return datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+def _seconds_between(start: Optional[datetime.datetime], end: Optional[datetime.datetime]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+@dataclass
+class ContainerReadiness:
+    name: str
+    started_sec: Optional[float] = None
+    """Seconds from the creation of the pod until the container started, None if it isn't running."""
+    image_pull_sec: Optional[float] = None
+    """Seconds spent pulling the container's image, 0 if it was already present, None if unknown."""
+
+
+@dataclass
+class PodReadiness:
+    """How long a pod and its containers took to become ready, in seconds since the pod was created."""
+
+    pod: str
+    workload: str
+    """Kind and name of the workload owning the pod, like 'Deployment/hello-world'."""
+    created_at: Optional[datetime.datetime] = None
+    scheduled_sec: Optional[float] = None
+    initialized_sec: Optional[float] = None
+    ready_sec: Optional[float] = None
+    """None if the pod isn't ready."""
+    containers: List[ContainerReadiness] = field(default_factory=list)
+
+
+def _workload(pod: pykube.Pod) -> str:
+    for owner in pod.obj["metadata"].get("ownerReferences", []):
+        if not owner.get("controller"):
+            continue
+        template_hash = pod.labels.get("pod-template-hash")
+        # a Deployment's pods are owned by a ReplicaSet named after the Deployment and the hash of the pod template
+        if owner["kind"] == "ReplicaSet" and template_hash and owner["name"].endswith(f"-{template_hash}"):
+            return f"Deployment/{owner['name'][: -len(template_hash) - 1]}"
+        return f"{owner['kind']}/{owner['name']}"
+    return f"Pod/{pod.name}"
+
+
+def _image_pull_durations(events: List[pykube.Event]) -> Dict[str, Dict[str, float]]:
+    """Return the image pull durations of the containers of every pod, by pod UID and container name."""
+    durations: Dict[str, Dict[str, float]] = {}
+    for event in events:
+        involved = event.obj.get("involvedObject", {})
+        match = _CONTAINER_FIELD_PATH_PATTERN.match(involved.get("fieldPath", ""))
+        if involved.get("kind") != "Pod" or match is None or event.obj.get("reason") != "Pulled":
+            continue
+        message = event.obj.get("message", "")
+        if "already present" in message:
+            duration = 0.0
+        else:
+            pulled_in = _PULLED_IN_PATTERN.search(message)
+            if pulled_in is None:
+                continue
+            duration = parse_go_duration(pulled_in.group(1))
+        durations.setdefault(involved.get("uid", ""), {})[match.group(1)] = duration
+    return durations
+
+
+def list_pod_uids(kube_client: HTTPClient, namespace: str) -> Set[str]:
+    """Return the UIDs of the pods in the namespace, to tell the ones a deploy started from the ones already there."""
+    return {pod.obj["metadata"]["uid"] for pod in pykube.Pod.objects(kube_client).filter(namespace=namespace)}
+
+
+def measure_readiness(
+    kube_client: HTTPClient, namespace: str, exclude_uids: Optional[Set[str]] = None
+) -> List[PodReadiness]:
+    """
+    Read how long every pod in the namespace took to become ready from its status.
+
+    The pod's conditions give the times it was scheduled, initialized and ready, the states of its containers the
+    times they started, and the 'Pulled' events of the pod the image pull durations. Every time is taken from the
+    cluster's clock, relative to the creation of the pod. Pods in ``exclude_uids``, like the ones running before a
+    deploy that didn't replace them, are skipped.
+    """
+    pods = [
+        p
+        for p in pykube.Pod.objects(kube_client).filter(namespace=namespace)
+        if p.obj["metadata"].get("uid") not in (exclude_uids or set())
+    ]
+    if not pods:
+        return []
+    pulls = _image_pull_durations(list(pykube.Event.objects(kube_client).filter(namespace=namespace)))
+    readiness: List[PodReadiness] = []
+    for pod in sorted(pods, key=lambda p: p.name):
+        created_at = _parse_time(pod.obj["metadata"].get("creationTimestamp"))
+        status = pod.obj.get("status", {})
+        conditions = {
+            c["type"]: _parse_time(c.get("lastTransitionTime"))
+            for c in status.get("conditions", [])
+            if c.get("status") == "True"
+        }
+        pod_pulls = pulls.get(pod.obj["metadata"].get("uid", ""), {})
+        readiness.append(
+            PodReadiness(
+                pod=pod.name,
+                workload=_workload(pod),
+                created_at=created_at,
+                scheduled_sec=_seconds_between(created_at, conditions.get("PodScheduled")),
+                initialized_sec=_seconds_between(created_at, conditions.get("Initialized")),
+                ready_sec=_seconds_between(created_at, conditions.get("Ready")),
+                containers=[
+                    ContainerReadiness(
+                        name=s["name"],
+                        started_sec=_seconds_between(
+                            created_at, _parse_time(s.get("state", {}).get("running", {}).get("startedAt"))
+                        ),
+                        image_pull_sec=pod_pulls.get(s["name"]),
+                    )
+                    for s in sorted(status.get("containerStatuses", []), key=lambda s: s["name"])
+                ],
+            )
+        )
+    return readiness
+
+
+def _max(values: List[Optional[float]]) -> Optional[float]:
+    known = [v for v in values if v is not None]
+    return max(known) if known else None
+
+
+def summarize_readiness(pods: List[PodReadiness]) -> Dict[str, Dict[str, Any]]:
+    """
+    Return how long every workload and its containers took to become ready, by workload.
+
+    A workload is ready once its last pod is, counted from the creation of its first pod; it stays None while any
+    of its pods isn't ready. Containers report the slowest start and image pull among the workload's pods.
+    """
+    workloads: Dict[str, List[PodReadiness]] = {}
+    for pod in pods:
+        workloads.setdefault(pod.workload, []).append(pod)
+    summary: Dict[str, Dict[str, Any]] = {}
+    for workload, workload_pods in sorted(workloads.items()):
+        first_created = min((p.created_at for p in workload_pods if p.created_at is not None), default=None)
+        ready_at = [
+            p.created_at + datetime.timedelta(seconds=p.ready_sec)
+            for p in workload_pods
+            if p.created_at is not None and p.ready_sec is not None
+        ]
+        ready_sec = None
+        if first_created is not None and len(ready_at) == len(workload_pods):
+            ready_sec = (max(ready_at) - first_created).total_seconds()
+        containers: Dict[str, List[ContainerReadiness]] = {}
+        for pod in workload_pods:
+            for container in pod.containers:
+                containers.setdefault(container.name, []).append(container)
+        summary[workload] = {
+            "pods": len(workload_pods),
+            "readySec": ready_sec,
+            "containers": {
+                name: {
+                    "startedSec": _max([c.started_sec for c in items]),
+                    "imagePullSec": _max([c.image_pull_sec for c in items]),
+                }
+                for name, items in sorted(containers.items())
+            },
+        }
+    return summary
+
+
+def write_readiness(path: str, namespace: str, pods: List[PodReadiness]) -> None:
+    """Write the readiness of every workload, with the timings of its pods, as a JSON file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "namespace": namespace,
+                "workloads": summarize_readiness(pods),
+                "pods": [
+                    {
+                        "pod": p.pod,
+                        "workload": p.workload,
+                        "scheduledSec": p.scheduled_sec,
+                        "initializedSec": p.initialized_sec,
+                        "readySec": p.ready_sec,
+                        "containers": [
+                            {"name": c.name, "startedSec": c.started_sec, "imagePullSec": c.image_pull_sec}
+                            for c in p.containers
+                        ],
+                    }
+                    for p in pods
+                ],
+            },
+            f,
+            indent=2,
+        )
@@ -0,0 +1,185 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import xml.etree.ElementTree as ET  # nosec, only reports written by the test executors are parsed
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_REPORT_DIR = "ats-reports"
+DEFAULT_SHARD = "0"
+STAGE_MAIN = "main"
+EXECUTIONS_DIR = "executions"
+AGGREGATED_JUNIT_FILE = "junit.xml"
+SUMMARY_FILE = "summary.json"
+POD_USAGE_SUFFIX = ".pod-usage.json"
+PERFORMANCE_SUFFIX = ".performance.json"
+READINESS_SUFFIX = ".readiness.json"
+AVAILABILITY_SUFFIX = ".availability.json"
+COMPATIBILITY_MATRIX_FILE = "compatibility-matrix.json"
+# JUnit elements marking a test case that didn't pass and the summary counters they are counted in
+_OUTCOME_COUNTERS = {
+    "failure": "failures",
+    "error": "errors",
+    "flakyFailure": "flaky",
+    "flakyError": "flaky",
+    "skipped": "skipped",
+}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReportSettings:
+    """Configures where the JUnit reports of single test executions are written and aggregated."""
+
+    directory: str = DEFAULT_REPORT_DIR
+    shard: str = DEFAULT_SHARD
+
+    def execution_report_path(self, scenario: str, stage: str = STAGE_MAIN) -> str:
+        """Return the absolute path of the JUnit report of one test execution."""
+        return os.path.abspath(
+            os.path.join(self.directory, EXECUTIONS_DIR, self.shard, f"{scenario}-{stage.replace('_', '-')}.xml")
+        )
+
+    def pod_usage_path(self, scenario: str, stage: str = STAGE_MAIN) -> str:
+        """Return the absolute path of the resource usage of the app's pods during one test execution."""
+        return os.path.splitext(self.execution_report_path(scenario, stage))[0] + POD_USAGE_SUFFIX
+
+    def performance_path(self, scenario: str, stage: str = STAGE_MAIN) -> str:
+        """Return the absolute path of the performance metrics of one test execution, compared to the baseline."""
+        return os.path.splitext(self.execution_report_path(scenario, stage))[0] + PERFORMANCE_SUFFIX
+
+    def readiness_path(self, scenario: str, stage: str = STAGE_MAIN) -> str:
+        """Return the absolute path of the time-to-ready of the workloads deployed for one test execution."""
+        return os.path.splitext(self.execution_report_path(scenario, stage))[0] + READINESS_SUFFIX
+
+    def availability_path(self, scenario: str, stage: str) -> str:
+        """Return the absolute path of what the availability probe saw while the release was deployed for a stage."""
+        return os.path.splitext(self.execution_report_path(scenario, stage))[0] + AVAILABILITY_SUFFIX
+
+    def compatibility_matrix_path(self) -> str:
+        """Return the absolute path of the outcome of the compatibility tests on every cluster."""
+        return os.path.abspath(os.path.join(self.directory, EXECUTIONS_DIR, self.shard, COMPATIBILITY_MATRIX_FILE))
+
+    def remove_stale_reports(self) -> None:
+        """Remove reports of this shard left by a previous run, so they aren't aggregated again."""
+        shutil.rmtree(os.path.join(self.directory, EXECUTIONS_DIR, self.shard), ignore_errors=True)
+
+
+def _execution_suites(path: str) -> List[ET.Element]:
+    root = ET.parse(path).getroot()  # nosec
+    return [root] if root.tag == "testsuite" else list(root.iter("testsuite"))
+
+
+def _read_execution_details(report_path: str, suffix: str, key: str, what: str) -> Optional[Any]:
+    path = os.path.splitext(report_path)[0] + suffix
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)[key]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Skipping {what} '{path}' that can't be read: {e}")
+        return None
+
+
+def _pod_usage_summary(report_path: str) -> Optional[Dict[str, Any]]:
+    pods = _read_execution_details(report_path, POD_USAGE_SUFFIX, "pods", "pod resource usage")
+    if pods is None:
+        return None
+    # the time series stay in their own file, the summary only gets the peaks and restarts
+    return {name: {k: v for k, v in pod.items() if k != "samples"} for name, pod in pods.items()}
+
+
+def _iter_execution_reports(directory: str) -> Iterator[Tuple[Dict[str, Any], List[ET.Element]]]:
+    for path in sorted(glob.glob(os.path.join(directory, EXECUTIONS_DIR, "*", "*.xml"))):
+        try:
+            suites = _execution_suites(path)
+        except ET.ParseError as e:
+            logger.warning(f"Skipping JUnit report '{path}' that can't be parsed: {e}")
+            continue
+        scenario, _, stage = os.path.splitext(os.path.basename(path))[0].partition("-")
+        shard = os.path.basename(os.path.dirname(path))
+        info: Dict[str, Any] = {
+            "name": f"{scenario}-{stage}-{shard}",
+            "scenario": scenario,
+            "stage": stage,
+            "shard": shard,
+        }
+        pod_usage = _pod_usage_summary(path)
+        if pod_usage is not None:
+            info["podUsage"] = pod_usage
+        # the timings of single pods stay in their own file, the summary only gets the workloads
+        readiness = _read_execution_details(path, READINESS_SUFFIX, "workloads", "workload readiness")
+        if readiness is not None:
+            info["readiness"] = readiness
+        availability = _read_execution_details(path, AVAILABILITY_SUFFIX, "services", "service availability")
+        if availability is not None:
+            # the single probe requests stay in their own file
+            info["availability"] = {
+                name: {k: v for k, v in service.items() if k != "samples"} for name, service in availability.items()
+            }
+        yield info, suites
+
+
+def _outcome(case: ET.Element) -> str:
+    for outcome in _OUTCOME_COUNTERS:
+        if case.find(outcome) is not None:
+            return outcome
+    return "passed"
+
+
+def aggregate_junit_reports(directory: str) -> Optional[Dict[str, Any]]:
+    """
+    Merge the JUnit reports of all the test executions into one JUnit file and write a JSON summary.
+
+    Every test suite of an execution is renamed to '<execution>/<suite>', where the execution name is made
+    of the scenario, the stage and the shard, like 'upgrade-pre-upgrade-0'. The merged file is written one
+    test suite at a time, so the XML of only a single execution report is held in memory; the summary keeps the
+    outcome and time of every test case. Returns the summary, or None if there was nothing to merge.
+    """
+    totals = {"tests": 0, "failures": 0, "errors": 0, "flaky": 0, "skipped": 0, "time": 0.0}
+    executions: List[Dict[str, Any]] = []
+    tests: List[Dict[str, Any]] = []
+    junit_path = os.path.join(directory, AGGREGATED_JUNIT_FILE)
+    tmp_path = f"{junit_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites name="app-test-suite">\n')
+        for execution_info, suites in _iter_execution_reports(directory):
+            execution = execution_info["name"]
+            counts = {"tests": 0, "failures": 0, "errors": 0, "flaky": 0, "skipped": 0, "time": 0.0}
+            for suite in suites:
+                suite.set("name", f"{execution}/{suite.get('name', '')}")
+                for case in suite.iter("testcase"):
+                    outcome = _outcome(case)
+                    time_sec = float(case.get("time") or 0.0)
+                    counts["tests"] += 1
+                    counts["time"] += time_sec
+                    if outcome in _OUTCOME_COUNTERS:
+                        counts[_OUTCOME_COUNTERS[outcome]] += 1
+                    tests.append(
+                        {
+                            "execution": execution,
+                            "classname": case.get("classname", ""),
+                            "name": case.get("name", ""),
+                            "outcome": outcome,
+                            "time": time_sec,
+                        }
+                    )
+                out.write(ET.tostring(suite, encoding="unicode"))
+                out.write("\n")
+            executions.append({**execution_info, **counts})
+            for key in totals:
+                totals[key] += counts[key]
+        out.write("</testsuites>\n")
+
+    if not executions:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, junit_path)
+    summary = {**totals, "executions": executions, "testcases": tests}
+    with open(os.path.join(directory, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
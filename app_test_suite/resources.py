@@ -0,0 +1,173 @@
+import logging
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+
+# every concurrent test worker (a Go test binary or compiler, a pytest process) is assumed to need this much memory
+TEST_WORKER_MEMORY_BYTES = 1024**3
+# diagnostics calls mostly wait for the API server and helm, so they can oversubscribe the CPUs this many times
+DIAGNOSTICS_WORKERS_PER_CPU = 4
+MAX_DIAGNOSTICS_WORKERS = 16
+# a deploy mostly waits for helm, kubectl and the API server, but is followed by a test run, so it needs the memory
+# of a test worker
+DEPLOY_WORKERS_PER_CPU = 2
+MAX_DEPLOY_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResourceLimits:
+    """CPUs and memory available to this process, as limited by the host, the CPU affinity and cgroups."""
+
+    cpus: float
+    memory_bytes: Optional[int] = None
+    """Available memory, or None when it can't be detected."""
+    source: str = "host"
+    """What limits the CPUs: 'host', 'cpu affinity' or 'cgroup'."""
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(cgroup_root: str, proc_self_cgroup: str, controller: str) -> List[str]:
+    """
+    Return the cgroup directories of this process for a controller, from its own cgroup up to the root.
+
+    Limits set on any ancestor apply too, so all of them have to be checked.
+    """
+    relative = None
+    for line in (_read_file(proc_self_cgroup) or "").splitlines():
+        _, controllers, path = line.split(":", 2)
+        # cgroup v2 has a single hierarchy with no controllers listed, v1 has one per controller
+        if controllers == "" or controller in controllers.split(","):
+            relative = path
+            base = cgroup_root if controllers == "" else os.path.join(cgroup_root, controller)
+            break
+    if relative is None:
+        return []
+    dirs = []
+    path = relative.strip("/")
+    while True:
+        dirs.append(os.path.join(base, path) if path else base)
+        if not path:
+            return dirs
+        path = os.path.dirname(path)
+
+
+def _cgroup_cpu_limit(cgroup_root: str, proc_self_cgroup: str) -> Optional[float]:
+    limits = []
+    for cgroup_dir in _cgroup_dirs(cgroup_root, proc_self_cgroup, "cpu"):
+        cpu_max = _read_file(os.path.join(cgroup_dir, "cpu.max"))
+        if cpu_max:
+            quota, _, period = cpu_max.partition(" ")
+            if quota != "max" and period:
+                limits.append(int(quota) / int(period))
+            continue
+        quota_us = _read_file(os.path.join(cgroup_dir, "cpu.cfs_quota_us"))
+        period_us = _read_file(os.path.join(cgroup_dir, "cpu.cfs_period_us"))
+        if quota_us and period_us and int(quota_us) > 0:
+            limits.append(int(quota_us) / int(period_us))
+    return min(limits) if limits else None
+
+
+def _cgroup_memory_limit(cgroup_root: str, proc_self_cgroup: str) -> Optional[int]:
+    limits = []
+    for cgroup_dir in _cgroup_dirs(cgroup_root, proc_self_cgroup, "memory"):
+        for limit_file in ("memory.max", "memory.limit_in_bytes"):
+            limit = _read_file(os.path.join(cgroup_dir, limit_file))
+            # cgroup v1 reports "no limit" as a huge number instead of 'max'
+            if limit and limit.isdigit() and int(limit) < 2**62:
+                limits.append(int(limit))
+    return min(limits) if limits else None
+
+
+def _available_memory(meminfo: str) -> Optional[int]:
+    for line in (_read_file(meminfo) or "").splitlines():
+        if line.startswith("MemAvailable:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def detect_resource_limits(
+    cgroup_root: str = "/sys/fs/cgroup", proc_self_cgroup: str = "/proc/self/cgroup", meminfo: str = "/proc/meminfo"
+) -> ResourceLimits:
+    """
+    Detect the CPUs and memory this process can use.
+
+    The CPU count is the smallest of the host CPUs, the CPUs in the affinity mask and the CPU quota of the
+    cgroup (v1 or v2) the process runs in, so a container limited to 2 CPUs on a 64 core host gets 2. Memory
+    is the smaller of the memory available on the host and the cgroup memory limit.
+    """
+    cpus: float = os.cpu_count() or 1
+    source = "host"
+    if hasattr(os, "sched_getaffinity"):
+        affinity = len(os.sched_getaffinity(0))
+        if affinity < cpus:
+            cpus, source = affinity, "cpu affinity"
+    cgroup_cpus = _cgroup_cpu_limit(cgroup_root, proc_self_cgroup)
+    if cgroup_cpus is not None and cgroup_cpus < cpus:
+        cpus, source = cgroup_cpus, "cgroup"
+    memory_limits = [
+        m for m in (_available_memory(meminfo), _cgroup_memory_limit(cgroup_root, proc_self_cgroup)) if m is not None
+    ]
+    return ResourceLimits(cpus=cpus, memory_bytes=min(memory_limits) if memory_limits else None, source=source)
+
+
+@lru_cache(maxsize=1)
+def get_resource_limits() -> ResourceLimits:
+    """Return the resource limits of this process, detected once."""
+    limits = detect_resource_limits()
+    memory = f"{limits.memory_bytes / 1024**3:.1f} GiB" if limits.memory_bytes is not None else "unknown"
+    logger.info(f"Detected {limits.cpus:g} CPUs (limited by {limits.source}) and {memory} of available memory.")
+    return limits
+
+
+class ResourceGovernor:
+    """
+    Derives how many things ATS and the tests it runs do at once from the available CPUs and memory.
+
+    ``max_workers``, when set, is an upper bound for every worker count, whatever the detected resources are.
+    """
+
+    def __init__(self, limits: ResourceLimits, max_workers: Optional[int] = None):
+        self._limits = limits
+        self._max_workers = max_workers
+
+    def _capped(self, workers: int) -> int:
+        if self._max_workers:
+            workers = min(workers, self._max_workers)
+        return max(workers, 1)
+
+    @property
+    def cpus(self) -> int:
+        """Whole CPUs available; a fractional quota is rounded up, as it still allows a CPU-bound process."""
+        return max(math.ceil(self._limits.cpus), 1)
+
+    @property
+    def test_workers(self) -> int:
+        """Concurrent test processes, like Go packages built and tested at once or pytest-xdist workers."""
+        workers = self.cpus
+        if self._limits.memory_bytes is not None:
+            workers = min(workers, self._limits.memory_bytes // TEST_WORKER_MEMORY_BYTES)
+        return self._capped(workers)
+
+    @property
+    def diagnostics_workers(self) -> int:
+        """Concurrent calls collecting failure diagnostics."""
+        return self._capped(min(self.cpus * DIAGNOSTICS_WORKERS_PER_CPU, MAX_DIAGNOSTICS_WORKERS))
+
+    @property
+    def deploy_workers(self) -> int:
+        """Concurrent deploys, each followed by its test run, like the clusters of the compatibility step."""
+        workers = min(self.cpus * DEPLOY_WORKERS_PER_CPU, MAX_DEPLOY_WORKERS)
+        if self._limits.memory_bytes is not None:
+            workers = min(workers, self._limits.memory_bytes // TEST_WORKER_MEMORY_BYTES)
+        return self._capped(workers)
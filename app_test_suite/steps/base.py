@@ -1,11 +1,12 @@
 import argparse
 import logging
 import os
+import re
 import shutil
 from abc import ABC
 from dataclasses import dataclass
 from tempfile import TemporaryDirectory
-from typing import Set, Optional, List, Dict
+from typing import Set, Optional, List, Dict, Tuple
 
 import configargparse
 import yaml
@@ -16,12 +17,50 @@ from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
 
 from app_test_suite.errors import ATSTestError
 from app_test_suite.cluster_manager import ClusterManager
+from app_test_suite.diagnostics import (
+    DEFAULT_DIAGNOSTICS_CALL_TIMEOUT_SEC,
+    DEFAULT_DIAGNOSTICS_DEADLINE_SEC,
+    DEFAULT_DIAGNOSTICS_DIR,
+)
+from app_test_suite.deploy_engine import DEFAULT_MANIFEST_CACHE_DIR, DEPLOY_ENGINE_HELM, DEPLOY_ENGINES
+from app_test_suite.history import DEFAULT_HISTORY_DB, TestPriority
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.performance import DEFAULT_PERFORMANCE_THRESHOLD, ENV_PERFORMANCE_RESULTS_FILE
+from app_test_suite.output_spool import (
+    DEFAULT_OUTPUT_DIR,
+    DEFAULT_TAIL_LINES,
+    OUTPUT_MODE_QUIET,
+    OUTPUT_MODES,
+    REPLAY_MODES,
+    REPLAY_TAIL,
+    OutputSettings,
+)
+from app_test_suite.resources import MAX_DIAGNOSTICS_WORKERS, ResourceGovernor, get_resource_limits
+from app_test_suite.reports import (
+    AGGREGATED_JUNIT_FILE,
+    DEFAULT_REPORT_DIR,
+    DEFAULT_SHARD,
+    SUMMARY_FILE,
+    ReportSettings,
+    aggregate_junit_reports,
+)
+from app_test_suite.tracing import span
 
 CONTEXT_KEY_CHART_YAML: str = "chart_yaml"
 CONTEXT_KEY_STABLE_CHART_YAML: str = "stable_chart_yaml"
 
 logger = logging.getLogger(__name__)
 
+_SHARD_NAME_PATTERN = re.compile(r"[A-Za-z0-9._-]+")
+
+DEFAULT_TEST_TIMEOUT_SEC = 2 * 60 * 60
+DEFAULT_HOOK_TIMEOUT_SEC = 30 * 60
+DEFAULT_PREPARE_TIMEOUT_SEC = 30 * 60
+DEFAULT_CRD_APPLY_TIMEOUT_SEC = 10 * 60
+
+TEST_ORDER_DEFAULT = "default"
+TEST_ORDER_HISTORY = "history"
+
 
 class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
     """
@@ -31,16 +70,50 @@ class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
     KEY_CONFIG_GROUP_NAME = "Base app testing options"
     KEY_CONFIG_OPTION_SKIP_DEPLOY_APP = "--app-tests-skip-app-deploy"
     KEY_CONFIG_OPTION_SKIP_DELETE_APP = "--app-tests-skip-app-delete"
-    KEY_CONFIG_OPTION_DEPLOY_NAMESPACE = "--app-tests-deploy-namespace"
+    KEY_CONFIG_OPTION_DEPLOY_NAMESPACE = NamespaceManager.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE
     KEY_CONFIG_OPTION_DEPLOY_CONFIG_FILE = "--app-tests-app-config-file"
     KEY_CONFIG_OPTION_PRE_HOOK = "--app-tests-pre-hook"
     KEY_CONFIG_OPTION_POST_HOOK = "--app-tests-post-hook"
     KEY_CONFIG_OPTION_CLUSTER_CRDS = "--cluster-crds"
     DEFAULT_CLUSTER_CRDS_DIR = "/etc/ats/crds"
-
-    def __init__(self, pipeline: List[BuildStep], cluster_manager: ClusterManager):
+    KEY_CONFIG_OPTION_DEPLOY_ENGINE = "--app-tests-deploy-engine"
+    KEY_CONFIG_OPTION_MANIFEST_CACHE_DIR = "--app-tests-manifest-cache-dir"
+    KEY_CONFIG_OPTION_DIAGNOSTICS_WORKERS = "--app-tests-diagnostics-workers"
+    KEY_CONFIG_OPTION_DIAGNOSTICS_CALL_TIMEOUT = "--app-tests-diagnostics-call-timeout"
+    KEY_CONFIG_OPTION_DIAGNOSTICS_DEADLINE = "--app-tests-diagnostics-deadline"
+    KEY_CONFIG_OPTION_DIAGNOSTICS_DIR = "--app-tests-diagnostics-dir"
+    KEY_CONFIG_OPTION_OUTPUT = "--app-tests-output"
+    KEY_CONFIG_OPTION_OUTPUT_DIR = "--app-tests-output-dir"
+    KEY_CONFIG_OPTION_OUTPUT_TAIL_LINES = "--app-tests-output-tail-lines"
+    KEY_CONFIG_OPTION_OUTPUT_REPLAY = "--app-tests-output-replay"
+    KEY_CONFIG_OPTION_REPORT_DIR = "--app-tests-report-dir"
+    KEY_CONFIG_OPTION_REPORT_SHARD = "--app-tests-report-shard"
+    KEY_CONFIG_OPTION_HISTORY_DB = "--app-tests-history-db"
+    KEY_CONFIG_OPTION_TEST_ORDER = "--app-tests-test-order"
+    KEY_CONFIG_OPTION_FAIL_FAST = "--app-tests-fail-fast"
+    KEY_CONFIG_OPTION_TEST_RETRIES = "--app-tests-test-retries"
+    KEY_CONFIG_OPTION_TEST_TIMEOUT = "--app-tests-test-timeout"
+    KEY_CONFIG_OPTION_HOOK_TIMEOUT = "--app-tests-hook-timeout"
+    KEY_CONFIG_OPTION_PREPARE_TIMEOUT = "--app-tests-prepare-timeout"
+    KEY_CONFIG_OPTION_CRD_APPLY_TIMEOUT = "--app-tests-crd-apply-timeout"
+    KEY_CONFIG_OPTION_SCENARIO_DEADLINE = "--app-tests-scenario-deadline"
+    KEY_CONFIG_OPTION_MAX_WORKERS = "--app-tests-max-workers"
+    KEY_CONFIG_OPTION_GO_MOD_CACHE_DIR = "--app-tests-go-mod-cache-dir"
+    KEY_CONFIG_OPTION_GO_BUILD_CACHE_DIR = "--app-tests-go-build-cache-dir"
+    KEY_CONFIG_OPTION_PYTEST_WORKER = "--app-tests-pytest-worker"
+    KEY_CONFIG_OPTION_POD_USAGE_INTERVAL = "--app-tests-pod-usage-interval"
+    KEY_CONFIG_OPTION_PERFORMANCE_THRESHOLD = "--app-tests-performance-threshold"
+    KEY_CONFIG_OPTION_PERFORMANCE_BASELINE_VERSION = "--app-tests-performance-baseline-version"
+
+    def __init__(
+        self,
+        pipeline: List[BuildStep],
+        cluster_manager: ClusterManager,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
         super().__init__(pipeline, self.KEY_CONFIG_GROUP_NAME)
         self._cluster_manager = cluster_manager
+        self._namespace_manager = namespace_manager or NamespaceManager()
         # Runs outside the filtered pipeline: every scenario needs the chart info in the context,
         # so it must not be skippable via '--steps'/'--skip-steps'.
         self._test_info_provider = TestInfoProvider()
@@ -71,7 +144,8 @@ class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
             self.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
             required=False,
             default="default",
-            help="The namespace your app under test should be deployed to for running tests.",
+            help="The namespace your app under test should be deployed to for running tests. Used when "
+            f"'{NamespaceManager.KEY_CONFIG_OPTION_NAMESPACE_MODE}' is 'fixed'.",
         )
         self._config_parser_group.add_argument(
             self.KEY_CONFIG_OPTION_DEPLOY_CONFIG_FILE,
@@ -95,7 +169,207 @@ class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
             help="Path or URL passed to 'kubectl apply --server-side -f' to bootstrap CRDs on the test cluster"
             f" before running tests. (default: {self.DEFAULT_CLUSTER_CRDS_DIR})",
         )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_DEPLOY_ENGINE,
+            required=False,
+            default=DEPLOY_ENGINE_HELM,
+            choices=DEPLOY_ENGINES,
+            help="How the chart under test is deployed. 'helm' runs 'helm upgrade --install'; 'template' renders "
+            "the chart once with 'helm template', caches the manifests and applies them with 'kubectl apply "
+            "--server-side', pruning objects dropped between versions.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_MANIFEST_CACHE_DIR,
+            required=False,
+            default=DEFAULT_MANIFEST_CACHE_DIR,
+            help="Directory where manifests rendered by the 'template' deploy engine are cached, keyed by the "
+            "chart, values, release name and namespace.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_WORKERS,
+            required=False,
+            type=int,
+            default=0,
+            help="Maximum number of API calls and 'helm' commands run concurrently when collecting diagnostics "
+            f"of a failed test run. 0 derives it from the available CPUs, up to {MAX_DIAGNOSTICS_WORKERS}.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_CALL_TIMEOUT,
+            required=False,
+            type=float,
+            default=DEFAULT_DIAGNOSTICS_CALL_TIMEOUT_SEC,
+            help="Timeout in seconds of a single call made when collecting diagnostics of a failed test run.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_DEADLINE,
+            required=False,
+            type=float,
+            default=DEFAULT_DIAGNOSTICS_DEADLINE_SEC,
+            help="Overall time limit in seconds for collecting diagnostics of a failed test run. Diagnostics "
+            "collected until then are still reported.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_DIR,
+            required=False,
+            default=DEFAULT_DIAGNOSTICS_DIR,
+            help="Directory where diagnostics of a failed test run are written as a '.tar.gz' bundle, with only "
+            "a summary logged. Set to an empty string to log all the diagnostics instead.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_OUTPUT,
+            required=False,
+            default=OUTPUT_MODE_QUIET,
+            choices=OUTPUT_MODES,
+            help="How the output of test executors and hooks is handled. 'quiet' saves it to a compressed file and "
+            "logs only a summary, replaying the output only when the command fails; 'stream' logs all of it.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_OUTPUT_DIR,
+            required=False,
+            default=DEFAULT_OUTPUT_DIR,
+            help="Directory where the output of test executors and hooks is saved in the 'quiet' output mode.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_OUTPUT_TAIL_LINES,
+            required=False,
+            type=int,
+            default=DEFAULT_TAIL_LINES,
+            help="Number of the last output lines of a failed command replayed in the 'quiet' output mode.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_OUTPUT_REPLAY,
+            required=False,
+            default=REPLAY_TAIL,
+            choices=REPLAY_MODES,
+            help="What is replayed when a command fails in the 'quiet' output mode: only the last lines ('tail') or "
+            "the whole output ('full').",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_REPORT_DIR,
+            required=False,
+            default=DEFAULT_REPORT_DIR,
+            help="Directory where the JUnit report of every test execution is saved and where all of them are merged "
+            f"into '{AGGREGATED_JUNIT_FILE}' and '{SUMMARY_FILE}' at the end of the run. Set to an empty string to "
+            "leave the reports in the test directory instead.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_REPORT_SHARD,
+            required=False,
+            default=DEFAULT_SHARD,
+            help="Name of this run in the report directory, for CI setups that split tests between runs sharing the "
+            "report directory. Only letters, digits, '.', '_' and '-' are allowed.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_HISTORY_DB,
+            required=False,
+            default=DEFAULT_HISTORY_DB,
+            help="SQLite database where the duration and outcome of every test and deploy are recorded, for "
+            "'ats report timings'. Set to an empty string to disable recording.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_TEST_ORDER,
+            required=False,
+            default=TEST_ORDER_DEFAULT,
+            choices=[TEST_ORDER_DEFAULT, TEST_ORDER_HISTORY],
+            help="Order in which tests are run: as the test framework collects them ('default') or recently failed "
+            f"tests first and then the fastest, based on '{self.KEY_CONFIG_OPTION_HISTORY_DB}' ('history').",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_FAIL_FAST,
+            required=False,
+            default=False,
+            action="store_true",
+            help="Stop a test run on its first failing test.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_TEST_RETRIES,
+            required=False,
+            default=0,
+            type=int,
+            help="How many times the failed tests of a test run are run again, against the release that is still "
+            "deployed. Tests that pass on a retry are reported as flaky instead of failed.",
+        )
+        for option, default, what in [
+            (self.KEY_CONFIG_OPTION_TEST_TIMEOUT, DEFAULT_TEST_TIMEOUT_SEC, "a test run, including its retries"),
+            (self.KEY_CONFIG_OPTION_HOOK_TIMEOUT, DEFAULT_HOOK_TIMEOUT_SEC, "a pre-, post- or upgrade hook"),
+            (
+                self.KEY_CONFIG_OPTION_PREPARE_TIMEOUT,
+                DEFAULT_PREPARE_TIMEOUT_SEC,
+                "preparing the test environment, like 'uv sync'",
+            ),
+            (self.KEY_CONFIG_OPTION_CRD_APPLY_TIMEOUT, DEFAULT_CRD_APPLY_TIMEOUT_SEC, "applying the cluster CRDs"),
+            (
+                self.KEY_CONFIG_OPTION_SCENARIO_DEADLINE,
+                0,
+                "a whole test scenario, from deploying the chart to the last test; it caps all the other timeouts",
+            ),
+        ]:
+            self._config_parser_group.add_argument(
+                option,
+                required=False,
+                default=default,
+                type=float,
+                help=f"Time limit in seconds for {what}. When it expires, the whole process group of the running "
+                "command is killed, failure diagnostics are collected and the scenario fails as timed out. "
+                "0 disables the limit.",
+            )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_MAX_WORKERS,
+            required=False,
+            default=0,
+            type=int,
+            help="Upper bound for everything ATS and the tests run concurrently: Go packages, pytest-xdist workers, "
+            "diagnostics calls and deploys. By default, these are derived from the CPU quota (cgroups included) "
+            "and the memory available.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_GO_MOD_CACHE_DIR,
+            required=False,
+            default="",
+            help="Directory used as 'GOMODCACHE' by Go tests, like a volume kept between CI runs, so modules are "
+            "downloaded only once. Go's default is used when not set.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_GO_BUILD_CACHE_DIR,
+            required=False,
+            default="",
+            help="Directory used as 'GOCACHE' by Go tests, so packages are compiled only when they change. Go's "
+            "default is used when not set.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_PYTEST_WORKER,
+            required=False,
+            action="store_true",
+            help="Run pytest sessions in a worker process started once, with pytest and the modules the tests "
+            "import already loaded, instead of starting 'uv run pytest' for every test run.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_POD_USAGE_INTERVAL,
+            required=False,
+            default=0,
+            type=float,
+            help="Sample the CPU and memory used by every pod in the release namespace every this many seconds "
+            "while the tests run, from the 'metrics.k8s.io' API or the kubelets. Peaks and restarts are logged and "
+            "saved with the reports and the upgrade metadata. 0 disables sampling.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_PERFORMANCE_THRESHOLD,
+            required=False,
+            default=DEFAULT_PERFORMANCE_THRESHOLD,
+            type=float,
+            help="Largest relative change for the worse of a metric reported by the performance tests, compared to "
+            "the baseline chart version, that doesn't fail the 'performance' step. Metrics can set their own. "
+            f"Baselines are kept in '{self.KEY_CONFIG_OPTION_HISTORY_DB}'.",
+        )
+        self._config_parser_group.add_argument(
+            self.KEY_CONFIG_OPTION_PERFORMANCE_BASELINE_VERSION,
+            required=False,
+            default="",
+            help="Chart version the performance metrics are compared with. By default, it's the highest version "
+            "lower than the one under test with recorded metrics.",
+        )
         self._cluster_manager.initialize_config(self._config_parser_group)
+        self._namespace_manager.initialize_config(self._config_parser_group)
 
     def pre_run(self, config: argparse.Namespace) -> None:
         super().pre_run(config)
@@ -106,6 +380,44 @@ class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
             raise ConfigError("chart-file", f"The file '{config.chart_file}' can't be found.")
 
         self._cluster_manager.pre_run(config)
+        self._namespace_manager.pre_run(config)
+        for option in [
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_CALL_TIMEOUT,
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_DEADLINE,
+            self.KEY_CONFIG_OPTION_OUTPUT_TAIL_LINES,
+        ]:
+            if get_config_value_by_cmd_line_option(config, option) <= 0:
+                raise ConfigError(option, f"The value of '{option}' has to be greater than 0.")
+        report_settings = self.get_report_settings(config)
+        if report_settings is not None:
+            if not _SHARD_NAME_PATTERN.fullmatch(report_settings.shard):
+                raise ConfigError(
+                    self.KEY_CONFIG_OPTION_REPORT_SHARD,
+                    f"Invalid shard name '{report_settings.shard}': only letters, digits, '.', '_' and '-' are "
+                    "allowed.",
+                )
+            report_settings.remove_stale_reports()
+        for option in [
+            self.KEY_CONFIG_OPTION_DIAGNOSTICS_WORKERS,
+            self.KEY_CONFIG_OPTION_MAX_WORKERS,
+            self.KEY_CONFIG_OPTION_TEST_RETRIES,
+            self.KEY_CONFIG_OPTION_TEST_TIMEOUT,
+            self.KEY_CONFIG_OPTION_HOOK_TIMEOUT,
+            self.KEY_CONFIG_OPTION_PREPARE_TIMEOUT,
+            self.KEY_CONFIG_OPTION_CRD_APPLY_TIMEOUT,
+            self.KEY_CONFIG_OPTION_SCENARIO_DEADLINE,
+            self.KEY_CONFIG_OPTION_POD_USAGE_INTERVAL,
+            self.KEY_CONFIG_OPTION_PERFORMANCE_THRESHOLD,
+        ]:
+            if get_config_value_by_cmd_line_option(config, option) < 0:
+                raise ConfigError(option, f"The value of '{option}' can't be negative.")
+        if get_config_value_by_cmd_line_option(
+            config, self.KEY_CONFIG_OPTION_TEST_ORDER
+        ) == TEST_ORDER_HISTORY and not get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_HISTORY_DB):
+            raise ConfigError(
+                self.KEY_CONFIG_OPTION_TEST_ORDER,
+                f"Ordering tests by '{TEST_ORDER_HISTORY}' needs '{self.KEY_CONFIG_OPTION_HISTORY_DB}' to be set.",
+            )
         app_config_file = get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_DEPLOY_CONFIG_FILE)
         if app_config_file:
             if not os.path.isfile(app_config_file):
@@ -126,6 +438,39 @@ class BaseTestScenariosFilteringPipeline(BuildStepsFilteringPipeline):
             self._test_info_provider.run(config, context)
         super().run(config, context)
 
+    def cleanup(self, config: argparse.Namespace, context: Context, has_build_failed: bool) -> None:
+        super().cleanup(config, context, has_build_failed)
+        # honor --app-tests-skip-app-delete: generated namespaces are then left for 'ats gc'
+        if not get_config_value_by_cmd_line_option(config, self.KEY_CONFIG_OPTION_SKIP_DELETE_APP):
+            self._namespace_manager.cleanup()
+        report_settings = self.get_report_settings(config)
+        if report_settings is not None and not self._all_pre_runs_skipped:
+            summary = aggregate_junit_reports(report_settings.directory)
+            if summary is not None:
+                logger.info(
+                    f"{summary['tests']} tests run in {len(summary['executions'])} executions: "
+                    f"{summary['failures']} failed, {summary['errors']} errors, {summary['flaky']} flaky, "
+                    f"{summary['skipped']} skipped. "
+                    f"Merged JUnit report written to '{os.path.join(report_settings.directory, AGGREGATED_JUNIT_FILE)}'."
+                )
+
+    @classmethod
+    def get_resource_governor(cls, config: argparse.Namespace) -> ResourceGovernor:
+        """Return the governor deriving worker counts from the detected resources and the configured cap."""
+        return ResourceGovernor(
+            get_resource_limits(), get_config_value_by_cmd_line_option(config, cls.KEY_CONFIG_OPTION_MAX_WORKERS)
+        )
+
+    @classmethod
+    def get_report_settings(cls, config: argparse.Namespace) -> Optional[ReportSettings]:
+        """Return where JUnit reports are saved and merged, or None if they are left in the test directory."""
+        report_dir = get_config_value_by_cmd_line_option(config, cls.KEY_CONFIG_OPTION_REPORT_DIR)
+        if not report_dir:
+            return None
+        return ReportSettings(
+            directory=report_dir, shard=get_config_value_by_cmd_line_option(config, cls.KEY_CONFIG_OPTION_REPORT_SHARD)
+        )
+
 
 @dataclass
 class TestExecInfo:
@@ -155,6 +500,24 @@ class TestExecInfo:
     """Name of the Helm release the chart under test was deployed as."""
     deploy_namespace: Optional[str] = None
     """Namespace the chart under test was deployed into."""
+    output: Optional[OutputSettings] = None
+    """Where the output of the test run is spooled to; it's logged directly when not set."""
+    junit_report_path: Optional[str] = None
+    """Where the JUnit report of the test run is written; a file in the test directory when not set."""
+    test_priorities: Optional[Dict[Tuple[str, str], TestPriority]] = None
+    """History of the tests by JUnit class name and name, to run them in that order; default order when not set."""
+    fail_fast: bool = False
+    """Should the test run stop on the first failing test."""
+    retries: int = 0
+    """How many times the failed tests are run again; the ones that pass on a retry are reported as flaky."""
+    timeout_sec: Optional[float] = None
+    """Time limit for the whole test run, retries included; no limit when not set."""
+    prepare_timeout_sec: Optional[float] = None
+    """Time limit for preparing the test environment; no limit when not set."""
+    workers: Optional[int] = None
+    """How many test processes can run at once, passed to the test framework; its own default when not set."""
+    performance_results_path: Optional[str] = None
+    """File the performance tests write the metrics they measured to; only set for the performance tests."""
 
 
 class TestExecutor(ABC):
@@ -203,6 +566,14 @@ class TestExecutor(ABC):
                 return legacy_dir
         return cwd_dir
 
+    def warm_up(self, test_type: str, timeout_sec: Optional[float]) -> None:
+        """
+        Optional step run in the background while the chart under test is deployed, like downloading dependencies.
+
+        It must not need the cluster. A failure only means the work is done again by the following steps.
+        """
+        return
+
     def prepare_test_environment(self, exec_info: TestExecInfo) -> None:
         """Optional step to prepare environment where your tests are executed (ie. installing dependencies)."""
         raise NotImplementedError()
@@ -211,6 +582,14 @@ class TestExecutor(ABC):
         """Execute test using a specific test executor and information provided as exec_info."""
         raise NotImplementedError()
 
+    def cleanup(self) -> None:
+        """Optional step to stop anything the test executor keeps running between test runs."""
+        return
+
+    def get_junit_report_path(self, exec_info: TestExecInfo) -> str:
+        """Path of the JUnit report the test executor writes for the test run described by exec_info."""
+        return exec_info.junit_report_path or os.path.join(self._test_dir, f"test_results_{exec_info.test_type}.xml")
+
     def get_test_info_env_variables(self, exec_info: TestExecInfo, append_to_sys_env: bool = True) -> Dict[str, str]:
         env_vars: Dict[str, str] = {}
         if append_to_sys_env:
@@ -242,6 +621,12 @@ class TestExecutor(ABC):
         if exec_info.deploy_namespace is not None:
             env_vars["ATS_RELEASE_NAMESPACE"] = exec_info.deploy_namespace
 
+        if exec_info.workers is not None:
+            env_vars["ATS_WORKERS"] = str(exec_info.workers)
+
+        if exec_info.performance_results_path is not None:
+            env_vars[ENV_PERFORMANCE_RESULTS_FILE] = exec_info.performance_results_path
+
         if exec_info.test_extra_info:
             env_vars.update({"ATS_EXTRA_" + k.upper(): v for k, v in exec_info.test_extra_info.items()})
 
@@ -263,21 +648,22 @@ class TestInfoProvider(BuildStep):
         self.extract_chart_info(config.chart_file, CONTEXT_KEY_CHART_YAML, context)
 
     def extract_chart_info(self, chart_file: str, context_key: str, context: Context) -> None:
-        if not os.path.isfile(chart_file):
-            raise ValidationError(self.name, f"Chart file '{chart_file}' not found")
-        with TemporaryDirectory(prefix="ats-") as tmp_dir:
-            shutil.unpack_archive(chart_file, tmp_dir)
-            _, sub_dirs, _ = next(os.walk(tmp_dir))
-            for sub_dir in sub_dirs:
-                chart_yaml_path = os.path.join(tmp_dir, sub_dir, "Chart.yaml")
-                if os.path.isfile(chart_yaml_path):
-                    with open(chart_yaml_path, "r") as file:
-                        chart_yaml = yaml.safe_load(file)
-                        logger.debug(f"Loading 'Chart.yaml' from subdirectory '{sub_dir}' in the chart archive.")
-                        context[context_key] = chart_yaml
-                    break
-            else:
-                raise ValidationError(
-                    self.name,
-                    "Couldn't find 'Chart.yaml' in any subdirectory of the chart archive file.",
-                )
+        with span("chart extraction", "config", chart=os.path.basename(chart_file)):
+            if not os.path.isfile(chart_file):
+                raise ValidationError(self.name, f"Chart file '{chart_file}' not found")
+            with TemporaryDirectory(prefix="ats-") as tmp_dir:
+                shutil.unpack_archive(chart_file, tmp_dir)
+                _, sub_dirs, _ = next(os.walk(tmp_dir))
+                for sub_dir in sub_dirs:
+                    chart_yaml_path = os.path.join(tmp_dir, sub_dir, "Chart.yaml")
+                    if os.path.isfile(chart_yaml_path):
+                        with open(chart_yaml_path, "r") as file:
+                            chart_yaml = yaml.safe_load(file)
+                            logger.debug(f"Loading 'Chart.yaml' from subdirectory '{sub_dir}' in the chart archive.")
+                            context[context_key] = chart_yaml
+                        break
+                else:
+                    raise ValidationError(
+                        self.name,
+                        "Couldn't find 'Chart.yaml' in any subdirectory of the chart archive file.",
+                    )
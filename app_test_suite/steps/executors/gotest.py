@@ -1,15 +1,30 @@
 import argparse
+import json
 import logging
 import os
-from typing import cast, List
+import re
+from collections import deque
+from tempfile import TemporaryDirectory
+from typing import cast, Callable, Deque, Dict, List, Optional, Tuple
 
 from step_exec_lib.errors import ValidationError
 from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
-from step_exec_lib.utils.processes import run_and_handle_error
 
 from app_test_suite.cluster_manager import ClusterManager
 from app_test_suite.config import KEY_CFG_TESTS_DIR
-from app_test_suite.errors import ATSTestError
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
+from app_test_suite.history import TestPriority
+from app_test_suite.junit import (
+    OUTCOME_FAILED,
+    OUTCOME_FLAKY,
+    OUTCOME_PASSED,
+    OUTCOME_SKIPPED,
+    JUnitTestCase,
+    write_junit_xml,
+)
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.output_spool import SpooledOutput
+from app_test_suite.processes import Deadline, run_and_log, run_and_stream
 from app_test_suite.steps.base import (
     TestExecInfo,
     TestExecutor,
@@ -19,73 +34,391 @@ from app_test_suite.steps.scenarios.simple import (
     FunctionalTestScenario,
     SmokeTestScenario,
 )
+from app_test_suite.steps.scenarios.compatibility import CompatibilityTestScenario
+from app_test_suite.steps.scenarios.performance import PerformanceTestScenario
 from app_test_suite.steps.scenarios.upgrade import UpgradeTestScenario
+from app_test_suite.tracing import span
 
 logger = logging.getLogger(__name__)
 
+_NO_TESTS_ERROR_TEXT = "build constraints exclude all Go files"
+_STALE_PACKAGES_TEMPLATE = "{{if not .Standard}}{{.ImportPath}} {{.Stale}}{{end}}"
+# the first Go version with 'go test -skip', needed to run the tests missing in the history
+_MIN_GO_VERSION_FOR_ORDERING = (1, 20)
+# how many 'go test -run' invocations the tests known from the history are split into by their duration
+_HISTORY_ORDER_BATCHES = 3
+
+
+def _count_module_zips(mod_cache_dir: str) -> int:
+    """Count the module archives in the download cache of a Go module cache."""
+    count = 0
+    for _, _, files in os.walk(os.path.join(mod_cache_dir, "cache", "download")):
+        count += sum(1 for f in files if f.endswith(".zip"))
+    return count
+
+
+def _count_json_objects(text: str) -> int:
+    """Count the JSON objects in the output of 'go ... -json', which prints them one after another."""
+    decoder = json.JSONDecoder()
+    count, pos = 0, 0
+    text = text.strip()
+    while pos < len(text):
+        _, pos = decoder.raw_decode(text, pos)
+        count += 1
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return count
+
+
+_MAX_TEST_OUTPUT_LINES = 200
+_GO_TEST_RESULTS = {"pass": OUTCOME_PASSED, "fail": OUTCOME_FAILED, "skip": OUTCOME_SKIPPED}
+# status lines that 'go test' prints for every test; they are replaced by our own result lines
+_GO_TEST_STATUS_PREFIXES = ("=== RUN", "=== PAUSE", "=== CONT", "=== NAME", "--- PASS", "--- FAIL", "--- SKIP")
+
 
 class GotestTestFilteringPipeline(BaseTestScenariosFilteringPipeline):
     def __init__(self) -> None:
         cluster_manager = ClusterManager()
+        namespace_manager = NamespaceManager()
         test_executor = GotestExecutor()
         super().__init__(
             [
-                SmokeTestScenario(cluster_manager, test_executor),
-                FunctionalTestScenario(cluster_manager, test_executor),
-                UpgradeTestScenario(cluster_manager, test_executor),
+                SmokeTestScenario(cluster_manager, test_executor, namespace_manager),
+                FunctionalTestScenario(cluster_manager, test_executor, namespace_manager),
+                UpgradeTestScenario(cluster_manager, test_executor, namespace_manager),
+                PerformanceTestScenario(cluster_manager, test_executor, namespace_manager),
+                CompatibilityTestScenario(cluster_manager, test_executor, namespace_manager),
             ],
             cluster_manager,
+            namespace_manager,
+        )
+
+
+class GoTestEventProcessor:
+    """
+    Consumes the output of 'go test -json' line by line, while the tests run.
+
+    Every finished test is logged with its result and duration as soon as its event arrives. Test output is
+    logged live too, and only the last ``max_output_lines`` lines of each running test are kept in memory,
+    to be attached to the JUnit report if the test fails. Lines that aren't JSON events (like build errors
+    printed to stderr) are logged as they are. All the output goes to ``output_handler``, which by default
+    logs it.
+    """
+
+    def __init__(
+        self,
+        expected_text: str = "",
+        max_output_lines: int = _MAX_TEST_OUTPUT_LINES,
+        output_handler: Callable[[str], None] = logger.info,
+    ):
+        self._expected_text = expected_text
+        self._output_handler = output_handler
+        self._max_output_lines = max_output_lines
+        self._output: Dict[Tuple[str, str], Deque[str]] = {}
+        self.test_cases: List[JUnitTestCase] = []
+        self.found_expected_text = False
+
+    def feed(self, line: str) -> None:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict):
+            self._log_output(line)
+            return
+
+        action = event.get("Action", "")
+        package = event.get("Package") or event.get("ImportPath", "")
+        test = event.get("Test")
+        if action in ("output", "build-output"):
+            output = event.get("Output", "").rstrip("\n")
+            if test:
+                self._output.setdefault((package, test), deque(maxlen=self._max_output_lines)).append(output)
+            if not output.startswith(_GO_TEST_STATUS_PREFIXES):
+                self._log_output(output)
+        elif action in _GO_TEST_RESULTS and test:
+            self._finish_test(package, test, action, float(event.get("Elapsed", 0.0)))
+        elif action in _GO_TEST_RESULTS:
+            level = logging.ERROR if action == "fail" else logging.INFO
+            logger.log(level, f"Package '{package}': {action.upper()} ({float(event.get('Elapsed', 0.0)):.2f}s)")
+
+    def log_summary(self) -> None:
+        counts = {outcome: 0 for outcome in [*_GO_TEST_RESULTS.values(), OUTCOME_FLAKY]}
+        for case in self.test_cases:
+            counts[case.outcome] += 1
+        logger.info(
+            f"Go tests finished: {counts[OUTCOME_PASSED]} passed, {counts[OUTCOME_FAILED]} failed, "
+            f"{counts[OUTCOME_FLAKY]} flaky, {counts[OUTCOME_SKIPPED]} skipped."
         )
+        for case in self.test_cases:
+            if case.outcome == OUTCOME_FAILED:
+                logger.error(f"FAILED: {case.classname}.{case.name}")
+
+    def _finish_test(self, package: str, test: str, action: str, elapsed: float) -> None:
+        output = self._output.pop((package, test), None)
+        outcome = _GO_TEST_RESULTS[action]
+        level = logging.ERROR if outcome == OUTCOME_FAILED else logging.INFO
+        logger.log(level, f"--- {action.upper()}: {package}.{test} ({elapsed:.2f}s)")
+        self.test_cases.append(
+            JUnitTestCase(
+                classname=package,
+                name=test,
+                time_sec=elapsed,
+                outcome=outcome,
+                output="\n".join(output) if output is not None and outcome == OUTCOME_FAILED else "",
+            )
+        )
+
+    def _log_output(self, line: str) -> None:
+        if self._expected_text and self._expected_text in line:
+            self.found_expected_text = True
+        self._output_handler(line)
 
 
 class GotestExecutor(TestExecutor):
     _GOTEST_BIN = "go"
 
-    def prepare_test_environment(self, exec_info: TestExecInfo) -> None:
-        return
+    def __init__(self) -> None:
+        super().__init__()
+        # GOMODCACHE and GOCACHE, when configured
+        self._cache_env_vars: Dict[str, str] = {}
 
-    def execute_test(self, exec_info: TestExecInfo) -> None:
-        env_vars = self.get_test_info_env_variables(exec_info)
+    def _go_env_vars(self, env_vars: Dict[str, str]) -> Dict[str, str]:
         env_vars.update(
             {
                 # Set env vars needed by Go.
                 "CGO_ENABLED": "0",
             }
         )
+        env_vars.update(self._cache_env_vars)
+        return env_vars
+
+    def warm_up(self, test_type: str, timeout_sec: Optional[float]) -> None:
+        """Download the Go modules and compile the tests, so the test run finds both in the caches."""
+        env_vars = self._go_env_vars(dict(os.environ))
+        deadline = Deadline(timeout_sec, "warm-up timeout")
+        go_env = json.loads(self._run_go(["env", "-json", "GOMODCACHE", "GOCACHE"], env_vars, deadline))
+
+        with span("go module download", "cache", cache="go-modules") as span_args:
+            cached_before = _count_module_zips(go_env["GOMODCACHE"])
+            modules = _count_json_objects(self._run_go(["mod", "download", "-json"], env_vars, deadline))
+            downloaded = max(_count_module_zips(go_env["GOMODCACHE"]) - cached_before, 0)
+            span_args.update(hits=modules - downloaded, lookups=modules)
+        logger.info(
+            f"Go module cache '{go_env['GOMODCACHE']}': {modules - downloaded} of {modules} module(s) found, "
+            f"{downloaded} downloaded."
+        )
+
+        with span("go test compilation", "cache", cache="go-build") as span_args:
+            # the test main packages are linked on every run, so only the packages they're built from are counted
+            stale = [
+                line.split()[1] == "true"
+                for line in self._run_go(
+                    ["list", "-deps", "-test", f"-tags={test_type}", "-f", _STALE_PACKAGES_TEMPLATE, "./..."],
+                    env_vars,
+                    deadline,
+                ).splitlines()
+                if line and not line.split()[0].endswith(".test")
+            ]
+            span_args.update(hits=stale.count(False), lookups=len(stale))
+            logger.info(
+                f"Go build cache '{go_env['GOCACHE']}': {stale.count(False)} of {len(stale)} package(s) up to date, "
+                f"compiling {stale.count(True)}."
+            )
+            with TemporaryDirectory(prefix="ats-gotest-") as tmp_dir:
+                self._run_go(["test", "-c", f"-tags={test_type}", "-o", tmp_dir + os.sep, "./..."], env_vars, deadline)
+
+    def _run_go(self, args: List[str], env_vars: Dict[str, str], deadline: Deadline) -> str:
+        run_res = run_and_log(
+            [self._GOTEST_BIN] + args,
+            timeout_sec=deadline.timeout(),
+            cwd=self._test_dir,
+            env=env_vars,
+            capture_output=True,
+        )  # nosec, no user input
+        if run_res.returncode != 0:
+            raise ATSTestError(f"Running 'go {' '.join(args)}' failed: {run_res.stderr.strip()}")
+        return cast(str, run_res.stdout)
+
+    def prepare_test_environment(self, exec_info: TestExecInfo) -> None:
+        return
+
+    def execute_test(self, exec_info: TestExecInfo) -> None:
+        env_vars = self._go_env_vars(self.get_test_info_env_variables(exec_info))
+        if exec_info.workers is not None:
+            # GOMAXPROCS sets both how many packages 'go test' builds and tests at once and the threads of every
+            # test binary; a value set by the user wins
+            env_vars.setdefault("GOMAXPROCS", str(exec_info.workers))
 
         args = [
             self._GOTEST_BIN,
             "test",
-            "-v",
+            "-json",
             f"-tags={exec_info.test_type}",
         ]
+        if exec_info.fail_fast:
+            args.append("-failfast")
+        # the test timeout covers all the 'go test' invocations of the test run
+        deadline = Deadline(exec_info.timeout_sec, "test timeout")
+        test_priorities = exec_info.test_priorities
+        if test_priorities and not self._supports_test_ordering(env_vars, deadline):
+            test_priorities = None
+        runs = self._get_test_runs(args, test_priorities)
         logger.info(f"Running {self._GOTEST_BIN} tool in '{self._test_dir}' directory.")
 
+        spool = None if exec_info.output is None else SpooledOutput(exec_info.output, f"gotest-{exec_info.test_type}")
+        events = GoTestEventProcessor(
+            _NO_TESTS_ERROR_TEXT, output_handler=logger.info if spool is None else spool.write
+        )
+        try:
+            if spool is None:
+                return_code = self._run_tests(args, runs, events, exec_info, env_vars, deadline)
+            else:
+                with spool:
+                    return_code = self._run_tests(args, runs, events, exec_info, env_vars, deadline)
+                spool.report(failed=return_code != 0 and not events.found_expected_text)
+        except ATSTimeoutError:
+            # keep the results of the tests that finished before the timeout
+            if spool is not None:
+                spool.report(failed=True)
+            self._write_junit_report(exec_info, events)
+            raise
         # If there are no Go tests with build tags for this test type we handle the error.
-        run_res = run_and_handle_error(
-            args,
-            "build constraints exclude all Go files",
-            cwd=self._test_dir,
-            env=env_vars,
-        )  # nosec, no user input here
+        if return_code != 0 and events.found_expected_text:
+            logger.info(f"Found expected error text '{_NO_TESTS_ERROR_TEXT}', overriding exit code to 0")
+            return_code = 0
+        self._write_junit_report(exec_info, events)
 
-        logger.info("#" * 40)
-        logger.info(f"Command '{args}' executed, exit code: {run_res.returncode}")
+        if return_code != 0:
+            raise ATSTestError(f"Gotest tests failed: running '{args}' in directory '{self._test_dir}' failed.")
 
-        logger.info("#" * 40)
-        logger.info("Command STDOUT was:")
-        for line in run_res.stdout.splitlines():
-            logger.info(line)
+    def _write_junit_report(self, exec_info: TestExecInfo, events: GoTestEventProcessor) -> None:
+        events.log_summary()
+        junit_path = self.get_junit_report_path(exec_info)
+        write_junit_xml(junit_path, f"gotest-{exec_info.test_type}", events.test_cases)
+        logger.info(f"JUnit test report written to '{junit_path}'.")
 
-        logger.info("#" * 40)
-        logger.info("Command STDERR was:")
-        for line in run_res.stderr.splitlines():
-            logger.info(line)
+    def _supports_test_ordering(self, env_vars: Dict[str, str], deadline: Deadline) -> bool:
+        try:
+            go_version = self._run_go(["env", "GOVERSION"], env_vars, deadline).strip()
+        except ATSTestError as e:
+            logger.warning(f"Checking the Go version failed, running the tests in the default order: {e}")
+            return False
+        match = re.search(r"go(\d+)\.(\d+)", go_version)
+        if match is None or (int(match.group(1)), int(match.group(2))) < _MIN_GO_VERSION_FOR_ORDERING:
+            logger.warning(
+                f"Ordering the tests by their history needs Go {'.'.join(map(str, _MIN_GO_VERSION_FOR_ORDERING))} "
+                f"or newer, found '{go_version}'; running the tests in the default order."
+            )
+            return False
+        return True
 
-        logger.info("#" * 40)
+    @staticmethod
+    def _get_test_runs(
+        args: List[str], test_priorities: Optional[Dict[Tuple[str, str], TestPriority]]
+    ) -> List[List[str]]:
+        """
+        Return the 'go test' invocations to run, in the order the pytest plugin uses for history-driven ordering.
 
-        if run_res.returncode != 0:
-            raise ATSTestError(f"Gotest tests failed: running '{args}' in directory '{self._test_dir}' failed.")
+        The recently failed tests run first, then the tests missing in the history, then the rest from the fastest
+        to the slowest. 'go test' always runs the tests of a package in their source order and '-run' only selects
+        them, so the order is kept by separate runs: the tests known from the history are split by their average
+        duration into up to ``_HISTORY_ORDER_BATCHES`` runs selecting them with '-run', and the other tests are
+        selected with '-skip', which needs Go 1.20. Subtests are run with their top-level test.
+        """
+        if not test_priorities:
+            return [args]
+        avg_sec: Dict[str, float] = {}
+        recently_failed = set()
+        for (_, name), priority in test_priorities.items():
+            test = name.split("/")[0]
+            avg_sec[test] = max(avg_sec.get(test, 0.0), priority.avg_sec)
+            if priority.recently_failed:
+                recently_failed.add(test)
+        by_duration = sorted((test for test in avg_sec if test not in recently_failed), key=lambda t: (avg_sec[t], t))
+
+        def pattern(tests: List[str]) -> str:
+            return f"^({'|'.join(re.escape(test) for test in tests)})$"
+
+        runs = []
+        if recently_failed:
+            logger.info(f"Running {len(recently_failed)} recently failed test(s) first: {sorted(recently_failed)}.")
+            runs.append(args + ["-run", pattern(sorted(recently_failed))])
+        runs.append(args + ["-skip", pattern(sorted(avg_sec))])
+        batch_size = -(-len(by_duration) // _HISTORY_ORDER_BATCHES)
+        for i in range(0, len(by_duration), batch_size or 1):
+            runs.append(args + ["-run", pattern(by_duration[i : i + batch_size])])
+        return runs
+
+    def _run_tests(
+        self,
+        args: List[str],
+        runs: List[List[str]],
+        events: GoTestEventProcessor,
+        exec_info: TestExecInfo,
+        env_vars: Dict[str, str],
+        deadline: Deadline,
+    ) -> int:
+        return_code = 0
+        for run_args in runs:
+            first_case = len(events.test_cases)
+            run_return_code = run_and_stream(
+                run_args, events.feed, timeout_sec=deadline.timeout(), cwd=self._test_dir, env=env_vars
+            )  # nosec, no user input
+            if run_return_code != 0 and exec_info.retries and not events.found_expected_text:
+                run_return_code = self._retry_failed_tests(
+                    args, events, first_case, exec_info.retries, env_vars, run_return_code, deadline
+                )
+            return_code = return_code or run_return_code
+            if return_code != 0 and exec_info.fail_fast and not events.found_expected_text:
+                break
+        return return_code
+
+    def _retry_failed_tests(
+        self,
+        args: List[str],
+        events: GoTestEventProcessor,
+        first_case: int,
+        retries: int,
+        env_vars: Dict[str, str],
+        return_code: int,
+        deadline: Deadline,
+    ) -> int:
+        """
+        Run the tests that failed in ``events.test_cases[first_case:]`` again, up to ``retries`` times.
+
+        Failed test cases that pass on a retry are marked as flaky; the results of the retries themselves aren't
+        kept. Returns 0 when all the failed tests passed on a retry, ``return_code`` of the failed run otherwise.
+        """
+        cases = events.test_cases[first_case:]
+        if not any(case.outcome == OUTCOME_FAILED for case in cases):
+            # the run failed outside any test, like when building the tests, so there's nothing to retry
+            return return_code
+        for attempt in range(1, retries + 1):
+            # subtests can't be run alone if they depend on their parent test, so the whole top-level test is run
+            failed_tests = sorted({case.name.split("/")[0] for case in cases if case.outcome == OUTCOME_FAILED})
+            logger.warning(
+                f"Running {len(failed_tests)} failed test(s) again, attempt {attempt} of {retries}: {failed_tests}."
+            )
+            retry_first_case = len(events.test_cases)
+            pattern = f"^({'|'.join(re.escape(name) for name in failed_tests)})$"
+            with span("test retry", "test", attempt=attempt, tests=len(failed_tests)):
+                retry_return_code = run_and_stream(
+                    args + ["-run", pattern],
+                    events.feed,
+                    timeout_sec=deadline.timeout(),
+                    cwd=self._test_dir,
+                    env=env_vars,
+                )  # nosec, no user input
+            retry_results = {(case.classname, case.name): case.outcome for case in events.test_cases[retry_first_case:]}
+            del events.test_cases[retry_first_case:]
+            for case in cases:
+                if case.outcome == OUTCOME_FAILED and retry_results.get((case.classname, case.name)) == OUTCOME_PASSED:
+                    logger.warning(f"Test {case.classname}.{case.name} passed when run again, reporting it as flaky.")
+                    case.outcome = OUTCOME_FLAKY
+            if retry_return_code == 0:
+                break
+        return return_code if any(case.outcome == OUTCOME_FAILED for case in cases) else 0
 
     def validate(self, config: argparse.Namespace, module_name: str) -> None:
         gotest_dir = get_config_value_by_cmd_line_option(config, KEY_CFG_TESTS_DIR)
@@ -102,3 +435,12 @@ class GotestExecutor(TestExecutor):
                 f"Gotest tests were requested, but no go source code file was found in directory '{gotest_dir}'.",
             )
         self._test_dir = gotest_dir
+        self._cache_env_vars = {}
+        for env_var, option in [
+            ("GOMODCACHE", BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_GO_MOD_CACHE_DIR),
+            ("GOCACHE", BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_GO_BUILD_CACHE_DIR),
+        ]:
+            cache_dir = get_config_value_by_cmd_line_option(config, option)
+            if cache_dir:
+                # Go only accepts absolute cache paths
+                self._cache_env_vars[env_var] = os.path.abspath(cache_dir)
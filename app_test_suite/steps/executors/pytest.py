@@ -1,16 +1,26 @@
 import argparse
+import dataclasses
+import json
 import logging
 import os
 import shutil
-from typing import cast, List
+import threading
+from tempfile import TemporaryDirectory
+from typing import cast, Dict, List, Optional, Set, Tuple
 
 from step_exec_lib.errors import ValidationError
 from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
-from step_exec_lib.utils.processes import run_and_log
 
 from app_test_suite.cluster_manager import ClusterManager
 from app_test_suite.config import KEY_CFG_TESTS_DIR
 from app_test_suite.errors import ATSTestError
+from app_test_suite.history import TestPriority
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.output_spool import SpooledOutput, run_spooled
+from app_test_suite.processes import Deadline, run_and_log
+from app_test_suite.junit import OUTCOME_PASSED, mark_flaky_tests, read_junit_xml
+from app_test_suite.pytest_plugin import ats_failed_tests, ats_test_order, ats_worker
+from app_test_suite.pytest_worker import PytestWorker, PytestWorkerError
 from app_test_suite.steps.base import (
     BaseTestScenariosFilteringPipeline,
     TestExecInfo,
@@ -20,22 +30,36 @@ from app_test_suite.steps.scenarios.simple import (
     FunctionalTestScenario,
     SmokeTestScenario,
 )
+from app_test_suite.steps.scenarios.compatibility import CompatibilityTestScenario
+from app_test_suite.steps.scenarios.performance import PerformanceTestScenario
 from app_test_suite.steps.scenarios.upgrade import UpgradeTestScenario
+from app_test_suite.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# the plugins are loaded from their own directory, as ATS isn't installed in the virtual env of the tests
+_PLUGIN_DIR = os.path.dirname(os.path.abspath(ats_test_order.__file__))
+_EXIT_CODE_TESTS_FAILED = 1
+# exit code 5 from pytest means that no tests matched the selector - it's not an error for us
+_OK_EXIT_CODES = [0, 5]
+_WORKER_SCRIPT = os.path.abspath(ats_worker.__file__)
+
 
 class PytestScenariosFilteringPipeline(BaseTestScenariosFilteringPipeline):
     def __init__(self) -> None:
         cluster_manager = ClusterManager()
+        namespace_manager = NamespaceManager()
         test_executor = PytestExecutor()
         super().__init__(
             [
-                SmokeTestScenario(cluster_manager, test_executor),
-                FunctionalTestScenario(cluster_manager, test_executor),
-                UpgradeTestScenario(cluster_manager, test_executor),
+                SmokeTestScenario(cluster_manager, test_executor, namespace_manager),
+                FunctionalTestScenario(cluster_manager, test_executor, namespace_manager),
+                UpgradeTestScenario(cluster_manager, test_executor, namespace_manager),
+                PerformanceTestScenario(cluster_manager, test_executor, namespace_manager),
+                CompatibilityTestScenario(cluster_manager, test_executor, namespace_manager),
             ],
             cluster_manager,
+            namespace_manager,
         )
 
 
@@ -43,17 +67,40 @@ class PytestExecutor(TestExecutor):
     _UV_BIN = "uv"
     _PYTEST_BIN = "pytest"
 
+    def __init__(self) -> None:
+        super().__init__()
+        # started with the first test run when '--app-tests-pytest-worker' is set, stopped in 'cleanup'
+        self._use_worker = False
+        self._worker: Optional[PytestWorker] = None
+        # the compatibility tests share the executor, and so the worker, between the clusters tested at once
+        self._worker_lock = threading.Lock()
+
     def prepare_test_environment(self, exec_info: TestExecInfo) -> None:
         args = [self._UV_BIN, "sync"]
         if exec_info.debug:
             args.append("--verbose")
         logger.info(f"Running '{self._UV_BIN} sync' in '{self._test_dir}' to install test virtual env.")
-        run_res = run_and_log(args, cwd=self._test_dir)  # nosec, no user input here
-        if run_res.returncode != 0:
+        timeout_sec = exec_info.prepare_timeout_sec
+        if exec_info.output is None:
+            return_code = run_and_log(  # nosec, no user input here
+                args, timeout_sec=timeout_sec, cwd=self._test_dir
+            ).returncode
+        else:
+            return_code = run_spooled(  # nosec
+                args, exec_info.output, "uv-sync", timeout_sec=timeout_sec, cwd=self._test_dir
+            )
+        if return_code != 0:
             raise ATSTestError(f"Running '{args}' in directory '{self._test_dir}' failed.")
 
     def execute_test(self, exec_info: TestExecInfo) -> None:
+        with TemporaryDirectory(prefix="ats-pytest-") as tmp_dir:
+            self._execute_test(exec_info, tmp_dir)
+
+    def _execute_test(self, exec_info: TestExecInfo, tmp_dir: str) -> None:
         env_vars = self.get_test_info_env_variables(exec_info)
+        if exec_info.workers is not None:
+            # used by 'pytest -n auto' when the tests use pytest-xdist; a value set by the user wins
+            env_vars.setdefault("PYTEST_XDIST_AUTO_NUM_WORKERS", str(exec_info.workers))
         args = [
             self._UV_BIN,
             "run",
@@ -62,14 +109,154 @@ class PytestExecutor(TestExecutor):
             exec_info.test_type,
             "--log-cli-level",
             "debug" if exec_info.debug else "info",
-            f"--junitxml=test_results_{exec_info.test_type}.xml",
         ]
+        if exec_info.fail_fast:
+            args.append("-x")
+        if exec_info.test_priorities:
+            args.extend(self._order_tests_by_history(exec_info.test_priorities, env_vars, tmp_dir))
+        if exec_info.retries:
+            env_vars[ats_failed_tests.ENV_FAILED_TESTS_FILE] = os.path.join(tmp_dir, "failed-tests.txt")
+            args.extend(self._load_plugin(ats_failed_tests.__name__, env_vars))
         logger.info(f"Running {self._PYTEST_BIN} tool in '{self._test_dir}' directory.")
-        run_res = run_and_log(args, cwd=self._test_dir, env=env_vars)  # nosec, no user input here
-        # exit code 5 from pytest means that no tests matched the selector - it's not an error for us
-        if run_res.returncode not in [0, 5]:
+        junit_arg = f"--junitxml={exec_info.junit_report_path or f'test_results_{exec_info.test_type}.xml'}"
+        # the test timeout covers all the pytest invocations of the test run
+        deadline = Deadline(exec_info.timeout_sec, "test timeout")
+        return_code = self._run_pytest(
+            args + [junit_arg], exec_info, env_vars, f"pytest-{exec_info.test_type}", deadline
+        )
+        if return_code == _EXIT_CODE_TESTS_FAILED and exec_info.retries:
+            return_code = self._retry_failed_tests(args, exec_info, env_vars, tmp_dir, deadline)
+        if return_code not in _OK_EXIT_CODES:
             raise ATSTestError(f"Pytest tests failed: running '{args}' in directory '{self._test_dir}' failed.")
 
+    def _run_pytest(
+        self, args: List[str], exec_info: TestExecInfo, env_vars: Dict[str, str], name: str, deadline: Deadline
+    ) -> int:
+        timeout_sec = deadline.timeout()
+        if self._use_worker:
+            try:
+                return self._run_pytest_in_worker(args, exec_info, env_vars, name, timeout_sec)
+            except PytestWorkerError as e:
+                logger.warning(f"{e} Running pytest without the warm worker from now on.")
+                self._use_worker = False
+        if exec_info.output is None:
+            return run_and_log(  # nosec, no user input here
+                args, timeout_sec=timeout_sec, cwd=self._test_dir, env=env_vars
+            ).returncode
+        return run_spooled(
+            args, exec_info.output, name, _OK_EXIT_CODES, timeout_sec=timeout_sec, cwd=self._test_dir, env=env_vars
+        )  # nosec, no user input here
+
+    def _run_pytest_in_worker(
+        self,
+        args: List[str],
+        exec_info: TestExecInfo,
+        env_vars: Dict[str, str],
+        name: str,
+        timeout_sec: Optional[float],
+    ) -> int:
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = PytestWorker(
+                    [self._UV_BIN, "run", "python", _WORKER_SCRIPT, self._test_dir], self._test_dir, dict(os.environ)
+                )
+        pytest_args = args[args.index(self._PYTEST_BIN) + 1 :]
+        if exec_info.output is None:
+            return self._worker.run(pytest_args, env_vars, self._test_dir, logger.info, timeout_sec)
+        spool = SpooledOutput(exec_info.output, name)
+        try:
+            with spool:
+                return_code = self._worker.run(pytest_args, env_vars, self._test_dir, spool.write, timeout_sec)
+        except ATSTestError:
+            spool.report(failed=True)
+            raise
+        spool.report(failed=return_code not in _OK_EXIT_CODES)
+        return return_code
+
+    def cleanup(self) -> None:
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker = None
+
+    def _retry_failed_tests(
+        self, args: List[str], exec_info: TestExecInfo, env_vars: Dict[str, str], tmp_dir: str, deadline: Deadline
+    ) -> int:
+        """
+        Run the failed tests again, up to ``exec_info.retries`` times, and return the exit code of the last run.
+
+        Tests that pass on a retry are marked as flaky in the JUnit report of the test run.
+        """
+        failed_tests_file = env_vars[ats_failed_tests.ENV_FAILED_TESTS_FILE]
+        flaky_tests: Set[Tuple[str, str]] = set()
+        return_code = _EXIT_CODE_TESTS_FAILED
+        for attempt in range(1, exec_info.retries + 1):
+            failed_tests = self._read_failed_tests(failed_tests_file)
+            if not failed_tests:
+                # the run failed outside any test, like during collection, so there's nothing to retry
+                break
+            os.remove(failed_tests_file)
+            logger.warning(
+                f"Running {len(failed_tests)} failed test(s) again, attempt {attempt} of {exec_info.retries}: "
+                f"{failed_tests}."
+            )
+            retry_report = os.path.join(tmp_dir, f"retry-{attempt}.xml")
+            with span("test retry", "test", attempt=attempt, tests=len(failed_tests)):
+                return_code = self._run_pytest(
+                    args + [f"--junitxml={retry_report}"] + failed_tests,
+                    exec_info,
+                    env_vars,
+                    f"pytest-{exec_info.test_type}-retry-{attempt}",
+                    deadline,
+                )
+            if os.path.isfile(retry_report):
+                flaky_tests.update(
+                    (case.classname, case.name)
+                    for case in read_junit_xml(retry_report)
+                    if case.outcome == OUTCOME_PASSED
+                )
+            if return_code != _EXIT_CODE_TESTS_FAILED:
+                break
+
+        if flaky_tests:
+            mark_flaky_tests(self.get_junit_report_path(exec_info), flaky_tests)
+            logger.warning(f"Tests that passed only when run again, reported as flaky: {sorted(flaky_tests)}.")
+        # no tests collected on a retry means the failed tests can't be found again, not that they passed
+        return 0 if return_code == 0 else _EXIT_CODE_TESTS_FAILED
+
+    @staticmethod
+    def _read_failed_tests(failed_tests_file: str) -> List[str]:
+        if not os.path.isfile(failed_tests_file):
+            return []
+        with open(failed_tests_file, encoding="utf-8") as f:
+            # a test fails in more than one phase when, for example, both its call and its teardown fail
+            return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    @staticmethod
+    def _load_plugin(module_name: str, env_vars: Dict[str, str]) -> List[str]:
+        """Make an ATS pytest plugin importable by the test run and return the pytest arguments that load it."""
+        python_path = env_vars.get("PYTHONPATH", "")
+        if _PLUGIN_DIR not in python_path.split(os.pathsep):
+            env_vars["PYTHONPATH"] = os.pathsep.join(p for p in [_PLUGIN_DIR, python_path] if p)
+        return ["-p", module_name.rsplit(".", 1)[-1]]
+
+    @classmethod
+    def _order_tests_by_history(
+        cls, test_priorities: Dict[Tuple[str, str], TestPriority], env_vars: Dict[str, str], tmp_dir: str
+    ) -> List[str]:
+        """Configure the ATS test order plugin and return the pytest arguments that load it."""
+        order_file = os.path.join(tmp_dir, "test-order.json")
+        with open(order_file, "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    {"classname": classname, "name": name, **dataclasses.asdict(priority)}
+                    for (classname, name), priority in test_priorities.items()
+                ],
+                f,
+            )
+        env_vars[ats_test_order.ENV_TEST_ORDER_FILE] = order_file
+        logger.info(f"Running recently failed tests first and then the fastest, out of {len(test_priorities)} known.")
+        return cls._load_plugin(ats_test_order.__name__, env_vars)
+
     def validate(self, config: argparse.Namespace, module_name: str) -> None:
         pytest_dir = get_config_value_by_cmd_line_option(config, KEY_CFG_TESTS_DIR)
         pytest_dir = self._resolve_test_dir(config.chart_file, pytest_dir)
@@ -90,3 +277,6 @@ class PytestExecutor(TestExecutor):
                 f"In order to install the pytest virtual env, you need to have '{self._UV_BIN}' installed.",
             )
         self._test_dir = pytest_dir
+        self._use_worker = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_PYTEST_WORKER
+        )
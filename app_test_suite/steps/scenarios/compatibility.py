@@ -0,0 +1,207 @@
+import argparse
+import copy
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Optional
+
+from step_exec_lib.types import StepType, Context
+
+from app_test_suite.cluster_manager import ClusterInfo, ClusterManager, StaticClusterManager
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
+from app_test_suite.junit import read_junit_xml
+from app_test_suite.kube_client import get_server_version
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.reports import STAGE_MAIN
+from app_test_suite.steps.base import (
+    BaseTestScenariosFilteringPipeline,
+    TestExecInfo,
+    TestExecutor,
+    CONTEXT_KEY_CHART_YAML,
+)
+from app_test_suite.steps.scenarios.simple import SimpleTestScenario
+from app_test_suite.steps.test_types import STEP_TEST_COMPATIBILITY
+from app_test_suite.tracing import span
+
+OUTCOME_PASSED = "passed"
+OUTCOME_FAILED = "failed"
+OUTCOME_TIMED_OUT = "timed out"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClusterOutcome:
+    """How the compatibility tests went on one cluster."""
+
+    cluster: str
+    cluster_version: str
+    outcome: str
+    tests: Dict[str, int] = field(default_factory=dict)
+    """Test cases by their JUnit outcome."""
+    error: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cluster": self.cluster,
+            "clusterVersion": self.cluster_version,
+            "outcome": self.outcome,
+            "tests": self.tests,
+            "error": self.error,
+        }
+
+
+class CompatibilityTestScenario(SimpleTestScenario):
+    """
+    Deploys the chart and runs the tests labelled 'compatibility' on several clusters at once.
+
+    The clusters are configured with '--cluster-compatibility-kubeconfigs', like clusters running different
+    Kubernetes versions. Every cluster runs the whole scenario, from the CRD bootstrap to the teardown, on a copy
+    of this scenario in a thread of its own; only the preparation of the test environment, which the clusters
+    share, is done one cluster at a time. The outcome on every cluster is logged as a matrix and saved next to the
+    JUnit reports, and the step fails if the tests didn't pass on any of the clusters.
+    """
+
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
+        super().__init__(cluster_manager, test_executor, namespace_manager)
+        self._deploy_workers = 1
+        self._prepare_lock = threading.Lock()
+        # JUnit reports are read to count the tests on every cluster, so they're kept here while the clusters run
+        # without a report directory
+        self._tmp_report_dir: Optional[str] = None
+
+    @property
+    def test_provided(self) -> StepType:
+        return STEP_TEST_COMPATIBILITY
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        super().pre_run(config)
+        self._deploy_workers = BaseTestScenariosFilteringPipeline.get_resource_governor(config).deploy_workers
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        clusters = self._cluster_manager.get_compatibility_clusters()
+        if not clusters:
+            logger.info(
+                f"No clusters configured with '{ClusterManager.KEY_CONFIG_OPTION_COMPATIBILITY_KUBECONFIGS}', "
+                "skipping the compatibility tests."
+            )
+            return
+        with span(
+            self.name,
+            "scenario",
+            chart=context[CONTEXT_KEY_CHART_YAML]["name"],
+            test_type=self.test_provided,
+            cluster_type=clusters[0].cluster_type,
+        ):
+            workers = min(len(clusters), self._deploy_workers)
+            logger.info(f"Running compatibility tests on {len(clusters)} clusters, {workers} at once.")
+            with (
+                TemporaryDirectory(prefix="ats-compatibility-") as tmp_dir,
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ats-compatibility") as pool,
+            ):
+                self._tmp_report_dir = tmp_dir
+                try:
+                    outcomes = list(pool.map(lambda cluster: self._run_on_cluster(config, context, cluster), clusters))
+                finally:
+                    self._tmp_report_dir = None
+            self._log_matrix(outcomes)
+            self._save_matrix(outcomes)
+        failed = [o.cluster for o in outcomes if o.outcome != OUTCOME_PASSED]
+        if failed:
+            raise ATSTestError(f"Compatibility tests didn't pass on clusters: {', '.join(failed)}.")
+
+    def _run_on_cluster(self, config: argparse.Namespace, context: Context, cluster: ClusterInfo) -> ClusterOutcome:
+        scenario = copy.copy(self)
+        scenario._cluster_manager = StaticClusterManager(cluster)
+        scenario._stage = cluster.name
+        scenario._warm_up = None
+        scenario._pod_usage = {}
+        scenario._readiness = {}
+        # the applied releases and the Kubernetes version are specific to a cluster
+        if self._manifest_deployer is not None:
+            scenario._manifest_deployer = self._manifest_deployer.for_another_cluster()
+        scenario._kube_version = None
+        # the release name is set in the context by the deploy, so every cluster needs a context of its own
+        cluster_context = dict(context)
+        with span("cluster", "cluster", cluster=cluster.name) as span_args:
+            try:
+                scenario._detect_cluster_version(cluster)
+                scenario._run_scenario(config, cluster_context)
+                outcome = ClusterOutcome(cluster.name, cluster.version, OUTCOME_PASSED)
+            except ATSTimeoutError as e:
+                outcome = ClusterOutcome(cluster.name, cluster.version, OUTCOME_TIMED_OUT, error=str(e))
+            except Exception as e:
+                outcome = ClusterOutcome(cluster.name, cluster.version, OUTCOME_FAILED, error=str(e))
+            outcome.tests = scenario._count_tests()
+            span_args.update(version=cluster.version, outcome=outcome.outcome)
+        if outcome.error:
+            logger.error(f"Compatibility tests on cluster '{cluster.name}' {outcome.outcome}: {outcome.error}")
+        return outcome
+
+    def _detect_cluster_version(self, cluster: ClusterInfo) -> None:
+        if cluster.version:
+            return
+        kube_client = self._cluster_manager.get_kube_client()
+        try:
+            cluster.version = get_server_version(kube_client)
+        except Exception as e:
+            logger.warning(f"Detecting the Kubernetes version of cluster '{cluster.name}' failed: {e}")
+        logger.info(f"Cluster '{cluster.name}' runs Kubernetes '{cluster.version or 'unknown'}'.")
+
+    def _prepare_test_environment(self, exec_info: TestExecInfo) -> None:
+        with self._prepare_lock:
+            super()._prepare_test_environment(exec_info)
+
+    def _junit_report_path(self, stage: str = STAGE_MAIN) -> Optional[str]:
+        path = super()._junit_report_path(stage)
+        if path is not None or self._tmp_report_dir is None:
+            return path
+        # the clusters can't share the executor's default report file in the test directory
+        return os.path.join(self._tmp_report_dir, f"{self.test_provided}-{stage}.xml")
+
+    def _count_tests(self) -> Dict[str, int]:
+        path = self._junit_report_path(self._stage)
+        if path is None or not os.path.isfile(path):
+            return {}
+        try:
+            return dict(Counter(case.outcome for case in read_junit_xml(path)))
+        except Exception as e:
+            logger.warning(f"Reading the JUnit report '{path}' failed: {e}")
+            return {}
+
+    @staticmethod
+    def _log_matrix(outcomes: List[ClusterOutcome]) -> None:
+        rows = [("CLUSTER", "VERSION", "OUTCOME", "TESTS")] + [
+            (
+                o.cluster,
+                o.cluster_version or "unknown",
+                o.outcome,
+                ", ".join(f"{count} {outcome}" for outcome, count in sorted(o.tests.items())) or "-",
+            )
+            for o in outcomes
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        logger.info("Compatibility test results:")
+        for row in rows:
+            logger.info("  " + "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+    def _save_matrix(self, outcomes: List[ClusterOutcome]) -> None:
+        if self._report_settings is None:
+            return
+        path = self._report_settings.compatibility_matrix_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"clusters": [o.to_dict() for o in outcomes]}, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Saving the compatibility test results to '{path}' failed: {e}")
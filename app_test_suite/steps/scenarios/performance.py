@@ -0,0 +1,152 @@
+import argparse
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+from typing import List, Optional
+
+from step_exec_lib.types import StepType, Context
+from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
+
+from app_test_suite.cluster_manager import ClusterManager
+from app_test_suite.errors import ATSTestError
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.performance import (
+    DEFAULT_PERFORMANCE_THRESHOLD,
+    ENV_PERFORMANCE_RESULTS_FILE,
+    PerformanceComparison,
+    PerformanceResult,
+    compare_performance,
+    read_performance_results,
+)
+from app_test_suite.reports import STAGE_MAIN
+from app_test_suite.steps.base import BaseTestScenariosFilteringPipeline, TestExecInfo, TestExecutor
+from app_test_suite.steps.scenarios.simple import SimpleTestScenario
+from app_test_suite.steps.test_types import STEP_TEST_PERFORMANCE
+
+_RESULTS_FILE = "performance-results.jsonl"
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceTestScenario(SimpleTestScenario):
+    """
+    Deploys the chart and runs the tests labelled 'performance', then checks the metrics they report.
+
+    The tests append the metrics they measure, like latency percentiles or throughput, to the file named by
+    the 'ATS_PERFORMANCE_RESULTS_FILE' env var, one JSON object per line. The metrics are compared to the ones
+    recorded in the history database for the baseline chart version, and the step fails when any of them got
+    worse by more than its threshold. The metrics are then recorded as the baseline of later versions.
+
+    Unlike the other steps, it only runs when requested explicitly with '--steps performance': most charts have no
+    performance tests, and finding that out would cost a full deploy and teardown on every default run.
+    """
+
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
+        super().__init__(cluster_manager, test_executor, namespace_manager)
+        self._threshold = DEFAULT_PERFORMANCE_THRESHOLD
+        self._baseline_version = ""
+
+    @property
+    def test_provided(self) -> StepType:
+        return STEP_TEST_PERFORMANCE
+
+    def pre_run(self, config: argparse.Namespace) -> None:
+        super().pre_run(config)
+        self._threshold = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_PERFORMANCE_THRESHOLD
+        )
+        self._baseline_version = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_PERFORMANCE_BASELINE_VERSION
+        )
+
+    def run(self, config: argparse.Namespace, context: Context) -> None:
+        if STEP_TEST_PERFORMANCE not in config.steps:
+            logger.info(f"Skipping the performance tests, they only run with '--steps {STEP_TEST_PERFORMANCE}'.")
+            return
+        super().run(config, context)
+
+    def _execute_test(
+        self, config: argparse.Namespace, context: Context, exec_info: TestExecInfo, stage: str = STAGE_MAIN
+    ) -> None:
+        with TemporaryDirectory(prefix="ats-performance-") as tmp_dir:
+            exec_info.performance_results_path = os.path.join(tmp_dir, _RESULTS_FILE)
+            super()._execute_test(config, context, exec_info, stage)
+            results = read_performance_results(exec_info.performance_results_path)
+        self._check_performance(config, context, exec_info, stage, results)
+
+    def _check_performance(
+        self,
+        config: argparse.Namespace,
+        context: Context,
+        exec_info: TestExecInfo,
+        stage: str,
+        results: List[PerformanceResult],
+    ) -> None:
+        if not results:
+            logger.warning(f"The performance tests didn't report any metrics in '{ENV_PERFORMANCE_RESULTS_FILE}'.")
+            return
+        key = self._history_key(context, exec_info.chart_ver)
+        baseline = None
+        if self._history is None:
+            logger.warning(
+                f"'{BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_HISTORY_DB}' isn't set, so performance "
+                "metrics aren't compared to a baseline."
+            )
+        else:
+            try:
+                baseline = self._history.performance_baseline(key, self._baseline_version or None)
+                self._history.record_performance_results(
+                    key, self._namespace_manager.get_run_id(config), stage, results
+                )
+            except Exception as e:
+                logger.warning(f"Reading or recording performance baselines failed: {e}")
+        baseline_version, baseline_values = baseline or (None, {})
+        comparisons = compare_performance(results, baseline_values, self._threshold)
+        self._log_comparisons(comparisons, baseline_version)
+        self._save_comparisons(comparisons, baseline_version, stage)
+
+        regressed = [c.result.name for c in comparisons if c.regressed]
+        if regressed:
+            raise ATSTestError(
+                f"Performance of chart version '{exec_info.chart_ver}' regressed against version "
+                f"'{baseline_version}': {', '.join(regressed)}."
+            )
+
+    @staticmethod
+    def _log_comparisons(comparisons: List[PerformanceComparison], baseline_version: Optional[str]) -> None:
+        if baseline_version is None:
+            logger.info("No baseline version with recorded performance metrics found, nothing to compare with.")
+        else:
+            logger.info(f"Performance metrics compared to chart version '{baseline_version}':")
+        for c in comparisons:
+            line = f"  {c.result.name}: {c.result.value:g}{c.result.unit}"
+            if c.change is not None:
+                line += (
+                    f" (baseline {c.baseline:g}{c.result.unit}, {'worse' if c.change > 0 else 'better'} by "
+                    f"{abs(c.change):.1%}, threshold {c.threshold:.1%})"
+                )
+            if c.regressed:
+                logger.error(f"{line} REGRESSED")
+            else:
+                logger.info(line)
+
+    def _save_comparisons(
+        self, comparisons: List[PerformanceComparison], baseline_version: Optional[str], stage: str
+    ) -> None:
+        if self._report_settings is None:
+            return
+        path = self._report_settings.performance_path(str(self.test_provided), stage)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"baselineVersion": baseline_version, "metrics": [c.to_dict() for c in comparisons]}, f, indent=2
+                )
+        except OSError as e:
+            logger.warning(f"Saving the performance metrics to '{path}' failed: {e}")
@@ -1,25 +1,44 @@
 import argparse
 import logging
 import os
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Set, cast
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, cast
 
-import yaml
-import pykube
-from pykube import HTTPClient, KubeConfig
+from pykube import HTTPClient
 from pytest_helm_charts.k8s.namespace import ensure_namespace_exists
 from step_exec_lib.steps import BuildStep
 from step_exec_lib.types import StepType, STEP_ALL, Context
 from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
-from step_exec_lib.utils.processes import run_and_log
 
 from app_test_suite.cluster_manager import ClusterManager, ClusterInfo
-from app_test_suite.errors import ATSTestError
+from app_test_suite.diagnostics import DiagnosticsLimits, FailureDiagnosticsCollector
+from app_test_suite.deploy_engine import DEPLOY_ENGINE_TEMPLATE, ManifestDeployer
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.pod_usage import PodUsage, PodUsageSampler, summarize_pod_usage, write_pod_usage
+from app_test_suite.readiness import (
+    PodReadiness,
+    list_pod_uids,
+    measure_readiness,
+    summarize_readiness,
+    write_readiness,
+)
+from app_test_suite.history import HistoryFilter, HistoryKey, TestPriority, TimingHistory
+from app_test_suite.junit import JUnitTestCase, read_junit_xml
+from app_test_suite.kube_client import get_server_version
+from app_test_suite.reports import STAGE_MAIN, ReportSettings
+from app_test_suite.output_spool import OUTPUT_MODE_QUIET, OutputSettings, run_spooled
+from app_test_suite.processes import Deadline, run_and_log
+from app_test_suite.tracing import span
 from app_test_suite.steps.base import (
     TestExecutor,
     BaseTestScenariosFilteringPipeline,
     TestExecInfo,
     CONTEXT_KEY_CHART_YAML,
+    TEST_ORDER_HISTORY,
 )
 from app_test_suite.steps.test_types import (
     STEP_TEST_FUNCTIONAL,
@@ -44,13 +63,52 @@ class SimpleTestScenario(BuildStep, ABC):
     test scenario.
     """
 
-    def __init__(self, cluster_manager: ClusterManager, test_executor: TestExecutor):
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
         self._cluster_manager = cluster_manager
+        self._namespace_manager = namespace_manager or NamespaceManager()
         self._configured_crd_dir = BaseTestScenariosFilteringPipeline.DEFAULT_CLUSTER_CRDS_DIR
         self._kube_client: Optional[HTTPClient] = None
         self._cluster_info: Optional[ClusterInfo] = None
         self._skip_app_deploy = False
         self._test_executor = test_executor
+        # set in 'pre_run' when the 'template' deploy engine is used instead of 'helm upgrade --install'
+        self._manifest_deployer: Optional[ManifestDeployer] = None
+        # Kubernetes version of the test cluster, detected on the first deploy with the 'template' engine
+        self._kube_version: Optional[str] = None
+        self._diagnostics_limits = DiagnosticsLimits()
+        # diagnostics are only logged until 'pre_run' configures the bundle directory
+        self._diagnostics_dir: Optional[str] = None
+        # output of tests and hooks is only spooled to disk when 'pre_run' configures the 'quiet' output mode
+        self._output_settings: Optional[OutputSettings] = None
+        # JUnit reports stay in the test directory unless 'pre_run' configures the report directory
+        self._report_settings: Optional[ReportSettings] = None
+        # test and deploy timings are only recorded when 'pre_run' configures the history database
+        self._history: Optional[TimingHistory] = None
+        self._order_by_history = False
+        self._fail_fast = False
+        self._test_retries = 0
+        # time limits in seconds, None for no limit; the scenario deadline starts when the scenario runs
+        self._test_timeout_sec: Optional[float] = None
+        self._hook_timeout_sec: Optional[float] = None
+        self._prepare_timeout_sec: Optional[float] = None
+        self._crd_apply_timeout_sec: Optional[float] = None
+        self._scenario_deadline_sec: Optional[float] = None
+        self._deadline = Deadline(None)
+        self._test_workers: Optional[int] = None
+        # the test executor's warm-up, running while the chart is deployed
+        self._warm_up: Optional["Future[None]"] = None
+        # pods are only sampled when 'pre_run' configures an interval; peaks and restarts are kept by test stage
+        self._pod_usage_interval_sec = 0.0
+        self._pod_usage: Dict[str, Dict[str, PodUsage]] = {}
+        # time-to-ready of the pods started by every deploy, by test stage
+        self._readiness: Dict[str, List[PodReadiness]] = {}
+        # names the reports of the test run; the compatibility tests run one stage per cluster
+        self._stage = STAGE_MAIN
 
     @property
     def steps_provided(self) -> Set[StepType]:
@@ -67,15 +125,16 @@ class SimpleTestScenario(BuildStep, ABC):
             raise ValueError("_cluster_info can't be None")
         return self._cluster_info.cluster_type
 
+    def _get_deploy_namespace(self, config: argparse.Namespace, context: Context) -> str:
+        chart_name = context[CONTEXT_KEY_CHART_YAML]["name"]
+        return self._namespace_manager.get_namespace(config, chart_name, self.test_provided)
+
     def run_tests(self, config: argparse.Namespace, context: Context) -> None:
         app_config_file_path = get_config_value_by_cmd_line_option(
             config,
             BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_CONFIG_FILE,
         )
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
+        deploy_namespace = self._get_deploy_namespace(config, context)
         cluster_info = cast(ClusterInfo, self._cluster_info)
         exec_info = TestExecInfo(
             chart_path=config.chart_file,
@@ -88,9 +147,164 @@ class SimpleTestScenario(BuildStep, ABC):
             debug=config.debug,
             release_name=context.get(CONTEXT_KEY_RELEASE_NAME),
             deploy_namespace=deploy_namespace,
+            output=self._output_settings,
+            junit_report_path=self._junit_report_path(self._stage),
+        )
+        self._prepare_test_environment(exec_info)
+        self._execute_test(config, context, exec_info, self._stage)
+
+    def _start_warm_up(self) -> None:
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ats-warm-up")
+        timeout_sec = self._deadline.timeout(self._prepare_timeout_sec)
+
+        def warm_up() -> None:
+            with span("warm-up", "test"):
+                self._test_executor.warm_up(str(self.test_provided), timeout_sec)
+
+        self._warm_up = pool.submit(warm_up)
+        pool.shutdown(wait=False)
+
+    def _finish_warm_up(self) -> None:
+        if self._warm_up is None:
+            return
+        warm_up, self._warm_up = self._warm_up, None
+        try:
+            warm_up.result()
+        except Exception as e:
+            logger.warning(f"Warming up the test environment failed, the tests will do it themselves: {e}")
+
+    def _prepare_test_environment(self, exec_info: TestExecInfo) -> None:
+        with span("test environment preparation", "test"):
+            self._finish_warm_up()
+            exec_info.prepare_timeout_sec = self._deadline.timeout(self._prepare_timeout_sec)
+            self._test_executor.prepare_test_environment(exec_info)
+
+    def _execute_test(
+        self, config: argparse.Namespace, context: Context, exec_info: TestExecInfo, stage: str = STAGE_MAIN
+    ) -> None:
+        with span("test execution", "test", stage=stage) as span_args:
+            exec_info.fail_fast = self._fail_fast
+            exec_info.retries = self._test_retries
+            exec_info.workers = self._test_workers
+            exec_info.timeout_sec = self._deadline.timeout(self._test_timeout_sec)
+            if self._order_by_history:
+                exec_info.test_priorities = self._load_test_priorities(context)
+            started_at = time.time()
+            sampler = self._start_pod_usage_sampling(exec_info)
+            try:
+                self._test_executor.execute_test(exec_info)
+            finally:
+                if sampler is not None:
+                    self._record_pod_usage(exec_info, stage, sampler.stop(), span_args)
+                test_cases = self._read_test_results(exec_info, started_at)
+                if test_cases is not None:
+                    span_args.update(Counter(f"tests_{case.outcome}" for case in test_cases))
+                    self._record_test_history(config, context, exec_info, stage, test_cases)
+
+    def _start_pod_usage_sampling(self, exec_info: TestExecInfo) -> Optional[PodUsageSampler]:
+        if not self._pod_usage_interval_sec or self._kube_client is None or not exec_info.deploy_namespace:
+            return None
+        return PodUsageSampler(self._kube_client, exec_info.deploy_namespace, self._pod_usage_interval_sec).start()
+
+    def _record_pod_usage(
+        self, exec_info: TestExecInfo, stage: str, usage: Dict[str, PodUsage], span_args: Dict[str, Any]
+    ) -> None:
+        self._pod_usage[stage] = usage
+        for name, summary in summarize_pod_usage(usage).items():
+            logger.info(
+                f"Pod '{name}' used at most {summary['peakCpuCores']} CPU cores and "
+                f"{summary['peakMemoryBytes'] / 1024**2:.1f} MiB of memory, {summary['restarts']} restarts."
+            )
+        if usage:
+            span_args["pods"] = len(usage)
+            span_args["peak_cpu_cores"] = max(u.peak_cpu_cores for u in usage.values())
+            span_args["peak_memory_bytes"] = max(u.peak_memory_bytes for u in usage.values())
+        if self._report_settings is None:
+            return
+        try:
+            write_pod_usage(
+                self._report_settings.pod_usage_path(str(self.test_provided), stage),
+                cast(str, exec_info.deploy_namespace),
+                self._pod_usage_interval_sec,
+                usage,
+            )
+        except OSError as e:
+            logger.warning(f"Saving the resource usage of pods failed: {e}")
+
+    def _history_key(self, context: Context, chart_version: str) -> HistoryKey:
+        return HistoryKey(
+            chart=context[CONTEXT_KEY_CHART_YAML]["name"],
+            chart_version=chart_version,
+            test_type=str(self.test_provided),
+            cluster_type=self._test_cluster_type,
         )
-        self._test_executor.prepare_test_environment(exec_info)
-        self._test_executor.execute_test(exec_info)
+
+    def _load_test_priorities(self, context: Context) -> Optional[Dict[Tuple[str, str], TestPriority]]:
+        if self._history is None:
+            return None
+        try:
+            return self._history.test_priorities(
+                HistoryFilter(
+                    chart=context[CONTEXT_KEY_CHART_YAML]["name"],
+                    test_type=str(self.test_provided),
+                    cluster_type=self._test_cluster_type,
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Loading test history failed, running tests in their default order: {e}")
+            return None
+
+    def _read_test_results(self, exec_info: TestExecInfo, started_at: float) -> Optional[List[JUnitTestCase]]:
+        report_path = self._test_executor.get_junit_report_path(exec_info)
+        # a report older than the test run was left by a previous run; whole seconds allow for coarse file timestamps
+        if not os.path.isfile(report_path) or os.path.getmtime(report_path) < int(started_at):
+            logger.debug(f"No JUnit report found in '{report_path}', test results not recorded.")
+            return None
+        try:
+            return read_junit_xml(report_path)
+        except Exception as e:
+            logger.warning(f"Reading the JUnit report '{report_path}' failed: {e}")
+            return None
+
+    def _record_test_history(
+        self,
+        config: argparse.Namespace,
+        context: Context,
+        exec_info: TestExecInfo,
+        stage: str,
+        test_cases: List[JUnitTestCase],
+    ) -> None:
+        if self._history is None:
+            return
+        try:
+            self._history.record_test_results(
+                self._history_key(context, exec_info.chart_ver),
+                self._namespace_manager.get_run_id(config),
+                stage,
+                test_cases,
+            )
+        except Exception as e:
+            logger.warning(f"Recording test timings failed: {e}")
+
+    def _record_deploy_history(
+        self, config: argparse.Namespace, context: Context, chart_version: str, stage: str, started_at: float
+    ) -> None:
+        if self._history is None:
+            return
+        try:
+            self._history.record_deploy(
+                self._history_key(context, chart_version),
+                self._namespace_manager.get_run_id(config),
+                stage,
+                time.monotonic() - started_at,
+            )
+        except Exception as e:
+            logger.warning(f"Recording deploy timing failed: {e}")
+
+    def _junit_report_path(self, stage: str = STAGE_MAIN) -> Optional[str]:
+        if self._report_settings is None:
+            return None
+        return self._report_settings.execution_report_path(str(self.test_provided), stage)
 
     def _run_hook(self, config: argparse.Namespace, context: Context, stage: str) -> None:
         key = (
@@ -101,6 +315,10 @@ class SimpleTestScenario(BuildStep, ABC):
         hook_cmd = get_config_value_by_cmd_line_option(config, key)
         if not hook_cmd:
             return
+        with span(f"{stage}-hook", "hook", command=hook_cmd):
+            self._run_hook_command(config, context, stage, hook_cmd)
+
+    def _run_hook_command(self, config: argparse.Namespace, context: Context, stage: str, hook_cmd: str) -> None:
         logger.info(f"Running {stage}-hook '{hook_cmd}'")
         cluster_info = cast(ClusterInfo, self._cluster_info)
         env = os.environ.copy()
@@ -109,27 +327,44 @@ class SimpleTestScenario(BuildStep, ABC):
         env["ATS_TEST_TYPE"] = str(self.test_provided)
         env["ATS_CHART_PATH"] = config.chart_file
         env["ATS_CHART_VERSION"] = context[CONTEXT_KEY_CHART_YAML]["version"]
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE
-        )
+        deploy_namespace = self._get_deploy_namespace(config, context)
         if deploy_namespace:
             env["ATS_RELEASE_NAMESPACE"] = deploy_namespace
         release_name = context.get(CONTEXT_KEY_RELEASE_NAME)
         if release_name:
             env["ATS_RELEASE_NAME"] = str(release_name)
-        run_res = run_and_log([hook_cmd], env=env)  # nosec
-        if run_res.returncode != 0:
-            raise ATSTestError(f"{stage.capitalize()}-hook '{hook_cmd}' failed with exit code {run_res.returncode}")
+        timeout_sec = self._deadline.timeout(self._hook_timeout_sec)
+        if self._output_settings is None:
+            return_code = run_and_log([hook_cmd], timeout_sec=timeout_sec, env=env).returncode  # nosec
+        else:
+            return_code = run_spooled(
+                [hook_cmd],
+                self._output_settings,
+                f"{self.test_provided}-{stage}-hook",
+                timeout_sec=timeout_sec,
+                env=env,
+            )
+        if return_code != 0:
+            raise ATSTestError(f"{stage.capitalize()}-hook '{hook_cmd}' failed with exit code {return_code}")
 
     def _ensure_cluster_prerequisites(self, kube_config_path: str) -> None:
-        logger.info(f"Applying cluster CRDs from {self._configured_crd_dir}")
-        run_res = run_and_log(
-            ["kubectl", f"--kubeconfig={kube_config_path}", "apply", "--server-side", "-f", self._configured_crd_dir],
-            capture_output=True,
-        )  # nosec
-        if run_res.returncode != 0:
-            raise ATSTestError(f"Bootstrapping CRDs on the target cluster failed:\n{run_res.stderr}")
-        logger.info("Cluster CRDs bootstrapped and ready.")
+        with span("CRD bootstrap", "cluster"):
+            logger.info(f"Applying cluster CRDs from {self._configured_crd_dir}")
+            run_res = run_and_log(
+                [
+                    "kubectl",
+                    f"--kubeconfig={kube_config_path}",
+                    "apply",
+                    "--server-side",
+                    "-f",
+                    self._configured_crd_dir,
+                ],
+                timeout_sec=self._deadline.timeout(self._crd_apply_timeout_sec),
+                capture_output=True,
+            )  # nosec
+            if run_res.returncode != 0:
+                raise ATSTestError(f"Bootstrapping CRDs on the target cluster failed:\n{run_res.stderr}")
+            logger.info("Cluster CRDs bootstrapped and ready.")
 
     def pre_run(self, config: argparse.Namespace) -> None:
         self._assert_binary_present_in_path(_HELM_BIN)
@@ -137,16 +372,104 @@ class SimpleTestScenario(BuildStep, ABC):
         self._configured_crd_dir = get_config_value_by_cmd_line_option(
             config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_CLUSTER_CRDS
         )
+        deploy_engine = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_ENGINE
+        )
+        if deploy_engine == DEPLOY_ENGINE_TEMPLATE:
+            cache_dir = get_config_value_by_cmd_line_option(
+                config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_MANIFEST_CACHE_DIR
+            )
+            self._manifest_deployer = ManifestDeployer(cache_dir, _HELM_DEPLOY_TIMEOUT)
+        self._pod_usage_interval_sec = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_POD_USAGE_INTERVAL
+        )
+        governor = BaseTestScenariosFilteringPipeline.get_resource_governor(config)
+        self._test_workers = governor.test_workers
+        self._diagnostics_limits = DiagnosticsLimits(
+            workers=get_config_value_by_cmd_line_option(
+                config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DIAGNOSTICS_WORKERS
+            )
+            or governor.diagnostics_workers,
+            call_timeout_sec=get_config_value_by_cmd_line_option(
+                config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DIAGNOSTICS_CALL_TIMEOUT
+            ),
+            deadline_sec=get_config_value_by_cmd_line_option(
+                config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DIAGNOSTICS_DEADLINE
+            ),
+        )
+        self._diagnostics_dir = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DIAGNOSTICS_DIR
+        )
+        self._report_settings = BaseTestScenariosFilteringPipeline.get_report_settings(config)
+        history_db = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_HISTORY_DB
+        )
+        self._history = TimingHistory(history_db) if history_db else None
+        self._order_by_history = (
+            get_config_value_by_cmd_line_option(config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_TEST_ORDER)
+            == TEST_ORDER_HISTORY
+        )
+        self._fail_fast = bool(
+            get_config_value_by_cmd_line_option(config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_FAIL_FAST)
+        )
+        self._test_retries = get_config_value_by_cmd_line_option(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_TEST_RETRIES
+        )
+        self._test_timeout_sec = self._get_timeout(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_TEST_TIMEOUT
+        )
+        self._hook_timeout_sec = self._get_timeout(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_HOOK_TIMEOUT
+        )
+        self._prepare_timeout_sec = self._get_timeout(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_PREPARE_TIMEOUT
+        )
+        self._crd_apply_timeout_sec = self._get_timeout(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_CRD_APPLY_TIMEOUT
+        )
+        self._scenario_deadline_sec = self._get_timeout(
+            config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_SCENARIO_DEADLINE
+        )
+        self._output_settings = None
+        if (
+            get_config_value_by_cmd_line_option(config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_OUTPUT)
+            == OUTPUT_MODE_QUIET
+        ):
+            self._output_settings = OutputSettings(
+                directory=get_config_value_by_cmd_line_option(
+                    config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_OUTPUT_DIR
+                ),
+                tail_lines=get_config_value_by_cmd_line_option(
+                    config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_OUTPUT_TAIL_LINES
+                ),
+                replay=get_config_value_by_cmd_line_option(
+                    config, BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_OUTPUT_REPLAY
+                ),
+            )
         self._test_executor.validate(config, self.name)
 
+    @staticmethod
+    def _get_timeout(config: argparse.Namespace, option: str) -> Optional[float]:
+        return float(get_config_value_by_cmd_line_option(config, option)) or None
+
     def run(self, config: argparse.Namespace, context: Context) -> None:
+        with span(
+            self.name, "scenario", chart=context[CONTEXT_KEY_CHART_YAML]["name"], test_type=self.test_provided
+        ) as span_args:
+            try:
+                self._run_scenario(config, context)
+            finally:
+                if self._cluster_info is not None:
+                    span_args["cluster_type"] = self._cluster_info.cluster_type
+
+    def _run_scenario(self, config: argparse.Namespace, context: Context) -> None:
+        self._deadline = Deadline(self._scenario_deadline_sec, f"deadline of the '{self.name}' scenario")
         logger.info("Using the configured test cluster.")
         self._cluster_info = self._cluster_manager.get_cluster()
 
         logger.info("Establishing connection to the test cluster.")
         try:
-            kube_config = KubeConfig.from_file(self._cluster_info.kube_config_path)
-            self._kube_client = HTTPClient(kube_config)
+            self._kube_client = self._cluster_manager.get_kube_client()
         except Exception:
             raise ATSTestError("Can't establish connection to the test cluster")
 
@@ -154,7 +477,13 @@ class SimpleTestScenario(BuildStep, ABC):
             self._ensure_cluster_prerequisites(self._cluster_info.kube_config_path)
             self._cluster_info.dependency_crds_ready = True
 
+        deploy_namespace = self._get_deploy_namespace(config, context)
         try:
+            with span("namespace setup", "cluster", namespace=deploy_namespace):
+                self._namespace_manager.ensure_namespace(
+                    config, self._kube_client, deploy_namespace, context[CONTEXT_KEY_CHART_YAML]["name"]
+                )
+            self._start_warm_up()
             if (
                 not get_config_value_by_cmd_line_option(
                     config,
@@ -166,28 +495,38 @@ class SimpleTestScenario(BuildStep, ABC):
             self._run_hook(config, context, "pre")
             self.run_tests(config, context)
             self._run_hook(config, context, "post")
+        except ATSTimeoutError as e:
+            self._collect_failure_diagnostics(config, context)
+            raise ATSTimeoutError(f"Application test run timed out: {e}") from e
         except Exception as e:
             self._collect_failure_diagnostics(config, context)
             raise ATSTestError(f"Application test run failed: {e}") from e
         finally:
+            self._finish_warm_up()
             # honor --app-tests-skip-app-delete; both delete helpers no-op when nothing was deployed
             if not get_config_value_by_cmd_line_option(
                 config,
                 BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_SKIP_DELETE_APP,
             ):
-                self._delete_release(config, context)
+                with span("teardown", "teardown"):
+                    self._delete_release(config, context)
+                    self._namespace_manager.release_namespace(config, deploy_namespace, self._kube_client)
+
+    def cleanup(self, config: argparse.Namespace, context: Context, has_build_failed: bool) -> None:
+        self._test_executor.cleanup()
 
     def _deploy_tested_chart_as_app(self, config: argparse.Namespace, context: Context) -> None:
         release_name = context[CONTEXT_KEY_CHART_YAML]["name"]
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
+        deploy_namespace = self._get_deploy_namespace(config, context)
         app_config_file_path = get_config_value_by_cmd_line_option(
             config,
             BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_CONFIG_FILE,
         )
-        self._helm_deploy(release_name, config.chart_file, deploy_namespace, app_config_file_path)
+        started_at = time.monotonic()
+        self._helm_deploy(release_name, config.chart_file, deploy_namespace, app_config_file_path, self._stage)
+        self._record_deploy_history(
+            config, context, context[CONTEXT_KEY_CHART_YAML]["version"], self._stage, started_at
+        )
         context[CONTEXT_KEY_RELEASE_NAME] = release_name
 
     def _helm_deploy(
@@ -196,12 +535,38 @@ class SimpleTestScenario(BuildStep, ABC):
         chart_file: str,
         deploy_namespace: str,
         app_config_file_path: Optional[str],
+        stage: str = STAGE_MAIN,
+    ) -> None:
+        with span("deploy", "deploy", release=release_name, chart=os.path.basename(chart_file)) as span_args:
+            existing_pods = self._list_pod_uids(deploy_namespace)
+            self._install_release(release_name, chart_file, deploy_namespace, app_config_file_path)
+            self._record_readiness(deploy_namespace, stage, existing_pods, span_args)
+
+    def _install_release(
+        self,
+        release_name: str,
+        chart_file: str,
+        deploy_namespace: str,
+        app_config_file_path: Optional[str],
     ) -> None:
         # Giant Swarm charts may ship PolicyException resources in the policy-exceptions namespace;
         # ensure it exists so the install does not fail on a cluster that lacks it.
         logger.info("Ensuring namespace 'policy-exceptions'.")
         ensure_namespace_exists(self._kube_client, "policy-exceptions")
 
+        if self._manifest_deployer is not None:
+            ensure_namespace_exists(self._kube_client, deploy_namespace)
+            self._manifest_deployer.deploy(
+                release_name,
+                chart_file,
+                deploy_namespace,
+                app_config_file_path,
+                self._get_kube_version(),
+                self._helm_env(),
+                self._deadline,
+            )
+            return
+
         args = [
             _HELM_BIN,
             "upgrade",
@@ -219,122 +584,78 @@ class SimpleTestScenario(BuildStep, ABC):
         if app_config_file_path:
             args += ["--values", app_config_file_path]
         logger.info(f"Installing chart as Helm release '{release_name}' into namespace '{deploy_namespace}'.")
-        run_res = run_and_log(args, env=self._helm_env())  # nosec, chart file is the user's responsibility
+        # the chart file is the user's responsibility
+        run_res = run_and_log(args, timeout_sec=self._deadline.timeout(), env=self._helm_env())  # nosec
         if run_res.returncode != 0:
             raise ATSTestError(f"Installing Helm release '{release_name}' failed")
 
-    def _collect_failure_diagnostics(self, config: argparse.Namespace, context: Context) -> None:
-        """Collect cluster diagnostics after a test failure, before cleanup destroys the evidence."""
+    def _list_pod_uids(self, namespace: str) -> Optional[Set[str]]:
         if self._kube_client is None:
-            logger.warning("No kube client available, skipping diagnostics collection.")
-            return
-
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
-        release_name = context.get(
-            CONTEXT_KEY_RELEASE_NAME, context.get(CONTEXT_KEY_CHART_YAML, {}).get("name", "unknown")
-        )
-        separator = "=" * 80
-
-        logger.error(f"{separator}")
-        logger.error(f"FAILURE DIAGNOSTICS for release '{release_name}' in namespace '{deploy_namespace}'")
-        logger.error(f"{separator}")
+            return None
+        try:
+            return list_pod_uids(self._kube_client, namespace)
+        except Exception as e:
+            logger.warning(f"Listing the pods in namespace '{namespace}' failed, time-to-ready isn't measured: {e}")
+            return None
 
+    def _record_readiness(
+        self, namespace: str, stage: str, existing_pods: Optional[Set[str]], span_args: Dict[str, Any]
+    ) -> None:
+        if self._kube_client is None or existing_pods is None:
+            return
         try:
-            # Pod status and logs
-            pods = list(pykube.Pod.objects(self._kube_client).filter(namespace=deploy_namespace))
-            if pods:
-                logger.error(f"--- Pods in namespace '{deploy_namespace}' ---")
-                for pod in pods:
-                    phase = pod.obj.get("status", {}).get("phase", "Unknown")
-                    logger.error(f"  {pod.name}: {phase}")
-
-            # Full spec/status for non-Running pods (shows conditions, events, image pull errors)
-            for pod in pods:
-                if pod.obj.get("status", {}).get("phase") != "Running":
-                    logger.error(f"--- Describe pod '{pod.name}' ---")
-                    logger.error(yaml.dump(pod.obj))
-
-            # Container logs from all pods in the namespace
-            for pod in pods:
-                all_containers = [c["name"] for c in pod.obj.get("spec", {}).get("containers", [])]
-                all_containers += [c["name"] for c in pod.obj.get("spec", {}).get("initContainers", [])]
-                for container in all_containers:
-                    try:
-                        logs = pod.logs(container=container, tail_lines=100)
-                        if logs:
-                            logger.error(f"--- Logs from pod '{pod.name}' container '{container}' (last 100 lines) ---")
-                            logger.error(logs)
-                    except Exception as ex:
-                        logger.warning(f"Failed to get logs for pod '{pod.name}' container '{container}': {ex}")
-                    try:
-                        prev_logs = pod.logs(container=container, previous=True, tail_lines=50)
-                        if prev_logs:
-                            logger.error(
-                                f"--- Previous logs from pod '{pod.name}' container '{container}' (last 50 lines) ---"
-                            )
-                            logger.error(prev_logs)
-                    except Exception:
-                        pass  # Previous logs don't exist if the container hasn't restarted
-
-            # Events in the app namespace
-            events = sorted(
-                pykube.Event.objects(self._kube_client).filter(namespace=deploy_namespace),
-                key=lambda e: e.obj.get("lastTimestamp") or "",
+            pods = measure_readiness(self._kube_client, namespace, existing_pods)
+        except Exception as e:
+            logger.warning(f"Measuring the time-to-ready of the deployed workloads failed: {e}")
+            return
+        if not pods:
+            logger.debug(f"The deploy didn't start any pods in namespace '{namespace}'.")
+            return
+        self._readiness[stage] = pods
+        summary = summarize_readiness(pods)
+        for workload, workload_summary in summary.items():
+            ready_sec = workload_summary["readySec"]
+            readiness = "isn't ready" if ready_sec is None else f"became ready in {ready_sec:g}s"
+            logger.info(f"Workload '{workload}' with {workload_summary['pods']} pods {readiness}.")
+            for name, container in workload_summary["containers"].items():
+                logger.debug(
+                    f"  Container '{name}' started after {container['startedSec']}s, "
+                    f"image pulled in {container['imagePullSec']}s."
+                )
+        ready = [w["readySec"] for w in summary.values() if w["readySec"] is not None]
+        if ready:
+            span_args["ready_sec"] = max(ready)
+        if self._report_settings is None:
+            return
+        try:
+            write_readiness(self._report_settings.readiness_path(str(self.test_provided), stage), namespace, pods)
+        except OSError as e:
+            logger.warning(f"Saving the time-to-ready of the deployed workloads failed: {e}")
+
+    def _collect_failure_diagnostics(self, config: argparse.Namespace, context: Context) -> None:
+        """Collect cluster diagnostics after a test failure, before cleanup destroys the evidence."""
+        with span("failure diagnostics", "diagnostics"):
+            if self._kube_client is None:
+                logger.warning("No kube client available, skipping diagnostics collection.")
+                return
+
+            deploy_namespace = self._get_deploy_namespace(config, context)
+            release_name = context.get(
+                CONTEXT_KEY_RELEASE_NAME, context.get(CONTEXT_KEY_CHART_YAML, {}).get("name", "unknown")
             )
-            if events:
-                logger.error(f"--- Events in namespace '{deploy_namespace}' ---")
-                for event in events:
-                    logger.error(
-                        f"  {event.obj.get('lastTimestamp', '')} {event.obj.get('type', '')} "
-                        f"{event.obj.get('reason', '')} {event.obj.get('message', '')}"
-                    )
-
-            # Helm release status
-            helm_env = self._helm_env()
-            for helm_cmd, label in [
-                ([_HELM_BIN, "status", release_name, "-n", deploy_namespace], "helm status"),
-                ([_HELM_BIN, "get", "values", release_name, "-n", deploy_namespace], "helm get values"),
-            ]:
-                res = run_and_log(helm_cmd, env=helm_env)  # nosec
-                if res.returncode == 0 and res.stdout:
-                    logger.error(f"--- {label} '{release_name}' ---")
-                    logger.error(res.stdout)
-
-            # Deployments status
-            deployments = list(pykube.Deployment.objects(self._kube_client).filter(namespace=deploy_namespace))
-            if deployments:
-                logger.error(f"--- Deployments in namespace '{deploy_namespace}' ---")
-                for deployment in deployments:
-                    logger.error(f"  {deployment.name}: {yaml.dump(deployment.obj.get('status', {}))}")
-
-            # Node status (useful for spotting clusters with resource issues)
-            nodes = list(pykube.Node.objects(self._kube_client).all())
-            if nodes:
-                logger.error("--- Cluster nodes ---")
-                for node in nodes:
-                    conditions = node.obj.get("status", {}).get("conditions", [])
-                    ready_cond = next((c for c in conditions if c.get("type") == "Ready"), None)
-                    ready_status = ready_cond.get("status", "Unknown") if ready_cond else "Unknown"
-                    logger.error(f"  {node.name}: Ready={ready_status}")
-
-        except Exception as ex:
-            logger.warning(f"Failed to collect diagnostics: {ex}")
-
-        logger.error(f"{separator}")
-        logger.error("END OF FAILURE DIAGNOSTICS")
-        logger.error(f"{separator}")
+            FailureDiagnosticsCollector(
+                self._kube_client, self._helm_env(), self._diagnostics_limits, self._diagnostics_dir
+            ).collect(release_name, deploy_namespace, f"{self.test_provided}-{self._stage}")
 
     def _delete_release(self, config: argparse.Namespace, context: Context) -> None:
         release_name = context.get(CONTEXT_KEY_RELEASE_NAME)
         if release_name is None:
             return
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
+        deploy_namespace = self._get_deploy_namespace(config, context)
+        if self._manifest_deployer is not None and self._manifest_deployer.delete(
+            release_name, deploy_namespace, self._helm_env()
+        ):
+            return
         logger.info(f"Uninstalling Helm release '{release_name}' from namespace '{deploy_namespace}'.")
         run_res = run_and_log(
             [_HELM_BIN, "uninstall", release_name, "--namespace", deploy_namespace, "--wait"],
@@ -343,14 +664,28 @@ class SimpleTestScenario(BuildStep, ABC):
         if run_res.returncode != 0:
             logger.warning(f"Uninstalling Helm release '{release_name}' failed; continuing.")
 
+    def _get_kube_version(self) -> str:
+        if self._kube_version is None:
+            self._kube_version = ""
+            try:
+                self._kube_version = get_server_version(cast(HTTPClient, self._kube_client))
+            except Exception as e:
+                logger.warning(f"Detecting the Kubernetes version of the test cluster failed: {e}")
+        return self._kube_version
+
     def _helm_env(self) -> Dict[str, str]:
         kube_config_path = cast(ClusterInfo, self._cluster_info).kube_config_path
         return {**os.environ, "KUBECONFIG": kube_config_path}
 
 
 class FunctionalTestScenario(SimpleTestScenario):
-    def __init__(self, cluster_manager: ClusterManager, test_executor: TestExecutor):
-        super().__init__(cluster_manager, test_executor)
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
+        super().__init__(cluster_manager, test_executor, namespace_manager)
 
     @property
     def test_provided(self) -> StepType:
@@ -358,8 +693,13 @@ class FunctionalTestScenario(SimpleTestScenario):
 
 
 class SmokeTestScenario(SimpleTestScenario):
-    def __init__(self, cluster_manager: ClusterManager, test_executor: TestExecutor):
-        super().__init__(cluster_manager, test_executor)
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
+        super().__init__(cluster_manager, test_executor, namespace_manager)
 
     @property
     def test_provided(self) -> StepType:
@@ -5,8 +5,9 @@ import os
 import re
 import shutil
 import subprocess
+import time
 from tempfile import TemporaryDirectory
-from typing import Tuple, cast, List, Match, Optional, Dict, Set
+from typing import Any, Tuple, cast, List, Match, Optional, Dict, Set
 from urllib.parse import urljoin
 
 import requests
@@ -16,7 +17,6 @@ from semver import VersionInfo
 from step_exec_lib.errors import ConfigError
 from step_exec_lib.types import StepType, Context
 from step_exec_lib.utils.config import get_config_value_by_cmd_line_option
-from step_exec_lib.utils.processes import run_and_log
 from validators import url as validator_url
 from yaml import YAMLError
 from yaml.parser import ParserError
@@ -29,8 +29,27 @@ from app_test_suite.config import (
     KEY_CFG_STABLE_APP_CONFIG,
     KEY_CFG_UPGRADE_HOOK,
     KEY_CFG_UPGRADE_SAVE_METADATA,
+    KEY_CFG_UPGRADE_PROBE_INTERVAL,
+    KEY_CFG_UPGRADE_PROBE_PATH,
+    KEY_CFG_UPGRADE_MAX_ERROR_RATE,
+    KEY_CFG_UPGRADE_MAX_OUTAGE,
+)
+from app_test_suite.availability import (
+    DEFAULT_PROBE_PATH,
+    AvailabilityProbe,
+    AvailabilityReport,
+    find_probe_targets,
+    summarize_availability,
+    write_availability,
 )
 from app_test_suite.errors import ATSTestError
+from app_test_suite.kube_client import build_kube_client
+from app_test_suite.namespace_manager import NamespaceManager
+from app_test_suite.output_spool import run_spooled
+from app_test_suite.pod_usage import summarize_pod_usage
+from app_test_suite.readiness import summarize_readiness
+from app_test_suite.processes import run_and_log
+from app_test_suite.reports import STAGE_MAIN
 from app_test_suite.steps.base import (
     TestExecutor,
     CONTEXT_KEY_CHART_YAML,
@@ -45,6 +64,7 @@ from app_test_suite.steps.scenarios.simple import (
     _HELM_BIN,
 )
 from app_test_suite.steps.test_types import STEP_TEST_UPGRADE
+from app_test_suite.tracing import span
 
 KEY_PRE_UPGRADE = "pre_upgrade"
 KEY_POST_UPGRADE = "post_upgrade"
@@ -64,11 +84,22 @@ class UpgradeTestScenario(SimpleTestScenario):
     Do a mixin of this class and a test executor mixin derived from TestExecutor class to get a test scenario.
     """
 
-    def __init__(self, cluster_manager: ClusterManager, test_executor: TestExecutor):
-        super().__init__(cluster_manager, test_executor)
+    def __init__(
+        self,
+        cluster_manager: ClusterManager,
+        test_executor: TestExecutor,
+        namespace_manager: Optional[NamespaceManager] = None,
+    ):
+        super().__init__(cluster_manager, test_executor, namespace_manager)
         self._skip_app_deploy = True
         self._stable_from_local_file = False
         self._semver_regex_match = re.compile(r"^.+((0|[1-9]\d*)\.(0|[1-9]\d*)\.(0|[1-9]\d*).*)\.tgz$")
+        # the Services of the release are only probed during the upgrade when 'pre_run' configures an interval
+        self._probe_interval_sec = 0.0
+        self._probe_path = DEFAULT_PROBE_PATH
+        self._max_error_rate = 1.0
+        self._max_outage_sec = 0.0
+        self._availability: Dict[str, AvailabilityReport] = {}
 
     @property
     def test_provided(self) -> StepType:
@@ -125,6 +156,19 @@ class UpgradeTestScenario(SimpleTestScenario):
                     f"Upgrade hook was configured, but '{cmd}' was not found to be a valid executable.",
                 )
 
+        self._probe_interval_sec = get_config_value_by_cmd_line_option(config, KEY_CFG_UPGRADE_PROBE_INTERVAL)
+        self._probe_path = get_config_value_by_cmd_line_option(config, KEY_CFG_UPGRADE_PROBE_PATH)
+        self._max_error_rate = get_config_value_by_cmd_line_option(config, KEY_CFG_UPGRADE_MAX_ERROR_RATE)
+        self._max_outage_sec = get_config_value_by_cmd_line_option(config, KEY_CFG_UPGRADE_MAX_OUTAGE)
+        for option, value in [
+            (KEY_CFG_UPGRADE_PROBE_INTERVAL, self._probe_interval_sec),
+            (KEY_CFG_UPGRADE_MAX_OUTAGE, self._max_outage_sec),
+        ]:
+            if value < 0:
+                raise ConfigError(option, f"The value of '{option}' can't be negative.")
+        if not 0 <= self._max_error_rate <= 1:
+            raise ConfigError(KEY_CFG_UPGRADE_MAX_ERROR_RATE, "The error rate has to be between 0 and 1.")
+
     def _resolve_stable_chart(
         self,
         config: argparse.Namespace,
@@ -196,10 +240,7 @@ class UpgradeTestScenario(SimpleTestScenario):
         app_name = context[CONTEXT_KEY_CHART_YAML]["name"]
         chart_version = context[CONTEXT_KEY_CHART_YAML]["version"]
 
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
+        deploy_namespace = self._get_deploy_namespace(config, context)
         stable_app_cfg_file = get_config_value_by_cmd_line_option(config, KEY_CFG_STABLE_APP_CONFIG)
         app_config_file_path = get_config_value_by_cmd_line_option(
             config,
@@ -207,7 +248,8 @@ class UpgradeTestScenario(SimpleTestScenario):
         )
 
         with TemporaryDirectory("-ats-stable-chart") as stable_dir:
-            stable_chart_file, stable_chart_ver = self._resolve_stable_chart(config, context, app_name, stable_dir)
+            with span("stable chart resolution", "deploy"):
+                stable_chart_file, stable_chart_ver = self._resolve_stable_chart(config, context, app_name, stable_dir)
             if VersionInfo.parse(stable_chart_ver) >= VersionInfo.parse(chart_version):
                 logger.warning(
                     "You have requested upgrade test where the stable chart version seems to be "
@@ -216,7 +258,9 @@ class UpgradeTestScenario(SimpleTestScenario):
                 )
 
             # deploy the stable version
-            self._helm_deploy(app_name, stable_chart_file, deploy_namespace, stable_app_cfg_file)
+            started_at = time.monotonic()
+            self._helm_deploy(app_name, stable_chart_file, deploy_namespace, stable_app_cfg_file, KEY_PRE_UPGRADE)
+            self._record_deploy_history(config, context, stable_chart_ver, KEY_PRE_UPGRADE, started_at)
             context[CONTEXT_KEY_RELEASE_NAME] = app_name
 
             # run pre-upgrade tests
@@ -229,14 +273,23 @@ class UpgradeTestScenario(SimpleTestScenario):
                 deploy_namespace=deploy_namespace,
                 test_extra_info={KEY_UPGRADE_TEST_STAGE_EXTRA_INFO: KEY_PRE_UPGRADE},
             )
-            self._test_executor.prepare_test_environment(exec_info)
-            self._test_executor.execute_test(exec_info)
+            self._prepare_test_environment(exec_info)
+            self._execute_test(config, context, exec_info, KEY_PRE_UPGRADE)
 
             # run the optional pre-upgrade hook
             self._run_upgrade_hook(config, KEY_PRE_UPGRADE, app_name, stable_chart_ver, chart_version)
 
-            # upgrade to the version under test
-            self._helm_deploy(app_name, config.chart_file, deploy_namespace, app_config_file_path)
+            # upgrade to the version under test, while clients keep requesting the app
+            probe = self._start_availability_probe(deploy_namespace)
+            started_at = time.monotonic()
+            try:
+                self._helm_deploy(app_name, config.chart_file, deploy_namespace, app_config_file_path, KEY_POST_UPGRADE)
+            finally:
+                if probe is not None:
+                    self._record_availability(deploy_namespace, probe.stop())
+            self._record_deploy_history(config, context, chart_version, KEY_POST_UPGRADE, started_at)
+            self._log_readiness_comparison(stable_chart_ver, chart_version)
+            self._check_availability()
 
             # run the optional post-upgrade hook
             self._run_upgrade_hook(config, KEY_POST_UPGRADE, app_name, stable_chart_ver, chart_version)
@@ -246,7 +299,8 @@ class UpgradeTestScenario(SimpleTestScenario):
             exec_info.chart_ver = chart_version
             exec_info.app_config_file_path = app_config_file_path
             cast(Dict[str, str], exec_info.test_extra_info)[KEY_UPGRADE_TEST_STAGE_EXTRA_INFO] = KEY_POST_UPGRADE
-            self._test_executor.execute_test(exec_info)
+            exec_info.junit_report_path = self._junit_report_path(KEY_POST_UPGRADE)
+            self._execute_test(config, context, exec_info, KEY_POST_UPGRADE)
 
         # save metadata, if requested
         if get_config_value_by_cmd_line_option(config, KEY_CFG_UPGRADE_SAVE_METADATA):
@@ -401,26 +455,31 @@ class UpgradeTestScenario(SimpleTestScenario):
             logger.info(f"No upgrade test {stage_name} hook configured. Moving on.")
             return
 
-        logger.info(f"Executing upgrade hook: '{upgrade_hook_exe}' with stage '{stage_name}'.")
-        deploy_namespace = get_config_value_by_cmd_line_option(
-            config,
-            BaseTestScenariosFilteringPipeline.KEY_CONFIG_OPTION_DEPLOY_NAMESPACE,
-        )
-        env = os.environ.copy()
-        env["KUBECONFIG"] = cast(ClusterInfo, self._cluster_info).kube_config_path
-        env["ATS_HOOK_STAGE"] = stage_name
-        env["ATS_TEST_TYPE"] = str(self.test_provided)
-        env["ATS_RELEASE_NAME"] = app_name
-        env["ATS_UPGRADE_FROM_VERSION"] = from_version
-        env["ATS_UPGRADE_TO_VERSION"] = to_version
-        if deploy_namespace:
-            env["ATS_RELEASE_NAMESPACE"] = deploy_namespace
-        args = upgrade_hook_exe.split(" ")
-        run_res = run_and_log(args, env=env)  # nosec, user configurable input, but we have to accept it here
-        if run_res.returncode != 0:
-            raise ATSTestError(
-                f"Upgrade hook for stage '{stage_name}' returned non-zero exit code: '{run_res.returncode}'."
-            )
+        with span(f"{stage_name} hook", "hook", command=upgrade_hook_exe):
+            logger.info(f"Executing upgrade hook: '{upgrade_hook_exe}' with stage '{stage_name}'.")
+            deploy_namespace = self._namespace_manager.get_namespace(config, app_name, self.test_provided)
+            env = os.environ.copy()
+            env["KUBECONFIG"] = cast(ClusterInfo, self._cluster_info).kube_config_path
+            env["ATS_HOOK_STAGE"] = stage_name
+            env["ATS_TEST_TYPE"] = str(self.test_provided)
+            env["ATS_RELEASE_NAME"] = app_name
+            env["ATS_UPGRADE_FROM_VERSION"] = from_version
+            env["ATS_UPGRADE_TO_VERSION"] = to_version
+            if deploy_namespace:
+                env["ATS_RELEASE_NAMESPACE"] = deploy_namespace
+            args = upgrade_hook_exe.split(" ")
+            timeout_sec = self._deadline.timeout(self._hook_timeout_sec)
+            if self._output_settings is None:
+                # nosec, user configurable input, but we have to accept it here
+                return_code = run_and_log(args, timeout_sec=timeout_sec, env=env).returncode  # nosec
+            else:
+                return_code = run_spooled(
+                    args, self._output_settings, f"upgrade-{stage_name}-hook", timeout_sec=timeout_sec, env=env
+                )  # nosec
+            if return_code != 0:
+                raise ATSTestError(
+                    f"Upgrade hook for stage '{stage_name}' returned non-zero exit code: '{return_code}'."
+                )
 
     def _get_test_exec_info(
         self,
@@ -445,9 +504,75 @@ class UpgradeTestScenario(SimpleTestScenario):
             release_name=release_name,
             deploy_namespace=deploy_namespace,
             test_extra_info=test_extra_info,
+            output=self._output_settings,
+            junit_report_path=self._junit_report_path(
+                (test_extra_info or {}).get(KEY_UPGRADE_TEST_STAGE_EXTRA_INFO, STAGE_MAIN)
+            ),
         )
         return exec_info
 
+    def _start_availability_probe(self, namespace: str) -> Optional[AvailabilityProbe]:
+        if not self._probe_interval_sec or self._kube_client is None:
+            return None
+        try:
+            targets = find_probe_targets(self._kube_client, namespace)
+        except Exception as e:
+            logger.warning(f"Listing the Services to probe during the upgrade failed: {e}")
+            return None
+        if not targets:
+            logger.warning(f"No Services found in namespace '{namespace}' to probe during the upgrade.")
+            return None
+        logger.info(
+            f"Probing {', '.join(t.name for t in targets)} every {self._probe_interval_sec:g}s during the upgrade."
+        )
+        # a client of its own, closed when the probe stops: the shared one retries failed requests and is rate
+        # limited, which would hide outages
+        probe_client = build_kube_client(cast(ClusterInfo, self._cluster_info).kube_config_path, qps=0, retries=0)
+        return AvailabilityProbe(probe_client, namespace, targets, self._probe_interval_sec, self._probe_path).start()
+
+    def _record_availability(self, namespace: str, reports: Dict[str, AvailabilityReport]) -> None:
+        self._availability = reports
+        for name, summary in summarize_availability(reports).items():
+            latency = ", ".join(f"{p} {value * 1000:.0f}ms" for p, value in summary["latencySec"].items())
+            logger.info(
+                f"Service '{name}' during the upgrade: {summary['errors']} of {summary['requests']} requests "
+                f"failed ({summary['errorRate']:.2%}), longest outage {summary['longestOutageSec']:g}s, "
+                f"latency {latency or 'unknown'}."
+            )
+        if self._report_settings is None:
+            return
+        try:
+            write_availability(
+                self._report_settings.availability_path(str(self.test_provided), KEY_POST_UPGRADE),
+                namespace,
+                self._probe_interval_sec,
+                reports,
+            )
+        except OSError as e:
+            logger.warning(f"Saving the availability of the Services during the upgrade failed: {e}")
+
+    def _check_availability(self) -> None:
+        disrupted = [
+            f"'{name}' ({report.error_rate:.2%} of requests failed, longest outage {report.longest_outage_sec:.1f}s)"
+            for name, report in sorted(self._availability.items())
+            if report.error_rate > self._max_error_rate
+            or (self._max_outage_sec and report.longest_outage_sec > self._max_outage_sec)
+        ]
+        if disrupted:
+            raise ATSTestError(f"The upgrade disrupted the app more than allowed: {', '.join(disrupted)}.")
+
+    def _log_readiness_comparison(self, stable_chart_version: str, chart_version: str) -> None:
+        stable = summarize_readiness(self._readiness.get(KEY_PRE_UPGRADE, []))
+        upgraded = summarize_readiness(self._readiness.get(KEY_POST_UPGRADE, []))
+        for workload in sorted(stable.keys() & upgraded.keys()):
+            before, after = stable[workload]["readySec"], upgraded[workload]["readySec"]
+            if before is None or after is None:
+                continue
+            logger.info(
+                f"Workload '{workload}' became ready in {after:g}s with chart version '{chart_version}', "
+                f"{before:g}s with '{stable_chart_version}' ({after - before:+g}s)."
+            )
+
     def _save_metadata(
         self,
         app_name: str,
@@ -458,7 +583,7 @@ class UpgradeTestScenario(SimpleTestScenario):
         cluster_type: str,
         cluster_version: str,
     ) -> None:
-        metadata = {
+        metadata: Dict[str, Any] = {
             "appName": app_name,
             "chartVersion": chart_version,
             "appVersion": app_version,
@@ -468,6 +593,15 @@ class UpgradeTestScenario(SimpleTestScenario):
             "upgradeToAppVersion": stable_app_version,
             "timestamp": datetime.datetime.now(datetime.UTC).replace(microsecond=0).isoformat(),
         }
+        if self._pod_usage:
+            # peaks and restarts of the pods while the tests ran before and after the upgrade
+            metadata["podUsage"] = {stage: summarize_pod_usage(usage) for stage, usage in self._pod_usage.items()}
+        if self._readiness:
+            # time-to-ready of the workloads started by the deploy of the stable version and by the upgrade
+            metadata["readiness"] = {stage: summarize_readiness(pods) for stage, pods in self._readiness.items()}
+        if self._availability:
+            # what clients of the Services saw while the app was upgraded
+            metadata["availability"] = summarize_availability(self._availability)
         meta_dir = f"{app_name}-{stable_chart_version}.tgz-meta"
         if not os.path.isdir(meta_dir):
             logger.debug(f"Creating '{meta_dir}' directory to store metadata.")
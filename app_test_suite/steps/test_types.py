@@ -5,7 +5,13 @@ STEP_TEST_FUNCTIONAL = StepType("functional")
 STEP_TEST_PERFORMANCE = StepType("performance")
 STEP_TEST_COMPATIBILITY = StepType("compatibility")
 STEP_TEST_UPGRADE = StepType("upgrade")
-TEST_TYPE_ALL = {STEP_TEST_SMOKE, STEP_TEST_FUNCTIONAL, STEP_TEST_UPGRADE}
+TEST_TYPE_ALL = {
+    STEP_TEST_SMOKE,
+    STEP_TEST_FUNCTIONAL,
+    STEP_TEST_UPGRADE,
+    STEP_TEST_PERFORMANCE,
+    STEP_TEST_COMPATIBILITY,
+}
 ALL_STEPS = {
     STEP_ALL,
 } | TEST_TYPE_ALL
@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """
+    Records nested spans of work as Chrome trace events.
+
+    Every thread gets a track of its own, named after the thread, so spans run concurrently by worker threads
+    show up side by side. The trace can be opened in Perfetto (https://ui.perfetto.dev) or 'chrome://tracing'.
+    """
+
+    def __init__(self) -> None:
+        self._origin_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._events: List[Dict[str, Any]] = [
+            {"ph": "M", "name": "process_name", "pid": self._pid, "tid": 0, "args": {"name": "ats"}}
+        ]
+        self._tids: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin_ns) / 1000
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._tids:
+                self._tids[ident] = len(self._tids) + 1
+                self._events.append(
+                    {
+                        "ph": "M",
+                        "name": "thread_name",
+                        "pid": self._pid,
+                        "tid": self._tids[ident],
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            return self._tids[ident]
+
+    @contextmanager
+    def span(self, name: str, category: str = "ats", **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Record the time spent in the ``with`` block as a span; an exception leaving it is added to the span.
+
+        The block gets the arguments of the span as a dict, to add what's only known once the work is done.
+        """
+        tid = self._tid()
+        started_us = self._now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            event = {
+                "ph": "X",
+                "name": name,
+                "cat": category,
+                "ts": started_us,
+                "dur": self._now_us() - started_us,
+                "pid": self._pid,
+                "tid": tid,
+                "args": {k: v if isinstance(v, (int, float)) else str(v) for k, v in args.items()},
+            }
+            with self._lock:
+                self._events.append(event)
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def write(self, path: str) -> None:
+        """Write the spans recorded so far as a Chrome trace-event JSON file."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Trace of the run written to '{path}'.")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start_tracing() -> Tracer:
+    """Start recording the spans of all the threads."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """Stop recording spans and return the tracer that recorded them, if tracing was started."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, category: str = "ats", **args: Any) -> ContextManager[Dict[str, Any]]:
+    """Record the ``with`` block as a span of the current tracer; does nothing if tracing wasn't started."""
+    if _tracer is None:
+        return nullcontext(args)
+    return _tracer.span(name, category, **args)
@@ -0,0 +1 @@
+"""End-to-end benchmarks of the ATS pipelines against a fake cluster, see ``python -m benchmarks --help``."""
@@ -0,0 +1,116 @@
+import argparse
+import logging
+import sys
+from typing import Dict, List
+
+from benchmarks.shims import TOOLS
+from benchmarks.suite import (
+    DEFAULT_BASELINE_FILE,
+    DEFAULT_CASES,
+    DEFAULT_RESULTS_FILE,
+    DEFAULT_TIME_THRESHOLD,
+    BenchmarkRunner,
+    compare_to_baseline,
+    log_regressions,
+    read_baseline,
+    to_performance_results,
+    write_baseline,
+    write_results,
+)
+
+logger = logging.getLogger("benchmarks")
+
+
+def _parse_latencies(parser: argparse.ArgumentParser, values: List[str]) -> Dict[str, float]:
+    latencies: Dict[str, float] = {}
+    for value in values:
+        tool, _, seconds = value.partition("=")
+        try:
+            if tool not in TOOLS:
+                raise ValueError(f"unknown tool '{tool}'")
+            latencies[tool] = float(seconds)
+        except ValueError as e:
+            parser.error(f"Tool latency '{value}' isn't 'TOOL=SECONDS' with a TOOL of {TOOLS}: {e}.")
+    return latencies
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run the ATS pipelines end to end against a fake cluster and shims of helm, kubectl, uv and go, "
+        "and compare ATS's own overhead to a baseline.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=[case.name for case in DEFAULT_CASES],
+        default=[case.name for case in DEFAULT_CASES],
+        help="Benchmark cases to run.",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Runs of every case; the median is reported.")
+    parser.add_argument(
+        "--tool-latency",
+        nargs="*",
+        default=[],
+        metavar="TOOL=SECONDS",
+        help=f"Time every call of a tool takes, for the tools {TOOLS}. Tools take no time by default, so the "
+        "reported phases are ATS's own overhead.",
+    )
+    parser.add_argument(
+        "--api-latency", type=float, default=0.0, help="Time every request to the fake API server takes, in seconds."
+    )
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="JSON file of the baseline metrics.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_TIME_THRESHOLD,
+        help="Largest relative increase of a time over its baseline that isn't a regression. Any increase of the "
+        "number of tool calls or API requests is one.",
+    )
+    parser.add_argument(
+        "--compare-times",
+        default=False,
+        action="store_true",
+        help="Compare the times to the baseline too, not only the numbers of tool calls and API requests. Only "
+        "meaningful with a baseline recorded with '--update-baseline' on the same kind of machine.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        default=False,
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing them to it.",
+    )
+    return parser
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s: %(message)s", level=logging.INFO)
+    parser = get_parser()
+    config = parser.parse_args()
+    runner = BenchmarkRunner(_parse_latencies(parser, config.tool_latency), config.api_latency, config.repeats)
+    results = []
+    for case in [case for case in DEFAULT_CASES if case.name in config.cases]:
+        logger.info(f"Running benchmark case '{case.name}' {config.repeats} time(s).")
+        result = runner.run_case(case)
+        logger.info(
+            f"Case '{case.name}': {result['wallSec']:.2f}s wall, {result['overheadSec']:.2f}s ATS overhead, "
+            f"{result['toolCalls']} tool calls, {sum(result['apiRequests'].values())} API requests."
+        )
+        results.append(result)
+    metrics = to_performance_results(results, config.threshold)
+    if config.update_baseline:
+        write_baseline(config.baseline, metrics)
+        logger.info(f"Baseline written to '{config.baseline}'.")
+    comparisons = compare_to_baseline(
+        metrics, {} if config.update_baseline else read_baseline(config.baseline), config.compare_times
+    )
+    write_results(config.output, results, comparisons)
+    logger.info(f"Results written to '{config.output}'.")
+    if log_regressions(comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
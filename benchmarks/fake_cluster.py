@@ -0,0 +1,262 @@
+import datetime
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# the shims of 'helm' install and uninstall releases through this path, as a real 'helm' would through the API
+RELEASES_PATH = "/_bench/releases"
+
+_NAMESPACE_PATH = re.compile(r"^/api/v1/namespaces/([^/]+)$")
+_NAMESPACED_LIST_PATH = re.compile(r"^/api/v1/namespaces/([^/]+)/(pods|events|services)$")
+_SERVICE_PROXY_PATH = re.compile(r"^/api/v1/namespaces/([^/]+)/services/([^/]+)/proxy(/.*)?$")
+_POD_METRICS_PATH = re.compile(r"^/apis/metrics\.k8s\.io/v1beta1/namespaces/([^/]+)/pods$")
+_RELEASE_PATH = re.compile(rf"^{RELEASES_PATH}/([^/]+)/([^/]+)$")
+
+
+def _timestamp(at: datetime.datetime) -> str:
+    return at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeKubernetesAPI:
+    """
+    A stand-in for the API server of a cluster, serving just what ATS itself requests, from memory.
+
+    Namespaces can be created, read and deleted. Installing a release through ``RELEASES_PATH`` starts
+    ``pods_per_release`` ready pods of a Deployment in its namespace, with their 'Pulled' events, a Service routing
+    to them and their usage in the metrics API. Every request waits ``latency_sec`` first, like the round trip to
+    a remote API server, and is counted by method and kind of resource.
+    """
+
+    def __init__(self, pods_per_release: int = 1, latency_sec: float = 0.0):
+        self.pods_per_release = pods_per_release
+        self.latency_sec = latency_sec
+        self._namespaces: Dict[str, Dict[str, Any]] = {}
+        self._pods: Dict[str, List[Dict[str, Any]]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._services: Dict[str, List[Dict[str, Any]]] = {}
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("The fake API server isn't running.")
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "FakeKubernetesAPI":
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+            def do_DELETE(self) -> None:
+                self._handle("DELETE")
+
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, response = api.handle(method, self.path.split("?")[0], body)
+                payload = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ats-bench-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeKubernetesAPI":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def write_kubeconfig(self, path: str) -> None:
+        """Write a kubeconfig file pointing at the fake API server, for ATS and the shims."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Config",
+                    "clusters": [{"name": "ats-bench", "cluster": {"server": self.url}}],
+                    "users": [{"name": "ats-bench", "user": {"token": "ats-bench"}}],
+                    "contexts": [{"name": "ats-bench", "context": {"cluster": "ats-bench", "user": "ats-bench"}}],
+                    "current-context": "ats-bench",
+                },
+                f,
+            )
+
+    def requests(self) -> Dict[str, int]:
+        """Return the number of requests served so far, by method and kind of resource, like 'GET pods'."""
+        with self._lock:
+            return dict(sorted(self._requests.items()))
+
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        with self._lock:
+            status, kind, response = self._route(method, path, body)
+            if not path.startswith(RELEASES_PATH):
+                self._requests[f"{method} {kind}"] = self._requests.get(f"{method} {kind}", 0) + 1
+        return status, response
+
+    def _route(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, str, Dict[str, Any]]:
+        if path == "/version":
+            return 200, "version", {"major": "1", "minor": "31", "gitVersion": "v1.31.0"}
+        if path == "/api/v1/namespaces" and method == "POST" and body is not None:
+            return 201, "namespaces", self._create_namespace(body)
+        if match := _NAMESPACE_PATH.match(path):
+            return self._namespace(method, match.group(1))
+        if (match := _NAMESPACED_LIST_PATH.match(path)) and method == "GET":
+            namespace, kind = match.groups()
+            items = {"pods": self._pods, "events": self._events, "services": self._services}[kind]
+            return 200, kind, self._list(items.get(namespace, []))
+        if _SERVICE_PROXY_PATH.match(path) and method == "GET":
+            return 200, "services/proxy", {}
+        if (match := _POD_METRICS_PATH.match(path)) and method == "GET":
+            return 200, "pods.metrics.k8s.io", self._list(self._pod_metrics(match.group(1)))
+        if match := _RELEASE_PATH.match(path):
+            namespace, release = match.groups()
+            if method == "POST":
+                self._install_release(namespace, release)
+            elif method == "DELETE":
+                self._uninstall_release(namespace, release)
+            return 200, "releases", {}
+        return 404, "unknown", self._not_found(path)
+
+    @staticmethod
+    def _list(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"kind": "List", "apiVersion": "v1", "metadata": {"resourceVersion": "1"}, "items": items}
+
+    @staticmethod
+    def _not_found(name: str) -> Dict[str, Any]:
+        return {
+            "kind": "Status",
+            "apiVersion": "v1",
+            "status": "Failure",
+            "message": name,
+            "reason": "NotFound",
+            "code": 404,
+        }
+
+    def _create_namespace(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        namespace = {
+            **body,
+            "metadata": {**body.get("metadata", {}), "uid": str(uuid.uuid4())},
+            "status": {"phase": "Active"},
+        }
+        self._namespaces[namespace["metadata"]["name"]] = namespace
+        return namespace
+
+    def _namespace(self, method: str, name: str) -> Tuple[int, str, Dict[str, Any]]:
+        if name not in self._namespaces:
+            return 404, "namespaces", self._not_found(name)
+        if method == "DELETE":
+            for items in (self._pods, self._events, self._services):
+                items.pop(name, None)
+            return 200, "namespaces", self._namespaces.pop(name)
+        return 200, "namespaces", self._namespaces[name]
+
+    def _install_release(self, namespace: str, release: str) -> None:
+        """Replace the pods of the release with new ones, like the rollout of a Deployment."""
+        self._namespaces.setdefault(namespace, {"metadata": {"name": namespace}, "status": {"phase": "Active"}})
+        self._uninstall_release(namespace, release)
+        created = datetime.datetime.now(datetime.UTC).replace(microsecond=0)
+        template_hash = uuid.uuid4().hex[:10]
+        for i in range(self.pods_per_release):
+            uid = str(uuid.uuid4())
+            self._pods.setdefault(namespace, []).append(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Pod",
+                    "metadata": {
+                        "name": f"{release}-{template_hash}-{i}",
+                        "namespace": namespace,
+                        "uid": uid,
+                        "creationTimestamp": _timestamp(created),
+                        "labels": {"app.kubernetes.io/instance": release, "pod-template-hash": template_hash},
+                        "ownerReferences": [
+                            {"kind": "ReplicaSet", "name": f"{release}-{template_hash}", "controller": True}
+                        ],
+                    },
+                    "spec": {"nodeName": "ats-bench", "containers": [{"name": "app", "image": "app:1.0"}]},
+                    "status": {
+                        "phase": "Running",
+                        "conditions": [
+                            {"type": t, "status": "True", "lastTransitionTime": _timestamp(created)}
+                            for t in ("PodScheduled", "Initialized", "ContainersReady", "Ready")
+                        ],
+                        "containerStatuses": [
+                            {"name": "app", "ready": True, "state": {"running": {"startedAt": _timestamp(created)}}}
+                        ],
+                    },
+                }
+            )
+            self._events.setdefault(namespace, []).append(
+                {
+                    "apiVersion": "v1",
+                    "kind": "Event",
+                    "metadata": {"name": f"{release}-{template_hash}-{i}.pulled", "namespace": namespace},
+                    "reason": "Pulled",
+                    "message": 'Container image "app:1.0" already present on machine',
+                    "involvedObject": {"kind": "Pod", "uid": uid, "fieldPath": "spec.containers{app}"},
+                }
+            )
+        self._services.setdefault(namespace, []).append(
+            {
+                "apiVersion": "v1",
+                "kind": "Service",
+                "metadata": {
+                    "name": release,
+                    "namespace": namespace,
+                    "labels": {"app.kubernetes.io/instance": release},
+                },
+                "spec": {"selector": {"app.kubernetes.io/instance": release}, "ports": [{"port": 8080}]},
+            }
+        )
+
+    def _uninstall_release(self, namespace: str, release: str) -> None:
+        def owned(obj: Dict[str, Any]) -> bool:
+            return obj["metadata"].get("labels", {}).get("app.kubernetes.io/instance") == release
+
+        removed = {p["metadata"]["uid"] for p in self._pods.get(namespace, []) if owned(p)}
+        self._pods[namespace] = [p for p in self._pods.get(namespace, []) if not owned(p)]
+        self._services[namespace] = [s for s in self._services.get(namespace, []) if not owned(s)]
+        self._events[namespace] = [
+            e for e in self._events.get(namespace, []) if e["involvedObject"]["uid"] not in removed
+        ]
+
+    def _pod_metrics(self, namespace: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "metadata": {"name": pod["metadata"]["name"], "namespace": namespace},
+                "containers": [{"name": "app", "usage": {"cpu": "5m", "memory": "16Mi"}}],
+            }
+            for pod in self._pods.get(namespace, [])
+        ]
@@ -0,0 +1,317 @@
+"""
+Microbenchmarks of the chart and catalog primitives of ATS on large generated inputs, see
+``python -m benchmarks.micro --help``.
+
+Every benchmark times one primitive on its own, with the HTTP requests it makes answered from memory, so only the
+work ATS does with the responses is measured, like parsing a catalog index or following the pages of a tag list.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tarfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Tuple
+from unittest import mock
+from urllib.parse import urljoin
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app_test_suite.cluster_manager import ClusterManager
+from app_test_suite.performance import PerformanceResult
+from app_test_suite.steps.base import TestInfoProvider
+from app_test_suite.steps.executors.pytest import PytestExecutor
+from app_test_suite.steps.scenarios.upgrade import UpgradeTestScenario
+from benchmarks.suite import (
+    DEFAULT_TIME_THRESHOLD,
+    REPO_DIR,
+    compare_to_baseline,
+    log_regressions,
+    read_baseline,
+    write_baseline,
+    write_results,
+)
+
+logger = logging.getLogger("benchmarks.micro")
+
+DEFAULT_BASELINE_FILE = os.path.join(REPO_DIR, "benchmarks", "micro_baseline.json")
+DEFAULT_RESULTS_FILE = "micro-benchmark-results.json"
+# the peak of the memory allocated by Python barely changes from run to run
+DEFAULT_MEMORY_THRESHOLD = 0.1
+
+# sizes of the inputs at scale 1
+CHART_FILES = 10_000
+INDEX_APPS = 5_000
+INDEX_VERSIONS = 100_000
+TAG_PAGES = 1_000
+TAGS_PER_PAGE = 100
+
+_CATALOG_URL = "https://catalog.example.com"
+_REGISTRY_HOST = "registry.example.com"
+_UPGRADE_HTTP_GET = "app_test_suite.steps.scenarios.upgrade.requests.get"
+
+# prepares the inputs of a benchmark in a directory and returns the call to time
+Setup = Callable[[str, float], Callable[[], Any]]
+
+
+def _scaled(size: int, scale: float) -> int:
+    return max(1, round(size * scale))
+
+
+def _version(i: int) -> str:
+    """Return the i-th of a mix of versions: mostly stable ones, every 4th a pre-release, every 50th not SemVer."""
+    if i % 50 == 49:
+        return f"sha-{i:07x}"
+    version = f"{i // 10_000}.{i // 100 % 100}.{i % 100}"
+    return f"{version}-rc.1" if i % 4 == 3 else version
+
+
+def _response(url: str, content: bytes, headers: Dict[str, str]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = url
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers)
+    return response
+
+
+def _chart_extraction(work_dir: str, scale: float) -> Callable[[], Any]:
+    """'TestInfoProvider.extract_chart_info' on a chart archive with many templates."""
+    chart_file = os.path.join(work_dir, "big-chart-1.0.0.tgz")
+    with tarfile.open(chart_file, "w:gz") as tar:
+        files = [("Chart.yaml", "apiVersion: v2\nname: big-chart\nversion: 1.0.0\nappVersion: 1.0.0\n")]
+        files += [
+            (f"templates/configmap-{i}.yaml", f"apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: cm-{i}\n")
+            for i in range(_scaled(CHART_FILES, scale) - 1)
+        ]
+        for name, content in files:
+            data = content.encode()
+            info = tarfile.TarInfo(f"big-chart/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    provider = TestInfoProvider()
+
+    def run() -> Dict[str, Any]:
+        context: Dict[str, Any] = {}
+        provider.extract_chart_info(chart_file, "chart", context)
+        return context["chart"]
+
+    return run
+
+
+def _catalog_index_parsing(work_dir: str, scale: float) -> Callable[[], Any]:
+    """'_get_latest_stable_version' with a catalog index of many apps and versions."""
+    apps = _scaled(INDEX_APPS, scale)
+    versions_per_app = max(1, _scaled(INDEX_VERSIONS, scale) // apps)
+    lines = ["apiVersion: v1", "entries:"]
+    for app in range(apps):
+        lines.append(f"  app-{app}:")
+        for i in range(versions_per_app):
+            version = _version(i)
+            lines += [
+                "  - apiVersion: v2",
+                f"    appVersion: {version}",
+                '    created: "2024-01-01T00:00:00Z"',
+                f"    description: App {app}",
+                f"    digest: {app:032x}{i:032x}",
+                f"    name: app-{app}",
+                "    urls:",
+                f"    - {_CATALOG_URL}/app-{app}-{version}.tgz",
+                f"    version: {version}",
+            ]
+    index = "\n".join(lines).encode()
+    scenario = UpgradeTestScenario(ClusterManager(), PytestExecutor())
+
+    def run() -> str:
+        with mock.patch(_UPGRADE_HTTP_GET, side_effect=lambda url, **_: _response(url, index, {})):
+            return scenario._get_latest_stable_version(_CATALOG_URL, f"app-{apps - 1}")
+
+    return run
+
+
+def _stable_version_picking(work_dir: str, scale: float) -> Callable[[], Any]:
+    """'_pick_latest_stable_version' among many versions, pre-releases and tags that aren't SemVer."""
+    versions = [_version(i) for i in range(_scaled(INDEX_VERSIONS, scale))]
+
+    def run() -> str:
+        return UpgradeTestScenario._pick_latest_stable_version(versions, "app", _CATALOG_URL)
+
+    return run
+
+
+def _oci_tag_pagination(work_dir: str, scale: float) -> Callable[[], Any]:
+    """'_list_oci_tags' following the 'Link' headers through many pages of a registry's tag list."""
+    pages: Dict[str, Tuple[bytes, Dict[str, str]]] = {}
+    url = f"https://{_REGISTRY_HOST}/v2/charts/app/tags/list"
+    page_count = _scaled(TAG_PAGES, scale)
+    for page in range(page_count):
+        tags = [_version(page * TAGS_PER_PAGE + i) for i in range(TAGS_PER_PAGE)]
+        headers = {}
+        if page + 1 < page_count:
+            # registries give the next page relative to the host, after the last tag of this one
+            headers["Link"] = f'</v2/charts/app/tags/list?n={TAGS_PER_PAGE}&last={tags[-1]}>; rel="next"'
+        pages[url] = (json.dumps({"name": "charts/app", "tags": tags}).encode(), headers)
+        if "Link" in headers:
+            url = urljoin(url, headers["Link"][1 : headers["Link"].index(">")])
+
+    def get(url: str, **_: Any) -> requests.Response:
+        content, headers = pages[url]
+        return _response(url, content, headers)
+
+    def run() -> List[str]:
+        with mock.patch(_UPGRADE_HTTP_GET, side_effect=get):
+            return UpgradeTestScenario._list_oci_tags(_REGISTRY_HOST, "charts/app")
+
+    return run
+
+
+MICROBENCHMARKS: Dict[str, Setup] = {
+    "chart-extraction": _chart_extraction,
+    "catalog-index-parsing": _catalog_index_parsing,
+    "stable-version-picking": _stable_version_picking,
+    "oci-tag-pagination": _oci_tag_pagination,
+}
+
+
+@dataclass
+class MicrobenchmarkResult:
+    name: str
+    scale: float
+    times_sec: List[float]
+    peak_memory_bytes: int
+    """Peak of the memory allocated by Python during a run, as traced by 'tracemalloc'."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "benchmark": self.name,
+            "scale": self.scale,
+            "repeats": len(self.times_sec),
+            "medianSec": round(statistics.median(self.times_sec), 4),
+            "minSec": round(min(self.times_sec), 4),
+            "peakMemoryMb": round(self.peak_memory_bytes / 2**20, 2),
+        }
+
+
+def run_microbenchmark(name: str, scale: float = 1.0, repeats: int = 3) -> MicrobenchmarkResult:
+    """
+    Time a benchmark ``repeats`` times, then run it once more to trace its peak memory.
+
+    Tracing allocations slows every one of them down, so the times are taken without it.
+    """
+    with TemporaryDirectory(prefix="ats-micro-") as work_dir:
+        run = MICROBENCHMARKS[name](work_dir, scale)
+        times_sec = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            run()
+            times_sec.append(time.perf_counter() - started)
+        tracemalloc.start()
+        try:
+            run()
+            peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return MicrobenchmarkResult(name, scale, times_sec, peak_memory_bytes)
+
+
+def to_performance_results(
+    results: List[MicrobenchmarkResult], time_threshold: float, memory_threshold: float
+) -> List[PerformanceResult]:
+    metrics: List[PerformanceResult] = []
+    for result in results:
+        summary = result.to_dict()
+        metrics += [
+            PerformanceResult(f"{result.name}/time", summary["medianSec"], "s", threshold=time_threshold),
+            PerformanceResult(f"{result.name}/peak_memory", summary["peakMemoryMb"], "MiB", threshold=memory_threshold),
+        ]
+    return metrics
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.micro",
+        description="Time the chart and catalog primitives of ATS on large generated inputs and compare them to a "
+        "baseline.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=list(MICROBENCHMARKS),
+        default=list(MICROBENCHMARKS),
+        help="Microbenchmarks to run.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help=f"Size of the inputs relative to {CHART_FILES} chart files, {INDEX_APPS} apps and {INDEX_VERSIONS} "
+        f"versions in the catalog index and {TAG_PAGES} pages of {TAGS_PER_PAGE} tags. Results are only compared to "
+        "the baseline at scale 1.",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs of every benchmark; the median is reported.")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="JSON file of the baseline metrics.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_TIME_THRESHOLD,
+        help="Largest relative increase of a time over its baseline that isn't a regression.",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=DEFAULT_MEMORY_THRESHOLD,
+        help="Largest relative increase of a peak memory over its baseline that isn't a regression.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        default=False,
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing them to it.",
+    )
+    return parser
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s: %(message)s", level=logging.INFO)
+    # the primitives log every call, which would drown the results
+    logging.getLogger("app_test_suite").setLevel(logging.WARNING)
+    parser = get_parser()
+    config = parser.parse_args()
+    if config.update_baseline and config.scale != 1:
+        parser.error("The baseline has to be measured at scale 1.")
+    results = []
+    for name in config.benchmarks:
+        logger.info(f"Running microbenchmark '{name}' at scale {config.scale:g}.")
+        result = run_microbenchmark(name, config.scale, config.repeats)
+        summary = result.to_dict()
+        logger.info(f"'{name}': {summary['medianSec']:.3f}s median, {summary['peakMemoryMb']:.1f} MiB peak memory.")
+        results.append(result)
+    metrics = to_performance_results(results, config.threshold, config.memory_threshold)
+    baseline: Dict[str, float] = {}
+    if config.update_baseline:
+        write_baseline(config.baseline, metrics)
+        logger.info(f"Baseline written to '{config.baseline}'.")
+    elif config.scale != 1:
+        logger.info("Inputs aren't at scale 1, so the results aren't compared to the baseline.")
+    else:
+        baseline = read_baseline(config.baseline)
+    comparisons = compare_to_baseline(metrics, baseline)
+    write_results(config.output, [r.to_dict() for r in results], comparisons)
+    logger.info(f"Results written to '{config.output}'.")
+    if log_regressions(comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
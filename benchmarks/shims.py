@@ -0,0 +1,144 @@
+"""
+Stand-ins for the 'helm', 'kubectl', 'uv' and 'go' binaries ATS runs, installed as scripts on the PATH of a run.
+
+Every shim sleeps for the latency configured for its tool in ``ENV_LATENCY_PREFIX + TOOL`` first, like the real tool
+would take to do its work, then answers just what ATS expects from it. Every call is appended to the file in
+``ENV_CALLS_FILE`` as a JSON line, with the time the shim slept, so that time can be told apart from ATS's own.
+
+Only the standard library is used, so the shims start as fast as an interpreter can.
+"""
+
+import json
+import os
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+from xml.sax.saxutils import quoteattr
+
+TOOLS = ("helm", "kubectl", "uv", "go")
+ENV_LATENCY_PREFIX = "ATS_BENCH_LATENCY_"
+ENV_CALLS_FILE = "ATS_BENCH_CALLS_FILE"
+ENV_API_URL = "ATS_BENCH_API_URL"
+ENV_TESTS = "ATS_BENCH_TESTS"
+ENV_GO_CACHE_DIR = "ATS_BENCH_GO_CACHE_DIR"
+
+_RELEASES_PATH = "/_bench/releases"
+_GO_PACKAGE = "example.com/ats-bench"
+
+
+def install_shims(bin_dir: str, repo_dir: str) -> None:
+    """Write an executable script for every tool into ``bin_dir``, running this module with this interpreter."""
+    os.makedirs(bin_dir, exist_ok=True)
+    for tool in TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {repo_dir!r})\n"
+                "from benchmarks.shims import main\n"
+                f"sys.exit(main({tool!r}, sys.argv[1:]))\n"
+            )
+        os.chmod(path, 0o755)
+
+
+def _option(args: List[str], name: str) -> Optional[str]:
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(f"{name}="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def _call_api(method: str, path: str) -> None:
+    request = urllib.request.Request(os.environ[ENV_API_URL] + path, method=method)
+    with urllib.request.urlopen(request, timeout=30):  # nosec, the URL of the fake API server
+        pass
+
+
+def _test_names() -> List[str]:
+    return [f"test_case_{i}" for i in range(int(os.environ.get(ENV_TESTS, "1")))]
+
+
+def _helm(args: List[str]) -> int:
+    namespace = _option(args, "--namespace") or "default"
+    if args[:2] == ["upgrade", "--install"]:
+        _call_api("POST", f"{_RELEASES_PATH}/{namespace}/{args[2]}")
+    elif args[:1] == ["uninstall"]:
+        _call_api("DELETE", f"{_RELEASES_PATH}/{namespace}/{args[1]}")
+    return 0
+
+
+def _kubectl(args: List[str]) -> int:
+    return 0
+
+
+def _uv(args: List[str]) -> int:
+    if args[:1] == ["sync"]:
+        return 0
+    if args[:2] != ["run", "pytest"]:
+        print(f"The 'uv' shim can't run '{' '.join(args)}'.", file=sys.stderr)
+        return 2
+    test_type = _option(args, "-m") or "smoke"
+    junit_path = _option(args, "--junitxml")
+    names = _test_names()
+    for name in names:
+        print(f"test_bench.py::{name} PASSED")
+    if junit_path:
+        cases = "".join(f'<testcase classname="test_bench" name={quoteattr(name)} time="0.001"/>' for name in names)
+        with open(junit_path, "w", encoding="utf-8") as f:
+            f.write(
+                '<?xml version="1.0" encoding="utf-8"?><testsuites>'
+                f'<testsuite name={quoteattr(test_type)} tests="{len(names)}" failures="0" errors="0" skipped="0">'
+                f"{cases}</testsuite></testsuites>"
+            )
+    return 0
+
+
+def _go(args: List[str]) -> int:
+    if args[:1] == ["env"]:
+        cache_dir = os.environ.get(ENV_GO_CACHE_DIR, "")
+        print(json.dumps({"GOMODCACHE": os.path.join(cache_dir, "mod"), "GOCACHE": os.path.join(cache_dir, "build")}))
+    elif args[:2] == ["mod", "download"]:
+        print(json.dumps({"Path": "github.com/stretchr/testify", "Version": "v1.9.0"}))
+    elif args[:1] == ["list"]:
+        print(f"{_GO_PACKAGE} false")
+        print(f"{_GO_PACKAGE}.test false")
+    elif args[:2] == ["test", "-json"]:
+        for name in _test_names():
+            for action in ("run", "pass"):
+                event: Dict[str, object] = {"Action": action, "Package": _GO_PACKAGE, "Test": name}
+                if action == "pass":
+                    event["Elapsed"] = 0.001
+                print(json.dumps(event))
+        print(json.dumps({"Action": "pass", "Package": _GO_PACKAGE, "Elapsed": 0.01}))
+    return 0
+
+
+_HANDLERS: Dict[str, Callable[[List[str]], int]] = {"helm": _helm, "kubectl": _kubectl, "uv": _uv, "go": _go}
+
+
+def main(tool: str, args: List[str]) -> int:
+    started = time.monotonic()
+    latency_sec = float(os.environ.get(f"{ENV_LATENCY_PREFIX}{tool.upper()}", "0"))
+    if latency_sec:
+        time.sleep(latency_sec)
+    return_code = _HANDLERS[tool](args)
+    calls_file = os.environ.get(ENV_CALLS_FILE)
+    if calls_file:
+        with open(calls_file, "a", encoding="utf-8") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "tool": tool,
+                        "args": args,
+                        "latencySec": latency_sec,
+                        "durationSec": time.monotonic() - started,
+                        "returnCode": return_code,
+                    }
+                )
+                + "\n"
+            )
+    return return_code
@@ -0,0 +1,354 @@
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess  # nosec
+import sys
+import tarfile
+import time
+from dataclasses import dataclass, field
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Optional
+
+from app_test_suite.performance import PerformanceComparison, PerformanceResult, compare_performance
+from benchmarks.fake_cluster import FakeKubernetesAPI
+from benchmarks.shims import (
+    ENV_API_URL,
+    ENV_CALLS_FILE,
+    ENV_GO_CACHE_DIR,
+    ENV_LATENCY_PREFIX,
+    ENV_TESTS,
+    TOOLS,
+    install_shims,
+)
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_FILE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+DEFAULT_RESULTS_FILE = "benchmark-results.json"
+# wall times of short runs are noisy, so only a change larger than that fails the comparison
+DEFAULT_TIME_THRESHOLD = 0.25
+# phases shorter than that are all noise; the wall time and the overhead still show them growing
+MIN_COMPARED_PHASE_SEC = 0.05
+
+EXECUTOR_PYTEST = "pytest"
+EXECUTOR_GOTEST = "gotest"
+# scenarios are added in this order, the upgrade one gets a stable chart to upgrade from
+SCENARIOS = ["smoke", "functional", "upgrade"]
+
+# spans that are phases of a run, as opposed to the scenarios and the steps of the pipeline around them
+_PHASE_CATEGORIES = {"config", "cluster", "deploy", "test", "teardown", "hook", "cache", "diagnostics"}
+
+
+@dataclass
+class BenchmarkCase:
+    """A full ATS run, or one per chart, against the fake cluster."""
+
+    name: str
+    executor: str = EXECUTOR_PYTEST
+    scenarios: int = 1
+    """How many of ``SCENARIOS`` are run, from the first one."""
+    charts: int = 1
+    """How many charts are tested, one ATS run after the other, against the same cluster."""
+    pods: int = 1
+    """Pods started by every install of a chart."""
+    tests: int = 10
+    """Test cases reported by every test run."""
+
+
+DEFAULT_CASES = [
+    BenchmarkCase("pytest"),
+    BenchmarkCase("pytest-3-scenarios", scenarios=3),
+    BenchmarkCase("pytest-4-charts", charts=4),
+    BenchmarkCase("pytest-100-pods", pods=100),
+    BenchmarkCase("gotest", executor=EXECUTOR_GOTEST),
+    BenchmarkCase("gotest-3-scenarios", executor=EXECUTOR_GOTEST, scenarios=3),
+]
+
+
+@dataclass
+class RunSample:
+    """What a single repetition of a case measured, summed over the ATS runs of all its charts."""
+
+    wall_sec: float = 0.0
+    cpu_sec: float = 0.0
+    """CPU time of ATS and the shims it ran."""
+    tool_latency_sec: float = 0.0
+    """Time the shims spent sleeping for their configured latency."""
+    tool_calls: int = 0
+    api_requests: Dict[str, int] = field(default_factory=dict)
+    phases_sec: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def overhead_sec(self) -> float:
+        """Time ATS took on top of the latency of the tools it ran."""
+        return self.wall_sec - self.tool_latency_sec
+
+
+def _write_chart(path: str, name: str, version: str) -> None:
+    with tarfile.open(path, "w:gz") as tar:
+        for file_name, content in [
+            ("Chart.yaml", f"apiVersion: v2\nname: {name}\nversion: {version}\nappVersion: {version}\n"),
+            ("values.yaml", "replicaCount: 1\n"),
+        ]:
+            data = content.encode()
+            info = tarfile.TarInfo(f"{name}/{file_name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def _write_tests(tests_dir: str, executor: str) -> None:
+    """Write a test directory the executor accepts; the shims report the test results, not these files."""
+    os.makedirs(tests_dir, exist_ok=True)
+    if executor == EXECUTOR_GOTEST:
+        files = {
+            "go.mod": "module example.com/ats-bench\n\ngo 1.22\n",
+            "bench_test.go": "package bench\n",
+        }
+    else:
+        files = {
+            "pyproject.toml": '[project]\nname = "ats-bench"\nversion = "0.1.0"\n',
+            "test_bench.py": "",
+        }
+    for file_name, content in files.items():
+        with open(os.path.join(tests_dir, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def _phase_durations(trace_path: str) -> Dict[str, float]:
+    """Return the time spent in every phase of the run, by span name, summed over all its spans."""
+    with open(trace_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    phases: Dict[str, float] = {}
+    for event in events:
+        if event.get("ph") == "X" and event.get("cat") in _PHASE_CATEGORIES:
+            phases[event["name"]] = phases.get(event["name"], 0.0) + event["dur"] / 1e6
+    return phases
+
+
+def _median(values: List[float]) -> float:
+    return round(statistics.median(values), 4)
+
+
+def _children_cpu_sec() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class BenchmarkRunner:
+    """
+    Runs the ATS pipelines end to end against a fake cluster and shims of the tools ATS runs.
+
+    Every ATS run is a process of its own, started like a user would, with the shims first on its PATH and a
+    kubeconfig of a ``FakeKubernetesAPI``. The time ATS spends in every phase of the run is read from its trace file.
+    The shims log their calls, so the latency configured for the tools can be subtracted from the wall time, which
+    leaves ATS's own overhead; the start-up of the shims counts as overhead, like the fork and exec of the real tools.
+    """
+
+    def __init__(
+        self, tool_latencies_sec: Optional[Dict[str, float]] = None, api_latency_sec: float = 0.0, repeats: int = 3
+    ):
+        self._tool_latencies_sec = tool_latencies_sec or {}
+        self._api_latency_sec = api_latency_sec
+        self._repeats = repeats
+
+    def run_case(self, case: BenchmarkCase) -> Dict[str, Any]:
+        """Run the case ``repeats`` times and return the median of every measurement."""
+        samples = [self._run_once(case) for _ in range(self._repeats)]
+        phases = sorted({name for sample in samples for name in sample.phases_sec})
+        api_requests = sorted({name for sample in samples for name in sample.api_requests})
+        return {
+            "case": case.__dict__,
+            "repeats": self._repeats,
+            "wallSec": _median([s.wall_sec for s in samples]),
+            "overheadSec": _median([s.overhead_sec for s in samples]),
+            "cpuSec": _median([s.cpu_sec for s in samples]),
+            "toolLatencySec": _median([s.tool_latency_sec for s in samples]),
+            "toolCalls": max(s.tool_calls for s in samples),
+            "apiRequests": {name: max(s.api_requests.get(name, 0) for s in samples) for name in api_requests},
+            "phasesSec": {name: _median([s.phases_sec.get(name, 0.0) for s in samples]) for name in phases},
+        }
+
+    def _run_once(self, case: BenchmarkCase) -> RunSample:
+        sample = RunSample()
+        with (
+            TemporaryDirectory(prefix="ats-bench-") as work_dir,
+            FakeKubernetesAPI(case.pods, self._api_latency_sec) as api,
+        ):
+            kubeconfig = os.path.join(work_dir, "kube.config")
+            api.write_kubeconfig(kubeconfig)
+            bin_dir = os.path.join(work_dir, "bin")
+            install_shims(bin_dir, REPO_DIR)
+            _write_tests(os.path.join(work_dir, "tests", "ats"), case.executor)
+            calls_file = os.path.join(work_dir, "calls.jsonl")
+            env = {
+                **os.environ,
+                "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+                "KUBECONFIG": kubeconfig,
+                # ATS runs from the work directory, off this checkout rather than an installed version
+                "PYTHONPATH": os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+                ENV_API_URL: api.url,
+                ENV_CALLS_FILE: calls_file,
+                ENV_TESTS: str(case.tests),
+                ENV_GO_CACHE_DIR: os.path.join(work_dir, "go"),
+                **{
+                    f"{ENV_LATENCY_PREFIX}{tool.upper()}": str(self._tool_latencies_sec.get(tool, 0.0))
+                    for tool in TOOLS
+                },
+            }
+            for chart in range(case.charts):
+                self._run_ats(case, chart, work_dir, kubeconfig, env, sample)
+            with open(calls_file, encoding="utf-8") as f:
+                calls = [json.loads(line) for line in f if line.strip()]
+            sample.tool_calls = len(calls)
+            sample.tool_latency_sec = sum(call["latencySec"] for call in calls)
+            sample.api_requests = api.requests()
+        return sample
+
+    def _run_ats(
+        self, case: BenchmarkCase, chart: int, work_dir: str, kubeconfig: str, env: Dict[str, str], sample: RunSample
+    ) -> None:
+        name = f"bench-app-{chart}"
+        chart_file = os.path.join(work_dir, f"{name}-0.2.0.tgz")
+        _write_chart(chart_file, name, "0.2.0")
+        scenarios = SCENARIOS[: case.scenarios]
+        trace_file = os.path.join(work_dir, f"{name}.trace.json")
+        args = [
+            sys.executable,
+            "-m",
+            "app_test_suite",
+            "--chart-file",
+            chart_file,
+            "--cluster-kubeconfig",
+            kubeconfig,
+            "--test-executor",
+            case.executor,
+            "--steps",
+            *scenarios,
+            "--trace-file",
+            trace_file,
+            # both default to the home directory; runs must neither leave anything behind nor reuse an earlier run's
+            "--app-tests-history-db",
+            os.path.join(work_dir, "history.sqlite"),
+            "--app-tests-manifest-cache-dir",
+            os.path.join(work_dir, "manifests"),
+        ]
+        if "upgrade" in scenarios:
+            stable_chart_file = os.path.join(work_dir, f"{name}-0.1.0.tgz")
+            _write_chart(stable_chart_file, name, "0.1.0")
+            args += ["--upgrade-tests-app-file", stable_chart_file]
+        cpu_before = _children_cpu_sec()
+        started = time.monotonic()
+        run_res = subprocess.run(args, cwd=work_dir, env=env, capture_output=True, text=True)  # nosec
+        sample.wall_sec += time.monotonic() - started
+        sample.cpu_sec += _children_cpu_sec() - cpu_before
+        if run_res.returncode != 0:
+            raise RuntimeError(
+                f"ATS run of case '{case.name}' failed with exit code {run_res.returncode}:\n"
+                + "\n".join(run_res.stderr.splitlines()[-30:])
+            )
+        for phase, duration_sec in _phase_durations(trace_file).items():
+            sample.phases_sec[phase] = sample.phases_sec.get(phase, 0.0) + duration_sec
+
+
+def to_performance_results(results: List[Dict[str, Any]], time_threshold: float) -> List[PerformanceResult]:
+    """
+    Turn the results of the cases into metrics to compare with a baseline.
+
+    Times can change from run to run, so they regress only beyond ``time_threshold``, and phases shorter than
+    ``MIN_COMPARED_PHASE_SEC`` aren't compared at all. The numbers of tool calls and API requests don't change, so
+    any increase is a regression.
+    """
+    metrics: List[PerformanceResult] = []
+    for result in results:
+        case = result["case"]["name"]
+        metrics += [
+            PerformanceResult(f"{case}/wall", result["wallSec"], "s", threshold=time_threshold),
+            PerformanceResult(f"{case}/overhead", result["overheadSec"], "s", threshold=time_threshold),
+            PerformanceResult(f"{case}/tool_calls", result["toolCalls"], threshold=0.0),
+            PerformanceResult(f"{case}/api_requests", sum(result["apiRequests"].values()), threshold=0.0),
+        ]
+        metrics += [
+            PerformanceResult(f"{case}/phase/{phase}", duration_sec, "s", threshold=time_threshold)
+            for phase, duration_sec in result["phasesSec"].items()
+            if duration_sec >= MIN_COMPARED_PHASE_SEC
+        ]
+    return metrics
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine the benchmarks ran on, as timings only compare on the same kind of machine."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: List[Dict[str, Any]], comparisons: List[PerformanceComparison]) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "environment": environment(),
+                "cases": results,
+                "metrics": [c.to_dict() for c in comparisons],
+            },
+            f,
+            indent=2,
+        )
+
+
+def read_baseline(path: str) -> Dict[str, float]:
+    """Return the metrics of the baseline file by name, none if the file doesn't exist."""
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {name: float(value) for name, value in json.load(f)["metrics"].items()}
+
+
+def write_baseline(path: str, metrics: List[PerformanceResult]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "environment": environment(),
+                "metrics": {m.name: round(m.value, 4) for m in sorted(metrics, key=lambda m: m.name)},
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def compare_to_baseline(
+    metrics: List[PerformanceResult], baseline: Dict[str, float], compare_times: bool = False
+) -> List[PerformanceComparison]:
+    """
+    Compare the metrics to their baseline.
+
+    The numbers of tool calls and API requests are the same on every machine, but times only compare with a baseline
+    recorded on the same kind of machine, so they are compared only with ``compare_times``.
+    """
+    if not compare_times:
+        times = {m.name for m in metrics if m.unit == "s"}
+        baseline = {name: value for name, value in baseline.items() if name not in times}
+    # every metric has its own threshold, the default one is never used
+    return compare_performance(metrics, baseline, DEFAULT_TIME_THRESHOLD)
+
+
+def log_regressions(comparisons: List[PerformanceComparison]) -> bool:
+    """Log every metric that regressed against its baseline and return whether any did."""
+    regressions = [c for c in comparisons if c.regressed]
+    for comparison in regressions:
+        result = comparison.result
+        logger.error(
+            f"Regression of '{result.name}': {result.value:g}{result.unit}, baseline "
+            f"{comparison.baseline:g}{result.unit} ({comparison.change:+.0%})."
+        )
+    return bool(regressions)
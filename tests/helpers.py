@@ -5,7 +5,6 @@ import unittest.mock
 from typing import cast
 from unittest.mock import Mock
 
-import pykube
 import yaml
 from configargparse import Namespace
 from pytest_mock import MockerFixture
@@ -59,6 +58,7 @@ def assert_helm_deployed(
 ) -> None:
     cast(Mock, app_test_suite.steps.scenarios.simple.run_and_log).assert_any_call(
         _helm_deploy_args(release_name, chart_file, deploy_namespace, values_file),
+        timeout_sec=None,
         env={"KUBECONFIG": kube_config_path},
     )
 
@@ -73,13 +73,14 @@ def assert_helm_uninstalled(release_name: str, deploy_namespace: str, kube_confi
 def assert_cluster_prerequisites_ready(kube_config_path: str) -> None:
     cast(unittest.mock.Mock, app_test_suite.steps.scenarios.simple.run_and_log).assert_any_call(
         ["kubectl", f"--kubeconfig={kube_config_path}", "apply", "--server-side", "-f", "/etc/ats/crds"],
+        timeout_sec=None,
         capture_output=True,
     )
 
 
-def assert_cluster_connection_created(kube_config_path: str) -> None:
-    cast(unittest.mock.Mock, pykube.KubeConfig.from_file).assert_called_once_with(kube_config_path)
-    cast(unittest.mock.Mock, app_test_suite.steps.scenarios.simple.HTTPClient).assert_called_once()
+def assert_cluster_connection_created(cluster_manager: ClusterManager) -> None:
+    # the API client is owned and shared by the cluster manager, scenarios only ask for it
+    cast(unittest.mock.Mock, cluster_manager.get_kube_client).assert_called_once()
 
 
 def get_base_config(mocker: MockerFixture) -> Namespace:
@@ -87,6 +88,30 @@ def get_base_config(mocker: MockerFixture) -> Namespace:
     config.app_tests_skip_app_deploy = False
     config.app_tests_skip_app_delete = False
     config.app_tests_deploy_namespace = MOCK_APP_DEPLOY_NS
+    config.app_tests_namespace_mode = "fixed"
+    config.app_tests_diagnostics_workers = 8
+    config.app_tests_diagnostics_call_timeout = 30.0
+    config.app_tests_diagnostics_deadline = 180.0
+    config.app_tests_diagnostics_dir = ""
+    config.app_tests_output = "stream"
+    config.app_tests_output_tail_lines = 200
+    config.app_tests_report_dir = ""
+    config.app_tests_history_db = ""
+    config.app_tests_test_order = "default"
+    config.app_tests_fail_fast = False
+    config.app_tests_test_retries = 0
+    config.app_tests_test_timeout = 0
+    config.app_tests_hook_timeout = 0
+    config.app_tests_prepare_timeout = 0
+    config.app_tests_crd_apply_timeout = 0
+    config.app_tests_scenario_deadline = 0
+    config.app_tests_max_workers = 0
+    config.app_tests_go_mod_cache_dir = ""
+    config.app_tests_go_build_cache_dir = ""
+    config.app_tests_pytest_worker = False
+    config.app_tests_pod_usage_interval = 0
+    config.app_tests_performance_threshold = 0.1
+    config.app_tests_performance_baseline_version = ""
     config.app_tests_app_config_file = ""
     config.app_tests_pre_deploy_script = ""
     config.app_tests_pre_hook = ""
@@ -111,8 +136,6 @@ def patch_base_test_runner(
     app_namespace: str = "",
 ) -> None:
     mocker.patch.dict(os.environ, {}, clear=True)
-    mocker.patch("pykube.KubeConfig.from_file", name="MockKubeConfig")
-    mocker.patch("app_test_suite.steps.scenarios.simple.HTTPClient")
     mocker.patch(
         "app_test_suite.steps.scenarios.simple.run_and_log",
         return_value=run_and_log_res,
@@ -127,6 +150,7 @@ def get_mock_cluster_manager(mocker: MockerFixture) -> ClusterManager:
         cluster_type="mock",
         version=MOCK_KUBE_VERSION,
     )
+    mock_cluster_manager.get_compatibility_clusters.return_value = []
     return mock_cluster_manager
 
 
@@ -137,6 +161,10 @@ def configure_for_upgrade_test(config: Namespace) -> None:
     config.upgrade_tests_app_config_file = MOCK_UPGRADE_APP_CONFIG_FILE
     config.upgrade_tests_upgrade_hook = MOCK_UPGRADE_UPGRADE_HOOK
     config.upgrade_tests_save_metadata = True
+    config.upgrade_tests_probe_interval = 0
+    config.upgrade_tests_probe_path = "/"
+    config.upgrade_tests_max_error_rate = 1.0
+    config.upgrade_tests_max_outage = 0
     # normally, `pre_run` method does this in this case to stop the default logic from
     # deploying the current chart before the stable chart can be deployed
     # since we're not calling pre_run() here, we need override in config
@@ -41,21 +41,28 @@ def assert_run_gotest(
     if test_extra_info:
         env_vars.update({k.upper(): v for k, v in [p.split("=") for p in test_extra_info.split(",")]})
 
-    cast(unittest.mock.Mock, app_test_suite.steps.executors.gotest.run_and_handle_error).assert_any_call(
+    cast(unittest.mock.Mock, app_test_suite.steps.executors.gotest.run_and_stream).assert_any_call(
         [
             "go",
             "test",
-            "-v",
+            "-json",
             f"-tags={test_provided}",
         ],
-        "build constraints exclude all Go files",
+        unittest.mock.ANY,
+        timeout_sec=None,
         cwd="",
         env=env_vars,
     )
+    cast(unittest.mock.Mock, app_test_suite.steps.executors.gotest.write_junit_xml).assert_any_call(
+        f"test_results_{test_provided}.xml", f"gotest-{test_provided}", unittest.mock.ANY
+    )
 
 
 def patch_gotest_test_runner(mocker: MockerFixture, run_and_handle_error_res: unittest.mock.Mock) -> None:
     mocker.patch(
-        "app_test_suite.steps.executors.gotest.run_and_handle_error",
-        return_value=run_and_handle_error_res,
+        "app_test_suite.steps.executors.gotest.run_and_stream",
+        return_value=run_and_handle_error_res.returncode,
     )
+    # the warm-up runs while the chart is deployed and its failures are only logged
+    mocker.patch("app_test_suite.steps.executors.gotest.run_and_log", return_value=run_and_handle_error_res)
+    mocker.patch("app_test_suite.steps.executors.gotest.write_junit_xml")
@@ -48,7 +48,7 @@ def assert_run_pytest(
         env_vars.update({k.upper(): v for k, v in [p.split("=") for p in test_extra_info.split(",")]})
 
     cast(unittest.mock.Mock, app_test_suite.steps.executors.pytest.run_and_log).assert_any_call(
-        expected_args, cwd="", env=env_vars
+        expected_args, timeout_sec=None, cwd="", env=env_vars
     )
 
 
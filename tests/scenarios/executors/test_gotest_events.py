@@ -0,0 +1,124 @@
+import json
+import logging
+import xml.etree.ElementTree as ET  # nosec, test input only
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.junit import OUTCOME_FAILED, OUTCOME_PASSED, OUTCOME_SKIPPED, write_junit_xml
+from app_test_suite.history import TestPriority
+from app_test_suite.processes import Deadline
+from app_test_suite.steps.executors.gotest import GoTestEventProcessor, GotestExecutor
+
+_PKG = "example.com/app/tests"
+
+
+def _event(action: str, test: str = "", output: str = "", elapsed: float = 0.0) -> str:
+    event = {"Action": action, "Package": _PKG, "Elapsed": elapsed}
+    if test:
+        event["Test"] = test
+    if output:
+        event["Output"] = output
+    return json.dumps(event)
+
+
+def test_processor_records_test_results(caplog: pytest.LogCaptureFixture) -> None:
+    processor = GoTestEventProcessor()
+
+    with caplog.at_level(logging.INFO):
+        for line in [
+            _event("run", "TestOK"),
+            _event("output", "TestOK", "=== RUN   TestOK\n"),
+            _event("output", "TestOK", "doing things\n"),
+            _event("pass", "TestOK", elapsed=1.5),
+            _event("run", "TestBroken"),
+            _event("output", "TestBroken", "    main_test.go:10: boom\n"),
+            _event("fail", "TestBroken", elapsed=0.25),
+            _event("skip", "TestLater"),
+            _event("fail", elapsed=2.0),
+        ]:
+            processor.feed(line)
+
+    assert [(c.name, c.outcome, c.time_sec) for c in processor.test_cases] == [
+        ("TestOK", OUTCOME_PASSED, 1.5),
+        ("TestBroken", OUTCOME_FAILED, 0.25),
+        ("TestLater", OUTCOME_SKIPPED, 0.0),
+    ]
+    assert processor.test_cases[0].output == ""
+    assert processor.test_cases[1].output == "    main_test.go:10: boom"
+    messages = [r.message for r in caplog.records]
+    assert f"--- PASS: {_PKG}.TestOK (1.50s)" in messages
+    assert "doing things" in messages
+    # go's own status lines are replaced by the result lines
+    assert "=== RUN   TestOK" not in messages
+
+
+def test_processor_keeps_bounded_output() -> None:
+    processor = GoTestEventProcessor(max_output_lines=3)
+
+    for i in range(100):
+        processor.feed(_event("output", "TestVerbose", f"line {i}\n"))
+    processor.feed(_event("fail", "TestVerbose"))
+
+    assert processor.test_cases[0].output == "line 97\nline 98\nline 99"
+
+
+def test_processor_detects_expected_text_in_plain_output() -> None:
+    processor = GoTestEventProcessor("build constraints exclude all Go files")
+
+    processor.feed("package example.com/app/tests: build constraints exclude all Go files in /src")
+
+    assert processor.found_expected_text
+    assert processor.test_cases == []
+
+
+def test_junit_report(tmp_path: Path) -> None:
+    processor = GoTestEventProcessor()
+    for line in [_event("pass", "TestOK", elapsed=1), _event("output", "TestBad", "boom\n"), _event("fail", "TestBad")]:
+        processor.feed(line)
+    report = tmp_path / "reports" / "test_results_smoke.xml"
+
+    write_junit_xml(str(report), "gotest-smoke", processor.test_cases)
+
+    suite = ET.parse(report).getroot().find("testsuite")  # nosec
+    assert suite is not None
+    assert suite.attrib["name"] == _PKG
+    assert (suite.attrib["tests"], suite.attrib["failures"]) == ("2", "1")
+    failure = suite.find("testcase[@name='TestBad']/failure")
+    assert failure is not None and failure.text == "boom"
+
+
+def test_tests_run_in_history_order() -> None:
+    args = ["go", "test", "-json", "-tags=functional"]
+    priorities = {
+        (_PKG, "TestSlow"): TestPriority(recently_failed=False, avg_sec=30.0),
+        (_PKG, "TestFast"): TestPriority(recently_failed=False, avg_sec=0.5),
+        (_PKG, "TestMedium/subtest"): TestPriority(recently_failed=False, avg_sec=4.0),
+        (_PKG, "TestFlaky/subtest"): TestPriority(recently_failed=True, avg_sec=1.0),
+        (_PKG, "TestBroken"): TestPriority(recently_failed=True, avg_sec=2.0),
+    }
+
+    runs = GotestExecutor._get_test_runs(args, priorities)
+
+    # recently failed, then the tests missing in the history, then the rest from the fastest to the slowest
+    assert runs == [
+        args + ["-run", "^(TestBroken|TestFlaky)$"],
+        args + ["-skip", "^(TestBroken|TestFast|TestFlaky|TestMedium|TestSlow)$"],
+        args + ["-run", "^(TestFast)$"],
+        args + ["-run", "^(TestMedium)$"],
+        args + ["-run", "^(TestSlow)$"],
+    ]
+    assert GotestExecutor._get_test_runs(args, {(_PKG, "TestSlow"): priorities[(_PKG, "TestSlow")]}) == [
+        args + ["-skip", "^(TestSlow)$"],
+        args + ["-run", "^(TestSlow)$"],
+    ]
+    assert GotestExecutor._get_test_runs(args, None) == [args]
+
+
+@pytest.mark.parametrize("go_version,supported", [("go1.22.5", True), ("go1.20", True), ("go1.19.13", False)])
+def test_history_order_needs_go_with_test_skip(mocker: MockerFixture, go_version: str, supported: bool) -> None:
+    executor = GotestExecutor()
+    mocker.patch.object(executor, "_run_go", return_value=f"{go_version}\n")
+
+    assert executor._supports_test_ordering({}, Deadline(None)) == supported
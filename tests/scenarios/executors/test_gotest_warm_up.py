@@ -0,0 +1,51 @@
+import json
+import unittest.mock
+from pathlib import Path
+from typing import Any, List
+
+from _pytest.logging import LogCaptureFixture
+from pytest_mock import MockerFixture
+
+from app_test_suite.steps.executors.gotest import GotestExecutor, _count_json_objects
+
+
+def test_count_json_objects() -> None:
+    assert _count_json_objects("") == 0
+    assert _count_json_objects('{"Path": "a"}\n{\n  "Path": "b",\n  "Info": {"x": 1}\n}\n') == 2
+
+
+def test_warm_up_downloads_modules_and_compiles_tests_into_configured_caches(
+    mocker: MockerFixture, tmp_path: Path, caplog: LogCaptureFixture
+) -> None:
+    mod_cache = tmp_path / "mod"
+    cached_zip = mod_cache / "cache" / "download" / "example.com" / "cached" / "@v" / "v1.0.0.zip"
+    cached_zip.parent.mkdir(parents=True)
+    cached_zip.touch()
+    calls: List[List[str]] = []
+
+    def go(args: List[str], **kwargs: Any) -> unittest.mock.Mock:
+        calls.append(args)
+        assert kwargs["env"]["GOMODCACHE"] == str(mod_cache)
+        stdout = ""
+        if args[1] == "env":
+            stdout = json.dumps({"GOMODCACHE": str(mod_cache), "GOCACHE": str(tmp_path / "build")})
+        elif args[1] == "mod":
+            downloaded = mod_cache / "cache" / "download" / "example.com" / "new" / "@v" / "v2.0.0.zip"
+            downloaded.parent.mkdir(parents=True)
+            downloaded.touch()
+            stdout = '{"Path": "example.com/cached"}\n{"Path": "example.com/new"}\n'
+        elif args[1] == "list":
+            stdout = "example.com/m true\nexample.com/m/util false\nexample.com/m.test true\n"
+        return mocker.Mock(returncode=0, stdout=stdout, stderr="")
+
+    mocker.patch("app_test_suite.steps.executors.gotest.run_and_log", side_effect=go)
+    executor = GotestExecutor()
+    executor._cache_env_vars = {"GOMODCACHE": str(mod_cache)}
+
+    with caplog.at_level("INFO"):
+        executor.warm_up("smoke", None)
+
+    assert [c[1] for c in calls] == ["env", "mod", "list", "test"]
+    assert calls[-1][:4] == ["go", "test", "-c", "-tags=smoke"]
+    assert f"Go module cache '{mod_cache}': 1 of 2 module(s) found, 1 downloaded." in caplog.messages
+    assert f"Go build cache '{tmp_path / 'build'}': 1 of 2 package(s) up to date, compiling 1." in caplog.messages
@@ -0,0 +1,128 @@
+import json
+import os
+import unittest.mock
+from pathlib import Path
+from typing import Any, Callable, List, Tuple
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.errors import ATSTestError
+from app_test_suite.junit import (
+    OUTCOME_FAILED,
+    OUTCOME_FLAKY,
+    OUTCOME_PASSED,
+    JUnitTestCase,
+    read_junit_xml,
+    write_junit_xml,
+)
+from app_test_suite.pytest_plugin.ats_failed_tests import ENV_FAILED_TESTS_FILE
+from app_test_suite.steps.base import TestExecInfo
+from app_test_suite.steps.executors.gotest import GotestExecutor
+from app_test_suite.steps.executors.pytest import _PLUGIN_DIR, PytestExecutor
+
+_PKG = "example.com/app/tests"
+
+
+def _exec_info(tmp_path: Path, retries: int) -> TestExecInfo:
+    return TestExecInfo(
+        chart_path="chart.tgz",
+        chart_ver="1.0.0",
+        app_config_file_path=None,
+        cluster_type="kind",
+        cluster_version="1.30.0",
+        kube_config_path="kube.config",
+        test_type="functional",
+        debug=False,
+        junit_report_path=str(tmp_path / "report.xml"),
+        retries=retries,
+    )
+
+
+def _go_runs(*runs: List[Tuple[str, str]]) -> Callable[..., int]:
+    """Return a fake 'run_and_stream' that emits the test results of the next run in ``runs`` on every call."""
+    remaining = list(runs)
+
+    def run(args: List[str], line_handler: Callable[[str], None], **_: Any) -> int:
+        results = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        for test, action in results:
+            line_handler(json.dumps({"Action": action, "Package": _PKG, "Test": test, "Elapsed": 0.1}))
+        return 1 if any(action == "fail" for _, action in results) else 0
+
+    return run
+
+
+def test_gotest_flaky_test_is_retried_and_reported(tmp_path: Path, mocker: MockerFixture) -> None:
+    run_mock = mocker.patch(
+        "app_test_suite.steps.executors.gotest.run_and_stream",
+        side_effect=_go_runs(
+            [("TestOK", "pass"), ("TestFlaky/sub", "fail"), ("TestFlaky", "fail")],
+            [("TestFlaky/sub", "pass"), ("TestFlaky", "pass")],
+        ),
+    )
+    write_mock = mocker.patch("app_test_suite.steps.executors.gotest.write_junit_xml")
+
+    GotestExecutor().execute_test(_exec_info(tmp_path, retries=2))
+
+    assert run_mock.call_count == 2
+    assert run_mock.call_args_list[1].args[0][-2:] == ["-run", "^(TestFlaky)$"]
+    cases = write_mock.call_args.args[2]
+    assert [(c.name, c.outcome) for c in cases] == [
+        ("TestOK", OUTCOME_PASSED),
+        ("TestFlaky/sub", OUTCOME_FLAKY),
+        ("TestFlaky", OUTCOME_FLAKY),
+    ]
+
+
+def test_gotest_failing_test_fails_after_retries(tmp_path: Path, mocker: MockerFixture) -> None:
+    run_mock = mocker.patch(
+        "app_test_suite.steps.executors.gotest.run_and_stream", side_effect=_go_runs([("TestBroken", "fail")])
+    )
+    write_mock = mocker.patch("app_test_suite.steps.executors.gotest.write_junit_xml")
+
+    with pytest.raises(ATSTestError):
+        GotestExecutor().execute_test(_exec_info(tmp_path, retries=2))
+
+    assert run_mock.call_count == 3
+    assert [c.outcome for c in write_mock.call_args.args[2]] == [OUTCOME_FAILED]
+
+
+def test_pytest_retries_only_failed_tests(tmp_path: Path, mocker: MockerFixture) -> None:
+    exec_info = _exec_info(tmp_path, retries=1)
+
+    def run(args: List[str], env: dict, **_: Any) -> unittest.mock.Mock:
+        junit_path = next(a for a in args if a.startswith("--junitxml=")).split("=", 1)[1]
+        if "tests/test_app.py::test_flaky" in args:
+            write_junit_xml(junit_path, "pytest", [JUnitTestCase("tests.test_app", "test_flaky", 1.0, OUTCOME_PASSED)])
+            return mocker.Mock(returncode=0)
+        write_junit_xml(
+            junit_path,
+            "pytest",
+            [
+                JUnitTestCase("tests.test_app", "test_ok", 1.0, OUTCOME_PASSED),
+                JUnitTestCase("tests.test_app", "test_flaky", 1.0, OUTCOME_FAILED),
+            ],
+        )
+        with open(env[ENV_FAILED_TESTS_FILE], "a") as f:
+            f.write("tests/test_app.py::test_flaky\ntests/test_app.py::test_flaky\n")
+        return mocker.Mock(returncode=1)
+
+    run_mock = mocker.patch("app_test_suite.steps.executors.pytest.run_and_log", side_effect=run)
+
+    PytestExecutor().execute_test(exec_info)
+
+    assert run_mock.call_count == 2
+    retry_args = run_mock.call_args_list[1].args[0]
+    assert retry_args[-1] == "tests/test_app.py::test_flaky" and retry_args.count("tests/test_app.py::test_flaky") == 1
+    assert "ats_failed_tests" in retry_args
+    assert run_mock.call_args.kwargs["env"]["PYTHONPATH"].split(os.pathsep).count(_PLUGIN_DIR) == 1
+    assert [c.outcome for c in read_junit_xml(str(tmp_path / "report.xml"))] == [OUTCOME_PASSED, OUTCOME_FLAKY]
+
+
+def test_pytest_collection_errors_are_not_retried(tmp_path: Path, mocker: MockerFixture) -> None:
+    run_mock = mocker.patch("app_test_suite.steps.executors.pytest.run_and_log", return_value=mocker.Mock(returncode=1))
+
+    with pytest.raises(ATSTestError):
+        PytestExecutor().execute_test(_exec_info(tmp_path, retries=3))
+
+    assert run_mock.call_count == 1
@@ -26,6 +26,9 @@ def _make_config(chart_file: str, tests_dir: str = DEFAULT_TESTS_DIR) -> argpars
     config = argparse.Namespace()
     config.chart_file = chart_file
     setattr(config, TESTS_DIR_ATTR, tests_dir)
+    config.app_tests_go_mod_cache_dir = ""
+    config.app_tests_go_build_cache_dir = ""
+    config.app_tests_pytest_worker = False
     return config
 
 
@@ -2,20 +2,30 @@ import argparse
 from pathlib import Path
 
 import pytest
+from pytest_mock import MockerFixture
 from step_exec_lib.errors import ConfigError
 
 from app_test_suite.cluster_manager import ClusterInfo, ClusterManager
+from app_test_suite.kube_client import DEFAULT_API_BURST, DEFAULT_API_QPS, DEFAULT_API_RETRIES
 
 
 def _config(
     cluster_kubeconfig: str | None = None,
     cluster_type: str | None = None,
     cluster_version: str | None = None,
+    cluster_api_qps: float = DEFAULT_API_QPS,
+    cluster_api_burst: int = DEFAULT_API_BURST,
+    cluster_api_retries: int = DEFAULT_API_RETRIES,
+    cluster_compatibility_kubeconfigs: list[str] | None = None,
 ) -> argparse.Namespace:
     return argparse.Namespace(
         cluster_kubeconfig=cluster_kubeconfig,
         cluster_type=cluster_type,
         cluster_version=cluster_version,
+        cluster_api_qps=cluster_api_qps,
+        cluster_api_burst=cluster_api_burst,
+        cluster_api_retries=cluster_api_retries,
+        cluster_compatibility_kubeconfigs=cluster_compatibility_kubeconfigs,
     )
 
 
@@ -61,3 +71,63 @@ def test_pre_run_honors_type_and_version_labels(tmp_path: Path) -> None:
     info = manager.get_cluster()
     assert info.cluster_type == "kind"
     assert info.version == "1.31"
+
+
+def test_pre_run_rejects_invalid_api_limits(tmp_path: Path) -> None:
+    kubeconfig = tmp_path / "kube.config"
+    kubeconfig.write_text("apiVersion: v1\n")
+
+    with pytest.raises(ConfigError):
+        ClusterManager().pre_run(_config(cluster_kubeconfig=str(kubeconfig), cluster_api_qps=-1))
+    with pytest.raises(ConfigError):
+        ClusterManager().pre_run(_config(cluster_kubeconfig=str(kubeconfig), cluster_api_burst=0))
+
+
+def test_kube_client_is_created_once_and_shared(tmp_path: Path, mocker: MockerFixture) -> None:
+    kubeconfig = tmp_path / "kube.config"
+    kubeconfig.write_text("apiVersion: v1\n")
+    build_mock = mocker.patch("app_test_suite.cluster_manager.build_kube_client")
+    manager = ClusterManager()
+    manager.pre_run(_config(cluster_kubeconfig=str(kubeconfig), cluster_api_qps=5, cluster_api_burst=10))
+
+    first = manager.get_kube_client()
+    second = manager.get_kube_client()
+
+    assert first is second
+    build_mock.assert_called_once_with(str(kubeconfig), qps=5, burst=10, retries=DEFAULT_API_RETRIES)
+
+
+def test_pre_run_reads_compatibility_clusters(tmp_path: Path) -> None:
+    kubeconfig = tmp_path / "kube.config"
+    kubeconfig.write_text("apiVersion: v1\n")
+    old = tmp_path / "k8s-1.29.yaml"
+    old.write_text("apiVersion: v1\n")
+    manager = ClusterManager()
+
+    manager.pre_run(
+        _config(
+            cluster_kubeconfig=str(kubeconfig),
+            cluster_type="kind",
+            cluster_compatibility_kubeconfigs=[f"latest={kubeconfig}", str(old)],
+        )
+    )
+
+    clusters = manager.get_compatibility_clusters()
+    assert [(c.name, c.kube_config_path) for c in clusters] == [("latest", str(kubeconfig)), ("k8s-1.29", str(old))]
+    # the version is detected from the API server when the tests run
+    assert all(c.cluster_type == "kind" and c.version == "" for c in clusters)
+
+
+def test_pre_run_rejects_invalid_compatibility_clusters(tmp_path: Path) -> None:
+    kubeconfig = tmp_path / "kube.config"
+    kubeconfig.write_text("apiVersion: v1\n")
+
+    for kubeconfigs in [
+        [str(tmp_path / "missing.yaml")],
+        [f"={kubeconfig}"],
+        [str(kubeconfig), f"kube={kubeconfig}"],
+    ]:
+        with pytest.raises(ConfigError):
+            ClusterManager().pre_run(
+                _config(cluster_kubeconfig=str(kubeconfig), cluster_compatibility_kubeconfigs=kubeconfigs)
+            )
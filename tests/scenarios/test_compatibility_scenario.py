@@ -0,0 +1,119 @@
+import json
+from pathlib import Path
+from typing import Dict, cast
+from unittest.mock import Mock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.cluster_manager import ClusterInfo
+from app_test_suite.deploy_engine import ManifestDeployer
+from app_test_suite.errors import ATSTestError
+from app_test_suite.junit import JUnitTestCase, write_junit_xml
+from app_test_suite.reports import ReportSettings
+from app_test_suite.steps.base import CONTEXT_KEY_CHART_YAML, TestExecInfo
+from app_test_suite.steps.executors.pytest import PytestExecutor
+from app_test_suite.steps.scenarios.compatibility import CompatibilityTestScenario
+from tests.helpers import (
+    MOCK_APP_NAME,
+    MOCK_CHART_VERSION,
+    get_base_config,
+    get_mock_cluster_manager,
+    get_run_and_log_result_mock,
+    patch_base_test_runner,
+)
+from tests.scenarios.executors.pytest import patch_pytest_test_runner
+
+
+def _runner(mocker: MockerFixture, clusters: Dict[str, str]) -> CompatibilityTestScenario:
+    run_and_log_res = get_run_and_log_result_mock(mocker)
+    patch_base_test_runner(mocker, run_and_log_res)
+    patch_pytest_test_runner(mocker, run_and_log_res)
+    mocker.patch.object(CompatibilityTestScenario, "_collect_failure_diagnostics")
+    cluster_manager = get_mock_cluster_manager(mocker)
+    cast(Mock, cluster_manager.get_compatibility_clusters).return_value = [
+        ClusterInfo(kube_config_path=f"{name}.yaml", cluster_type="kind", version="", name=name) for name in clusters
+    ]
+
+    def static_cluster_manager(cluster: ClusterInfo) -> object:
+        manager = get_mock_cluster_manager(mocker)
+        cast(Mock, manager.get_cluster).return_value = cluster
+        cast(Mock, manager.get_kube_client).return_value.session.get.return_value.json.return_value = {
+            "gitVersion": clusters[cluster.name]
+        }
+        return manager
+
+    mocker.patch(
+        "app_test_suite.steps.scenarios.compatibility.StaticClusterManager", side_effect=static_cluster_manager
+    )
+    executor = PytestExecutor()
+
+    def execute_test(exec_info: TestExecInfo) -> None:
+        outcome = "failed" if exec_info.cluster_version.startswith("v1.29") else "passed"
+        write_junit_xml(
+            executor.get_junit_report_path(exec_info),
+            "compatibility",
+            [JUnitTestCase("tests.test_crds", "test_crds_served", 0.1, outcome)],
+        )
+        if outcome == "failed":
+            raise ATSTestError("Pytest tests failed")
+
+    mocker.patch.object(executor, "execute_test", side_effect=execute_test)
+    return CompatibilityTestScenario(cluster_manager, executor)
+
+
+def test_compatibility_tests_run_on_every_cluster(mocker: MockerFixture, tmp_path: Path) -> None:
+    runner = _runner(mocker, {"old": "v1.29.4", "new": "v1.31.1"})
+    runner._report_settings = ReportSettings(directory=str(tmp_path))
+    context = {CONTEXT_KEY_CHART_YAML: {"name": MOCK_APP_NAME, "version": MOCK_CHART_VERSION}}
+
+    with pytest.raises(ATSTestError, match="didn't pass on clusters: old"):
+        runner.run(get_base_config(mocker), context)
+
+    with open(runner._report_settings.compatibility_matrix_path()) as f:
+        matrix = json.load(f)["clusters"]
+    assert [(c["cluster"], c["clusterVersion"], c["outcome"], c["tests"]) for c in matrix] == [
+        ("old", "v1.29.4", "failed", {"failed": 1}),
+        ("new", "v1.31.1", "passed", {"passed": 1}),
+    ]
+    # every cluster gets a JUnit report of its own, named after the cluster
+    assert Path(runner._report_settings.execution_report_path("compatibility", "old")).is_file()
+    assert Path(runner._report_settings.execution_report_path("compatibility", "new")).is_file()
+    # the release name set by the deploys doesn't leak into the context of the pipeline
+    assert list(context) == [CONTEXT_KEY_CHART_YAML]
+
+
+def test_compatibility_tests_count_tests_without_report_dir(mocker: MockerFixture) -> None:
+    runner = _runner(mocker, {"new": "v1.31.1"})
+    context = {CONTEXT_KEY_CHART_YAML: {"name": MOCK_APP_NAME, "version": MOCK_CHART_VERSION}}
+    log_mock = mocker.patch.object(CompatibilityTestScenario, "_log_matrix")
+
+    runner.run(get_base_config(mocker), context)
+
+    assert log_mock.call_args.args[0][0].tests == {"passed": 1}
+
+
+def test_compatibility_tests_skipped_without_clusters(mocker: MockerFixture) -> None:
+    runner = CompatibilityTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    run_mock = mocker.patch.object(runner, "_run_on_cluster")
+
+    runner.run(get_base_config(mocker), {CONTEXT_KEY_CHART_YAML: {"name": MOCK_APP_NAME}})
+
+    run_mock.assert_not_called()
+
+
+def test_compatibility_tests_deploy_with_a_deployer_per_cluster(mocker: MockerFixture) -> None:
+    runner = _runner(mocker, {"old": "v1.29.4", "new": "v1.31.1"})
+    runner._manifest_deployer = ManifestDeployer("/tmp/ats-cache", "5m")
+    deployers = []
+    mocker.patch.object(
+        CompatibilityTestScenario,
+        "_run_scenario",
+        autospec=True,
+        side_effect=lambda scenario, config, context: deployers.append(scenario._manifest_deployer),
+    )
+
+    runner.run(get_base_config(mocker), {CONTEXT_KEY_CHART_YAML: {"name": MOCK_APP_NAME}})
+
+    # the applied releases of one cluster must not be deleted from another one
+    assert len({id(d) for d in deployers + [runner._manifest_deployer]}) == 3
@@ -1,11 +1,17 @@
 import logging
+import pathlib
+import tarfile
+import threading
 import unittest.mock
+from typing import IO, Any, List, cast
 
 import pytest
 import pykube
+import yaml
 from pytest_mock import MockerFixture
 
 from app_test_suite.cluster_manager import ClusterInfo
+from app_test_suite.diagnostics import DiagnosticsBundle, DiagnosticsLimits, FailureDiagnosticsCollector
 from app_test_suite.steps.base import CONTEXT_KEY_CHART_YAML
 from app_test_suite.steps.executors.pytest import PytestExecutor
 from app_test_suite.steps.scenarios.simple import SmokeTestScenario, CONTEXT_KEY_RELEASE_NAME
@@ -103,10 +109,14 @@ def _patch_pykube(
 
 
 def _patch_run_and_log(mocker: MockerFixture, stdout: str = "") -> unittest.mock.MagicMock:
-    result = mocker.MagicMock(name="run_and_log_result")
-    result.returncode = 0
-    result.stdout = stdout
-    return mocker.patch("app_test_suite.steps.scenarios.simple.run_and_log", return_value=result)
+    def run_and_log(args: List[str], **kwargs: Any) -> unittest.mock.MagicMock:
+        result = mocker.MagicMock(name="run_and_log_result")
+        result.returncode = 0
+        # like the real one, the output is only returned when it's captured; otherwise it goes to ATS's stdout
+        result.stdout = stdout if kwargs.get("capture_output") else None
+        return result
+
+    return mocker.patch("app_test_suite.diagnostics.run_and_log", side_effect=run_and_log)
 
 
 def _make_scenario(mocker: MockerFixture) -> SmokeTestScenario:
@@ -130,6 +140,7 @@ def _make_context() -> dict:
 def _make_config(mocker: MockerFixture) -> unittest.mock.MagicMock:
     config = mocker.MagicMock(name="config")
     config.app_tests_deploy_namespace = MOCK_APP_DEPLOY_NS
+    config.app_tests_namespace_mode = "fixed"
     return config
 
 
@@ -281,7 +292,9 @@ def test_diagnostics_logs_helm_status(mocker: MockerFixture, caplog: pytest.LogC
 
     mock_run.assert_any_call(
         ["helm", "status", MOCK_APP_NAME, "-n", MOCK_APP_DEPLOY_NS],
+        timeout_sec=unittest.mock.ANY,
         env=unittest.mock.ANY,
+        capture_output=True,
     )
     error_messages = [r.message for r in caplog.records if r.levelno == logging.ERROR]
     assert any("helm status" in m and MOCK_APP_NAME in m for m in error_messages)
@@ -296,7 +309,9 @@ def test_diagnostics_logs_helm_get_values(mocker: MockerFixture, caplog: pytest.
 
     mock_run.assert_any_call(
         ["helm", "get", "values", MOCK_APP_NAME, "-n", MOCK_APP_DEPLOY_NS],
+        timeout_sec=unittest.mock.ANY,
         env=unittest.mock.ANY,
+        capture_output=True,
     )
 
 
@@ -364,3 +379,113 @@ def test_diagnostics_logs_node_status(mocker: MockerFixture, caplog: pytest.LogC
     error_messages = [r.message for r in caplog.records if r.levelno == logging.ERROR]
     assert any("node-1" in m and "Ready=True" in m for m in error_messages)
     assert any("node-2" in m and "Ready=False" in m for m in error_messages)
+
+
+def _collect(mocker: MockerFixture, limits: DiagnosticsLimits) -> None:
+    collector = FailureDiagnosticsCollector(mocker.MagicMock(name="kube_client"), {}, limits)
+    collector.collect(MOCK_APP_NAME, MOCK_APP_DEPLOY_NS)
+
+
+def test_diagnostics_order_is_deterministic(mocker: MockerFixture, caplog: pytest.LogCaptureFixture) -> None:
+    first, second = _make_pod(mocker, "pod-a", "Running"), _make_pod(mocker, "pod-b", "Running")
+    # the first pod answers last, the output still follows the pod order
+    first.logs.side_effect = lambda **kwargs: threading.Event().wait(0.2) or "first log"
+    second.logs.return_value = "second log"
+    _patch_pykube(mocker, app_ns_pods=[first, second], nodes=[_make_node(mocker, "node-1", "True")])
+    _patch_run_and_log(mocker)
+
+    with caplog.at_level(logging.ERROR):
+        _collect(mocker, DiagnosticsLimits(workers=4))
+
+    error_messages = [r.message for r in caplog.records if r.levelno == logging.ERROR]
+    assert error_messages.index("first log") < error_messages.index("second log")
+    assert error_messages.index("second log") < next(i for i, m in enumerate(error_messages) if "node-1" in m)
+
+
+def test_diagnostics_call_timeout_keeps_other_results(mocker: MockerFixture, caplog: pytest.LogCaptureFixture) -> None:
+    release = threading.Event()
+    hanging = _make_pod(mocker, "hanging-pod", "Running")
+    hanging.logs.side_effect = lambda **kwargs: release.wait(5) and ""
+    _patch_pykube(mocker, app_ns_pods=[hanging], nodes=[_make_node(mocker, "node-1", "True")])
+    _patch_run_and_log(mocker)
+
+    try:
+        with caplog.at_level(logging.WARNING):
+            _collect(mocker, DiagnosticsLimits(workers=4, call_timeout_sec=0.2, deadline_sec=5))
+    finally:
+        release.set()
+
+    messages = [r.message for r in caplog.records]
+    assert any("logs of 'hanging-pod/main'" in m and "timed out" in m for m in messages)
+    assert any("node-1" in m and "Ready=True" in m for m in messages)
+    assert messages[-2] == "END OF FAILURE DIAGNOSTICS"
+
+
+def test_diagnostics_deadline_reports_partial_results(mocker: MockerFixture, caplog: pytest.LogCaptureFixture) -> None:
+    release = threading.Event()
+    _patch_pykube(mocker, app_ns_pods=[_make_pod(mocker, "my-pod", "Running")])
+    mocker.patch.object(pykube.Node, "objects", side_effect=lambda client: release.wait(5) and [])
+    _patch_run_and_log(mocker)
+
+    try:
+        with caplog.at_level(logging.WARNING):
+            _collect(mocker, DiagnosticsLimits(workers=2, call_timeout_sec=30, deadline_sec=0.5))
+    finally:
+        release.set()
+
+    messages = [r.message for r in caplog.records]
+    assert any("my-pod: Running" in m for m in messages)
+    assert any("(nodes) timed out" in m for m in messages)
+
+
+def test_diagnostics_bundle_contents(
+    mocker: MockerFixture, caplog: pytest.LogCaptureFixture, tmp_path: pathlib.Path
+) -> None:
+    pod = _make_pod(mocker, "crashing-pod", "Pending", containers=["main", "sidecar"], logs="container log line")
+    events = [_make_event(mocker, "2024-01-01T00:00:01Z", "Warning", "BackOff", "Back-off restarting")]
+    _patch_pykube(mocker, app_ns_pods=[pod], events=events, nodes=[_make_node(mocker, "node-1", "False")])
+    _patch_run_and_log(mocker, stdout="STATUS: failed")
+
+    collector = FailureDiagnosticsCollector(mocker.MagicMock(), {}, DiagnosticsLimits(), str(tmp_path))
+    with caplog.at_level(logging.ERROR):
+        bundle_path = collector.collect(MOCK_APP_NAME, MOCK_APP_DEPLOY_NS, "compatibility-kind_1.30")
+
+    assert bundle_path is not None and bundle_path.startswith(str(tmp_path))
+    # the stage keeps bundles of scenarios failing at the same time apart
+    assert "-compatibility-kind-1-30-" in bundle_path
+    assert [p.name for p in tmp_path.iterdir()] == [pathlib.Path(bundle_path).name]
+    with tarfile.open(bundle_path) as tar:
+        names = set(tar.getnames())
+        index = yaml.safe_load(cast(IO[bytes], tar.extractfile("index.yaml")))
+        log = cast(IO[bytes], tar.extractfile(f"{MOCK_APP_DEPLOY_NS}/pods/crashing-pod/sidecar.log")).read()
+        helm_status = cast(IO[bytes], tar.extractfile(f"{MOCK_APP_DEPLOY_NS}/helm-status.txt")).read()
+    assert {
+        f"{MOCK_APP_DEPLOY_NS}/pods.txt",
+        f"{MOCK_APP_DEPLOY_NS}/pods/crashing-pod/pod.yaml",
+        f"{MOCK_APP_DEPLOY_NS}/pods/crashing-pod/main.log",
+        f"{MOCK_APP_DEPLOY_NS}/pods/crashing-pod/main.previous.log",
+        f"{MOCK_APP_DEPLOY_NS}/events.txt",
+        f"{MOCK_APP_DEPLOY_NS}/helm-status.txt",
+        "cluster/nodes.txt",
+    } <= names
+    assert log == b"container log line\n"
+    assert helm_status == b"STATUS: failed\n"
+    assert index["release"] == MOCK_APP_NAME and index["skipped"] == []
+    assert len(index["items"]) == len(names) - 1
+    # only the summary ends up in the log
+    messages = [r.message for r in caplog.records]
+    assert "container log line" not in messages
+    assert any("Pod 'crashing-pod' is Pending" in m for m in messages)
+    assert any("Node 'node-1' is not ready" in m for m in messages)
+    assert any(bundle_path in m for m in messages)
+
+
+def test_diagnostics_bundle_ignores_items_added_after_close(tmp_path: pathlib.Path) -> None:
+    bundle = DiagnosticsBundle(str(tmp_path / "bundle.tar.gz"))
+    bundle.add("ns/events.txt", "--- Events ---", ["event"])
+
+    assert bundle.close({}) == 1
+    bundle.add("ns/late.txt", "--- Late ---", ["late"])
+
+    with tarfile.open(bundle.path) as tar:
+        assert tar.getnames() == ["ns/events.txt", "index.yaml"]
@@ -0,0 +1,162 @@
+import argparse
+
+import pykube
+import pytest
+from pytest_mock import MockerFixture
+from step_exec_lib.errors import ConfigError
+
+from app_test_suite.namespace_manager import (
+    LABEL_CHART,
+    LABEL_EXPIRES_AT,
+    LABEL_MANAGED,
+    LABEL_RUN_ID,
+    NAMESPACE_MODE_FIXED,
+    NAMESPACE_MODE_PER_RUN,
+    NAMESPACE_MODE_PER_SCENARIO,
+    NamespaceManager,
+    sweep_expired_namespaces,
+)
+
+
+def _config(
+    mode: str = NAMESPACE_MODE_FIXED,
+    ttl: int = 3600,
+    run_id: str | None = "run1",
+    deploy_namespace: str = "default",
+) -> argparse.Namespace:
+    return argparse.Namespace(
+        app_tests_namespace_mode=mode,
+        app_tests_namespace_ttl=ttl,
+        app_tests_run_id=run_id,
+        app_tests_deploy_namespace=deploy_namespace,
+    )
+
+
+def test_fixed_mode_uses_configured_namespace() -> None:
+    manager = NamespaceManager()
+
+    assert manager.get_namespace(_config(deploy_namespace="my-ns"), "my-chart", "smoke") == "my-ns"
+    assert not manager.is_ephemeral(_config())
+
+
+def test_per_run_namespace_is_shared_by_scenarios() -> None:
+    manager = NamespaceManager()
+    config = _config(mode=NAMESPACE_MODE_PER_RUN)
+
+    assert manager.get_namespace(config, "my_chart", "smoke") == "ats-my-chart-run1"
+    assert manager.get_namespace(config, "my_chart", "functional") == "ats-my-chart-run1"
+
+
+def test_per_scenario_namespace_is_unique_and_valid() -> None:
+    manager = NamespaceManager()
+    config = _config(mode=NAMESPACE_MODE_PER_SCENARIO, run_id=None)
+
+    smoke_ns = manager.get_namespace(config, "x" * 100, "smoke")
+    functional_ns = manager.get_namespace(config, "x" * 100, "functional")
+
+    assert smoke_ns != functional_ns
+    assert len(smoke_ns) <= 63 and len(functional_ns) <= 63
+    assert smoke_ns.endswith("-smoke")
+    # the generated run ID is stable for the lifetime of the manager
+    assert manager.get_namespace(config, "x" * 100, "smoke") == smoke_ns
+
+
+def test_pre_run_rejects_non_positive_ttl() -> None:
+    with pytest.raises(ConfigError):
+        NamespaceManager().pre_run(_config(mode=NAMESPACE_MODE_PER_RUN, ttl=0))
+
+
+def test_ensure_namespace_labels_generated_namespace(mocker: MockerFixture) -> None:
+    ensure_mock = mocker.patch("app_test_suite.namespace_manager.ensure_namespace_exists")
+    mocker.patch("app_test_suite.namespace_manager.time.time", return_value=1000)
+    kube_client = mocker.MagicMock(name="kube_client")
+    manager = NamespaceManager()
+    config = _config(mode=NAMESPACE_MODE_PER_RUN, ttl=60)
+
+    manager.ensure_namespace(config, kube_client, "ats-chart-run1", "chart")
+    manager.ensure_namespace(config, kube_client, "ats-chart-run1", "chart")
+
+    ensure_mock.assert_called_once_with(
+        kube_client,
+        "ats-chart-run1",
+        extra_metadata={
+            "labels": {
+                LABEL_MANAGED: "true",
+                LABEL_RUN_ID: "run1",
+                LABEL_CHART: "chart",
+                LABEL_EXPIRES_AT: "1060",
+            }
+        },
+    )
+
+
+def test_ensure_namespace_is_noop_in_fixed_mode(mocker: MockerFixture) -> None:
+    ensure_mock = mocker.patch("app_test_suite.namespace_manager.ensure_namespace_exists")
+
+    NamespaceManager().ensure_namespace(_config(), mocker.MagicMock(), "default", "chart")
+
+    ensure_mock.assert_not_called()
+
+
+def test_per_run_namespace_is_deleted_on_cleanup_only(mocker: MockerFixture) -> None:
+    mocker.patch("app_test_suite.namespace_manager.ensure_namespace_exists")
+    delete_mock = mocker.patch.object(pykube.Namespace, "delete")
+    manager = NamespaceManager()
+    config = _config(mode=NAMESPACE_MODE_PER_RUN)
+    manager.ensure_namespace(config, mocker.MagicMock(), "ats-chart-run1", "chart")
+
+    manager.release_namespace(config, "ats-chart-run1")
+    delete_mock.assert_not_called()
+
+    manager.cleanup()
+    delete_mock.assert_called_once()
+
+
+def test_per_scenario_namespace_is_deleted_on_release(mocker: MockerFixture) -> None:
+    mocker.patch("app_test_suite.namespace_manager.ensure_namespace_exists")
+    delete_mock = mocker.patch.object(pykube.Namespace, "delete")
+    manager = NamespaceManager()
+    config = _config(mode=NAMESPACE_MODE_PER_SCENARIO)
+    manager.ensure_namespace(config, mocker.MagicMock(), "ats-chart-run1-smoke", "chart")
+
+    manager.release_namespace(config, "ats-chart-run1-smoke")
+    manager.cleanup()
+
+    delete_mock.assert_called_once()
+
+
+def _make_namespace(mocker: MockerFixture, name: str, expires_at: str, run_id: str = "run1") -> pykube.Namespace:
+    ns = mocker.MagicMock(name=f"ns-{name}")
+    ns.name = name
+    ns.obj = {"metadata": {"labels": {LABEL_MANAGED: "true", LABEL_RUN_ID: run_id, LABEL_EXPIRES_AT: expires_at}}}
+    return ns
+
+
+def test_sweep_deletes_only_expired_namespaces(mocker: MockerFixture) -> None:
+    expired = _make_namespace(mocker, "ats-expired", "100")
+    alive = _make_namespace(mocker, "ats-alive", "300")
+    broken = _make_namespace(mocker, "ats-broken", "not-a-timestamp")
+    query = mocker.MagicMock(name="ns_query")
+    query.filter.return_value = [expired, alive, broken]
+    mocker.patch.object(pykube.Namespace, "objects", return_value=query)
+
+    result = sweep_expired_namespaces(mocker.MagicMock(), now=200)
+
+    assert result == ["ats-expired"]
+    query.filter.assert_called_once_with(selector={LABEL_MANAGED: "true"})
+    expired.delete.assert_called_once()
+    alive.delete.assert_not_called()
+    broken.delete.assert_not_called()
+
+
+def test_sweep_dry_run_and_run_id(mocker: MockerFixture) -> None:
+    alive = _make_namespace(mocker, "ats-alive", "300")
+    query = mocker.MagicMock(name="ns_query")
+    query.filter.return_value = [alive]
+    mocker.patch.object(pykube.Namespace, "objects", return_value=query)
+
+    result = sweep_expired_namespaces(mocker.MagicMock(), now=200, dry_run=True, run_id="run1")
+
+    assert result == ["ats-alive"]
+    query.filter.assert_called_once_with(selector={LABEL_MANAGED: "true", LABEL_RUN_ID: "run1"})
+    alive.delete.assert_not_called()
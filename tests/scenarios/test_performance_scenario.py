@@ -0,0 +1,88 @@
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.cluster_manager import ClusterInfo
+from app_test_suite.errors import ATSTestError
+from app_test_suite.history import TimingHistory
+from app_test_suite.performance import ENV_PERFORMANCE_RESULTS_FILE
+from app_test_suite.reports import ReportSettings
+from app_test_suite.steps.base import CONTEXT_KEY_CHART_YAML, TestExecInfo
+from app_test_suite.steps.executors.pytest import PytestExecutor
+from app_test_suite.steps.scenarios.performance import PerformanceTestScenario
+from tests.helpers import MOCK_KUBE_CONFIG_PATH, get_mock_cluster_manager
+
+
+def _runner(mocker: MockerFixture, tmp_path: Path, latency_ms: float) -> PerformanceTestScenario:
+    executor = PytestExecutor()
+
+    def execute_test(exec_info: TestExecInfo) -> None:
+        # what a performance test does with the env var it gets
+        results_file = executor.get_test_info_env_variables(exec_info)[ENV_PERFORMANCE_RESULTS_FILE]
+        with open(results_file, "a") as f:
+            f.write(json.dumps({"name": "latency_p99", "value": latency_ms, "unit": "ms"}) + "\n")
+
+    mocker.patch.object(executor, "execute_test", side_effect=execute_test)
+    runner = PerformanceTestScenario(get_mock_cluster_manager(mocker), executor)
+    runner._cluster_info = ClusterInfo(kube_config_path=MOCK_KUBE_CONFIG_PATH, cluster_type="kind", version="1.30")
+    runner._history = TimingHistory(str(tmp_path / "history.sqlite"))
+    runner._report_settings = ReportSettings(directory=str(tmp_path / "reports"))
+    return runner
+
+
+def _run(runner: PerformanceTestScenario, mocker: MockerFixture, chart_version: str) -> None:
+    context = {CONTEXT_KEY_CHART_YAML: {"name": "hello-world", "version": chart_version}}
+    exec_info = TestExecInfo(
+        chart_path="chart.tgz",
+        chart_ver=chart_version,
+        app_config_file_path=None,
+        cluster_type="kind",
+        cluster_version="1.30",
+        kube_config_path=MOCK_KUBE_CONFIG_PATH,
+        test_type="performance",
+        debug=False,
+    )
+    runner._execute_test(mocker.MagicMock(app_tests_run_id="run"), context, exec_info)
+
+
+def _saved_metrics(tmp_path: Path) -> List[dict]:
+    path = ReportSettings(directory=str(tmp_path / "reports")).performance_path("performance")
+    with open(path) as f:
+        return json.load(f)["metrics"]
+
+
+def test_performance_is_compared_with_the_previous_version(mocker: MockerFixture, tmp_path: Path) -> None:
+    _run(_runner(mocker, tmp_path, 100.0), mocker, "1.0.0")
+    assert _saved_metrics(tmp_path)[0]["baseline"] is None
+
+    _run(_runner(mocker, tmp_path, 105.0), mocker, "1.1.0")
+    assert _saved_metrics(tmp_path)[0]["change"] == pytest.approx(0.05)
+
+    with pytest.raises(ATSTestError, match="regressed against version '1.1.0': latency_p99"):
+        _run(_runner(mocker, tmp_path, 150.0), mocker, "1.2.0")
+    assert _saved_metrics(tmp_path)[0]["regressed"] is True
+
+
+def test_missing_results_are_only_logged(mocker: MockerFixture, tmp_path: Path) -> None:
+    runner = _runner(mocker, tmp_path, 100.0)
+    mocker.patch.object(runner._test_executor, "execute_test")
+
+    _run(runner, mocker, "1.0.0")
+
+    assert not os.path.exists(tmp_path / "reports")
+
+
+@pytest.mark.parametrize("steps,runs", [(["all"], False), (["performance"], True)])
+def test_performance_tests_only_run_when_requested(
+    mocker: MockerFixture, tmp_path: Path, steps: List[str], runs: bool
+) -> None:
+    scenario_run = mocker.patch("app_test_suite.steps.scenarios.simple.SimpleTestScenario.run")
+    runner = _runner(mocker, tmp_path, 100.0)
+
+    runner.run(mocker.MagicMock(steps=steps), {CONTEXT_KEY_CHART_YAML: {"name": "hello-world", "version": "1.0.0"}})
+
+    assert scenario_run.called == runs
@@ -4,7 +4,7 @@ from typing import Callable, Type, cast
 
 import pytest
 from pytest_mock import MockerFixture
-from app_test_suite.errors import ATSTestError
+from app_test_suite.errors import ATSTestError, ATSTimeoutError
 from app_test_suite.steps.base import CONTEXT_KEY_CHART_YAML, TestExecutor
 from step_exec_lib.types import StepType
 from app_test_suite.steps.executors.gotest import GotestExecutor
@@ -15,6 +15,9 @@ from app_test_suite.steps.scenarios.simple import (
     FunctionalTestScenario,
     CONTEXT_KEY_RELEASE_NAME,
 )
+from app_test_suite.pod_usage import PodUsage
+from app_test_suite.reports import STAGE_MAIN
+from app_test_suite.tracing import start_tracing, stop_tracing
 from tests.helpers import (
     assert_helm_deployed,
     assert_helm_uninstalled,
@@ -96,7 +99,7 @@ def test_simple_runner_run(
     runner = scenario_type(mock_cluster_manager, test_executor)
     runner.run(config, context)
 
-    assert_cluster_connection_created(MOCK_KUBE_CONFIG_PATH)
+    assert_cluster_connection_created(mock_cluster_manager)
     assert_cluster_prerequisites_ready(MOCK_KUBE_CONFIG_PATH)
     assert_helm_deployed(MOCK_APP_NAME, config.chart_file, MOCK_APP_DEPLOY_NS, MOCK_KUBE_CONFIG_PATH)
     asserter(
@@ -196,3 +199,146 @@ def test_pre_hook_failure_raises(mocker: MockerFixture) -> None:
 
     with pytest.raises(ATSTestError, match="Pre-hook"):
         runner.run(config, context)
+
+
+def test_per_scenario_namespace_used_for_deploy_tests_and_teardown(mocker: MockerFixture) -> None:
+    runner = _make_smoke_runner(mocker)
+    ensure_mock = mocker.patch("app_test_suite.namespace_manager.ensure_namespace_exists")
+    delete_mock = mocker.patch("pykube.Namespace.delete")
+    config = get_base_config(mocker)
+    config.app_tests_namespace_mode = "per-scenario"
+    config.app_tests_namespace_ttl = 600
+    config.app_tests_run_id = "ci-42"
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+
+    runner.run(config, context)
+
+    expected_ns = "ats-mock-app-ci-42-smoke"
+    assert ensure_mock.call_args.args[1] == expected_ns
+    assert_helm_deployed(MOCK_APP_NAME, config.chart_file, expected_ns, MOCK_KUBE_CONFIG_PATH)
+    import app_test_suite.steps.executors.pytest as pytest_mod
+
+    test_call = cast(unittest.mock.Mock, pytest_mod.run_and_log).call_args_list[-1]
+    assert test_call.kwargs["env"]["ATS_RELEASE_NAMESPACE"] == expected_ns
+    assert_helm_uninstalled(MOCK_APP_NAME, expected_ns, MOCK_KUBE_CONFIG_PATH)
+    delete_mock.assert_called_once()
+
+
+def test_template_deploy_engine_replaces_helm_install(mocker: MockerFixture) -> None:
+    runner = _make_smoke_runner(mocker)
+    mocker.patch("app_test_suite.steps.scenarios.simple.SimpleTestScenario._assert_binary_present_in_path")
+    mocker.patch.object(PytestExecutor, "validate")
+    deployer_cls = mocker.patch("app_test_suite.steps.scenarios.simple.ManifestDeployer")
+    mocker.patch("app_test_suite.steps.scenarios.simple.get_server_version", return_value="v1.29.2")
+    config = get_base_config(mocker)
+    config.app_tests_deploy_engine = "template"
+    config.app_tests_manifest_cache_dir = "/tmp/ats-cache"
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+
+    runner.pre_run(config)
+    runner.run(config, context)
+
+    deployer = deployer_cls.return_value
+    deployer.deploy.assert_called_once_with(
+        MOCK_APP_NAME,
+        config.chart_file,
+        MOCK_APP_DEPLOY_NS,
+        "",
+        "v1.29.2",
+        {"KUBECONFIG": MOCK_KUBE_CONFIG_PATH},
+        mocker.ANY,
+    )
+    deployer.delete.assert_called_once_with(MOCK_APP_NAME, MOCK_APP_DEPLOY_NS, {"KUBECONFIG": MOCK_KUBE_CONFIG_PATH})
+    import app_test_suite.steps.scenarios.simple as simple_mod
+
+    calls = cast(unittest.mock.Mock, simple_mod.run_and_log).call_args_list
+    assert not any(c.args[0][:2] == ["helm", "upgrade"] for c in calls)
+
+
+def test_timed_out_hook_fails_scenario_as_timed_out(mocker: MockerFixture) -> None:
+    run_and_log_res = get_run_and_log_result_mock(mocker)
+    patch_base_test_runner(mocker, run_and_log_res)
+    patch_pytest_test_runner(mocker, run_and_log_res)
+
+    def side_effect(args: list[str], **kwargs: object) -> unittest.mock.Mock:
+        if args[0] == "slow-hook.sh":
+            assert kwargs["timeout_sec"] == 5
+            raise ATSTimeoutError("Command 'slow-hook.sh' timed out after 5s and was killed.")
+        return run_and_log_res
+
+    mocker.patch("app_test_suite.steps.scenarios.simple.run_and_log", side_effect=side_effect)
+    diagnostics_mock = mocker.patch.object(SmokeTestScenario, "_collect_failure_diagnostics")
+
+    runner = SmokeTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    runner._hook_timeout_sec = 5
+    config = get_base_config(mocker)
+    config.app_tests_post_hook = "slow-hook.sh"
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+
+    with pytest.raises(ATSTimeoutError, match="Application test run timed out: Command 'slow-hook.sh' timed out"):
+        runner.run(config, context)
+    diagnostics_mock.assert_called_once()
+    assert_helm_uninstalled(MOCK_APP_NAME, MOCK_APP_DEPLOY_NS, MOCK_KUBE_CONFIG_PATH)
+
+
+def test_executor_warms_up_while_chart_is_deployed(mocker: MockerFixture) -> None:
+    run_and_log_res = get_run_and_log_result_mock(mocker)
+    patch_base_test_runner(mocker, run_and_log_res)
+    patch_pytest_test_runner(mocker, run_and_log_res)
+    executor = PytestExecutor()
+    events: list[str] = []
+
+    def failing_warm_up(test_type: str, timeout_sec: object) -> None:
+        events.append("warm-up")
+        raise OSError("no network")
+
+    warm_up_mock = mocker.patch.object(executor, "warm_up", side_effect=failing_warm_up)
+    mocker.patch.object(executor, "prepare_test_environment", side_effect=lambda _: events.append("prepare"))
+
+    runner = SmokeTestScenario(get_mock_cluster_manager(mocker), executor)
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+    runner.run(get_base_config(mocker), context)
+
+    # a failed warm-up is only logged; preparing the test environment waits for it
+    warm_up_mock.assert_called_once_with("smoke", None)
+    assert events == ["warm-up", "prepare"]
+    assert_helm_deployed(MOCK_APP_NAME, MOCK_CHART_FILE_NAME, MOCK_APP_DEPLOY_NS, MOCK_KUBE_CONFIG_PATH)
+
+
+def test_scenario_phases_are_traced(mocker: MockerFixture) -> None:
+    run_and_log_res = get_run_and_log_result_mock(mocker)
+    patch_base_test_runner(mocker, run_and_log_res)
+    patch_pytest_test_runner(mocker, run_and_log_res)
+    runner = SmokeTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+
+    tracer = start_tracing()
+    try:
+        runner.run(get_base_config(mocker), context)
+    finally:
+        stop_tracing()
+
+    spans = [e["name"] for e in tracer.events if e["ph"] == "X"]
+    assert spans[-1] == runner.name
+    for phase in ["namespace setup", "deploy", "test environment preparation", "test execution", "teardown"]:
+        assert phase in spans
+
+
+def test_pod_usage_is_sampled_while_tests_run(mocker: MockerFixture) -> None:
+    run_and_log_res = get_run_and_log_result_mock(mocker)
+    patch_base_test_runner(mocker, run_and_log_res)
+    patch_pytest_test_runner(mocker, run_and_log_res)
+    usage = {"app-0": PodUsage("app-0", restarts=1, peak_cpu_cores=0.5, peak_memory_bytes=1024)}
+    sampler_cls = mocker.patch("app_test_suite.steps.scenarios.simple.PodUsageSampler")
+    sampler_cls.return_value.start.return_value.stop.return_value = usage
+    cluster_manager = get_mock_cluster_manager(mocker)
+    runner = SmokeTestScenario(cluster_manager, PytestExecutor())
+    runner._pod_usage_interval_sec = 5
+    context = {CONTEXT_KEY_CHART_YAML: {"name": REAL_CHART_APP_NAME, "version": REAL_CHART_VERSION}}
+
+    runner.run(get_base_config(mocker), context)
+
+    sampler_cls.assert_called_once_with(
+        cast(unittest.mock.Mock, cluster_manager.get_kube_client).return_value, MOCK_APP_DEPLOY_NS, 5
+    )
+    assert runner._pod_usage == {STAGE_MAIN: usage}
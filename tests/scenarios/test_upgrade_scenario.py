@@ -1,9 +1,12 @@
+import datetime
 import subprocess
 import unittest
+from pathlib import Path
 from typing import cast, Callable
 from unittest.mock import Mock
 
 import pytest
+import yaml
 from pytest_mock import MockerFixture
 from requests import Response
 from semver import VersionInfo
@@ -13,7 +16,10 @@ from yaml.parser import ParserError
 import app_test_suite
 import app_test_suite.steps.scenarios.upgrade
 from app_test_suite.cluster_manager import ClusterManager
+from app_test_suite.availability import AvailabilityReport
 from app_test_suite.errors import ATSTestError
+from app_test_suite.pod_usage import PodUsage
+from app_test_suite.readiness import PodReadiness
 from app_test_suite.steps.base import CONTEXT_KEY_CHART_YAML
 from app_test_suite.steps.base import TestExecutor
 from app_test_suite.steps.executors.gotest import GotestExecutor
@@ -199,7 +205,7 @@ def test_upgrade_pytest_runner_run(
     runner._stable_from_local_file = True
     runner.run(config, context)
 
-    assert_cluster_connection_created(MOCK_KUBE_CONFIG_PATH)
+    assert_cluster_connection_created(mock_cluster_manager)
     assert_cluster_prerequisites_ready(MOCK_KUBE_CONFIG_PATH)
     # stable version installed via helm
     assert_helm_deployed(MOCK_APP_NAME, MOCK_STABLE_APP_FILE, MOCK_APP_DEPLOY_NS, MOCK_KUBE_CONFIG_PATH)
@@ -489,3 +495,64 @@ def test_get_latest_stable_oci_version_follows_link_pagination(mocker: MockerFix
     assert get_mock.call_args_list[0].args[0] == base
     # the relative rel="next" link is resolved against the current page URL
     assert get_mock.call_args_list[1].args[0] == f"{base}?last=1.1.0&n=2"
+
+
+def test_upgrade_metadata_includes_pod_usage(
+    mocker: MockerFixture, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    runner = UpgradeTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    runner._pod_usage = {
+        KEY_PRE_UPGRADE: {"app-0": PodUsage("app-0", peak_cpu_cores=0.25, peak_memory_bytes=2048)},
+        KEY_POST_UPGRADE: {"app-0": PodUsage("app-0", restarts=2, peak_cpu_cores=0.5, peak_memory_bytes=4096)},
+    }
+
+    runner._save_metadata(MOCK_APP_NAME, "0.2.0", "0.2.0", "0.1.0", "0.1.0", "kind", "1.30")
+
+    with open(tmp_path / f"{MOCK_APP_NAME}-0.1.0.tgz-meta" / "tested-upgrade-0.2.0.yaml") as f:
+        metadata = yaml.safe_load(f)
+    assert metadata["podUsage"] == {
+        KEY_PRE_UPGRADE: {"app-0": {"peakCpuCores": 0.25, "peakMemoryBytes": 2048, "restarts": 0}},
+        KEY_POST_UPGRADE: {"app-0": {"peakCpuCores": 0.5, "peakMemoryBytes": 4096, "restarts": 2}},
+    }
+
+
+def test_upgrade_metadata_includes_readiness(
+    mocker: MockerFixture, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    runner = UpgradeTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    created_at = datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC)
+    runner._readiness = {
+        KEY_PRE_UPGRADE: [PodReadiness("app-0", "StatefulSet/app", created_at, ready_sec=4.0)],
+        KEY_POST_UPGRADE: [PodReadiness("app-0", "StatefulSet/app", created_at, ready_sec=6.5)],
+    }
+
+    runner._save_metadata(MOCK_APP_NAME, "0.2.0", "0.2.0", "0.1.0", "0.1.0", "kind", "1.30")
+
+    with open(tmp_path / f"{MOCK_APP_NAME}-0.1.0.tgz-meta" / "tested-upgrade-0.2.0.yaml") as f:
+        metadata = yaml.safe_load(f)
+    assert metadata["readiness"] == {
+        KEY_PRE_UPGRADE: {"StatefulSet/app": {"pods": 1, "readySec": 4.0, "containers": {}}},
+        KEY_POST_UPGRADE: {"StatefulSet/app": {"pods": 1, "readySec": 6.5, "containers": {}}},
+    }
+
+
+def test_upgrade_fails_when_disruption_exceeds_thresholds(
+    mocker: MockerFixture, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    runner = UpgradeTestScenario(get_mock_cluster_manager(mocker), PytestExecutor())
+    runner._max_outage_sec = 2.0
+    runner._record_availability(
+        MOCK_APP_NS,
+        {"web:80": AvailabilityReport("web:80", [(0.0, True, 0.01), (1.0, False, 0.01), (4.0, True, 0.01)])},
+    )
+
+    with pytest.raises(ATSTestError, match="'web:80'"):
+        runner._check_availability()
+
+    runner._save_metadata(MOCK_APP_NAME, "0.2.0", "0.2.0", "0.1.0", "0.1.0", "kind", "1.30")
+    with open(tmp_path / f"{MOCK_APP_NAME}-0.1.0.tgz-meta" / "tested-upgrade-0.2.0.yaml") as f:
+        metadata = yaml.safe_load(f)
+    assert metadata["availability"]["web:80"]["longestOutageSec"] == 3.0
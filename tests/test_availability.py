@@ -0,0 +1,83 @@
+import json
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pykube
+import requests
+from pytest_mock import MockerFixture
+
+from app_test_suite.availability import (
+    AvailabilityProbe,
+    AvailabilityReport,
+    ProbeTarget,
+    find_probe_targets,
+    write_availability,
+)
+
+
+def _service(name: str, spec: dict) -> pykube.Service:
+    return pykube.Service(None, {"metadata": {"name": name, "namespace": "app"}, "spec": spec})
+
+
+def test_outages_and_latency_are_computed_from_samples() -> None:
+    report = AvailabilityReport(
+        "app:80",
+        [(0.0, True, 0.01), (1.0, False, 0.02), (2.0, False, 5.0), (7.5, True, 0.03), (8.5, False, 0.5)],
+    )
+
+    assert report.error_rate == 0.6
+    # from the failed request at 1s to the next successful one at 7.5s; the last one runs until it returned
+    assert report.longest_outage_sec == 6.5
+    assert report.latency_percentiles()["p50"] == 0.02
+    assert report.summary()["errors"] == 3
+
+
+def test_services_routing_to_pods_are_probed(mocker: MockerFixture) -> None:
+    mocker.patch("app_test_suite.availability.pykube.Service.objects").return_value.filter.return_value = [
+        _service("web", {"selector": {"app": "web"}, "ports": [{"port": 8080}, {"port": 9090}]}),
+        _service("dns", {"selector": {"app": "dns"}, "ports": [{"port": 53, "protocol": "UDP"}]}),
+        _service("external", {"type": "ExternalName", "externalName": "example.com"}),
+        _service("manual", {"ports": [{"port": 80}]}),
+    ]
+
+    assert find_probe_targets(MagicMock(), "app") == [ProbeTarget("web", 8080)]
+
+
+def test_server_errors_and_timeouts_are_failures() -> None:
+    kube_client = MagicMock()
+    probe = AvailabilityProbe(kube_client, "app", [], 1.0, "/healthz")
+    target = ProbeTarget("web", 8080)
+
+    kube_client.get.return_value.status_code = 404
+    assert probe.probe(target)
+    kube_client.get.assert_called_with(namespace="app", url="services/web:8080/proxy/healthz", timeout=5.0)
+    kube_client.get.return_value.status_code = 503
+    assert not probe.probe(target)
+    kube_client.get.side_effect = requests.Timeout()
+    assert not probe.probe(target)
+
+
+def test_probe_requests_until_stopped(tmp_path: Path) -> None:
+    kube_client = MagicMock()
+    kube_client.get.return_value.status_code = 200
+    probe = AvailabilityProbe(kube_client, "app", [ProbeTarget("web", 80)], 0.001, "/").start()
+    deadline = time.monotonic() + 5
+    while not kube_client.get.call_count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    reports = probe.stop()
+
+    assert reports["web:80"].requests >= 1
+    assert reports["web:80"].error_rate == 0.0
+    write_availability(str(tmp_path / "upgrade.availability.json"), "app", 0.001, reports)
+    with open(tmp_path / "upgrade.availability.json") as f:
+        saved = json.load(f)["services"]["web:80"]
+    assert saved["requests"] == len(saved["samples"])
+
+
+def test_probe_without_targets_stops_at_once() -> None:
+    kube_client = MagicMock()
+    assert AvailabilityProbe(kube_client, "app", [], 1.0, "/").start().stop() == {}
+    # the probe owns its client, so its pooled connections are closed with it
+    kube_client.session.close.assert_called_once()
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pykube
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from pytest_helm_charts.k8s.namespace import ensure_namespace_exists
+
+from app_test_suite.availability import ProbeTarget, find_probe_targets
+from app_test_suite.junit import OUTCOME_PASSED, read_junit_xml
+from app_test_suite.readiness import measure_readiness
+from benchmarks.fake_cluster import RELEASES_PATH, FakeKubernetesAPI
+from benchmarks.micro import MICROBENCHMARKS, TAGS_PER_PAGE, _version, run_microbenchmark
+from benchmarks.micro import to_performance_results as micro_performance_results
+from benchmarks.shims import ENV_CALLS_FILE, ENV_LATENCY_PREFIX, ENV_TESTS, main
+from benchmarks.suite import BenchmarkCase, BenchmarkRunner, compare_to_baseline, to_performance_results
+
+
+@pytest.fixture
+def api() -> Iterator[FakeKubernetesAPI]:
+    with FakeKubernetesAPI(pods_per_release=2) as api:
+        yield api
+
+
+def test_fake_api_serves_what_ats_reads(api: FakeKubernetesAPI, tmp_path: Path) -> None:
+    api.write_kubeconfig(str(tmp_path / "kube.config"))
+    kube_client = pykube.HTTPClient(pykube.KubeConfig.from_file(str(tmp_path / "kube.config")))
+
+    assert ensure_namespace_exists(kube_client, "app")[1]
+    assert not ensure_namespace_exists(kube_client, "app")[1]
+    api.handle("POST", f"{RELEASES_PATH}/app/hello", None)
+
+    assert [p.workload for p in measure_readiness(kube_client, "app")] == ["Deployment/hello"] * 2
+    assert find_probe_targets(kube_client, "app") == [ProbeTarget("hello", 8080)]
+    assert api.requests() == {
+        "GET events": 1,
+        "GET namespaces": 2,
+        "GET pods": 1,
+        "GET services": 1,
+        "POST namespaces": 1,
+    }
+
+
+def test_uv_shim_reports_the_tests_and_its_call(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv(ENV_TESTS, "3")
+    monkeypatch.setenv(ENV_CALLS_FILE, str(tmp_path / "calls.jsonl"))
+    monkeypatch.setenv(f"{ENV_LATENCY_PREFIX}UV", "0.01")
+
+    assert main("uv", ["run", "pytest", "-m", "smoke", f"--junitxml={tmp_path / 'report.xml'}"]) == 0
+
+    cases = read_junit_xml(str(tmp_path / "report.xml"))
+    assert [(c.name, c.outcome) for c in cases] == [(f"test_case_{i}", OUTCOME_PASSED) for i in range(3)]
+    with open(tmp_path / "calls.jsonl") as f:
+        call = json.loads(f.read())
+    assert (call["tool"], call["latencySec"]) == ("uv", 0.01)
+
+
+def test_pipeline_runs_end_to_end_against_the_fake_cluster(monkeypatch: MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    result = BenchmarkRunner(repeats=1).run_case(BenchmarkCase("pytest", tests=2))
+    # nothing, like the test history, is written outside the work directory of the run
+    assert not list(tmp_path.iterdir())
+
+    # CRD bootstrap, 'uv sync', 'helm upgrade --install', 'uv run pytest' and 'helm uninstall'
+    assert result["toolCalls"] == 5
+    assert {"deploy", "test execution", "teardown"} <= set(result["phasesSec"])
+
+    metrics = to_performance_results([result], 0.25)
+    baseline = {m.name: m.value for m in metrics}
+    baseline["pytest/api_requests"] -= 1
+    baseline["pytest/wall"] /= 2
+    regressed = [c.result.name for c in compare_to_baseline(metrics, baseline) if c.regressed]
+    # times of a baseline recorded on another machine don't compare
+    assert regressed == ["pytest/api_requests"]
+    regressed = [c.result.name for c in compare_to_baseline(metrics, baseline, compare_times=True) if c.regressed]
+    assert regressed == ["pytest/api_requests", "pytest/wall"]
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("chart-extraction", {"apiVersion": "v2", "name": "big-chart", "version": "1.0.0", "appVersion": "1.0.0"}),
+        # 10 apps with 20 versions each, 0.0.0 to 0.0.19, of which every 4th is a pre-release
+        ("catalog-index-parsing", "0.0.18"),
+        # 200 versions up to 0.1.98, followed by a tag that isn't SemVer
+        ("stable-version-picking", "0.1.98"),
+        ("oci-tag-pagination", [_version(i) for i in range(2 * TAGS_PER_PAGE)]),
+    ],
+)
+def test_microbenchmarks_run_the_primitives(name: str, expected: object, tmp_path: Path) -> None:
+    assert MICROBENCHMARKS[name](str(tmp_path), 0.002)() == expected
+
+
+def test_microbenchmark_results_are_compared_by_time_and_memory() -> None:
+    result = run_microbenchmark("stable-version-picking", 0.001, repeats=2)
+
+    assert len(result.times_sec) == 2
+    assert result.peak_memory_bytes > 0
+    metrics = micro_performance_results([result], 0.25, 0.1)
+    assert [(m.name, m.threshold) for m in metrics] == [
+        ("stable-version-picking/time", 0.25),
+        ("stable-version-picking/peak_memory", 0.1),
+    ]
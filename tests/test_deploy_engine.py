@@ -0,0 +1,128 @@
+import os
+import unittest.mock
+from pathlib import Path
+
+import yaml
+from pytest_mock import MockerFixture
+
+from app_test_suite.deploy_engine import LABEL_RELEASE, ManifestDeployer, label_manifests
+from app_test_suite.processes import Deadline
+
+_RENDERED = """---
+# Source: chart/templates/deployment.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+  labels:
+    app: web
+---
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: cfg
+---
+apiVersion: kyverno.io/v2
+kind: PolicyException
+metadata:
+  name: exception
+  namespace: policy-exceptions
+---
+apiVersion: apiextensions.k8s.io/v1
+kind: CustomResourceDefinition
+metadata:
+  name: widgets.example.com
+---
+"""
+
+
+def _patch_run_and_log(mocker: MockerFixture, stdout: str = _RENDERED) -> unittest.mock.Mock:
+    result = mocker.MagicMock(name="run_and_log_result")
+    result.returncode = 0
+    result.stdout = stdout
+    return mocker.patch("app_test_suite.deploy_engine.run_and_log", return_value=result)
+
+
+def _make_files(tmp_path: Path) -> tuple[str, str]:
+    chart = tmp_path / "chart-0.1.0.tgz"
+    chart.write_bytes(b"chart content")
+    values = tmp_path / "values.yaml"
+    values.write_text("replicas: 1\n")
+    return str(chart), str(values)
+
+
+def test_label_manifests_adds_release_label_and_finds_workloads() -> None:
+    labelled, workloads = label_manifests(_RENDERED, "my_release", "ns")
+
+    docs = list(yaml.safe_load_all(labelled))
+    assert len(docs) == 4
+    assert all(d["metadata"]["labels"][LABEL_RELEASE] == "my-release" for d in docs)
+    assert docs[0]["metadata"]["labels"]["app"] == "web"
+    # objects keep the namespace set by the chart, cluster-scoped ones get none
+    assert [d["metadata"].get("namespace") for d in docs] == ["ns", "ns", "policy-exceptions", None]
+    assert workloads == [("Deployment", "ns", "web")]
+
+
+def test_render_is_cached_by_chart_values_namespace_and_kube_version(mocker: MockerFixture, tmp_path: Path) -> None:
+    run_mock = _patch_run_and_log(mocker)
+    chart, values = _make_files(tmp_path)
+    deployer = ManifestDeployer(str(tmp_path / "cache"), "5m")
+
+    first = deployer.render("rel", chart, "ns1", values, "", {}, Deadline(None))
+    second = deployer.render("rel", chart, "ns1", values, "", {}, Deadline(None))
+    other_ns = deployer.render("rel", chart, "ns2", values, "", {}, Deadline(None))
+
+    assert first == second
+    assert first != other_ns
+    assert run_mock.call_count == 2
+    assert run_mock.call_args_list[0].args[0][:4] == ["helm", "template", "rel", chart]
+
+    other_version = deployer.render("rel", chart, "ns1", values, "v1.29.2", {}, Deadline(None))
+    assert other_version != first
+    assert run_mock.call_args.args[0][-2:] == ["--kube-version", "v1.29.2"]
+
+    Path(values).write_text("replicas: 2\n")
+    assert deployer.render("rel", chart, "ns1", values, "", {}, Deadline(None)) != first
+
+
+def test_deploy_applies_with_prune_waits_and_deletes(mocker: MockerFixture, tmp_path: Path) -> None:
+    run_mock = _patch_run_and_log(mocker)
+    chart, values = _make_files(tmp_path)
+    deployer = ManifestDeployer(str(tmp_path / "cache"), "5m")
+
+    manifest = deployer.deploy("rel", chart, "ns", values, "", {"KUBECONFIG": "kube.config"}, Deadline(None))
+
+    commands = [c.args[0] for c in run_mock.call_args_list]
+    apply_cmd = next(c for c in commands if c[:2] == ["kubectl", "apply"])
+    assert "--server-side" in apply_cmd and "--prune" in apply_cmd
+    # objects in other namespaces than the deploy one are rejected by kubectl with '--namespace'
+    assert "--namespace" not in apply_cmd
+    assert apply_cmd[apply_cmd.index("--selector") + 1] == f"{LABEL_RELEASE}=rel"
+    assert apply_cmd[apply_cmd.index("--filename") + 1] == manifest
+    assert ["kubectl", "rollout", "status", "deployment/web", "--namespace", "ns", "--timeout", "5m"] in commands
+    assert all("timeout_sec" in c.kwargs for c in run_mock.call_args_list)
+
+    assert deployer.delete("rel", "ns", {})
+    delete_cmd = run_mock.call_args.args[0]
+    assert delete_cmd[:2] == ["kubectl", "delete"] and "--namespace" not in delete_cmd
+    with open(delete_cmd[delete_cmd.index("--filename") + 1]) as f:
+        deleted_kinds = [d["kind"] for d in yaml.safe_load_all(f)]
+    # CRDs are kept, deleting them would delete all their objects in the cluster
+    assert deleted_kinds == ["Deployment", "ConfigMap", "PolicyException"]
+    # a release that wasn't applied by this deployer is left to 'helm uninstall'
+    assert not deployer.delete("rel", "ns", {})
+
+
+def test_commands_are_bound_by_the_deadline_except_delete(mocker: MockerFixture, tmp_path: Path) -> None:
+    run_mock = _patch_run_and_log(mocker)
+    chart, values = _make_files(tmp_path)
+    deployer = ManifestDeployer(str(tmp_path / "cache"), "5m")
+
+    deployer.deploy("rel", chart, "ns", values, "", {}, Deadline(600))
+
+    assert all(0 < c.kwargs["timeout_sec"] <= 600 for c in run_mock.call_args_list)
+    # teardown runs after a timed out scenario too, so it can't use the expired deadline
+    assert deployer.delete("rel", "ns", {})
+    assert run_mock.call_args.kwargs["timeout_sec"] == 300
+    # no temporary files are left in the cache directory
+    assert not [f for f in os.listdir(tmp_path / "cache") if f.endswith(".tmp")]
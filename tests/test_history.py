@@ -0,0 +1,100 @@
+import csv
+import io
+from pathlib import Path
+
+from app_test_suite.history import HistoryFilter, HistoryKey, TimingHistory
+from app_test_suite.junit import OUTCOME_FAILED, OUTCOME_PASSED, JUnitTestCase
+
+_KIND_KEY = HistoryKey(chart="hello-world", chart_version="1.0.0", test_type="functional", cluster_type="kind")
+_EKS_KEY = HistoryKey(chart="hello-world", chart_version="1.0.0", test_type="functional", cluster_type="eks")
+
+
+def _record_run(
+    history: TimingHistory, run_id: str, fast_sec: float, slow_sec: float, key: HistoryKey = _KIND_KEY
+) -> None:
+    history.record_test_results(
+        key,
+        run_id,
+        "main",
+        [
+            JUnitTestCase("tests.test_app", "test_fast", fast_sec, OUTCOME_PASSED),
+            JUnitTestCase("tests.test_app", "test_slow", slow_sec, OUTCOME_PASSED),
+        ],
+    )
+
+
+def test_slowest_tests_are_averaged_and_filtered(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "nested" / "history.sqlite"))
+    _record_run(history, "run1", 1.0, 10.0)
+    _record_run(history, "run2", 3.0, 20.0)
+    _record_run(history, "run3", 100.0, 100.0, key=_EKS_KEY)
+    history.record_test_results(
+        _KIND_KEY, "run3", "main", [JUnitTestCase("tests.test_app", "test_fast", 2.0, OUTCOME_FAILED)]
+    )
+
+    slowest = history.slowest_tests(HistoryFilter(cluster_type="kind"), limit=5)
+
+    assert [row["name"] for row in slowest] == ["test_slow", "test_fast"]
+    assert slowest[0]["avg_sec"] == 15.0
+    assert slowest[0]["runs"] == 2
+    assert slowest[1]["runs"] == 3
+    assert slowest[1]["failures"] == 1
+    assert len(history.slowest_tests(HistoryFilter(), limit=1)) == 1
+
+
+def test_regressions_compare_latest_run_with_median_baseline(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "history.sqlite"))
+    for run_id, slow_sec in (("run1", 10.0), ("run2", 11.0), ("run3", 50.0), ("run4", 9.0)):
+        _record_run(history, run_id, 0.1, slow_sec)
+    # 'test_fast' more than doubles, but stays under the minimal delta
+    _record_run(history, "run5", 0.3, 30.0)
+
+    regressions = history.regressions(HistoryFilter(chart="hello-world"), threshold=1.5, min_delta_sec=1.0)
+
+    assert len(regressions) == 1
+    assert regressions[0]["name"] == "test_slow"
+    assert regressions[0]["latest_sec"] == 30.0
+    assert regressions[0]["baseline_sec"] == 10.5
+    assert history.regressions(HistoryFilter(), threshold=3.0) == []
+
+
+def test_regressions_need_a_baseline(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "history.sqlite"))
+    _record_run(history, "run1", 1.0, 10.0)
+
+    assert history.regressions(HistoryFilter()) == []
+
+
+def test_export_csv(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "history.sqlite"))
+    _record_run(history, "run1", 1.0, 10.0)
+    _record_run(history, "run2", 1.0, 10.0, key=_EKS_KEY)
+    history.record_deploy(_KIND_KEY, "run1", "main", 42.0)
+
+    out = io.StringIO()
+    count = history.export_csv(HistoryFilter(cluster_type="eks"), out)
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert count == 2
+    assert {row["run_id"] for row in rows} == {"run2"}
+    assert rows[0]["name"] == "test_fast"
+    assert float(rows[1]["duration_sec"]) == 10.0
+
+
+def test_priorities_flag_recent_failures(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "history.sqlite"))
+    history.record_test_results(
+        _KIND_KEY, "run1", "main", [JUnitTestCase("tests.test_app", "test_slow", 4.0, OUTCOME_FAILED)]
+    )
+    _record_run(history, "run2", 1.0, 8.0)
+    _record_run(history, "run3", 3.0, 6.0)
+
+    priorities = history.test_priorities(HistoryFilter(), failure_window=3)
+
+    assert priorities[("tests.test_app", "test_slow")].recently_failed
+    assert priorities[("tests.test_app", "test_slow")].avg_sec == 6.0
+    assert not priorities[("tests.test_app", "test_fast")].recently_failed
+    assert priorities[("tests.test_app", "test_fast")].avg_sec == 2.0
+    assert not history.test_priorities(HistoryFilter(), failure_window=2)[
+        ("tests.test_app", "test_slow")
+    ].recently_failed
@@ -0,0 +1,106 @@
+import io
+from typing import List
+
+import pytest
+import requests
+from pykube import KubeConfig
+from pytest_mock import MockerFixture
+
+from app_test_suite.kube_client import RateLimitedHTTPAdapter, TokenBucket, parse_retry_after
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float) -> None:
+        self.sleeps.append(sec)
+        self.now += sec
+
+
+def test_token_bucket_allows_burst_then_throttles() -> None:
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.5)
+    assert waits[4] == pytest.approx(0.5)
+
+
+def test_token_bucket_disabled_with_zero_rate() -> None:
+    clock = _FakeClock()
+    bucket = TokenBucket(rate=0, burst=1, clock=clock, sleep=clock.sleep)
+
+    assert all(bucket.acquire() == 0.0 for _ in range(10))
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [("3", 3.0), ("-1", 0.0), ("1000", 60.0), ("", None), ("not a date", None)],
+    ids=["seconds", "negative", "capped", "empty", "garbage"],
+)
+def test_parse_retry_after(value: str, expected: float | None) -> None:
+    assert parse_retry_after(value) == expected
+
+
+def _response(status_code: int, headers: dict | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"")
+    return response
+
+
+def _adapter(sleeps: List[float], retries: int = 3) -> RateLimitedHTTPAdapter:
+    return RateLimitedHTTPAdapter(
+        KubeConfig.from_url("http://localhost:6443"),
+        TokenBucket(rate=0, burst=1),
+        retries=retries,
+        sleep=sleeps.append,
+    )
+
+
+def _request(method: str) -> requests.PreparedRequest:
+    return requests.Request(method, "http://localhost:6443/api/v1/pods").prepare()
+
+
+def test_throttled_request_honours_retry_after(mocker: MockerFixture) -> None:
+    send_mock = mocker.patch(
+        "pykube.http.KubernetesHTTPAdapter.send",
+        side_effect=[_response(429, {"Retry-After": "2"}), _response(200)],
+    )
+    sleeps: List[float] = []
+
+    response = _adapter(sleeps).send(_request("POST"))
+
+    assert response.status_code == 200
+    assert send_mock.call_count == 2
+    assert sleeps == [2.0]
+
+
+def test_server_error_retried_only_for_idempotent_methods(mocker: MockerFixture) -> None:
+    mocker.patch("pykube.http.KubernetesHTTPAdapter.send", side_effect=[_response(503), _response(200)])
+    assert _adapter([]).send(_request("GET")).status_code == 200
+
+    mocker.patch("pykube.http.KubernetesHTTPAdapter.send", side_effect=[_response(503), _response(200)])
+    assert _adapter([]).send(_request("POST")).status_code == 503
+
+
+def test_connection_errors_retried_until_limit(mocker: MockerFixture) -> None:
+    send_mock = mocker.patch(
+        "pykube.http.KubernetesHTTPAdapter.send", side_effect=requests.ConnectionError("connection reset")
+    )
+    sleeps: List[float] = []
+
+    with pytest.raises(requests.ConnectionError):
+        _adapter(sleeps, retries=2).send(_request("GET"))
+
+    assert send_mock.call_count == 3
+    assert len(sleeps) == 2
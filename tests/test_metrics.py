@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app_test_suite.metrics import DURATION_BUCKETS_SEC, RunMetrics
+
+
+def _span(name: str, category: str, ts_sec: float, dur_sec: float, **args: Any) -> Dict[str, Any]:
+    return {
+        "ph": "X",
+        "name": name,
+        "cat": category,
+        "ts": ts_sec * 1_000_000,
+        "dur": dur_sec * 1_000_000,
+        "pid": 1,
+        "tid": 1,
+        "args": args,
+    }
+
+
+def _events() -> List[Dict[str, Any]]:
+    return [
+        {"ph": "M", "name": "process_name", "pid": 1, "tid": 0, "args": {"name": "ats"}},
+        _span("config parsing", "config", 0, 0.05),
+        _span("deploy", "deploy", 2, 20),
+        _span("go module download", "cache", 3, 2, cache="go-modules", hits=3, lookups=4),
+        _span("test retry", "test", 40, 5, attempt=2, tests=1),
+        _span("test execution", "test", 25, 30, stage="smoke", tests_passed=5, tests_failed=1),
+        _span("get pods", "diagnostics-call", 56, 1),
+        _span("teardown", "teardown", 58, 2),
+        _span("SimpleTestScenario", "scenario", 1, 60, chart="hello", test_type="smoke", cluster_type="kind"),
+    ]
+
+
+def _samples(text: str) -> Dict[str, str]:
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_phases_are_histograms_labelled_by_scenario() -> None:
+    samples = _samples(RunMetrics(_events(), succeeded=True, finished_at=100.0).render())
+
+    assert samples["ats_run_success"] == "1"
+    assert samples["ats_run_duration_seconds"] == "61.0"
+    assert samples["ats_run_timestamp_seconds"] == "100.0"
+    deploy = 'chart="hello",test_type="smoke",cluster_type="kind",phase="deploy"'
+    assert samples[f'ats_phase_duration_seconds_bucket{{{deploy},le="10.0"}}'] == "0"
+    assert samples[f'ats_phase_duration_seconds_bucket{{{deploy},le="30.0"}}'] == "1"
+    assert samples[f'ats_phase_duration_seconds_bucket{{{deploy},le="+Inf"}}'] == "1"
+    assert samples[f"ats_phase_duration_seconds_sum{{{deploy}}}"] == "20.0"
+    assert samples[f"ats_phase_duration_seconds_count{{{deploy}}}"] == "1"
+    assert len([s for s in samples if s.startswith(f"ats_phase_duration_seconds_bucket{{{deploy}")]) == (
+        len(DURATION_BUCKETS_SEC) + 1
+    )
+    # spans outside any scenario aren't labelled with one, diagnostics calls aren't phases
+    assert samples['ats_phase_duration_seconds_count{phase="config parsing"}'] == "1"
+    assert not [s for s in samples if "get pods" in s]
+
+
+def test_tests_retries_and_caches_are_counted() -> None:
+    samples = _samples(RunMetrics(_events(), succeeded=False).render())
+
+    scenario = 'chart="hello",test_type="smoke",cluster_type="kind"'
+    assert samples["ats_run_success"] == "0"
+    assert samples[f'ats_tests{{{scenario},outcome="passed"}}'] == "5"
+    assert samples[f'ats_tests{{{scenario},outcome="failed"}}'] == "1"
+    assert samples[f"ats_test_retries{{{scenario}}}"] == "1"
+    assert samples[f'ats_cache_hits{{{scenario},cache="go-modules"}}'] == "3"
+    assert samples[f'ats_cache_lookups{{{scenario},cache="go-modules"}}'] == "4"
+    assert samples[f'ats_cache_hit_ratio{{{scenario},cache="go-modules"}}'] == "0.75"
+
+
+def test_label_values_are_escaped() -> None:
+    events = [_span("scenario", "scenario", 0, 1, chart='a"b\\c')]
+
+    assert 'chart="a\\"b\\\\c"' in RunMetrics(events, succeeded=True).render()
+
+
+def test_write_replaces_the_file(tmp_path: Path) -> None:
+    path = tmp_path / "textfile" / "ats.prom"
+    RunMetrics(_events(), succeeded=False).write(str(path))
+    RunMetrics(_events(), succeeded=True).write(str(path))
+
+    assert "ats_run_success 1\n" in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ["ats.prom"]
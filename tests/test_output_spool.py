@@ -0,0 +1,55 @@
+import gzip
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+from app_test_suite.output_spool import REPLAY_FULL, OutputSettings, SpooledOutput, run_spooled
+
+
+def _messages(caplog: pytest.LogCaptureFixture) -> list[str]:
+    return [r.message for r in caplog.records if r.name == "app_test_suite.output_spool"]
+
+
+def test_success_logs_only_summary(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.INFO):
+        with SpooledOutput(OutputSettings(directory=str(tmp_path)), "pytest-smoke") as spool:
+            for i in range(10):
+                spool.write(f"line {i}")
+        spool.report(failed=False)
+
+    assert _messages(caplog) == [f"Command output (10 lines) saved to '{spool.path}'."]
+    with gzip.open(spool.path, "rt") as f:
+        assert f.read().splitlines() == [f"line {i}" for i in range(10)]
+
+
+def test_failure_replays_tail(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.INFO):
+        with SpooledOutput(OutputSettings(directory=str(tmp_path), tail_lines=2), "hook") as spool:
+            for i in range(5):
+                spool.write(f"line {i}")
+        spool.report(failed=True)
+
+    assert _messages(caplog)[1:] == ["[... 3 lines skipped ...]", "line 3", "line 4"]
+
+
+def test_failure_replays_full_output(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.INFO):
+        with SpooledOutput(OutputSettings(directory=str(tmp_path), tail_lines=1, replay=REPLAY_FULL), "x") as spool:
+            for i in range(3):
+                spool.write(f"line {i}")
+        spool.report(failed=True)
+
+    assert _messages(caplog)[1:] == ["line 0", "line 1", "line 2"]
+
+
+def test_run_spooled_honors_ok_codes(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    settings = OutputSettings(directory=str(tmp_path))
+    args = [sys.executable, "-c", "print('no tests collected'); exit(5)"]
+
+    with caplog.at_level(logging.INFO):
+        assert run_spooled(args, settings, "pytest-smoke", ok_codes=[0, 5]) == 5
+
+    assert not any("no tests collected" == m for m in _messages(caplog))
+    assert len(list(tmp_path.glob("pytest-smoke-*.log.gz"))) == 1
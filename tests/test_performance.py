@@ -0,0 +1,66 @@
+import math
+from pathlib import Path
+
+from app_test_suite.history import HistoryKey, TimingHistory
+from app_test_suite.performance import PerformanceResult, compare_performance, read_performance_results
+
+
+def _key(chart_version: str) -> HistoryKey:
+    return HistoryKey(chart="hello-world", chart_version=chart_version, test_type="performance", cluster_type="kind")
+
+
+def test_results_file_is_read_line_by_line(tmp_path: Path) -> None:
+    results_file = tmp_path / "results.jsonl"
+    results_file.write_text(
+        '{"name": "latency_p99", "value": 120, "unit": "ms"}\n'
+        "\n"
+        "not json\n"
+        '{"name": "throughput", "value": "fast"}\n'
+        '{"value": 1}\n'
+        '{"name": "throughput", "value": 900, "unit": "rps", "higher_is_better": true, "threshold": 0.2}\n'
+        '{"name": "latency_p99", "value": 110, "unit": "ms"}\n'
+    )
+
+    results = read_performance_results(str(results_file))
+
+    # invalid lines are skipped and a metric reported twice keeps its last value
+    assert results == [
+        PerformanceResult("latency_p99", 110.0, "ms"),
+        PerformanceResult("throughput", 900.0, "rps", higher_is_better=True, threshold=0.2),
+    ]
+    assert read_performance_results(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_regressions_depend_on_the_direction_and_threshold() -> None:
+    results = [
+        PerformanceResult("latency_p99", 115.0),
+        PerformanceResult("latency_p50", 20.0),
+        PerformanceResult("throughput", 700.0, higher_is_better=True, threshold=0.5),
+        PerformanceResult("errors", 1.0),
+        PerformanceResult("new_metric", 1.0),
+    ]
+    baseline = {"latency_p99": 100.0, "latency_p50": 10.0, "throughput": 1000.0, "errors": 0.0}
+
+    comparisons = {c.result.name: c for c in compare_performance(results, baseline, 0.1)}
+
+    assert comparisons["latency_p99"].change == 0.15 and comparisons["latency_p99"].regressed
+    assert comparisons["latency_p50"].regressed
+    # throughput dropping by 30% is within its own threshold
+    assert math.isclose(comparisons["throughput"].change or 0, 0.3) and not comparisons["throughput"].regressed
+    assert comparisons["errors"].change == math.inf and comparisons["errors"].regressed
+    assert comparisons["new_metric"].change is None and not comparisons["new_metric"].regressed
+
+
+def test_baseline_is_the_previous_recorded_version(tmp_path: Path) -> None:
+    history = TimingHistory(str(tmp_path / "history.sqlite"))
+    for version, runs in (("0.9.0", [50.0]), ("1.0.0", [100.0, 110.0, 300.0]), ("1.2.0", [90.0])):
+        for value in runs:
+            history.record_performance_results(_key(version), "run", "main", [PerformanceResult("latency_p99", value)])
+
+    # the median of the highest lower version, versions not lower than the one under test are ignored
+    assert history.performance_baseline(_key("1.1.0")) == ("1.0.0", {"latency_p99": 110.0})
+    assert history.performance_baseline(_key("1.1.0"), "0.9.0") == ("0.9.0", {"latency_p99": 50.0})
+    assert history.performance_baseline(_key("0.1.0")) is None
+    assert history.performance_baseline(_key("1.1.0"), "2.0.0") is None
+    # without a semantic version, the most recently recorded other version is used
+    assert history.performance_baseline(_key("main-abc123")) == ("1.2.0", {"latency_p99": 90.0})
@@ -0,0 +1,149 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest.mock import MagicMock
+
+import pykube
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.pod_usage import PodUsageSampler, parse_cpu, parse_memory, summarize_pod_usage, write_pod_usage
+from app_test_suite.junit import OUTCOME_PASSED, JUnitTestCase, write_junit_xml
+from app_test_suite.reports import ReportSettings, aggregate_junit_reports
+
+
+def _response(status_code: int, body: Dict[str, Any]) -> MagicMock:
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = body
+    return response
+
+
+def _pod(name: str, node: str, restarts: List[int]) -> pykube.Pod:
+    return pykube.Pod(
+        None,
+        {
+            "metadata": {"name": name, "namespace": "app"},
+            "spec": {"nodeName": node},
+            "status": {"containerStatuses": [{"restartCount": r} for r in restarts]},
+        },
+    )
+
+
+@pytest.fixture
+def pods(mocker: MockerFixture) -> List[pykube.Pod]:
+    pods = [_pod("app-0", "node-1", [1, 0]), _pod("app-1", "node-2", [0])]
+    mocker.patch("app_test_suite.pod_usage.pykube.Pod.objects").return_value.filter.return_value = pods
+    return pods
+
+
+def test_quantities_are_parsed() -> None:
+    assert parse_cpu("250m") == 0.25
+    assert parse_cpu("1500000n") == pytest.approx(0.0015)
+    assert parse_cpu("2") == 2.0
+    assert parse_memory("128Mi") == 128 * 1024**2
+    assert parse_memory("1G") == 1000**3
+    assert parse_memory("4096") == 4096
+
+
+def test_usage_is_read_from_the_metrics_api(pods: List[pykube.Pod]) -> None:
+    kube_client = MagicMock()
+    kube_client.get.side_effect = [
+        _response(
+            200,
+            {
+                "items": [
+                    {
+                        "metadata": {"name": "app-0"},
+                        "containers": [
+                            {"usage": {"cpu": "100m", "memory": "64Mi"}},
+                            {"usage": {"cpu": "50m", "memory": "16Mi"}},
+                        ],
+                    }
+                ]
+            },
+        ),
+        _response(
+            200,
+            {"items": [{"metadata": {"name": "app-0"}, "containers": [{"usage": {"cpu": "20m", "memory": "96Mi"}}]}]},
+        ),
+    ]
+    sampler = PodUsageSampler(kube_client, "app", 1)
+    sampler.poll()
+    pods[0].obj["status"]["containerStatuses"][1]["restartCount"] = 2
+    sampler.poll()
+
+    summary = summarize_pod_usage(sampler.stop())
+    assert summary == {
+        "app-0": {"peakCpuCores": 0.15, "peakMemoryBytes": 96 * 1024**2, "restarts": 3},
+        # pods without usage yet are still reported with their restarts
+        "app-1": {"peakCpuCores": 0.0, "peakMemoryBytes": 0, "restarts": 0},
+    }
+    kube_client.get.assert_called_with(version="metrics.k8s.io/v1beta1", namespace="app", url="pods")
+
+
+def test_usage_falls_back_to_the_kubelets(pods: List[pykube.Pod]) -> None:
+    def get(**kwargs: Any) -> MagicMock:
+        if kwargs.get("version") == "metrics.k8s.io/v1beta1":
+            return _response(404, {})
+        node = kwargs["url"].split("/")[1]
+        return _response(
+            200,
+            {
+                "pods": [
+                    {
+                        "podRef": {"name": "app-0" if node == "node-1" else "app-1", "namespace": "app"},
+                        "cpu": {"usageNanoCores": 500_000_000},
+                        "memory": {"workingSetBytes": 1024},
+                    },
+                    {"podRef": {"name": "other", "namespace": "kube-system"}, "cpu": {}, "memory": {}},
+                ]
+            },
+        )
+
+    kube_client = MagicMock()
+    kube_client.get.side_effect = get
+    sampler = PodUsageSampler(kube_client, "app", 1)
+    sampler.poll()
+    sampler.poll()
+
+    usage = sampler.stop()
+    assert sorted(usage) == ["app-0", "app-1"]
+    assert usage["app-1"].samples[0][1:] == (0.5, 1024)
+    # the metrics API is only tried once
+    assert [c.kwargs.get("version") for c in kube_client.get.call_args_list].count("metrics.k8s.io/v1beta1") == 1
+
+
+def test_failed_polls_are_logged_once(pods: List[pykube.Pod], caplog: pytest.LogCaptureFixture) -> None:
+    kube_client = MagicMock()
+    kube_client.get.side_effect = ConnectionError("refused")
+    sampler = PodUsageSampler(kube_client, "app", 0.01)
+    sampler.poll()
+    sampler.poll()
+
+    assert sampler.stop() == {}
+    assert len([r for r in caplog.records if r.levelno == logging.WARNING]) == 1
+
+
+def test_usage_is_saved_with_the_reports(tmp_path: Path, pods: List[pykube.Pod]) -> None:
+    kube_client = MagicMock()
+    kube_client.get.return_value = _response(
+        200, {"items": [{"metadata": {"name": "app-0"}, "containers": [{"usage": {"cpu": "1", "memory": "1Ki"}}]}]}
+    )
+    sampler = PodUsageSampler(kube_client, "app", 0.01).start()
+    usage = sampler.stop()
+    settings = ReportSettings(directory=str(tmp_path))
+    write_junit_xml(settings.execution_report_path("smoke"), "smoke", [JUnitTestCase("a", "b", 1.0, OUTCOME_PASSED)])
+    write_pod_usage(settings.pod_usage_path("smoke"), "app", 0.01, usage)
+
+    assert json.loads(Path(settings.pod_usage_path("smoke")).read_text())["pods"]["app-0"]["samples"][0][1:] == [
+        1.0,
+        1024,
+    ]
+    summary = aggregate_junit_reports(str(tmp_path))
+    assert summary is not None
+    assert summary["executions"][0]["podUsage"]["app-0"] == {
+        "peakCpuCores": 1.0,
+        "peakMemoryBytes": 1024,
+        "restarts": 1,
+    }
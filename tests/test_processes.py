@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from app_test_suite.errors import ATSTimeoutError
+from app_test_suite.processes import Deadline, run_and_log, run_and_stream
+
+
+def test_run_and_stream_passes_lines_in_order() -> None:
+    lines: list[str] = []
+
+    return_code = run_and_stream(
+        [sys.executable, "-c", "import sys; print('out'); sys.stdout.flush(); print('err', file=sys.stderr); exit(3)"],
+        lines.append,
+    )
+
+    assert return_code == 3
+    assert lines == ["out", "err"]
+
+
+def _sleeping_command(tmp_path: Path) -> List[str]:
+    # the shell starts a background child that would outlive it if only the shell was killed
+    pid_file = tmp_path / "child.pid"
+    return ["sh", "-c", f"echo started; sleep 30 & echo $! > {pid_file}; wait"]
+
+
+def _assert_child_killed(tmp_path: Path) -> None:
+    pid = int((tmp_path / "child.pid").read_text())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    pytest.fail(f"Child process {pid} is still running.")
+
+
+def test_run_and_stream_kills_process_group_on_timeout(tmp_path: Path) -> None:
+    lines: List[str] = []
+    started = time.monotonic()
+
+    with pytest.raises(ATSTimeoutError, match="timed out after"):
+        run_and_stream(_sleeping_command(tmp_path), lines.append, timeout_sec=0.5)
+
+    assert time.monotonic() - started < 10
+    assert lines == ["started"]
+    _assert_child_killed(tmp_path)
+
+
+def test_run_and_log_kills_process_group_on_timeout(tmp_path: Path) -> None:
+    with pytest.raises(ATSTimeoutError):
+        run_and_log(_sleeping_command(tmp_path), timeout_sec=0.5, capture_output=True)
+
+    _assert_child_killed(tmp_path)
+
+
+def test_run_and_log_with_timeout_returns_result() -> None:
+    result = run_and_log([sys.executable, "-c", "print('done'); exit(2)"], timeout_sec=10, capture_output=True)
+
+    assert (result.returncode, result.stdout) == (2, "done\n")
+
+
+def test_deadline_caps_command_timeouts() -> None:
+    assert Deadline(None).timeout(5) == 5
+    assert Deadline(None).timeout() is None
+    capped = Deadline(1).timeout(60)
+    assert capped is not None and 0 < capped <= 1
+    assert Deadline(60).timeout(5) == 5
+
+    expired = Deadline(0.01, "scenario deadline")
+    time.sleep(0.02)
+    with pytest.raises(ATSTimeoutError, match="scenario deadline of 0.01s expired"):
+        expired.timeout(5)
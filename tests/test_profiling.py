@@ -0,0 +1,53 @@
+import pstats
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app_test_suite.profiling import profiled
+
+
+def _busy_worker(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _busy_main(duration_sec: float) -> None:
+    deadline = time.monotonic() + duration_sec
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_profile_samples_every_thread(tmp_path: Path) -> None:
+    prefix = tmp_path / "profile" / "ats"
+    stop = threading.Event()
+    with profiled(str(prefix), interval_sec=0.001):
+        worker = threading.Thread(target=_busy_worker, args=(stop,), name="diagnostics worker")
+        worker.start()
+        _busy_main(0.2)
+        stop.set()
+        worker.join()
+
+    stacks = [
+        line.rsplit(" ", 1)[0].split(";") for line in (tmp_path / "profile" / "ats.collapsed").read_text().splitlines()
+    ]
+    # every stack starts with its thread, spaces in thread names are replaced to keep the format parseable
+    assert any(s[0] == "MainThread" and "_busy_main" in s[-1] for s in stacks)
+    assert any(s[0] == "diagnostics_worker" and "_busy_worker" in s[-1] for s in stacks)
+    assert not any(s[0] == "ats-profiler" for s in stacks)
+    functions = {func for _, _, func in pstats.Stats(str(prefix) + ".pstats").stats}  # type: ignore[attr-defined]
+    assert "_busy_main" in functions
+
+
+def test_profile_is_written_when_the_block_fails(tmp_path: Path) -> None:
+    with pytest.raises(SystemExit):
+        with profiled(str(tmp_path / "ats")):
+            raise SystemExit(1)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["ats.collapsed", "ats.pstats"]
+
+
+def test_no_profile_without_a_path() -> None:
+    with profiled("") as profiler:
+        assert profiler is None
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from app_test_suite.pytest_plugin.ats_failed_tests import ENV_FAILED_TESTS_FILE
+from app_test_suite.pytest_plugin.ats_test_order import ENV_TEST_ORDER_FILE, junit_test_id
+
+pytest_plugins = ["pytester"]
+
+
+def test_junit_test_id() -> None:
+    assert junit_test_id("tests/test_app.py::test_ok") == ("tests.test_app", "test_ok")
+    assert junit_test_id("test_app.py::TestApp::test_ok[1]") == ("test_app.TestApp", "test_ok[1]")
+
+
+def test_plugin_runs_failed_then_new_then_fastest(pytester: pytest.Pytester, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytester.makepyfile(
+        test_app="""
+        def test_slow(): pass
+        def test_fast(): pass
+        def test_new(): pass
+        def test_failed(): pass
+        """
+    )
+    order_file = pytester.path / "order.json"
+    order_file.write_text(
+        json.dumps(
+            [
+                {"classname": "test_app", "name": "test_slow", "recently_failed": False, "avg_sec": 9.0},
+                {"classname": "test_app", "name": "test_fast", "recently_failed": False, "avg_sec": 0.1},
+                {"classname": "test_app", "name": "test_failed", "recently_failed": True, "avg_sec": 5.0},
+            ]
+        )
+    )
+    monkeypatch.setenv(ENV_TEST_ORDER_FILE, str(order_file))
+
+    result = pytester.runpytest("-p", "app_test_suite.pytest_plugin.ats_test_order", "-v")
+
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(
+        ["*test_failed PASSED*", "*test_new PASSED*", "*test_fast PASSED*", "*test_slow PASSED*"]
+    )
+
+
+def test_failed_tests_plugin_records_node_ids(pytester: pytest.Pytester, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytester.makepyfile(
+        test_app="""
+        import pytest
+
+        def test_ok(): pass
+        def test_bad(): assert False
+
+        @pytest.fixture
+        def broken_teardown():
+            yield
+            raise RuntimeError()
+
+        def test_teardown(broken_teardown): pass
+        """
+    )
+    failed_tests_file = pytester.path / "failed.txt"
+    monkeypatch.setenv(ENV_FAILED_TESTS_FILE, str(failed_tests_file))
+
+    pytester.runpytest("-p", "app_test_suite.pytest_plugin.ats_failed_tests")
+
+    assert failed_tests_file.read_text().splitlines() == ["test_app.py::test_bad", "test_app.py::test_teardown"]
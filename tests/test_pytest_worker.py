@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.errors import ATSTimeoutError
+from app_test_suite.pytest_plugin import ats_worker
+from app_test_suite.pytest_worker import PytestWorker, PytestWorkerError
+from app_test_suite.steps.base import TestExecInfo
+from app_test_suite.steps.executors.pytest import PytestExecutor
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="the warm pytest worker needs os.fork")
+
+_TEST_MODULE = """
+import os
+import sys
+
+import json  # a third-party import in real tests, preloaded by the worker
+
+LEAKED = []
+
+
+def test_env():
+    LEAKED.append(1)
+    os.environ["ATS_LEAKED"] = "1"
+    assert os.environ["ATS_EXPECTED"] == "yes"
+    assert len(LEAKED) == 1
+    print("worker pid", os.getppid())
+
+
+def test_slow():
+    if os.environ.get("ATS_SLOW"):
+        import time
+        time.sleep(30)
+"""
+
+
+@pytest.fixture
+def worker(tmp_path: Path) -> Iterator[PytestWorker]:
+    (tmp_path / "test_worker_sample.py").write_text(_TEST_MODULE)
+    worker = PytestWorker([sys.executable, os.path.abspath(ats_worker.__file__), str(tmp_path)], str(tmp_path), {})
+    yield worker
+    worker.stop()
+
+
+def _env(**extra: str) -> dict:
+    return {"PATH": os.environ.get("PATH", ""), **extra}
+
+
+def test_sessions_run_isolated_in_the_same_worker(worker: PytestWorker, tmp_path: Path) -> None:
+    outputs: List[List[str]] = [[], []]
+
+    for output in outputs:
+        return_code = worker.run(
+            ["-p", "no:cacheprovider", "-s", "-k", "test_env"], _env(ATS_EXPECTED="yes"), str(tmp_path), output.append
+        )
+        assert return_code == 0, output
+
+    # both sessions were forked from the same worker, and neither saw what the other changed
+    pids = [next(line for line in output if "worker pid" in line) for output in outputs]
+    assert pids[0] == pids[1]
+    assert worker.running
+    assert "ATS_LEAKED" not in os.environ
+
+
+def test_failed_session_returns_pytest_exit_code(worker: PytestWorker, tmp_path: Path) -> None:
+    output: List[str] = []
+
+    assert worker.run(["-p", "no:cacheprovider", "-k", "test_env"], _env(), str(tmp_path), output.append) == 1
+    assert any("KeyError" in line for line in output)
+
+
+def test_timed_out_session_kills_worker(worker: PytestWorker, tmp_path: Path) -> None:
+    started = time.monotonic()
+
+    with pytest.raises(ATSTimeoutError, match="timed out after"):
+        worker.run(["-p", "no:cacheprovider", "-k", "test_slow"], _env(ATS_SLOW="1"), str(tmp_path), print, 1)
+
+    assert time.monotonic() - started < 15
+    assert not worker.running
+    # the next session starts a new worker
+    assert worker.run(["-p", "no:cacheprovider", "-k", "test_slow"], _env(), str(tmp_path), print) == 0
+
+
+def test_worker_that_does_not_start_raises(tmp_path: Path) -> None:
+    worker = PytestWorker([sys.executable, "-c", "print('no worker here')"], str(tmp_path), {})
+
+    with pytest.raises(PytestWorkerError, match="exited before it was ready"):
+        worker.run([], _env(), str(tmp_path), print)
+
+
+def test_preload_skips_local_modules(tmp_path: Path) -> None:
+    (tmp_path / "helpers.py").write_text("")
+    (tmp_path / "test_a.py").write_text(
+        "import helpers\nimport pykube.objects\nfrom json import dumps\nfrom . import x\n"
+    )
+
+    assert ats_worker._imported_modules(str(tmp_path)) == {"pykube", "json"}
+
+
+def test_executor_falls_back_to_uv_run_when_worker_fails(mocker: MockerFixture, tmp_path: Path) -> None:
+    worker_run = mocker.patch.object(PytestWorker, "run", side_effect=PytestWorkerError("The worker broke."))
+    run_and_log = mocker.patch("app_test_suite.steps.executors.pytest.run_and_log")
+    run_and_log.return_value.returncode = 0
+    executor = PytestExecutor()
+    executor._use_worker = True
+    exec_info = TestExecInfo(
+        chart_path="chart.tgz",
+        chart_ver="1.0.0",
+        app_config_file_path=None,
+        cluster_type="kind",
+        cluster_version="1.30.0",
+        kube_config_path="kube.config",
+        test_type="smoke",
+        debug=False,
+        junit_report_path=str(tmp_path / "report.xml"),
+    )
+
+    executor.execute_test(exec_info)
+
+    # the worker gets the pytest arguments only, 'uv run pytest' is what it replaces
+    assert worker_run.call_args.args[0][:2] == ["-m", "smoke"]
+    assert run_and_log.call_args.args[0][:3] == ["uv", "run", "pytest"]
+    assert not executor._use_worker
+    executor.cleanup()
@@ -0,0 +1,109 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest.mock import MagicMock
+
+import pykube
+import pytest
+from pytest_mock import MockerFixture
+
+from app_test_suite.junit import OUTCOME_PASSED, JUnitTestCase, write_junit_xml
+from app_test_suite.readiness import measure_readiness, parse_go_duration, summarize_readiness, write_readiness
+from app_test_suite.reports import ReportSettings, aggregate_junit_reports
+
+
+def _pod(name: str, uid: str, owner: Optional[Dict[str, Any]], created: str, ready: Optional[str]) -> pykube.Pod:
+    conditions = [{"type": "PodScheduled", "status": "True", "lastTransitionTime": created}]
+    if ready is not None:
+        conditions.append({"type": "Ready", "status": "True", "lastTransitionTime": ready})
+    return pykube.Pod(
+        None,
+        {
+            "metadata": {
+                "name": name,
+                "uid": uid,
+                "creationTimestamp": created,
+                "labels": {"pod-template-hash": "5d4f8"},
+                "ownerReferences": [owner] if owner else [],
+            },
+            "status": {
+                "conditions": conditions,
+                "containerStatuses": [{"name": "app", "state": {"running": {"startedAt": "2026-01-01T10:00:04Z"}}}],
+            },
+        },
+    )
+
+
+def _pulled(uid: str, message: str) -> pykube.Event:
+    return pykube.Event(
+        None,
+        {
+            "metadata": {"name": f"{uid}.pulled"},
+            "reason": "Pulled",
+            "message": message,
+            "involvedObject": {"kind": "Pod", "uid": uid, "fieldPath": "spec.containers{app}"},
+        },
+    )
+
+
+@pytest.fixture
+def cluster(mocker: MockerFixture) -> List[pykube.Pod]:
+    replica_set = {"kind": "ReplicaSet", "name": "app-5d4f8", "controller": True}
+    pods = [
+        _pod("app-5d4f8-a", "uid-a", replica_set, "2026-01-01T10:00:00Z", "2026-01-01T10:00:06Z"),
+        _pod("app-5d4f8-b", "uid-b", replica_set, "2026-01-01T10:00:02Z", "2026-01-01T10:00:10Z"),
+        _pod("db-0", "uid-c", {"kind": "StatefulSet", "name": "db", "controller": True}, "2026-01-01T10:00:00Z", None),
+    ]
+    events = [
+        _pulled("uid-a", 'Successfully pulled image "app:1.0" in 1m2.5s (1m2.5s including waiting)'),
+        _pulled("uid-b", 'Container image "app:1.0" already present on machine'),
+    ]
+    mocker.patch("app_test_suite.readiness.pykube.Pod.objects").return_value.filter.return_value = pods
+    mocker.patch("app_test_suite.readiness.pykube.Event.objects").return_value.filter.return_value = events
+    return pods
+
+
+def test_go_durations_are_parsed() -> None:
+    assert parse_go_duration("1m2.5s") == 62.5
+    assert parse_go_duration("850ms") == pytest.approx(0.85)
+    assert parse_go_duration("1h") == 3600
+
+
+def test_pod_timings_are_read_from_conditions_and_events(cluster: List[pykube.Pod]) -> None:
+    pods = measure_readiness(MagicMock(), "app")
+
+    assert [(p.pod, p.workload, p.scheduled_sec, p.ready_sec) for p in pods] == [
+        ("app-5d4f8-a", "Deployment/app", 0.0, 6.0),
+        ("app-5d4f8-b", "Deployment/app", 0.0, 8.0),
+        ("db-0", "StatefulSet/db", 0.0, None),
+    ]
+    assert [(c.name, c.started_sec, c.image_pull_sec) for c in pods[0].containers] == [("app", 4.0, 62.5)]
+    assert pods[1].containers[0].image_pull_sec == 0.0
+
+
+def test_pods_running_before_the_deploy_are_skipped(cluster: List[pykube.Pod]) -> None:
+    pods = measure_readiness(MagicMock(), "app", exclude_uids={"uid-a", "uid-c"})
+
+    assert [p.pod for p in pods] == ["app-5d4f8-b"]
+
+
+def test_workloads_are_ready_once_their_last_pod_is(cluster: List[pykube.Pod]) -> None:
+    summary = summarize_readiness(measure_readiness(MagicMock(), "app"))
+
+    # from the creation of the first pod at 10:00:00 to the last pod ready at 10:00:10
+    assert summary["Deployment/app"] == {
+        "pods": 2,
+        "readySec": 10.0,
+        "containers": {"app": {"startedSec": 4.0, "imagePullSec": 62.5}},
+    }
+    assert summary["StatefulSet/db"]["readySec"] is None
+
+
+def test_readiness_is_added_to_the_report_summary(cluster: List[pykube.Pod], tmp_path: Path) -> None:
+    settings = ReportSettings(directory=str(tmp_path))
+    write_junit_xml(settings.execution_report_path("smoke"), "smoke", [JUnitTestCase("t", "a", 1.0, OUTCOME_PASSED)])
+    write_readiness(settings.readiness_path("smoke"), "app", measure_readiness(MagicMock(), "app"))
+
+    summary = aggregate_junit_reports(str(tmp_path))
+
+    assert summary is not None
+    assert summary["executions"][0]["readiness"]["Deployment/app"]["readySec"] == 10.0
@@ -0,0 +1,95 @@
+import json
+import xml.etree.ElementTree as ET  # nosec, test input only
+from pathlib import Path
+
+from app_test_suite.junit import (
+    OUTCOME_FAILED,
+    OUTCOME_FLAKY,
+    OUTCOME_PASSED,
+    JUnitTestCase,
+    mark_flaky_tests,
+    read_junit_xml,
+    write_junit_xml,
+)
+from app_test_suite.reports import AGGREGATED_JUNIT_FILE, SUMMARY_FILE, ReportSettings, aggregate_junit_reports
+
+_PYTEST_REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" tests="2">
+<testcase classname="tests.test_app" name="test_ok" time="1.5"/>
+<testcase classname="tests.test_app" name="test_skipped" time="0"><skipped/></testcase>
+</testsuite></testsuites>
+"""
+
+
+def test_execution_report_paths_are_unique_per_stage_and_shard(tmp_path: Path) -> None:
+    settings = ReportSettings(directory=str(tmp_path), shard="1")
+
+    assert settings.execution_report_path("upgrade", "pre_upgrade").endswith("executions/1/upgrade-pre-upgrade.xml")
+    assert settings.execution_report_path("upgrade", "post_upgrade") != settings.execution_report_path(
+        "upgrade", "pre_upgrade"
+    )
+    assert settings.execution_report_path("smoke").endswith("executions/1/smoke-main.xml")
+
+
+def test_aggregate_merges_executions_and_writes_summary(tmp_path: Path) -> None:
+    shard_0 = ReportSettings(directory=str(tmp_path), shard="0")
+    smoke_report = Path(shard_0.execution_report_path("smoke"))
+    smoke_report.parent.mkdir(parents=True)
+    smoke_report.write_text(_PYTEST_REPORT)
+    write_junit_xml(
+        ReportSettings(directory=str(tmp_path), shard="1").execution_report_path("upgrade", "post_upgrade"),
+        "gotest-upgrade",
+        [
+            JUnitTestCase("example.com/app", "TestUpgrade", 2.0, OUTCOME_FAILED, "boom"),
+            JUnitTestCase("example.com/app", "TestOther", 0.5, OUTCOME_PASSED),
+        ],
+    )
+
+    summary = aggregate_junit_reports(str(tmp_path))
+
+    assert summary is not None
+    assert (summary["tests"], summary["failures"], summary["skipped"], summary["time"]) == (4, 1, 1, 4.0)
+    assert [e["name"] for e in summary["executions"]] == ["smoke-main-0", "upgrade-post-upgrade-1"]
+    assert summary["executions"][1]["stage"] == "post-upgrade"
+    assert json.loads((tmp_path / SUMMARY_FILE).read_text()) == summary
+    suites = ET.parse(tmp_path / AGGREGATED_JUNIT_FILE).getroot().findall("testsuite")  # nosec
+    assert [s.get("name") for s in suites] == ["smoke-main-0/pytest", "upgrade-post-upgrade-1/example.com/app"]
+
+
+def test_aggregate_without_reports_writes_nothing(tmp_path: Path) -> None:
+    assert aggregate_junit_reports(str(tmp_path)) is None
+    assert not (tmp_path / AGGREGATED_JUNIT_FILE).exists()
+
+
+def test_remove_stale_reports_keeps_other_shards(tmp_path: Path) -> None:
+    for shard in ("0", "1"):
+        report = Path(ReportSettings(directory=str(tmp_path), shard=shard).execution_report_path("smoke"))
+        report.parent.mkdir(parents=True)
+        report.write_text(_PYTEST_REPORT)
+
+    ReportSettings(directory=str(tmp_path), shard="0").remove_stale_reports()
+
+    assert [p.parent.name for p in tmp_path.glob("executions/*/*.xml")] == ["1"]
+
+
+def test_flaky_tests_are_marked_and_counted(tmp_path: Path) -> None:
+    report = ReportSettings(directory=str(tmp_path)).execution_report_path("functional")
+    write_junit_xml(
+        report,
+        "pytest",
+        [
+            JUnitTestCase("tests.test_app", "test_flaky", 1.0, OUTCOME_FAILED, "timeout"),
+            JUnitTestCase("tests.test_app", "test_broken", 1.0, OUTCOME_FAILED, "boom"),
+        ],
+    )
+
+    mark_flaky_tests(report, {("tests.test_app", "test_flaky")})
+
+    assert [case.outcome for case in read_junit_xml(report)] == [OUTCOME_FLAKY, OUTCOME_FAILED]
+    suite = ET.parse(report).getroot().find("testsuite")  # nosec
+    assert suite is not None and suite.get("failures") == "1"
+    flaky = suite.find("testcase[@name='test_flaky']/flakyFailure")
+    assert flaky is not None and flaky.text == "timeout"
+    summary = aggregate_junit_reports(str(tmp_path))
+    assert summary is not None
+    assert (summary["failures"], summary["flaky"]) == (1, 1)
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+
+from app_test_suite.resources import (
+    MAX_DEPLOY_WORKERS,
+    MAX_DIAGNOSTICS_WORKERS,
+    TEST_WORKER_MEMORY_BYTES,
+    ResourceGovernor,
+    ResourceLimits,
+    detect_resource_limits,
+)
+
+
+def _write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _meminfo(tmp_path: Path, available_gib: int) -> str:
+    meminfo = tmp_path / "meminfo"
+    _write(meminfo, f"MemTotal: 67108864 kB\nMemAvailable: {available_gib * 1024 * 1024} kB\n")
+    return str(meminfo)
+
+
+def test_detects_cgroup_v2_limits(tmp_path: Path) -> None:
+    root = tmp_path / "cgroup"
+    _write(tmp_path / "self", "0::/kubepods/pod1/ats\n")
+    _write(root / "kubepods" / "pod1" / "ats" / "cpu.max", "max 100000\n")
+    # the limit of a parent cgroup applies too
+    _write(root / "kubepods" / "pod1" / "cpu.max", "50000 100000\n")
+    _write(root / "kubepods" / "pod1" / "ats" / "memory.max", f"{2 * 1024**3}\n")
+
+    limits = detect_resource_limits(str(root), str(tmp_path / "self"), _meminfo(tmp_path, 32))
+
+    assert limits.cpus == pytest.approx(0.5)
+    assert limits.source == "cgroup"
+    assert limits.memory_bytes == 2 * 1024**3
+
+
+def test_detects_cgroup_v1_limits(tmp_path: Path) -> None:
+    root = tmp_path / "cgroup"
+    _write(tmp_path / "self", "5:memory:/docker/abc\n4:cpu,cpuacct:/docker/abc\n")
+    _write(root / "cpu" / "docker" / "abc" / "cpu.cfs_quota_us", "50000\n")
+    _write(root / "cpu" / "docker" / "abc" / "cpu.cfs_period_us", "100000\n")
+    _write(root / "memory" / "docker" / "abc" / "memory.limit_in_bytes", "9223372036854771712\n")
+
+    limits = detect_resource_limits(str(root), str(tmp_path / "self"), _meminfo(tmp_path, 3))
+
+    assert limits.cpus == pytest.approx(0.5)
+    assert limits.memory_bytes == 3 * 1024**3
+
+
+def test_no_cgroup_falls_back_to_host(tmp_path: Path) -> None:
+    limits = detect_resource_limits(str(tmp_path / "cgroup"), str(tmp_path / "missing"), str(tmp_path / "missing"))
+
+    assert limits.cpus >= 1
+    assert limits.source in ("host", "cpu affinity")
+    assert limits.memory_bytes is None
+
+
+def test_governor_derives_worker_counts() -> None:
+    governor = ResourceGovernor(ResourceLimits(cpus=1.5, memory_bytes=64 * TEST_WORKER_MEMORY_BYTES))
+
+    assert governor.cpus == 2
+    assert governor.test_workers == 2
+    assert governor.diagnostics_workers == 8
+    assert governor.deploy_workers == 4
+    assert ResourceGovernor(ResourceLimits(cpus=64)).diagnostics_workers == MAX_DIAGNOSTICS_WORKERS
+    assert ResourceGovernor(ResourceLimits(cpus=64)).deploy_workers == MAX_DEPLOY_WORKERS
+
+
+def test_governor_limits_test_workers_by_memory() -> None:
+    governor = ResourceGovernor(ResourceLimits(cpus=16, memory_bytes=3 * TEST_WORKER_MEMORY_BYTES))
+    assert governor.test_workers == 3
+
+    assert governor.deploy_workers == 3
+
+    low_memory = ResourceGovernor(ResourceLimits(cpus=16, memory_bytes=TEST_WORKER_MEMORY_BYTES // 2))
+    assert (low_memory.test_workers, low_memory.deploy_workers) == (1, 1)
+
+
+def test_max_workers_caps_every_worker_count() -> None:
+    governor = ResourceGovernor(ResourceLimits(cpus=32, memory_bytes=None), max_workers=3)
+
+    assert (governor.test_workers, governor.diagnostics_workers, governor.deploy_workers) == (3, 3, 3)
@@ -0,0 +1,68 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from app_test_suite.tracing import Tracer, span, start_tracing, stop_tracing
+
+
+@pytest.fixture
+def tracer() -> Iterator[Tracer]:
+    yield start_tracing()
+    stop_tracing()
+
+
+def _spans(tracer: Tracer) -> List[Dict[str, Any]]:
+    return [e for e in tracer.events if e["ph"] == "X"]
+
+
+def test_spans_nest_and_record_errors(tracer: Tracer) -> None:
+    with span("scenario", "scenario"):
+        with span("deploy", "deploy", release="app"):
+            pass
+        with pytest.raises(ValueError):
+            with span("tests", "test"):
+                raise ValueError("boom")
+
+    deploy, tests, scenario = _spans(tracer)
+    assert [deploy["name"], tests["name"], scenario["name"]] == ["deploy", "tests", "scenario"]
+    assert deploy["args"] == {"release": "app"}
+    assert tests["args"] == {"error": "ValueError: boom"}
+    # nested spans are within their parent, on the same track
+    assert scenario["ts"] <= deploy["ts"] and deploy["ts"] + deploy["dur"] <= scenario["ts"] + scenario["dur"]
+    assert deploy["tid"] == scenario["tid"]
+
+
+def test_every_thread_gets_a_named_track(tracer: Tracer) -> None:
+    def work() -> None:
+        with span("call", "diagnostics"):
+            pass
+
+    threads = [threading.Thread(target=work, name=f"ats-diagnostics_{i}") for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({e["tid"] for e in _spans(tracer)}) == 2
+    thread_names = {e["args"]["name"] for e in tracer.events if e["name"] == "thread_name"}
+    assert thread_names == {"ats-diagnostics_0", "ats-diagnostics_1"}
+
+
+def test_span_does_nothing_without_tracer() -> None:
+    stop_tracing()
+    with span("ignored"):
+        pass
+
+
+def test_write_chrome_trace(tracer: Tracer, tmp_path: Path) -> None:
+    with span("run"):
+        pass
+
+    tracer.write(str(tmp_path / "traces" / "ats.json"))
+
+    trace = json.loads((tmp_path / "traces" / "ats.json").read_text())
+    assert trace["displayTimeUnit"] == "ms"
+    assert [e["name"] for e in trace["traceEvents"] if e["ph"] == "X"] == ["run"]